@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+# ─────────────────────────────────────────────
+#  QUERY BENCHMARKS
+# ─────────────────────────────────────────────
+
+# Times the queries behind the heaviest handlers against a database built by
+# seed.py, the way pytest-benchmark would: warm-up, N rounds, min / median /
+# mean / stddev per scenario, plus the per-repo-method split. Baselines are
+# JSON files under .benchmarks/; --compare fails when a median regresses.
+#
+#     python seed.py /tmp/bench.db
+#     python benchmark.py /tmp/bench.db --save before
+#     ... change a query or an index ...
+#     python benchmark.py /tmp/bench.db --compare before
+#
+# Without a path the database comes from DATABASE_URL / DB_PATH as usual, so
+# the same scenarios can be timed on PostgreSQL.
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".benchmarks")
+
+ROUNDS    = 20
+WARMUP    = 2
+TOLERANCE = 0.25   # a median more than 25% over baseline fails --compare
+NOISE_MS  = 0.5    # ...unless it moved by less than this; sub-ms timings jitter
+
+SEARCH_KEYWORD = "older 004"
+SUPER_ADMIN    = 10   # seed.py makes admin 10 the super admin
+ADMIN          = 11
+
+
+def _env(path: str | None) -> None:
+    """Point config.py at the benchmark database before anything imports it."""
+    if path:
+        os.environ["DB_PATH"]      = path
+        os.environ["DATABASE_URL"] = ""
+    os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+    os.environ.setdefault("ADMIN_ID", str(SUPER_ADMIN))
+
+
+# ─────────────────────────────────────────────
+#  SCENARIOS
+# ─────────────────────────────────────────────
+
+def scenarios() -> dict:
+    """Handler name -> callable running the same repo calls as the handler."""
+    from repos import (
+        adminRepo, banRepo, broadcastRepo, fileRepo, folderRepo, inboxRepo,
+        linkRepo, logRepo, mediaRepo, subscriberRepo, trendingRepo,
+    )
+
+    def stats():
+        subscriberRepo.count(); folderRepo.count(); fileRepo.count(); logRepo.count()
+        logRepo.countSince("-1 day"); adminRepo.count(); banRepo.count(); broadcastRepo.count()
+        linkRepo.countActive(); linkRepo.countExpired(); linkRepo.countRevoked()
+        logRepo.topFolder(); mediaRepo.storageTotals(); mediaRepo.duplicateRefs()
+
+    def quota():
+        folderRepo.largest(20); mediaRepo.storageTotals()
+
+    def trending():
+        trendingRepo.publicSnapshot()
+
+    def inbox(recipient):
+        inboxRepo.counts(recipient)
+        inboxRepo.messages(recipient, 20)
+        if recipient is None:
+            adminRepo.directory()
+
+    return {
+        "statsCallback":                stats,
+        "cmdSearch":                    lambda: folderRepo.search(SEARCH_KEYWORD),
+        "cmdQuota":                     quota,
+        "viewTrendingCallback":         trending,
+        "userMessagesCallback (super)": lambda: inbox(None),
+        "userMessagesCallback (admin)": lambda: inbox(ADMIN),
+    }
+
+
+def _invalidateAll() -> None:
+    import repos
+    for value in vars(repos).values():
+        if isinstance(value, repos.Repo):
+            value.invalidate()
+
+
+def run(rounds: int = ROUNDS, warmup: int = WARMUP, only: str = None) -> dict:
+    """{scenario: {min, max, mean, median, stddev, rounds, queries}} in milliseconds."""
+    from repos import queryStats
+
+    results = {}
+    for name, fn in scenarios().items():
+        if only and only not in name:
+            continue
+        for _ in range(warmup):
+            _invalidateAll()
+            fn()
+        before  = {row[0]: row[1:] for row in queryStats()}
+        timings = []
+        for _ in range(rounds):
+            _invalidateAll()  # cached lookups would hide the query cost
+            started = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = {}
+        for method, calls, total, _ in queryStats():
+            prevCalls, prevTotal, _ = before.get(method, (0, 0.0, 0.0))
+            if calls > prevCalls:
+                queries[method] = round((total - prevTotal) * 1000 / rounds, 3)
+        results[name] = {
+            "min":     round(min(timings), 3),
+            "max":     round(max(timings), 3),
+            "mean":    round(statistics.mean(timings), 3),
+            "median":  round(statistics.median(timings), 3),
+            "stddev":  round(statistics.stdev(timings), 3) if rounds > 1 else 0.0,
+            "rounds":  rounds,
+            "queries": dict(sorted(queries.items(), key=lambda kv: kv[1], reverse=True)),
+        }
+    return results
+
+
+# ─────────────────────────────────────────────
+#  BASELINES
+# ─────────────────────────────────────────────
+
+def _tableCounts() -> dict:
+    from config import conn
+    tables = ["subscribers", "folders", "files", "links", "logs", "user_messages", "trending"]
+    return {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in tables}
+
+
+def _baselinePath(name: str) -> str:
+    return name if name.endswith(".json") else os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def save(name: str, results: dict) -> str:
+    path = _baselinePath(name)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "created":    datetime.now().isoformat(timespec="seconds"),
+            "machine":    {"python": platform.python_version(), "system": platform.platform()},
+            "dataset":    _tableCounts(),
+            "benchmarks": results,
+        }, f, indent=2)
+    return path
+
+
+def compare(name: str, results: dict, tolerance: float = TOLERANCE) -> list[str]:
+    """Print current vs baseline medians; return the scenarios that regressed."""
+    with open(_baselinePath(name), encoding="utf-8") as f:
+        baseline = json.load(f)["benchmarks"]
+    regressed = []
+    print(f"\n{'scenario':<32} {'baseline':>10} {'now':>10} {'change':>8}")
+    for scenario, now in results.items():
+        old = baseline.get(scenario)
+        if not old:
+            print(f"{scenario:<32} {'-':>10} {now['median']:>9.2f}ms {'new':>8}")
+            continue
+        change = now["median"] / old["median"] - 1 if old["median"] else 0.0
+        slower = change > tolerance and now["median"] - old["median"] > NOISE_MS
+        flag   = "  REGRESSED" if slower else ""
+        print(f"{scenario:<32} {old['median']:>8.2f}ms {now['median']:>8.2f}ms {change:>+7.0%}{flag}")
+        if flag:
+            regressed.append(scenario)
+    return regressed
+
+
+def _report(results: dict) -> None:
+    rounds = next(iter(results.values()))["rounds"] if results else 0
+    print(f"{'scenario':<32} {'min':>9} {'median':>9} {'mean':>9} {'stddev':>9}   (ms, {rounds} rounds)")
+    for name, r in results.items():
+        print(f"{name:<32} {r['min']:>9.2f} {r['median']:>9.2f} {r['mean']:>9.2f} {r['stddev']:>9.2f}")
+        for method, ms in list(r["queries"].items())[:3]:
+            print(f"    {method:<36} {ms:>8.2f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Time the heaviest handler queries.")
+    parser.add_argument("path", nargs="?", help="SQLite database built by seed.py")
+    parser.add_argument("--rounds", type=int, default=ROUNDS)
+    parser.add_argument("-k", dest="only", help="only scenarios whose name contains this")
+    parser.add_argument("--save", metavar="NAME", help="write results to .benchmarks/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="fail if a median regressed against NAME")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    if args.path and not os.path.exists(args.path):
+        parser.error(f"{args.path} does not exist — build it with seed.py first")
+    _env(args.path)
+    results = run(args.rounds, only=args.only)
+    _report(results)
+
+    if args.save:
+        print(f"\nSaved baseline {save(args.save, results)}")
+    if args.compare:
+        regressed = compare(args.compare, results, args.tolerance)
+        if regressed:
+            print(f"\n{len(regressed)} scenario(s) more than {args.tolerance:.0%} slower than {args.compare}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import time
+
+from config import ADMIN_ID, CAPTURE_UPDATES, CAPTURE_SALT
+from helpers import isAdmin
+
+# ─────────────────────────────────────────────
+#  UPDATE CAPTURE
+# ─────────────────────────────────────────────
+
+# With CAPTURE_UPDATES set, every incoming update is appended to that file as
+# one JSON line: {"t": arrival time, "role": "super" | "admin" | "user",
+# "update": Update.to_dict()}. replay.py feeds the file back through the
+# handlers.
+#
+# Identities are anonymised before anything is written: user and chat ids map
+# to stable aliases, and names, usernames and phone numbers are replaced. User
+# ids inside callback data get the same aliases, so replayed buttons still
+# point at the right user. Text the bot wrote (the message a button sits under,
+# button labels) names users and is replaced. Text users send is kept, because
+# commands, link tokens and typed inputs decide which handler runs.
+
+SUPER_ALIAS = 1   # the super admin always becomes this id; replay.py runs with ADMIN_ID=1
+
+_IDENTITY_KEYS = {"from", "chat", "user", "forward_from", "sender_chat", "via_bot", "sender_user"}
+_salt          = (CAPTURE_SALT or os.urandom(16).hex()).encode()
+_file          = None
+
+# Callback data whose trailing number is a user id (see the patterns in main.py)
+_USER_CALLBACK = re.compile(
+    r"^((?:admin_info|ban_info|cancel_delivery|contact_select|quickban|quickunban"
+    r"|remove_admin|sub_info|sub_revoke|unban)_|(?:otp_gen|replyto|userreply)_\d+_)(\d+)$"
+)
+_BOT_TEXT_KEYS = {"text", "caption", "entities", "caption_entities"}
+
+
+def alias(realId: int) -> int:
+    """Stable anonymous id with the sign of the original (negative ids are groups and channels)."""
+    if realId == ADMIN_ID:
+        return SUPER_ALIAS
+    digest = hmac.new(_salt, str(abs(realId)).encode(), hashlib.sha256).digest()
+    value  = 1_000_000 + int.from_bytes(digest[:5], "big")
+    return -value if realId < 0 else value
+
+
+def _identity(d: dict) -> dict:
+    out = {k: v for k, v in d.items() if k not in ("first_name", "last_name", "username", "title")}
+    if "id" in d:
+        out["id"] = alias(d["id"])
+        if "first_name" in d:
+            out["first_name"] = f"User {out['id']}"
+        if d.get("username"):
+            out["username"] = f"u{out['id']}"
+        if "title" in d:
+            out["title"] = f"Chat {out['id']}"
+    return out
+
+
+def _callbackData(data: str) -> str:
+    match = _USER_CALLBACK.match(data)
+    if not match:
+        return data
+    return f"{match.group(1)}{alias(int(match.group(2)))}"
+
+
+def _button(b: dict) -> dict:
+    out = {**b, "text": "Button"}
+    if "callback_data" in b:
+        out["callback_data"] = _callbackData(b["callback_data"])
+    return out
+
+
+def anonymise(value):
+    """Copy of an Update dict with every identity replaced."""
+    if isinstance(value, list):
+        return [anonymise(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    fromBot = "message_id" in value and (value.get("from") or {}).get("is_bot")
+    out = {}
+    for key, v in value.items():
+        if fromBot and key in _BOT_TEXT_KEYS:
+            if key in ("text", "caption"):
+                out[key] = "(bot message)"
+        elif key == "data" and isinstance(v, str):
+            out[key] = _callbackData(v)
+        elif key == "inline_keyboard":
+            out[key] = [[_button(b) for b in row] for row in v]
+        elif key in _IDENTITY_KEYS and isinstance(v, dict):
+            out[key] = anonymise(_identity(v))
+        elif key == "contact" and isinstance(v, dict):
+            uid = alias(v["user_id"]) if v.get("user_id") else None
+            out[key] = {"phone_number": f"+1000{uid or 0}", "first_name": f"User {uid}", "user_id": uid}
+        elif key == "new_chat_members":
+            out[key] = [_identity(m) for m in v]
+        else:
+            out[key] = anonymise(v)
+    return out
+
+
+async def captureUpdate(update, context) -> None:
+    """TypeHandler callback in group -1: record the update, let the real handlers run."""
+    global _file
+    user = update.effective_user
+    try:
+        if _file is None:
+            _file = open(CAPTURE_UPDATES, "a", encoding="utf-8", buffering=1)
+        role = "user"
+        if user and user.id == ADMIN_ID:
+            role = "super"
+        elif user and isAdmin(user.id):
+            role = "admin"
+        _file.write(json.dumps({
+            "t":      round(time.time(), 3),
+            "role":   role,
+            "update": anonymise(update.to_dict()),
+        }, separators=(",", ":")) + "\n")
+    except Exception as e:
+        logging.error(f"captureUpdate: {e}")
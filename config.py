@@ -17,6 +17,25 @@ if not TOKEN:
 if ADMIN_ID == 0:
     raise ValueError("ADMIN_ID not found in .env")
 
+# Outbound Bot API budget shared by every handler (requests per second).
+# Telegram allows roughly 30/s for bulk sends; keep some headroom.
+OUTBOUND_RATE         = float(os.getenv("OUTBOUND_RATE", "25"))
+OUTBOUND_BURST        = int(os.getenv("OUTBOUND_BURST", "10"))
+OUTBOUND_BULK_BACKOFF = float(os.getenv("OUTBOUND_BULK_BACKOFF", "5"))
+
+# Optional private channel the bot is an admin of. When set, uploads are
+# mirrored there once and delivered with copyMessages (up to 100 per call).
+STORAGE_CHANNEL_ID = int(os.getenv("STORAGE_CHANNEL_ID", "0"))
+
+# Bot API server to talk to instead of api.telegram.org, e.g. a local
+# fakeapi.py instance for load tests (http://127.0.0.1:8081).
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "").rstrip("/")
+
+# Append every incoming update, anonymised, to this JSONL file for replay.py.
+# CAPTURE_SALT keeps the anonymised ids stable across restarts.
+CAPTURE_UPDATES = os.getenv("CAPTURE_UPDATES", "")
+CAPTURE_SALT    = os.getenv("CAPTURE_SALT", "")
+
 BOT_VERSION  = "3.0.0"
 BOT_CODENAME = "Drazeforce"
 START_TIME   = datetime.now()
@@ -56,20 +75,30 @@ else:
     # Local dev — store right next to the source files
     DB_PATH = _LOCAL_FALLBACK
 
-# Make sure the containing directory exists
-_db_dir = os.path.dirname(DB_PATH)
-if _db_dir:
-    os.makedirs(_db_dir, exist_ok=True)
+# DATABASE_URL (postgresql://...) switches to PostgreSQL so several bot
+# workers can share one database; DB_PATH is then ignored.
+DATABASE_URL = os.getenv("DATABASE_URL")
+IS_POSTGRES  = bool(DATABASE_URL)
 
-logging.info(f"Database path: {DB_PATH}")
+if IS_POSTGRES:
+    from db import connectPostgres
+    conn = connectPostgres(DATABASE_URL)
+    logging.info("Database: PostgreSQL")
+else:
+    # Make sure the containing directory exists
+    _db_dir = os.path.dirname(DB_PATH)
+    if _db_dir:
+        os.makedirs(_db_dir, exist_ok=True)
 
-conn   = sqlite3.connect(DB_PATH, check_same_thread=False)
+    logging.info(f"Database path: {DB_PATH}")
 
-# WAL mode — safe concurrent writes, survives crashes
-conn.execute("PRAGMA journal_mode=WAL")
-conn.execute("PRAGMA synchronous=NORMAL")
-conn.execute("PRAGMA foreign_keys=ON")
-conn.commit()
+    conn   = sqlite3.connect(DB_PATH, check_same_thread=False)
+
+    # WAL mode — safe concurrent writes, survives crashes
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.commit()
 
 cursor = conn.cursor()
 
@@ -77,260 +106,10 @@ cursor = conn.cursor()
 #  SCHEMA
 # ─────────────────────────────────────────────
 
-cursor.executescript("""
-PRAGMA journal_mode=WAL;
-PRAGMA foreign_keys=ON;
-
-CREATE TABLE IF NOT EXISTS folders (
-    id                  INTEGER PRIMARY KEY AUTOINCREMENT,
-    name                TEXT UNIQUE,
-    created_at          TEXT,
-    forwardable         INTEGER DEFAULT 1,
-    auto_delete_minutes INTEGER,
-    password            TEXT,
-    note                TEXT,
-    pinned              INTEGER DEFAULT 0,
-    is_secret           INTEGER DEFAULT 0,
-    secret_code         TEXT,
-    otp_required        INTEGER DEFAULT 0,
-    otp_expiry_minutes  INTEGER
-);
-
-CREATE TABLE IF NOT EXISTS files (
-    id           INTEGER PRIMARY KEY AUTOINCREMENT,
-    folder_id    INTEGER,
-    file_id      TEXT,
-    file_type    TEXT,
-    file_size    INTEGER,
-    uploaded_at  TEXT,
-    text_content TEXT
-);
-
-CREATE TABLE IF NOT EXISTS links (
-    id           INTEGER PRIMARY KEY AUTOINCREMENT,
-    folder_id    INTEGER,
-    token        TEXT,
-    expiry       TEXT,
-    revoked      INTEGER DEFAULT 0,
-    created_at   TEXT,
-    access_count INTEGER DEFAULT 0,
-    single_use   INTEGER DEFAULT 0,
-    used_by      INTEGER,
-    used_at      TEXT
-);
-
-CREATE TABLE IF NOT EXISTS logs (
-    id          INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id     INTEGER,
-    username    TEXT,
-    folder_id   INTEGER,
-    accessed_at TEXT
-);
-
-CREATE TABLE IF NOT EXISTS admins (
-    id             INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id        INTEGER UNIQUE,
-    username       TEXT,
-    added_by       INTEGER,
-    added_at       TEXT,
-    is_super_admin INTEGER DEFAULT 0
-);
-
-CREATE TABLE IF NOT EXISTS subscribers (
-    id             INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id        INTEGER UNIQUE,
-    username       TEXT,
-    first_name     TEXT,
-    subscribed_at  TEXT,
-    last_active    TEXT,
-    banned         INTEGER DEFAULT 0,
-    ban_reason     TEXT,
-    phone_verified INTEGER DEFAULT 0,
-    phone_number   TEXT
-);
-
-CREATE TABLE IF NOT EXISTS broadcasts (
-    id             INTEGER PRIMARY KEY AUTOINCREMENT,
-    broadcast_code TEXT UNIQUE,
-    created_by     INTEGER,
-    created_at     TEXT,
-    scheduled_for  TEXT,
-    password       TEXT,
-    expiry_minutes INTEGER,
-    forwardable    INTEGER DEFAULT 1,
-    total_sent     INTEGER DEFAULT 0,
-    total_failed   INTEGER DEFAULT 0,
-    status         TEXT DEFAULT 'sent'
-);
-
-CREATE TABLE IF NOT EXISTS broadcast_files (
-    id           INTEGER PRIMARY KEY AUTOINCREMENT,
-    broadcast_id INTEGER,
-    file_id      TEXT,
-    file_type    TEXT,
-    text_content TEXT
-);
-
-CREATE TABLE IF NOT EXISTS user_messages (
-    id                 INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id            INTEGER,
-    username           TEXT,
-    first_name         TEXT,
-    message_id         TEXT UNIQUE,
-    sent_at            TEXT,
-    status             TEXT DEFAULT 'unread',
-    viewed_at          TEXT,
-    recipient_admin_id INTEGER,
-    recipient_is_super INTEGER DEFAULT 0
-);
-
-CREATE TABLE IF NOT EXISTS user_message_files (
-    id           INTEGER PRIMARY KEY AUTOINCREMENT,
-    message_id   TEXT,
-    file_id      TEXT,
-    file_type    TEXT,
-    text_content TEXT
-);
-
-CREATE TABLE IF NOT EXISTS banned_users (
-    id        INTEGER PRIMARY KEY AUTOINCREMENT,
-    user_id   INTEGER UNIQUE,
-    username  TEXT,
-    reason    TEXT,
-    banned_at TEXT,
-    banned_by INTEGER
-);
-
-CREATE TABLE IF NOT EXISTS scheduled_broadcasts (
-    id           INTEGER PRIMARY KEY AUTOINCREMENT,
-    job_id       TEXT UNIQUE,
-    created_by   INTEGER,
-    scheduled_at TEXT,
-    created_at   TEXT,
-    status       TEXT DEFAULT 'pending'
-);
-
-CREATE TABLE IF NOT EXISTS pinned_messages (
-    id         INTEGER PRIMARY KEY AUTOINCREMENT,
-    message_id TEXT UNIQUE,
-    content    TEXT,
-    pinned_by  INTEGER,
-    pinned_at  TEXT
-);
-
-CREATE TABLE IF NOT EXISTS polls (
-    id          INTEGER PRIMARY KEY AUTOINCREMENT,
-    question    TEXT,
-    option_a    TEXT,
-    option_b    TEXT,
-    option_c    TEXT,
-    option_d    TEXT,
-    created_by  INTEGER,
-    created_at  TEXT,
-    closes_at   TEXT,
-    status      TEXT DEFAULT 'open',
-    result_sent INTEGER DEFAULT 0
-);
-
-CREATE TABLE IF NOT EXISTS poll_votes (
-    id       INTEGER PRIMARY KEY AUTOINCREMENT,
-    poll_id  INTEGER,
-    user_id  INTEGER,
-    choice   TEXT,
-    voted_at TEXT,
-    UNIQUE(poll_id, user_id)
-);
-
-CREATE TABLE IF NOT EXISTS quotes (
-    id        INTEGER PRIMARY KEY AUTOINCREMENT,
-    text      TEXT,
-    author    TEXT,
-    added_by  INTEGER,
-    added_at  TEXT,
-    last_sent TEXT
-);
-
-CREATE TABLE IF NOT EXISTS trending (
-    id         INTEGER PRIMARY KEY AUTOINCREMENT,
-    folder_id  INTEGER,
-    label      TEXT,
-    added_by   INTEGER,
-    added_at   TEXT,
-    expires_at TEXT,
-    sort_order INTEGER DEFAULT 0
-);
-
-CREATE TABLE IF NOT EXISTS bot_settings (
-    key   TEXT PRIMARY KEY,
-    value TEXT
-);
-
-CREATE TABLE IF NOT EXISTS link_access_log (
-    id          INTEGER PRIMARY KEY AUTOINCREMENT,
-    link_id     INTEGER,
-    folder_id   INTEGER,
-    user_id     INTEGER,
-    username    TEXT,
-    accessed_at TEXT
-);
-
-CREATE TABLE IF NOT EXISTS message_replies (
-    id            INTEGER PRIMARY KEY AUTOINCREMENT,
-    reply_id      TEXT    UNIQUE,
-    message_id    TEXT,
-    from_admin_id INTEGER,
-    to_user_id    INTEGER,
-    content       TEXT,
-    sent_at       TEXT,
-    status        TEXT    DEFAULT 'unread'
-);
-
-CREATE TABLE IF NOT EXISTS message_reply_files (
-    id           INTEGER PRIMARY KEY AUTOINCREMENT,
-    reply_id     TEXT,
-    file_id      TEXT,
-    file_type    TEXT,
-    text_content TEXT
-);
-
-CREATE TABLE IF NOT EXISTS folder_otps (
-    id          INTEGER PRIMARY KEY AUTOINCREMENT,
-    folder_id   INTEGER,
-    user_id     INTEGER,
-    code        TEXT,
-    created_at  TEXT,
-    expires_at  TEXT,
-    status      TEXT DEFAULT 'pending'
-);
-
-CREATE TABLE IF NOT EXISTS shortened_links (
-    id           INTEGER PRIMARY KEY AUTOINCREMENT,
-    short_code   TEXT UNIQUE,
-    original_url TEXT,
-    created_by   INTEGER,
-    created_at   TEXT,
-    clicks       INTEGER DEFAULT 0
-);
-
-CREATE INDEX IF NOT EXISTS idx_folder_name      ON folders(name);
-CREATE INDEX IF NOT EXISTS idx_link_token       ON links(token);
-CREATE INDEX IF NOT EXISTS idx_admin_user       ON admins(user_id);
-CREATE INDEX IF NOT EXISTS idx_logs_folder      ON logs(folder_id);
-CREATE INDEX IF NOT EXISTS idx_subscriber_user  ON subscribers(user_id);
-CREATE INDEX IF NOT EXISTS idx_broadcast_code   ON broadcasts(broadcast_code);
-CREATE INDEX IF NOT EXISTS idx_user_message_id  ON user_messages(message_id);
-CREATE INDEX IF NOT EXISTS idx_msg_recipient    ON user_messages(recipient_admin_id);
-CREATE INDEX IF NOT EXISTS idx_banned_user      ON banned_users(user_id);
-CREATE INDEX IF NOT EXISTS idx_poll_votes       ON poll_votes(poll_id, user_id);
-CREATE INDEX IF NOT EXISTS idx_trending         ON trending(folder_id);
-CREATE INDEX IF NOT EXISTS idx_link_access      ON link_access_log(link_id);
-CREATE INDEX IF NOT EXISTS idx_quotes           ON quotes(last_sent);
-CREATE INDEX IF NOT EXISTS idx_reply_msg        ON message_replies(message_id);
-CREATE INDEX IF NOT EXISTS idx_reply_user       ON message_replies(to_user_id);
-CREATE INDEX IF NOT EXISTS idx_reply_files      ON message_reply_files(reply_id);
-CREATE INDEX IF NOT EXISTS idx_otp_folder_user  ON folder_otps(folder_id, user_id);
-CREATE INDEX IF NOT EXISTS idx_otp_status       ON folder_otps(status);
-""")
+# Tables, columns, indexes and triggers are versioned in migrations.py; only
+# pending migrations run, so a warm start is a single version read.
+from migrations import migrate
+migrate(conn)
 
 # Seed super admin
 cursor.execute("""
@@ -339,32 +118,4 @@ cursor.execute("""
 """, (ADMIN_ID, ADMIN_ID, datetime.now().isoformat()))
 conn.commit()
 
-# ── Safe column migrations for pre-existing databases ──────────────────────
-_migrations = [
-    ("user_messages",  "recipient_admin_id",  "INTEGER", "NULL"),
-    ("user_messages",  "recipient_is_super",   "INTEGER", "0"),
-    ("folders",        "note",                 "TEXT",    "NULL"),
-    ("folders",        "pinned",               "INTEGER", "0"),
-    ("folders",        "is_secret",            "INTEGER", "0"),
-    ("folders",        "secret_code",          "TEXT",    "NULL"),
-    ("folders",        "otp_required",         "INTEGER", "0"),
-    ("folders",        "otp_expiry_minutes",   "INTEGER", "NULL"),
-    ("subscribers",    "banned",               "INTEGER", "0"),
-    ("subscribers",    "ban_reason",           "TEXT",    "NULL"),
-    ("subscribers",    "phone_verified",       "INTEGER", "0"),
-    ("subscribers",    "phone_number",         "TEXT",    "NULL"),
-    ("broadcasts",     "scheduled_for",        "TEXT",    "NULL"),
-    ("broadcasts",     "status",               "TEXT",    "'sent'"),
-    ("links",          "single_use",           "INTEGER", "0"),
-    ("links",          "used_by",              "INTEGER", "NULL"),
-    ("links",          "used_at",              "TEXT",    "NULL"),
-    ("quotes",         "author",               "TEXT",    "NULL"),
-]
-for _tbl, _col, _type, _default in _migrations:
-    try:
-        cursor.execute(f"ALTER TABLE {_tbl} ADD COLUMN {_col} {_type} DEFAULT {_default}")
-        conn.commit()
-    except sqlite3.OperationalError:
-        pass  # column already exists — fine
-
-logging.info("Database initialised successfully.")
\ No newline at end of file
+logging.info("Database initialised successfully.")
@@ -0,0 +1,345 @@
+import contextlib
+import functools
+import logging
+import re
+import sqlite3
+
+try:
+    import psycopg2  # type: ignore
+    import psycopg2.extensions  # type: ignore
+    import psycopg2.extras  # type: ignore
+    import psycopg2.pool  # type: ignore
+except ImportError:  # SQLite-only deployments don't need it
+    psycopg2 = None
+
+# ─────────────────────────────────────────────
+#  POSTGRESQL BACKEND
+# ─────────────────────────────────────────────
+
+# Handlers are written against sqlite3: "?" placeholders, INSERT OR IGNORE /
+# REPLACE, datetime('now', ...), cursor.lastrowid and sqlite3 exceptions.
+# PgConnection / PgCursor accept exactly that, so the same handler code runs
+# on either backend. Statements are rewritten once and cached.
+
+POOL_MAX = 5
+
+# Keep datetime(...) comparisons identical to SQLite: text "YYYY-MM-DD HH:MM:SS", UTC for 'now'.
+_SHIMS = """
+CREATE OR REPLACE FUNCTION datetime(t text) RETURNS text AS $$
+    SELECT to_char(
+        CASE WHEN t = 'now' THEN now() AT TIME ZONE 'UTC' ELSE t::timestamp END,
+        'YYYY-MM-DD HH24:MI:SS')
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION datetime(t text, modifier text) RETURNS text AS $$
+    SELECT to_char(
+        (CASE WHEN t = 'now' THEN now() AT TIME ZONE 'UTC' ELSE t::timestamp END) + modifier::interval,
+        'YYYY-MM-DD HH24:MI:SS')
+$$ LANGUAGE sql STABLE;
+"""
+
+# Serialises schema scripts when several workers start at once.
+_SCHEMA_LOCK_KEY = 0x6472617a
+
+_DML       = re.compile(r"^\s*(INSERT|UPDATE|DELETE|REPLACE)\b", re.I)
+_INSERT    = re.compile(r"^\s*INSERT\s+(?:OR\s+(IGNORE|REPLACE)\s+)?INTO\s+(\w+)\s*\(([^)]*)\)", re.I)
+_OR_CLAUSE = re.compile(r"^\s*INSERT\s+OR\s+(?:IGNORE|REPLACE)\s+INTO", re.I)
+_PRAGMA    = re.compile(r"^\s*PRAGMA\b[^;]*;?", re.I | re.M)
+_QUOTED    = re.compile(r"('(?:[^']|'')*')")
+
+
+def _outsideQuotes(sql: str, fn) -> str:
+    """Apply fn to every part of sql that is not inside a '...' literal."""
+    parts = _QUOTED.split(sql)
+    return "".join(p if i % 2 else fn(p) for i, p in enumerate(parts))
+
+
+def _translateDdl(sql: str) -> str:
+    sql = _PRAGMA.sub("", sql)
+    sql = re.sub(r"INTEGER\s+PRIMARY\s+KEY\s+AUTOINCREMENT", "BIGSERIAL PRIMARY KEY", sql, flags=re.I)
+    # Telegram user and chat ids do not fit in a 32-bit INTEGER
+    return re.sub(r"\bINTEGER\b", "BIGINT", sql)
+
+
+@functools.lru_cache(maxsize=1024)
+def translate(sql: str) -> str:
+    """Rewrite one SQLite-dialect statement for psycopg2."""
+    if re.match(r"^\s*(CREATE|ALTER)\s+TABLE", sql, re.I):
+        sql = _translateDdl(sql)
+
+    def rewrite(part: str) -> str:
+        part = part.replace("%", "%%").replace("?", "%s")
+        return re.sub(r"\bLIKE\b", "ILIKE", part)
+
+    body = _outsideQuotes(sql, rewrite).strip().rstrip(";")
+
+    m = _INSERT.match(body)
+    if m and m.group(1):
+        body = _OR_CLAUSE.sub("INSERT INTO", body, count=1)
+        if m.group(1).upper() == "IGNORE":
+            body += " ON CONFLICT DO NOTHING"
+        else:
+            # INSERT OR REPLACE: every caller lists the unique key first
+            cols = [c.strip() for c in m.group(3).split(",")]
+            sets = ", ".join(f"{c} = EXCLUDED.{c}" for c in cols[1:])
+            body += f" ON CONFLICT ({cols[0]}) DO " + (f"UPDATE SET {sets}" if sets else "NOTHING")
+    return body
+
+
+def _mapError(e):
+    """Surface psycopg2 errors as the sqlite3 types the handlers catch."""
+    if isinstance(e, psycopg2.IntegrityError):
+        return sqlite3.IntegrityError(str(e))
+    return sqlite3.OperationalError(str(e))
+
+
+def _numeric(value, cur):
+    # SUM()/AVG() over BIGINT come back as NUMERIC; hand out int/float like sqlite3
+    if value is None:
+        return None
+    return int(value) if value.lstrip("-").isdigit() else float(value)
+
+
+class PgCursor:
+    """sqlite3.Cursor look-alike over a psycopg2 cursor."""
+
+    def __init__(self, conn):
+        self._conn     = conn
+        self._cur      = None
+        self.lastrowid = None
+
+    # ── Execution ────────────────────────────────────────────────────────
+
+    def execute(self, sql: str, params=()):
+        if _PRAGMA.fullmatch(sql.strip()):
+            return self
+        stmt = translate(sql)
+        m    = _INSERT.match(sql)
+        wantId = bool(m) and self._conn.hasId(m.group(2))
+        if wantId:
+            stmt += " RETURNING id"
+        self._run(lambda cur: cur.execute(stmt, tuple(params)), sql)
+        self.lastrowid = None
+        if wantId:
+            row = self._cur.fetchone()
+            self.lastrowid = row[0] if row else None
+        return self
+
+    def executemany(self, sql: str, seq):
+        stmt = translate(sql)
+        self._run(lambda cur: psycopg2.extras.execute_batch(cur, stmt, [tuple(p) for p in seq]), sql)
+        return self
+
+    def executescript(self, script: str):
+        script = _translateDdl(script)
+        self._conn.commit()
+        self._run(
+            lambda cur: cur.execute(
+                f"BEGIN; SELECT pg_advisory_xact_lock({_SCHEMA_LOCK_KEY}); {script}; COMMIT;"
+            ),
+            script,
+            dml=False,
+        )
+        return self
+
+    def _run(self, fn, sql: str, dml: bool = None):
+        conn = self._conn
+        if dml is None:
+            dml = bool(_DML.match(sql))
+        if dml:
+            conn._begin()
+        self._cur = conn._raw.cursor()
+        try:
+            fn(self._cur)
+        except psycopg2.Error as e:
+            # Postgres aborts the whole transaction on error, unlike SQLite
+            conn._abort()
+            raise _mapError(e) from e
+
+    # ── Results ──────────────────────────────────────────────────────────
+
+    @property
+    def rowcount(self) -> int:
+        return self._cur.rowcount if self._cur else -1
+
+    @property
+    def description(self):
+        return self._cur.description if self._cur else None
+
+    def fetchone(self):
+        return self._cur.fetchone() if self._cur and self._cur.description else None
+
+    def fetchall(self):
+        return self._cur.fetchall() if self._cur and self._cur.description else []
+
+    def fetchmany(self, size: int = 100):
+        return self._cur.fetchmany(size) if self._cur and self._cur.description else []
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self) -> None:
+        if self._cur:
+            self._cur.close()
+
+
+class PgConnection:
+    """
+    sqlite3.Connection look-alike backed by a psycopg2 pool. Like the sqlite3
+    module, a transaction is opened implicitly before the first write and
+    held until commit(); reads outside a transaction run in autocommit.
+    """
+
+    def __init__(self, dsn: str, maxConn: int = POOL_MAX):
+        if psycopg2 is None:
+            raise RuntimeError("DATABASE_URL is set but psycopg2 is not installed")
+        self._pool = psycopg2.pool.ThreadedConnectionPool(1, maxConn, dsn)
+        self._raw  = None
+        self._inTx = False
+        self._ids  = {}
+        self._savepoints = []
+        self._connect()
+        self.cursor().executescript(_SHIMS)
+
+    def _connect(self) -> None:
+        if self._raw is not None:
+            self._pool.putconn(self._raw, close=True)
+        self._raw = self._pool.getconn()
+        self._raw.autocommit = True
+        self._inTx = False
+        self._savepoints = []
+        psycopg2.extensions.register_type(
+            psycopg2.extensions.new_type(psycopg2.extensions.DECIMAL.values, "BOT_NUMERIC", _numeric),
+            self._raw,
+        )
+
+    def _begin(self) -> None:
+        if self._raw.closed:
+            logging.warning("PostgreSQL connection lost — reconnecting")
+            self._connect()
+        if not self._inTx:
+            with self._raw.cursor() as cur:
+                cur.execute("BEGIN")
+            self._inTx = True
+
+    def lockSchema(self) -> None:
+        """Open a transaction holding the schema lock until commit(), so concurrent workers migrate one at a time."""
+        self._begin()
+        with self._raw.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (_SCHEMA_LOCK_KEY,))
+
+    def hasId(self, table: str) -> bool:
+        """Whether INSERTs into table can return an id for lastrowid."""
+        table = table.lower()
+        if table not in self._ids:
+            with self._raw.cursor() as cur:
+                cur.execute(
+                    "SELECT 1 FROM information_schema.columns WHERE table_name=%s AND column_name='id'",
+                    (table,),
+                )
+                self._ids[table] = cur.fetchone() is not None
+        return self._ids[table]
+
+    # ── sqlite3.Connection API ───────────────────────────────────────────
+
+    def cursor(self) -> PgCursor:
+        if self._raw.closed:
+            self._connect()
+        return PgCursor(self)
+
+    def execute(self, sql: str, params=()) -> PgCursor:
+        return self.cursor().execute(sql, params)
+
+    def commit(self) -> None:
+        if self._inTx:
+            self._inTx = False
+            with self._raw.cursor() as cur:
+                cur.execute("COMMIT")
+
+    def rollback(self) -> None:
+        if self._inTx:
+            self._inTx = False
+            with self._raw.cursor() as cur:
+                cur.execute("ROLLBACK")
+
+    def _abort(self) -> None:
+        if self._savepoints and self._inTx and not self._raw.closed:
+            # Inside savepoint(): undo just that block and keep the transaction
+            with self._raw.cursor() as cur:
+                cur.execute(f"ROLLBACK TO SAVEPOINT {self._savepoints[-1]}")
+            return
+        self._inTx = False
+        if not self._raw.closed:
+            with self._raw.cursor() as cur:
+                cur.execute("ROLLBACK")
+
+    def close(self) -> None:
+        self._pool.closeall()
+
+    # ── Streaming ────────────────────────────────────────────────────────
+
+    def stream(self, sql: str, params=(), size: int = 500):
+        """Yield rows through a server-side cursor on a separate pooled connection."""
+        raw = self._pool.getconn()
+        try:
+            raw.autocommit = False
+            with raw.cursor(name="bot_stream") as cur:
+                cur.itersize = size
+                cur.execute(translate(sql), tuple(params))
+                yield from cur
+        except psycopg2.Error as e:
+            raise _mapError(e) from e
+        finally:
+            raw.rollback()
+            self._pool.putconn(raw)
+
+
+def connectPostgres(dsn: str) -> PgConnection:
+    return PgConnection(dsn)
+
+
+# ─────────────────────────────────────────────
+#  BACKEND-NEUTRAL HELPERS
+# ─────────────────────────────────────────────
+
+@contextlib.contextmanager
+def savepoint(conn, name: str):
+    """
+    Run a block of writes that can fail on its own. On error only the block's
+    writes are undone and the error is re-raised; other handlers' pending
+    writes on the shared connection are left for their own commit. Nothing is
+    committed here. The block must not await, or another handler's writes
+    could land inside the savepoint.
+    """
+    pg = isinstance(conn, PgConnection)
+    if pg:
+        conn._begin()
+        conn._savepoints.append(name)
+    conn.execute(f"SAVEPOINT {name}")
+    try:
+        yield
+    except Exception:
+        conn.execute(f"ROLLBACK TO SAVEPOINT {name}")
+        raise
+    finally:
+        conn.execute(f"RELEASE SAVEPOINT {name}")
+        if pg:
+            conn._savepoints.pop()
+
+
+def iterRows(conn, sql: str, params=(), size: int = 500):
+    """
+    Iterate a large result without loading it all at once: a server-side
+    cursor on PostgreSQL, fetchmany batches on SQLite.
+    """
+    if isinstance(conn, PgConnection):
+        yield from conn.stream(sql, params, size)
+        return
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    with contextlib.closing(cur):
+        while True:
+            rows = cur.fetchmany(size)
+            if not rows:
+                return
+            yield from rows
@@ -0,0 +1,82 @@
+import asyncio
+import itertools
+import logging
+import time
+from datetime import datetime
+
+# ─────────────────────────────────────────────
+#  DELIVERY REGISTRY
+# ─────────────────────────────────────────────
+
+# In-flight folder deliveries, keyed by a per-process delivery id. Entries are
+# added when sending starts and always removed when it ends — finished,
+# cancelled or failed — so nothing lingers the way bot_data flags did.
+
+_active = {}
+_ids    = itertools.count(1)
+
+
+class Delivery:
+    """One folder being sent to one user."""
+
+    def __init__(self, user, folderName: str, total: int):
+        self.id         = next(_ids)
+        self.userId     = user.id
+        self.username   = user.username
+        self.folderName = folderName
+        self.total      = total
+        self.sentIds    = []
+        self.startedAt  = datetime.now()
+        self.cancelled  = False
+        self.error      = None
+        self.task       = None
+        self._started   = time.monotonic()
+
+    @property
+    def sent(self) -> int:
+        return len(self.sentIds)
+
+    def rate(self) -> float:
+        """Messages per second since the delivery started."""
+        elapsed = time.monotonic() - self._started
+        return self.sent / elapsed if elapsed > 0 else 0.0
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+
+async def runDelivery(user, folderName: str, total: int, coro) -> Delivery:
+    """
+    Run coro (a sendItems(...) call writing into delivery.sentIds) as a
+    tracked task. Returns the delivery however it ends, so whatever went out
+    can still be auto-deleted: delivery.cancelled is set if the user
+    cancelled, delivery.error if sending failed.
+    """
+    delivery = Delivery(user, folderName, total)
+    _active[delivery.id] = delivery
+    try:
+        delivery.task = asyncio.create_task(coro(delivery.sentIds))
+        await delivery.task
+    except asyncio.CancelledError:
+        if not delivery.cancelled:
+            raise
+    except Exception as e:
+        logging.error(f"delivery {delivery.id} uid={delivery.userId}: {e}")
+        delivery.error = e
+    finally:
+        _active.pop(delivery.id, None)
+    return delivery
+
+
+def cancelForUser(userId: int) -> int:
+    """Stop every in-flight delivery to a user. Returns how many were stopped."""
+    matches = [d for d in _active.values() if d.userId == userId]
+    for d in matches:
+        d.cancel()
+    return len(matches)
+
+
+def activeDeliveries() -> list:
+    return sorted(_active.values(), key=lambda d: d.id)
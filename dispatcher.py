@@ -0,0 +1,194 @@
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import logging
+import time
+
+from telegram.error import RetryAfter  # type: ignore
+from telegram.ext import BaseRateLimiter  # type: ignore
+
+from config import OUTBOUND_RATE, OUTBOUND_BURST, OUTBOUND_BULK_BACKOFF
+
+# ─────────────────────────────────────────────
+#  LANES
+# ─────────────────────────────────────────────
+
+# Lower value = higher priority.
+INTERACTIVE = 0   # menus, safeEdit, query.answer — anything a user is waiting on
+DELIVERY    = 1   # folder / broadcast / preview content for one user
+BULK        = 2   # fan-out to every subscriber (broadcasts, QOTD, polls)
+
+LANE_NAMES = {INTERACTIVE: "interactive", DELIVERY: "delivery", BULK: "bulk"}
+
+# These endpoints are always answers to a tap, whatever lane the caller is in.
+_INTERACTIVE_ENDPOINTS = {
+    "answerCallbackQuery",
+    "editMessageText",
+    "editMessageReplyMarkup",
+}
+
+_currentLane = contextvars.ContextVar("outbound_lane", default=INTERACTIVE)
+
+
+@contextlib.contextmanager
+def outboundLane(lane: int):
+    """Route every Bot API call made inside the block through the given lane."""
+    token = _currentLane.set(lane)
+    try:
+        yield
+    finally:
+        _currentLane.reset(token)
+
+
+# ─────────────────────────────────────────────
+#  PRIORITY RATE LIMITER
+# ─────────────────────────────────────────────
+
+class PriorityRateLimiter(BaseRateLimiter):
+    """
+    Shared token bucket for all outbound requests. Waiting requests are
+    released strictly by lane, and bulk traffic is throttled to a quarter of
+    the budget while interactive traffic has been seen recently.
+
+    Callers pick a lane with ``outboundLane(...)`` or by passing
+    ``rate_limit_args={"lane": BULK}`` to an ExtBot method.
+    """
+
+    def __init__(
+        self,
+        rate: float = OUTBOUND_RATE,
+        burst: int = OUTBOUND_BURST,
+        bulkBackoff: float = OUTBOUND_BULK_BACKOFF,
+        maxRetries: int = 3,
+    ):
+        self._rate        = rate
+        self._burst       = burst
+        self._bulkBackoff = bulkBackoff
+        self._maxRetries  = maxRetries
+
+        self._tokens          = float(burst)
+        self._updated         = time.monotonic()
+        self._lastInteractive = 0.0
+        self._nextBulkAt      = 0.0
+
+        self._waiters = []
+        self._seq     = itertools.count()
+        self._wakeup  = None
+        self._pump    = None
+
+        self._sent   = {lane: 0 for lane in LANE_NAMES}
+        self._queued = {lane: 0 for lane in LANE_NAMES}
+
+    async def initialize(self) -> None:
+        if self._pump:
+            return   # Application and Updater both initialize the bot
+        self._wakeup = asyncio.Event()
+        self._pump   = asyncio.create_task(self._pumpLoop())
+
+    async def shutdown(self) -> None:
+        if self._pump:
+            self._pump.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._pump
+            self._pump = None
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.cancel()
+
+    # ── Public stats (bot status screen) ──────────────────────────────────
+
+    def stats(self) -> dict:
+        return {
+            LANE_NAMES[lane]: {"sent": self._sent[lane], "waiting": self._queued[lane]}
+            for lane in LANE_NAMES
+        }
+
+    # ── Token bucket ──────────────────────────────────────────────────────
+
+    def _refill(self, now: float) -> None:
+        self._tokens  = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def _bulkThrottled(self, now: float) -> bool:
+        return now - self._lastInteractive < self._bulkBackoff and now < self._nextBulkAt
+
+    async def _acquire(self, lane: int) -> None:
+        now = time.monotonic()
+        if lane == INTERACTIVE:
+            self._lastInteractive = now
+
+        # Fast path: nothing queued ahead of us and a token is available
+        self._refill(now)
+        if not self._waiters and self._tokens >= 1 and not (lane == BULK and self._bulkThrottled(now)):
+            self._take(lane, now)
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (lane, next(self._seq), fut))
+        self._queued[lane] += 1
+        self._wakeup.set()
+        try:
+            await fut
+        finally:
+            self._queued[lane] -= 1
+
+    def _take(self, lane: int, now: float) -> None:
+        self._tokens -= 1
+        self._sent[lane] += 1
+        if lane == BULK and now - self._lastInteractive < self._bulkBackoff:
+            self._nextBulkAt = now + 4 / self._rate
+
+    async def _pumpLoop(self) -> None:
+        while True:
+            if not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            self._refill(now)
+            lane, _, fut = self._waiters[0]
+
+            if fut.done():
+                heapq.heappop(self._waiters)
+                continue
+
+            if self._tokens < 1:
+                delay = (1 - self._tokens) / self._rate
+            elif lane == BULK and self._bulkThrottled(now):
+                delay = self._nextBulkAt - now
+            else:
+                heapq.heappop(self._waiters)
+                self._take(lane, now)
+                fut.set_result(None)
+                continue
+
+            # Sleep until a token frees up, or wake early if a higher lane arrives
+            self._wakeup.clear()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+
+    # ── BaseRateLimiter ───────────────────────────────────────────────────
+
+    def _laneFor(self, endpoint: str, rate_limit_args) -> int:
+        if endpoint in _INTERACTIVE_ENDPOINTS:
+            return INTERACTIVE
+        if isinstance(rate_limit_args, dict) and "lane" in rate_limit_args:
+            return rate_limit_args["lane"]
+        return _currentLane.get()
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        lane = self._laneFor(endpoint, rate_limit_args)
+        for attempt in range(self._maxRetries + 1):
+            await self._acquire(lane)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == self._maxRetries:
+                    raise
+                # Only this request waits — other lanes keep flowing
+                logging.info(f"{endpoint} ({LANE_NAMES[lane]}) rate limited, retrying in {e.retry_after}s")
+                await asyncio.sleep(e.retry_after + 0.1)
@@ -0,0 +1,143 @@
+import heapq
+import itertools
+import logging
+import sqlite3
+from datetime import datetime, timedelta
+
+from config import conn
+from db import savepoint
+from fanout import sendBulk
+from repos import linkRepo, otpRepo, trendingRepo
+
+# A failed database write is retried after this many seconds.
+RETRY_DELAY = 60
+
+
+# ─────────────────────────────────────────────
+#  EXPIRY SCHEDULER
+# ─────────────────────────────────────────────
+
+# Everything with a deadline sits in one min-heap of (expires_at, seq, kind,
+# key), and a single JobQueue job is armed for the head of the heap. When it
+# fires, every entry that is due is expired in one targeted write per kind —
+# by primary key, so no table is swept — and the job is re-armed for the next
+# deadline.
+#
+#   trending  trending.id        row deleted
+#   link      links.id           row deleted
+#   otp       folder_otps.id     status set to 'expired' if still pending
+#   messages  (chat_id, ids)     auto-deleted chat messages; memory only
+#
+# Rows are loaded from their tables at startup, so a restart loses nothing
+# but pending message deletions. Entries whose row has since been removed
+# simply match nothing.
+
+_EXPIRE = {
+    "trending": trendingRepo.deleteIds,
+    "link":     linkRepo.deleteIds,
+    "otp":      otpRepo.expire,
+}
+
+_heap     = []
+_seq      = itertools.count()
+_jobQueue = None
+_timer    = None
+_armedAt  = None
+
+
+def _push(at: datetime, kind: str, key) -> None:
+    heapq.heappush(_heap, (at, next(_seq), kind, key))
+
+
+def _arm() -> None:
+    """Make sure the job fires at the earliest deadline."""
+    global _timer, _armedAt
+    if _jobQueue is None or not _heap:
+        return
+    at = _heap[0][0]
+    if _armedAt is not None and _armedAt <= at:
+        return
+    if _timer:
+        _timer.schedule_removal()
+    _armedAt = at
+    # Deadlines are naive local time; a delay avoids JobQueue reading them as UTC
+    _timer   = _jobQueue.run_once(_expiryJob, max(0.0, (at - datetime.now()).total_seconds()))
+
+
+def expireAt(kind: str, key, at) -> None:
+    """Expire a row at `at` (datetime or ISO string). Call once the row is committed."""
+    try:
+        at = at if isinstance(at, datetime) else datetime.fromisoformat(at)
+    except (TypeError, ValueError):
+        logging.warning(f"expireAt {kind} {key}: unreadable deadline {at!r}")
+        return
+    _push(at, kind, key)
+    _arm()
+
+
+def deleteMessagesLater(chatId: int, messageIds: list, delay: int) -> None:
+    """Delete messages from a chat after `delay` seconds."""
+    if messageIds:
+        expireAt("messages", (chatId, tuple(messageIds)), datetime.now() + timedelta(seconds=delay))
+
+
+def loadExpiries(jobQueue) -> int:
+    """Startup: queue every row with a deadline and arm the job. Returns how many."""
+    global _jobQueue, _timer, _armedAt
+    _jobQueue = jobQueue
+    _timer    = _armedAt = None
+    _heap.clear()
+    for kind, rows in (
+        ("trending", trendingRepo.expiries()),
+        ("link",     linkRepo.expiries()),
+        ("otp",      otpRepo.expiries()),
+    ):
+        for rowId, expiresAt in rows:
+            try:
+                _push(datetime.fromisoformat(expiresAt), kind, rowId)
+            except (TypeError, ValueError):
+                logging.warning(f"{kind} {rowId} has an unreadable expiry; left to the daily sweep")
+    _arm()
+    return len(_heap)
+
+
+# ─────────────────────────────────────────────
+#  JOBS
+# ─────────────────────────────────────────────
+
+async def _deleteMessages(bot, chatId: int, messageIds: list) -> None:
+    for i in range(0, len(messageIds), 100):
+        await bot.delete_messages(chatId, messageIds[i:i + 100])
+
+
+async def _expiryJob(context):
+    global _timer, _armedAt
+    _timer = _armedAt = None
+    now    = datetime.now()
+    due    = {}
+    while _heap and _heap[0][0] <= now:
+        _, _, kind, key = heapq.heappop(_heap)
+        due.setdefault(kind, []).append(key)
+    messages = due.pop("messages", [])
+
+    if due:
+        try:
+            with savepoint(conn, "expire_due"):
+                for kind, keys in due.items():
+                    _EXPIRE[kind](keys)
+            conn.commit()
+            logging.info("Expired " + ", ".join(f"{len(keys)} {kind}" for kind, keys in due.items()))
+        except sqlite3.Error as e:
+            logging.error(f"expiryJob: {e}")
+            for kind, keys in due.items():
+                for key in keys:
+                    _push(now + timedelta(seconds=RETRY_DELAY), kind, key)
+    _arm()
+
+    if messages:
+        byChat = {}
+        for chatId, ids in messages:
+            byChat.setdefault(chatId, []).extend(ids)
+        await sendBulk(
+            list(byChat), lambda chatId: _deleteMessages(context.bot, chatId, byChat[chatId]), "auto-delete"
+        )
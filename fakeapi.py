@@ -0,0 +1,357 @@
+import asyncio
+import itertools
+import json
+import logging
+import math
+import random
+import time
+from collections import Counter, defaultdict
+
+try:
+    from aiohttp import web  # type: ignore
+except ImportError:  # only needed for load testing
+    web = None
+
+# ─────────────────────────────────────────────
+#  FAKE BOT API
+# ─────────────────────────────────────────────
+
+# A local stand-in for api.telegram.org, good enough to run main.py end to
+# end without Telegram. Point the bot at it with TELEGRAM_API_URL:
+#
+#     python fakeapi.py --port 8081 --latency 0.05 --flood-rate 0.01
+#     TELEGRAM_API_URL=http://127.0.0.1:8081 python main.py
+#
+# Updates are injected with FakeBotApi.push*() (see loadtest.py), or POSTed
+# to /push when running standalone, and served through getUpdates long
+# polling. Every outbound call is recorded so a driver can wait for the bot's
+# reply in a given chat. Methods without an _m_<method> result below simply
+# succeed with result=True.
+
+BOT_ID       = 1_000_000
+BOT_USERNAME = "fake_bot"
+
+# Telegram's documented soft limits: about one message per second in a
+# private chat and about 30 per second overall.
+CHAT_RATE   = 1.0
+CHAT_BURST  = 3
+GLOBAL_RATE = 30.0
+
+# Methods that post a message into a chat and therefore count against limits
+_SENDS = {
+    "sendMessage", "sendPhoto", "sendVideo", "sendDocument", "sendMediaGroup",
+    "copyMessage", "copyMessages", "forwardMessage",
+}
+
+
+class _Bucket:
+    """Token bucket: rate tokens per second, up to burst."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate   = rate
+        self.burst  = burst
+        self.tokens = burst
+        self.stamp  = time.monotonic()
+
+    def take(self) -> float:
+        """Spend one token. Returns 0, or the seconds until one is available."""
+        now         = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp  = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class FakeBotApi:
+    """
+    In-process Bot API server. latency (+/- jitter) is added to every call,
+    floodRate is the chance any send is refused with 429 RetryAfter, and
+    chatRate / globalRate enforce Telegram-like flood limits.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, floodRate: float = 0.0,
+                 retryAfter: int = 1, chatRate: float = CHAT_RATE, chatBurst: float = CHAT_BURST,
+                 globalRate: float = GLOBAL_RATE, seed: int = None):
+        if web is None:
+            raise RuntimeError("fakeapi needs aiohttp: pip install aiohttp")
+        self.latency    = latency
+        self.jitter     = jitter
+        self.floodRate  = floodRate
+        self.retryAfter = retryAfter
+        self.chatRate   = chatRate
+        self.chatBurst  = chatBurst
+
+        self._rnd       = random.Random(seed)
+        self._updates   = []
+        self._updateIds = itertools.count(1)
+        self._msgIds    = defaultdict(lambda: itertools.count(1))
+        self._newUpdate = asyncio.Event()
+        self._chats     = {}
+        self._callbacks = {}   # callback query id -> user id, to attribute answers
+        self._global    = _Bucket(globalRate, globalRate)
+        self._runner    = None
+
+        self.calls      = Counter()
+        self.refused    = Counter()   # method -> 429s returned
+        self.outbox     = defaultdict(list)   # chat id -> [(monotonic time, method, params)]
+        self.polling    = asyncio.Event()
+        self._outboxChanged = asyncio.Condition()
+
+    # ── Lifecycle ────────────────────────────────────────────────────────
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/stats", self._stats)
+        app.router.add_post("/push", self._pushRaw)
+        app.router.add_route("*", "/bot{token}/{method}", self._dispatch)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8081) -> str:
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+    # ── Injecting updates ────────────────────────────────────────────────
+
+    def _push(self, **update) -> int:
+        updateId = next(self._updateIds)
+        self._updates.append({"update_id": updateId, **update})
+        self._newUpdate.set()
+        return updateId
+
+    @staticmethod
+    def userDict(userId: int) -> dict:
+        return {"id": userId, "is_bot": False, "first_name": f"Load {userId}", "username": f"load{userId}"}
+
+    def _message(self, userId: int, **fields) -> dict:
+        return {
+            "message_id": next(self._msgIds[userId]),
+            "date":       int(time.time()),
+            "chat":       {"id": userId, "type": "private", "first_name": f"Load {userId}"},
+            "from":       self.userDict(userId),
+            **fields,
+        }
+
+    def pushText(self, userId: int, text: str) -> int:
+        fields = {"text": text}
+        if text.startswith("/"):
+            fields["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return self._push(message=self._message(userId, **fields))
+
+    def pushContact(self, userId: int, phone: str) -> int:
+        contact = {"phone_number": phone, "first_name": f"Load {userId}", "user_id": userId}
+        return self._push(message=self._message(userId, contact=contact))
+
+    def pushCallback(self, userId: int, data: str, messageId: int = None) -> str:
+        """Press an inline button on the bot's latest message (or messageId) in the user's chat."""
+        callbackId = f"cb{next(self._updateIds)}"
+        if messageId is None:
+            messageId = self.lastMessageId(userId) or 1
+        message = {
+            "message_id": messageId,
+            "date":       int(time.time()),
+            "chat":       {"id": userId, "type": "private"},
+            "from":       {"id": BOT_ID, "is_bot": True, "first_name": "Fake", "username": BOT_USERNAME},
+            "text":       "menu",
+        }
+        self._callbacks[callbackId] = userId
+        self._push(callback_query={
+            "id": callbackId, "from": self.userDict(userId), "chat_instance": str(userId),
+            "data": data, "message": message,
+        })
+        return callbackId
+
+    # ── Observing replies ────────────────────────────────────────────────
+
+    def lastMessageId(self, chatId: int):
+        for _, method, params in reversed(self.outbox[chatId]):
+            if method in _SENDS and "message_id" in params:
+                return params["message_id"]
+        return None
+
+    async def waitForReply(self, chatId: int, since: float, timeout: float = 30.0) -> float | None:
+        """Seconds from since until the bot's first call touching chatId, or None on timeout."""
+        deadline = time.monotonic() + timeout
+        async with self._outboxChanged:
+            while True:
+                for stamp, _, _ in self.outbox[chatId]:
+                    if stamp >= since:
+                        return stamp - since
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                try:
+                    await asyncio.wait_for(self._outboxChanged.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return None
+
+    # ── HTTP ─────────────────────────────────────────────────────────────
+
+    @staticmethod
+    async def _params(request) -> dict:
+        if request.content_type == "application/json":
+            return await request.json()
+        params = {}
+        for key, value in (await request.post()).items():
+            if not isinstance(value, str):
+                params[key] = "<upload>"
+                continue
+            try:
+                params[key] = json.loads(value)
+            except ValueError:
+                params[key] = value
+        return params
+
+    @staticmethod
+    def _ok(result):
+        return web.json_response({"ok": True, "result": result})
+
+    def _tooMany(self, method: str, retryAfter: int):
+        self.refused[method] += 1
+        return web.json_response({
+            "ok": False, "error_code": 429,
+            "description": f"Too Many Requests: retry after {retryAfter}",
+            "parameters": {"retry_after": retryAfter},
+        }, status=429)
+
+    async def _dispatch(self, request):
+        method = request.match_info["method"]
+        params = await self._params(request)
+        self.calls[method] += 1
+
+        if method == "getUpdates":
+            return self._ok(await self._getUpdates(params))
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + self._rnd.uniform(-self.jitter, self.jitter)))
+
+        chatId = params.get("chat_id")
+        if method in _SENDS and chatId is not None:
+            if self.floodRate and self._rnd.random() < self.floodRate:
+                return self._tooMany(method, self.retryAfter)
+            bucket = self._chats.setdefault(chatId, _Bucket(self.chatRate, self.chatBurst))
+            wait   = bucket.take() or self._global.take()
+            if wait:
+                return self._tooMany(method, math.ceil(wait))
+
+        handler = getattr(self, f"_m_{method}", None)
+        result  = handler(params) if handler else True
+        await self._record(method, params, result)
+        return self._ok(result)
+
+    async def _record(self, method: str, params: dict, result) -> None:
+        chatId = params.get("chat_id")
+        if method == "answerCallbackQuery":
+            chatId = self._callbacks.pop(params.get("callback_query_id"), None)
+        if chatId is None:
+            return
+        if isinstance(result, dict) and "message_id" in result:
+            params = {**params, "message_id": result["message_id"]}
+        async with self._outboxChanged:
+            self.outbox[int(chatId)].append((time.monotonic(), method, params))
+            self._outboxChanged.notify_all()
+
+    async def _getUpdates(self, params: dict) -> list:
+        self.polling.set()
+        offset  = int(params.get("offset") or 0)
+        limit   = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates and timeout:
+            self._newUpdate.clear()
+            try:
+                await asyncio.wait_for(self._newUpdate.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    async def _pushRaw(self, request):
+        """POST a raw Update body (without update_id) when running standalone."""
+        return self._ok(self._push(**await request.json()))
+
+    async def _stats(self, request):
+        return web.json_response({"calls": self.calls, "refused": self.refused, "pending": len(self._updates)})
+
+    # ── Method results ───────────────────────────────────────────────────
+
+    def _sent(self, params: dict, **fields) -> dict:
+        chatId = int(params["chat_id"])
+        return {
+            "message_id": next(self._msgIds[chatId]),
+            "date":       int(time.time()),
+            "chat":       {"id": chatId, "type": "private"},
+            "from":       {"id": BOT_ID, "is_bot": True, "first_name": "Fake", "username": BOT_USERNAME},
+            **fields,
+        }
+
+    @staticmethod
+    def _file(fileId, **extra) -> dict:
+        return {"file_id": str(fileId), "file_unique_id": f"u{fileId}", **extra}
+
+    def _m_getMe(self, params):
+        return {
+            "id": BOT_ID, "is_bot": True, "first_name": "Fake", "username": BOT_USERNAME,
+            "can_join_groups": False, "can_read_all_group_messages": False, "supports_inline_queries": False,
+        }
+
+    def _m_sendMessage(self, params):
+        return self._sent(params, text=str(params.get("text", "")))
+
+    def _m_sendPhoto(self, params):
+        return self._sent(params, photo=[self._file(params.get("photo"), width=1280, height=720)])
+
+    def _m_sendVideo(self, params):
+        return self._sent(params, video=self._file(params.get("video"), width=1280, height=720, duration=30))
+
+    def _m_sendDocument(self, params):
+        return self._sent(params, document=self._file(params.get("document")))
+
+    def _m_sendMediaGroup(self, params):
+        return [self._sent(params, photo=[self._file(m.get("media"), width=1280, height=720)])
+                for m in params.get("media", [])]
+
+    def _m_copyMessages(self, params):
+        return [{"message_id": next(self._msgIds[int(params["chat_id"])])} for _ in params.get("message_ids", [])]
+
+    def _m_copyMessage(self, params):
+        return {"message_id": next(self._msgIds[int(params["chat_id"])])}
+
+    def _m_editMessageText(self, params):
+        if "inline_message_id" in params:
+            return True
+        return {**self._sent(params, text=str(params.get("text", ""))), "message_id": int(params["message_id"])}
+
+
+def main() -> None:
+    import argparse
+    parser = argparse.ArgumentParser(description="Run a fake Telegram Bot API server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every call")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="chance a send gets a 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--chat-rate", type=float, default=CHAT_RATE, help="sends per second per chat")
+    parser.add_argument("--global-rate", type=float, default=GLOBAL_RATE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    async def serve():
+        api = FakeBotApi(args.latency, args.jitter, args.flood_rate, args.retry_after,
+                         args.chat_rate, CHAT_BURST, args.global_rate)
+        url = await api.start(args.host, args.port)
+        logging.info(f"Fake Bot API listening on {url} (stats at {url}/stats)")
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
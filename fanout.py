@@ -0,0 +1,60 @@
+import asyncio
+import logging
+import sqlite3
+
+from telegram.error import BadRequest, Forbidden  # type: ignore
+
+from config import conn
+from dispatcher import outboundLane, BULK
+from repos import subscriberRepo
+
+# Sends in flight at once. PriorityRateLimiter still paces the requests
+# themselves; this only keeps enough queued that one slow response does not
+# hold up everyone behind it.
+FANOUT_CONCURRENCY = 20
+
+
+# ─────────────────────────────────────────────
+#  BULK SENDER
+# ─────────────────────────────────────────────
+
+def _isUnreachable(error: Exception) -> bool:
+    """Blocked, deactivated or deleted — retrying next time will fail the same way."""
+    if isinstance(error, Forbidden):
+        return True
+    return isinstance(error, BadRequest) and "chat not found" in error.message.lower()
+
+
+async def sendBulk(userIds, send, label: str = "fan-out") -> tuple[int, int]:
+    """
+    Await send(uid) for every user, FANOUT_CONCURRENCY at a time on the BULK
+    lane. Users who blocked the bot or no longer exist are marked unreachable
+    so later fan-outs skip them. Returns (sent, failed).
+    """
+    pending     = iter(userIds)
+    unreachable = []
+    counts      = {"sent": 0, "failed": 0}
+
+    async def worker():
+        for uid in pending:
+            try:
+                await send(uid)
+                counts["sent"] += 1
+            except Exception as e:
+                counts["failed"] += 1
+                if _isUnreachable(e):
+                    unreachable.append(uid)
+                else:
+                    logging.error(f"{label} uid={uid}: {e}")
+
+    with outboundLane(BULK):
+        await asyncio.gather(*(worker() for _ in range(FANOUT_CONCURRENCY)))
+
+    if unreachable:
+        try:
+            subscriberRepo.markUnreachable(unreachable)
+            conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"sendBulk markUnreachable: {e}")
+        logging.info(f"{label}: {len(unreachable)} subscriber(s) unreachable, skipped from now on")
+    return counts["sent"], counts["failed"]
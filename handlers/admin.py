@@ -5,9 +5,10 @@ from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup  # type: ignore
 from telegram.ext import ContextTypes  # type: ignore
 
-from config import conn, cursor, ADMIN_ID
+from config import conn, ADMIN_ID
 from helpers import isAdmin, isSuperAdmin, safeEdit, fmtDt
 from keyboards import kbAdminPanel, kbHome, kbBack
+from repos import adminRepo, banRepo
 
 
 # ─────────────────────────────────────────────
@@ -60,9 +61,7 @@ async def addAdminCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def listAdminsCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    admins = cursor.execute(
-        "SELECT user_id, username, added_at, is_super_admin FROM admins ORDER BY is_super_admin DESC, added_at ASC"
-    ).fetchall()
+    admins = adminRepo.listAll()
 
     buttons = []
     for userId, username, addedAt, isSuper in admins:
@@ -83,9 +82,7 @@ async def adminInfoCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query  = update.callback_query
     await query.answer()
     userId = int(query.data.replace("admin_info_", ""))
-    row    = cursor.execute(
-        "SELECT user_id, username, added_at, is_super_admin FROM admins WHERE user_id=?", (userId,)
-    ).fetchone()
+    row    = adminRepo.get(userId)
     if not row:
         await safeEdit(query, "Administrator not found.", markup=kbBack("list_admins"))
         return
@@ -110,9 +107,7 @@ async def adminInfoCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def removeAdminCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    admins = cursor.execute(
-        "SELECT user_id, username FROM admins WHERE user_id != ? AND is_super_admin = 0", (ADMIN_ID,)
-    ).fetchall()
+    admins = adminRepo.removable(ADMIN_ID)
     if not admins:
         await safeEdit(
             query,
@@ -140,21 +135,18 @@ async def removeAdminConfirmCallback(update: Update, context: ContextTypes.DEFAU
     userId = int(query.data.replace("remove_admin_", ""))
 
     # Get admin info before deleting
-    adminRow = cursor.execute(
-        "SELECT username FROM admins WHERE user_id=? AND is_super_admin=0", (userId,)
-    ).fetchone()
-    if not adminRow:
+    adminRow = adminRepo.get(userId)
+    if not adminRow or adminRow[3]:
         await safeEdit(query, "Admin not found or cannot be removed.", markup=kbBack("admin_menu"))
         return
 
-    username = adminRow[0]
+    username = adminRow[1]
 
     # Who is doing the demoting
-    demotedByRow  = cursor.execute("SELECT username FROM admins WHERE user_id=?", (query.from_user.id,)).fetchone()
-    demotedByName = (demotedByRow[0] if demotedByRow else None) or f"Admin {query.from_user.id}"
+    demotedByName = adminRepo.displayName(query.from_user.id)
 
     try:
-        cursor.execute("DELETE FROM admins WHERE user_id=? AND is_super_admin=0", (userId,))
+        adminRepo.remove(userId)
         conn.commit()
         displayName = f"@{username}" if username else str(userId)
         await safeEdit(
@@ -203,9 +195,7 @@ async def bannedListCallback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     query = update.callback_query
     await query.answer()
     try:
-        bans = cursor.execute(
-            "SELECT user_id, username, reason, banned_at FROM banned_users ORDER BY banned_at DESC"
-        ).fetchall()
+        bans = banRepo.listAll()
     except sqlite3.Error as e:
         logging.error(f"bannedList: {e}")
         await safeEdit(query, "Failed to load ban list.", markup=kbBack("admin_menu"))
@@ -238,9 +228,7 @@ async def banInfoCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query  = update.callback_query
     await query.answer()
     userId = int(query.data.replace("ban_info_", ""))
-    row    = cursor.execute(
-        "SELECT user_id, username, reason, banned_at FROM banned_users WHERE user_id=?", (userId,)
-    ).fetchone()
+    row    = banRepo.get(userId)
     if not row:
         await safeEdit(query, "Ban record not found.", markup=kbBack("banned_list"))
         return
@@ -265,11 +253,8 @@ async def unbanCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     userId = int(query.data.replace("unban_", ""))
     try:
-        # Remove from both tables
-        cursor.execute("DELETE FROM banned_users WHERE user_id=?", (userId,))
-        cursor.execute(
-            "UPDATE subscribers SET banned=0, ban_reason=NULL WHERE user_id=?", (userId,)
-        )
+        # Removes from both tables
+        banRepo.unban(userId)
         conn.commit()
         await safeEdit(
             query,
@@ -2,12 +2,17 @@ import logging
 import sqlite3
 from datetime import datetime
 
-from telegram import Update  # type: ignore
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup  # type: ignore
 from telegram.ext import ContextTypes  # type: ignore
 
-from config import cursor, START_TIME, BOT_VERSION, BOT_CODENAME
-from helpers import safeEdit, fmtSize, fmtDt, fmtUptime
+from config import START_TIME, BOT_VERSION, BOT_CODENAME
+from helpers import safeEdit, fmtSize, fmtDt, fmtUptime, adminOnly
+from deliveries import activeDeliveries
 from keyboards import kbHome
+from repos import (
+    queryStats, adminRepo, banRepo, broadcastRepo, fileRepo, folderRepo, linkRepo, logRepo, mediaRepo,
+    subscriberRepo,
+)
 
 
 # ─────────────────────────────────────────────
@@ -18,29 +23,20 @@ async def statsCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     try:
-        folderCount  = cursor.execute("SELECT COUNT(*) FROM folders").fetchone()[0]
-        fileCount    = cursor.execute("SELECT COUNT(*) FROM files").fetchone()[0]
-        totalSize    = cursor.execute("SELECT SUM(file_size) FROM files").fetchone()[0] or 0
-        activeLinks  = cursor.execute(
-            "SELECT COUNT(*) FROM links WHERE revoked=0 AND datetime(expiry) > datetime('now')"
-        ).fetchone()[0]
-        expiredLinks = cursor.execute(
-            "SELECT COUNT(*) FROM links WHERE revoked=0 AND datetime(expiry) <= datetime('now')"
-        ).fetchone()[0]
-        revokedLinks = cursor.execute("SELECT COUNT(*) FROM links WHERE revoked=1").fetchone()[0]
-        totalViews   = cursor.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
-        views24h     = cursor.execute(
-            "SELECT COUNT(*) FROM logs WHERE datetime(accessed_at) > datetime('now', '-1 day')"
-        ).fetchone()[0]
-        topFolder    = cursor.execute("""
-            SELECT f.name, COUNT(l.id)
-            FROM folders f LEFT JOIN logs l ON f.id = l.folder_id
-            GROUP BY f.id ORDER BY COUNT(l.id) DESC LIMIT 1
-        """).fetchone()
-        totalSubs   = cursor.execute("SELECT COUNT(*) FROM subscribers").fetchone()[0]
-        bannedCount = cursor.execute("SELECT COUNT(*) FROM banned_users").fetchone()[0]
-        bcCount     = cursor.execute("SELECT COUNT(*) FROM broadcasts").fetchone()[0]
-        adminCount  = cursor.execute("SELECT COUNT(*) FROM admins").fetchone()[0]
+        folderCount  = folderRepo.count()
+        fileCount    = fileRepo.count()
+        uniqueFiles, totalSize = mediaRepo.storageTotals()
+        duplicates   = mediaRepo.duplicateRefs()
+        activeLinks  = linkRepo.countActive()
+        expiredLinks = linkRepo.countExpired()
+        revokedLinks = linkRepo.countRevoked()
+        totalViews   = logRepo.count()
+        views24h     = logRepo.countSince("-1 day")
+        topFolder    = logRepo.topFolder()
+        totalSubs   = subscriberRepo.count()
+        bannedCount = banRepo.count()
+        bcCount     = broadcastRepo.count()
+        adminCount  = adminRepo.count()
     except sqlite3.Error as e:
         logging.error(f"stats: {e}")
         await safeEdit(query, "Failed to load analytics.", markup=kbHome())
@@ -59,6 +55,8 @@ async def statsCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "<b>Content</b>\n"
         f"<code>Folders     :  {folderCount}</code>\n"
         f"<code>Files       :  {fileCount}</code>\n"
+        f"<code>Unique      :  {uniqueFiles}</code>\n"
+        f"<code>Duplicates  :  {duplicates}</code>\n"
         f"<code>Storage     :  {fmtSize(totalSize)}</code>\n\n"
         "<b>Links</b>\n"
         f"<code>Active      :  {activeLinks}</code>\n"
@@ -87,11 +85,7 @@ async def activityCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     try:
-        rows = cursor.execute("""
-            SELECT l.username, l.user_id, f.name, l.accessed_at
-            FROM logs l JOIN folders f ON l.folder_id = f.id
-            ORDER BY l.accessed_at DESC LIMIT 15
-        """).fetchall()
+        rows = logRepo.recent(15)
     except sqlite3.Error as e:
         logging.error(f"activity: {e}")
         await safeEdit(query, "Failed to load activity.", markup=kbHome())
@@ -129,12 +123,26 @@ async def botStatusCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     started = fmtDt(START_TIME.isoformat())
 
     try:
-        db_folders = cursor.execute("SELECT COUNT(*) FROM folders").fetchone()[0]
-        db_files   = cursor.execute("SELECT COUNT(*) FROM files").fetchone()[0]
-        db_subs    = cursor.execute("SELECT COUNT(*) FROM subscribers").fetchone()[0]
+        db_folders = folderRepo.count()
+        db_files   = fileRepo.count()
+        db_subs    = subscriberRepo.count()
     except sqlite3.Error:
         db_folders = db_files = db_subs = "?"
 
+    busiest = queryStats()[:3]
+    queries = ""
+    if busiest:
+        queries = "\n\n<b>Queries</b>"
+        for name, calls, total, slowest in busiest:
+            queries += f"\n<code>{name}  :  {calls}x  |  avg {total / calls * 1000:.1f} ms</code>"
+
+    lanes = ""
+    limiter = context.bot.rate_limiter
+    if limiter and hasattr(limiter, "stats"):
+        lanes = "\n\n<b>Outbound</b>"
+        for name, st in limiter.stats().items():
+            lanes += f"\n<code>{name.capitalize():<11}:  {st['sent']} sent  |  {st['waiting']} waiting</code>"
+
     await safeEdit(
         query,
         "<b>Bot Status</b>\n\n"
@@ -149,7 +157,44 @@ async def botStatusCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"<code>Users     :  {db_subs}</code>\n\n"
         "<b>System</b>\n"
         "<code>Status    :  Online</code>\n"
-        "<code>Polling   :  Active</code>",
-        markup=kbHome(),
+        "<code>Polling   :  Active</code>"
+        f"{lanes}{queries}",
+        markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton(f"Active Deliveries ({len(activeDeliveries())})", callback_data="deliveries")],
+            [InlineKeyboardButton("Main Menu", callback_data="back_main")],
+        ]),
+        parse_mode="HTML",
+    )
+
+
+# ─────────────────────────────────────────────
+#  ACTIVE DELIVERIES
+# ─────────────────────────────────────────────
+
+@adminOnly
+async def deliveriesCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    active = activeDeliveries()
+    if not active:
+        lines = ["<b>Active Deliveries</b>\n\nNo folder deliveries are in progress."]
+    else:
+        lines = [f"<b>Active Deliveries</b>  |  {len(active)}\n"]
+        for d in active:
+            lines.append(
+                f"\n<code>{d.folderName}</code>  →  @{d.username or d.userId}\n"
+                f"<code>Progress  :  {d.sent}/{d.total}</code>\n"
+                f"<code>Rate      :  {d.rate():.1f} msg/s</code>\n"
+                f"<code>Started   :  {fmtDt(d.startedAt.isoformat())}</code>"
+            )
+
+    await safeEdit(
+        query,
+        "\n".join(lines),
+        markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("Refresh", callback_data="deliveries")],
+            [InlineKeyboardButton("Back",    callback_data="bot_status")],
+        ]),
         parse_mode="HTML",
     )
@@ -1,14 +1,16 @@
-import asyncio
 import logging
 import sqlite3
-from datetime import datetime
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup  # type: ignore
 from telegram.ext import ContextTypes  # type: ignore
 
-from config import conn, cursor, ADMIN_ID
-from helpers import safeEdit, generateBroadcastCode, isAdmin, isSuperAdmin, deleteAll
+from config import conn, ADMIN_ID
+from helpers import safeEdit, generateBroadcastCode, isAdmin, isSuperAdmin
+from dispatcher import outboundLane, BULK
+from storage import sendItems
+from expiry import deleteMessagesLater
 from keyboards import kbHome
+from repos import broadcastRepo, mediaRepo, subscriberRepo
 
 
 # ─────────────────────────────────────────────
@@ -130,9 +132,7 @@ async def broadcastPublishCallback(update: Update, context: ContextTypes.DEFAULT
     await query.answer("Sending...", show_alert=False)
 
     try:
-        subscribers = cursor.execute(
-            "SELECT user_id FROM subscribers WHERE banned=0 OR banned IS NULL"
-        ).fetchall()
+        subscribers = subscriberRepo.activeIds()
     except sqlite3.Error as e:
         logging.error(f"broadcastPublish sub: {e}")
         await safeEdit(query, "Database error.", markup=kbHome())
@@ -155,25 +155,23 @@ async def broadcastPublishCallback(update: Update, context: ContextTypes.DEFAULT
     files   = context.user_data.get("broadcast_files", [])
     protect = fwd == 0
     code    = generateBroadcastCode()
+    items   = [
+        (f.get("file_id"), f.get("file_type"), f.get("text_content"), f.get("storage_msg_id"))
+        for f in files
+    ]
 
     try:
-        cursor.execute("""
-            INSERT INTO broadcasts
-                (broadcast_code, created_by, created_at, password, expiry_minutes, forwardable, status)
-            VALUES (?, ?, ?, ?, ?, ?, 'sent')
-        """, (code, query.from_user.id, datetime.now().isoformat(), pwd, expiry, fwd))
-        broadcastId = cursor.lastrowid
-        for f in files:
-            cursor.execute(
-                "INSERT INTO broadcast_files (broadcast_id, file_id, file_type, text_content) VALUES (?, ?, ?, ?)",
-                (broadcastId, f.get("file_id"), f.get("file_type"), f.get("text_content"))
-            )
+        broadcastId = broadcastRepo.create(code, query.from_user.id, pwd, expiry, fwd)
+        mediaRepo.register([f.get("media") for f in files])
+        broadcastRepo.addFiles(broadcastId, files)
         conn.commit()
     except sqlite3.Error as e:
         logging.error(f"broadcastPublish save: {e}")
         await safeEdit(query, "Failed to save broadcast.", markup=kbHome())
         context.user_data.clear()
         return
+    # Cleared now: the admin can use the panel while the broadcast is sent
+    context.user_data.clear()
 
     await safeEdit(
         query,
@@ -184,69 +182,57 @@ async def broadcastPublishCallback(update: Update, context: ContextTypes.DEFAULT
     )
 
     sent = failed = 0
-    for (uid,) in subscribers:
-        if isAdmin(uid):
-            continue
-        try:
-            if pwd:
-                await context.bot.send_message(
-                    chat_id=uid,
-                    text="<b>New Broadcast</b>\n\n"
-                         "You have received a new broadcast message.\n"
-                         "This broadcast is password-protected.\n\n"
-                         "Reply with the password to unlock the content.\n\n"
-                         f"<code>Code  :  {code}</code>",
-                    parse_mode="HTML",
-                )
-            else:
-                sentMsgs = []
-                alert = await context.bot.send_message(
-                    chat_id=uid,
-                    text="<b>New Broadcast</b>\n\n"
-                         "You have a new message from the administrator.",
-                    parse_mode="HTML",
-                )
-                sentMsgs.append(alert)
-
-                if expiry:
-                    m = await context.bot.send_message(
-                        uid,
-                        f"<b>Note</b>\n\n"
-                        f"This content will be automatically deleted in <code>{expiry}</code> minute(s).",
+    with outboundLane(BULK):
+        for uid in subscribers:
+            if isAdmin(uid):
+                continue
+            try:
+                if pwd:
+                    await context.bot.send_message(
+                        chat_id=uid,
+                        text="<b>New Broadcast</b>\n\n"
+                             "You have received a new broadcast message.\n"
+                             "This broadcast is password-protected.\n\n"
+                             "Reply with the password to unlock the content.\n\n"
+                             f"<code>Code  :  {code}</code>",
+                        parse_mode="HTML",
+                    )
+                else:
+                    sentMsgs = []
+                    alert = await context.bot.send_message(
+                        chat_id=uid,
+                        text="<b>New Broadcast</b>\n\n"
+                             "You have a new message from the administrator.",
                         parse_mode="HTML",
                     )
-                    sentMsgs.append(m)
-
-                for f in files:
-                    fid, ftype, txt = f.get("file_id"), f.get("file_type"), f.get("text_content")
-                    if ftype == "text":
-                        m = await context.bot.send_message(uid, txt)
-                    elif ftype == "video":
-                        m = await context.bot.send_video(uid, fid, protect_content=protect, has_spoiler=True)
-                    elif ftype == "photo":
-                        m = await context.bot.send_photo(uid, fid, protect_content=protect, has_spoiler=True)
-                    else:
-                        m = await context.bot.send_document(uid, fid, protect_content=protect)
-                    sentMsgs.append(m)
-
-                if expiry:
-                    asyncio.create_task(deleteAll(sentMsgs, expiry * 60))
-
-            sent += 1
-        except Exception as e:
-            logging.error(f"broadcastPublish uid={uid}: {e}")
-            failed += 1
+                    sentMsgs.append(alert)
+
+                    if expiry:
+                        m = await context.bot.send_message(
+                            uid,
+                            f"<b>Note</b>\n\n"
+                            f"This content will be automatically deleted in <code>{expiry}</code> minute(s).",
+                            parse_mode="HTML",
+                        )
+                        sentMsgs.append(m)
+
+                    sentIds = await sendItems(context.bot, uid, items, protect)
+
+                    if expiry:
+                        sentIds = [m.message_id for m in sentMsgs] + sentIds
+                        deleteMessagesLater(uid, sentIds, expiry * 60)
+
+                sent += 1
+            except Exception as e:
+                logging.error(f"broadcastPublish uid={uid}: {e}")
+                failed += 1
 
     try:
-        cursor.execute(
-            "UPDATE broadcasts SET total_sent=?, total_failed=? WHERE id=?",
-            (sent, failed, broadcastId)
-        )
+        broadcastRepo.setTotals(broadcastId, sent, failed)
         conn.commit()
     except sqlite3.Error:
         pass
 
-    context.user_data.clear()
     await safeEdit(
         query,
         f"<b>Broadcast Complete</b>\n\n"
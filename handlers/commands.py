@@ -6,8 +6,13 @@ from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup  # type: ignore
 from telegram.ext import ContextTypes  # type: ignore
 
-from config import cursor, conn, START_TIME, BOT_VERSION, ADMIN_ID
+from config import conn, START_TIME, BOT_VERSION, ADMIN_ID
 from helpers import isAdmin, isSuperAdmin, isBanned, fmtSize, fmtDt, fmtUptime
+from dispatcher import outboundLane, BULK
+from repos import (
+    adminRepo, banRepo, fileRepo, folderRepo, linkRepo, logRepo, mediaRepo, pollRepo, settingsRepo,
+    subscriberRepo, trendingRepo,
+)
 from keyboards import kbHome, kbUser
 
 
@@ -61,36 +66,19 @@ async def cmdStats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not isAdmin(update.effective_user.id):
         return
     try:
-        fc        = cursor.execute("SELECT COUNT(*) FROM folders").fetchone()[0]
-        fil       = cursor.execute("SELECT COUNT(*) FROM files").fetchone()[0]
-        totalSize = cursor.execute("SELECT SUM(file_size) FROM files").fetchone()[0] or 0
-        sub       = cursor.execute("SELECT COUNT(*) FROM subscribers").fetchone()[0]
-        newSubs   = cursor.execute(
-            "SELECT COUNT(*) FROM subscribers WHERE datetime(subscribed_at) > datetime('now', '-1 day')"
-        ).fetchone()[0]
-        lnk       = cursor.execute(
-            "SELECT COUNT(*) FROM links WHERE revoked=0 AND datetime(expiry) > datetime('now')"
-        ).fetchone()[0]
-        opens     = cursor.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
-        opens24h  = cursor.execute(
-            "SELECT COUNT(*) FROM logs WHERE datetime(accessed_at) > datetime('now', '-1 day')"
-        ).fetchone()[0]
-        banned    = cursor.execute("SELECT COUNT(*) FROM banned_users").fetchone()[0]
-        topToday  = cursor.execute("""
-            SELECT f.name, COUNT(l.id) as cnt FROM folders f
-            JOIN logs l ON f.id = l.folder_id
-            WHERE datetime(l.accessed_at) > datetime('now', '-1 day')
-            GROUP BY f.id ORDER BY cnt DESC LIMIT 1
-        """).fetchone()
-        topAll    = cursor.execute("""
-            SELECT f.name, COUNT(l.id) as cnt FROM folders f
-            JOIN logs l ON f.id = l.folder_id
-            GROUP BY f.id ORDER BY cnt DESC LIMIT 1
-        """).fetchone()
-        activePolls = cursor.execute("SELECT COUNT(*) FROM polls WHERE status='open'").fetchone()[0]
-        trending    = cursor.execute(
-            "SELECT COUNT(*) FROM trending WHERE datetime(expires_at) > datetime('now')"
-        ).fetchone()[0]
+        fc        = folderRepo.count()
+        fil       = fileRepo.count()
+        uniq, totalSize = mediaRepo.storageTotals()
+        sub       = subscriberRepo.count()
+        newSubs   = subscriberRepo.countJoinedSince("-1 day")
+        lnk       = linkRepo.countActive()
+        opens     = logRepo.count()
+        opens24h  = logRepo.countSince("-1 day")
+        banned    = banRepo.count()
+        topToday  = logRepo.topFolder(since="-1 day")
+        topAll    = logRepo.topFolder()
+        activePolls = pollRepo.count("open")
+        trending    = trendingRepo.countActive()
     except sqlite3.Error as e:
         await update.message.reply_text(f"Database error: {e}")
         return
@@ -102,7 +90,7 @@ async def cmdStats(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "<b>Analytics Dashboard</b>\n\n"
         "<b>Content</b>\n"
         f"<code>Folders      :  {fc}</code>\n"
-        f"<code>Files        :  {fil}</code>\n"
+        f"<code>Files        :  {fil}  ({uniq} unique)</code>\n"
         f"<code>Storage      :  {fmtSize(totalSize)}</code>\n\n"
         "<b>Links</b>\n"
         f"<code>Active links :  {lnk}</code>\n\n"
@@ -152,15 +140,7 @@ async def cmdSearch(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     keyword = " ".join(context.args).strip()
     try:
-        results = cursor.execute("""
-            SELECT f.id, f.name, COUNT(fi.id), f.created_at,
-                   (SELECT COUNT(*) FROM links WHERE folder_id=f.id
-                    AND revoked=0 AND datetime(expiry) > datetime('now')) as active_links
-            FROM folders f
-            LEFT JOIN files fi ON f.id = fi.folder_id
-            WHERE f.name LIKE ?
-            GROUP BY f.id ORDER BY f.created_at DESC
-        """, (f"%{keyword}%",)).fetchall()
+        results = folderRepo.search(keyword)
     except sqlite3.Error:
         await update.message.reply_text("Database error during search.")
         return
@@ -188,13 +168,9 @@ async def cmdQuota(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not isAdmin(update.effective_user.id):
         return
     try:
-        rows  = cursor.execute("""
-            SELECT f.name, COUNT(fi.id), COALESCE(SUM(fi.file_size), 0)
-            FROM folders f
-            LEFT JOIN files fi ON f.id = fi.folder_id
-            GROUP BY f.id ORDER BY SUM(fi.file_size) DESC LIMIT 20
-        """).fetchall()
-        total = cursor.execute("SELECT COALESCE(SUM(file_size), 0) FROM files").fetchone()[0]
+        rows  = folderRepo.largest(20)
+        # A file shared by several folders is listed under each, but counted once here
+        _, total = mediaRepo.storageTotals()
     except sqlite3.Error:
         await update.message.reply_text("Failed to load quota data.")
         return
@@ -215,10 +191,7 @@ async def cmdPurge(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not isAdmin(update.effective_user.id):
         return
     try:
-        cursor.execute("DELETE FROM links WHERE datetime(expiry) <= datetime('now') AND revoked=0")
-        expired = cursor.rowcount
-        cursor.execute("DELETE FROM links WHERE revoked=1")
-        revoked = cursor.rowcount
+        expired, revoked = linkRepo.purge()
         conn.commit()
     except sqlite3.Error:
         await update.message.reply_text("Failed to purge links.")
@@ -237,44 +210,48 @@ async def cmdPurge(update: Update, context: ContextTypes.DEFAULT_TYPE):
 #  /export
 # ─────────────────────────────────────────────
 
+def _csvExport(header: list, rows) -> tuple[io.BytesIO, int]:
+    """Write streamed rows to CSV as they arrive, rather than fetching them all first."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(header)
+    count  = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return io.BytesIO(output.getvalue().encode()), count
+
+
 async def cmdExport(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not isAdmin(update.effective_user.id):
         return
     export_type = context.args[0].lower() if context.args else "subscribers"
     if export_type == "subscribers":
         try:
-            rows = cursor.execute(
-                "SELECT user_id, username, first_name, subscribed_at, last_active, banned FROM subscribers"
-            ).fetchall()
+            file_bytes, count = _csvExport(
+                ["user_id", "username", "first_name", "subscribed_at", "last_active", "banned"],
+                subscriberRepo.streamAll(),
+            )
         except sqlite3.Error:
             await update.message.reply_text("Failed to export subscriber data.")
             return
-        output          = io.StringIO()
-        writer          = csv.writer(output)
-        writer.writerow(["user_id", "username", "first_name", "subscribed_at", "last_active", "banned"])
-        writer.writerows(rows)
-        file_bytes      = io.BytesIO(output.getvalue().encode())
         file_bytes.name = f"subscribers_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
         await update.message.reply_document(
             file_bytes,
-            caption=f"<b>Subscriber Export</b>\n\n{len(rows)} records exported.",
+            caption=f"<b>Subscriber Export</b>\n\n{count} records exported.",
             parse_mode="HTML",
         )
     elif export_type == "logs":
         try:
-            rows = cursor.execute(
-                "SELECT user_id, username, folder_id, accessed_at FROM logs ORDER BY accessed_at DESC LIMIT 1000"
-            ).fetchall()
+            file_bytes, count = _csvExport(
+                ["user_id", "username", "folder_id", "accessed_at"],
+                logRepo.streamRecent(1000),
+            )
         except sqlite3.Error:
             await update.message.reply_text("Failed to export logs.")
             return
-        output          = io.StringIO()
-        writer          = csv.writer(output)
-        writer.writerow(["user_id", "username", "folder_id", "accessed_at"])
-        writer.writerows(rows)
-        file_bytes      = io.BytesIO(output.getvalue().encode())
         file_bytes.name = f"logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        await update.message.reply_document(file_bytes, caption=f"<b>Log Export</b>\n\n{len(rows)} records.", parse_mode="HTML")
+        await update.message.reply_document(file_bytes, caption=f"<b>Log Export</b>\n\n{count} records.", parse_mode="HTML")
     else:
         await update.message.reply_text(
             "<b>Export</b>\n\nUsage:\n<code>/export subscribers</code>\n<code>/export logs</code>",
@@ -291,9 +268,9 @@ async def cmdStatus(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     uptime = fmtUptime(START_TIME)
     try:
-        db_folders = cursor.execute("SELECT COUNT(*) FROM folders").fetchone()[0]
-        db_files   = cursor.execute("SELECT COUNT(*) FROM files").fetchone()[0]
-        db_subs    = cursor.execute("SELECT COUNT(*) FROM subscribers").fetchone()[0]
+        db_folders = folderRepo.count()
+        db_files   = fileRepo.count()
+        db_subs    = subscriberRepo.count()
     except sqlite3.Error:
         db_folders = db_files = db_subs = "?"
     await update.message.reply_text(
@@ -331,20 +308,21 @@ async def cmdPin(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     text    = " ".join(context.args)
-    senders = cursor.execute("SELECT user_id FROM subscribers WHERE banned=0 OR banned IS NULL").fetchall()
+    senders = subscriberRepo.activeIds()
     sent = failed = 0
-    for (uid,) in senders:
-        if isAdmin(uid):
-            continue
-        try:
-            await context.bot.send_message(
-                chat_id=uid,
-                text=f"<b>Announcement</b>\n\n{text}",
-                parse_mode="HTML",
-            )
-            sent += 1
-        except Exception:
-            failed += 1
+    with outboundLane(BULK):
+        for uid in senders:
+            if isAdmin(uid):
+                continue
+            try:
+                await context.bot.send_message(
+                    chat_id=uid,
+                    text=f"<b>Announcement</b>\n\n{text}",
+                    parse_mode="HTML",
+                )
+                sent += 1
+            except Exception:
+                failed += 1
     await update.message.reply_text(
         f"<b>Announcement Sent</b>\n\n<code>Delivered  :  {sent}</code>\n<code>Failed     :  {failed}</code>",
         parse_mode="HTML",
@@ -370,21 +348,19 @@ async def cmdNote(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     folderName = context.args[0]
     noteText   = " ".join(context.args[1:])
-    folder     = cursor.execute("SELECT id, name FROM folders WHERE name=?", (folderName,)).fetchone()
-    if not folder:
-        folder = cursor.execute(
-            "SELECT id, name FROM folders WHERE LOWER(name)=LOWER(?)", (folderName,)
-        ).fetchone()
-    if not folder:
+    folderId   = folderRepo.idByName(folderName)
+    if folderId is None:
+        folderId = folderRepo.idByName(folderName, ignoreCase=True)
+    if folderId is None:
         await update.message.reply_text(
             f"<b>Folder Not Found</b>\n\n<code>{folderName}</code> does not exist.\n\nUse /search to find the exact name.",
             parse_mode="HTML",
             reply_markup=kbHome(),
         )
         return
-    folderId, exactName = folder
+    exactName = folderRepo.name(folderId)
     if noteText.upper() == "CLEAR":
-        cursor.execute("UPDATE folders SET note=NULL WHERE id=?", (folderId,))
+        folderRepo.setNote(folderId, None)
         conn.commit()
         await update.message.reply_text(
             f"<b>Note Cleared</b>\n\n<code>{exactName}</code>",
@@ -392,7 +368,7 @@ async def cmdNote(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=kbHome(),
         )
     else:
-        cursor.execute("UPDATE folders SET note=? WHERE id=?", (noteText, folderId))
+        folderRepo.setNote(folderId, noteText)
         conn.commit()
         await update.message.reply_text(
             f"<b>Note Saved</b>\n\n"
@@ -411,8 +387,7 @@ async def cmdWelcome(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not isSuperAdmin(update.effective_user.id):
         return
     if not context.args:
-        current = cursor.execute("SELECT value FROM bot_settings WHERE key='welcome_message'").fetchone()
-        current_text = current[0] if current else "<i>Using default welcome message</i>"
+        current_text = settingsRepo.get("welcome_message", "<i>Using default welcome message</i>")
         await update.message.reply_text(
             f"<b>Welcome Message</b>\n\n<b>Current:</b>\n{current_text}\n\n"
             "<b>Usage:</b>\n<code>/welcome new message text</code>\n<code>/welcome RESET</code>  — restore default",
@@ -422,7 +397,7 @@ async def cmdWelcome(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     text = " ".join(context.args)
     if text.upper() == "RESET":
-        cursor.execute("DELETE FROM bot_settings WHERE key='welcome_message'")
+        settingsRepo.delete("welcome_message")
         conn.commit()
         await update.message.reply_text(
             "<b>Welcome Message Reset</b>\n\nDefault greeting restored.",
@@ -430,9 +405,7 @@ async def cmdWelcome(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=kbHome(),
         )
     else:
-        cursor.execute(
-            "INSERT OR REPLACE INTO bot_settings (key, value) VALUES ('welcome_message', ?)", (text,)
-        )
+        settingsRepo.set("welcome_message", text)
         conn.commit()
         await update.message.reply_text(
             f"<b>Welcome Message Updated</b>\n\nPreview:\n\n{text}",
@@ -457,12 +430,7 @@ async def cmdLinkinfo(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     token = context.args[0].strip()
     try:
-        link = cursor.execute("""
-            SELECT l.id, l.folder_id, f.name, l.expiry, l.revoked, l.single_use,
-                   l.used_by, l.used_at, l.created_at, l.access_count
-            FROM links l JOIN folders f ON l.folder_id = f.id
-            WHERE l.token=?
-        """, (token,)).fetchone()
+        link = linkRepo.details(token)
     except sqlite3.Error as e:
         await update.message.reply_text(f"Database error: {e}")
         return
@@ -483,15 +451,11 @@ async def cmdLinkinfo(update: Update, context: ContextTypes.DEFAULT_TYPE):
         status = "Active"
     if singleUse and usedBy:
         status = "Used (single-use redeemed)"
-        usedByRow = cursor.execute(
-            "SELECT username, first_name FROM subscribers WHERE user_id=?", (usedBy,)
-        ).fetchone()
+        usedByRow = subscriberRepo.name(usedBy)
         usedByLabel = f"@{usedByRow[0]}" if usedByRow and usedByRow[0] else (usedByRow[1] if usedByRow else str(usedBy))
     else:
         usedByLabel = "N/A"
-    unique = cursor.execute(
-        "SELECT COUNT(DISTINCT user_id) FROM link_access_log WHERE link_id=?", (lid,)
-    ).fetchone()[0]
+    unique = linkRepo.uniqueUsers(lid)
     await update.message.reply_text(
         f"<b>Link Inspector</b>\n\n"
         f"<code>Token      :  {token[:16]}...</code>\n"
@@ -517,14 +481,7 @@ async def cmdBlock(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not isSuperAdmin(update.effective_user.id):
         return
     try:
-        users = cursor.execute("""
-            SELECT s.user_id, s.username, s.first_name,
-                   CASE WHEN b.user_id IS NOT NULL THEN 1 ELSE 0 END as is_banned
-            FROM subscribers s
-            LEFT JOIN banned_users b ON s.user_id = b.user_id
-            ORDER BY is_banned DESC, s.subscribed_at DESC
-            LIMIT 30
-        """).fetchall()
+        users = subscriberRepo.withBanState(30)
     except sqlite3.Error as e:
         await update.message.reply_text(f"Database error: {e}")
         return
@@ -562,17 +519,11 @@ async def quickBanCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if userId == ADMIN_ID or isSuperAdmin(userId):
         await query.answer("Cannot ban a super admin.", show_alert=True)
         return
-    row      = cursor.execute("SELECT username, first_name FROM subscribers WHERE user_id=?", (userId,)).fetchone()
+    row      = subscriberRepo.name(userId)
     username = (row[0] if row else None)
     name     = username or (row[1] if row else None) or str(userId)
     try:
-        cursor.execute("""
-            INSERT OR REPLACE INTO banned_users (user_id, username, reason, banned_at, banned_by)
-            VALUES (?, ?, 'Banned via /block', ?, ?)
-        """, (userId, username, datetime.now().isoformat(), query.from_user.id))
-        cursor.execute(
-            "UPDATE subscribers SET banned=1, ban_reason='Banned via /block' WHERE user_id=?", (userId,)
-        )
+        banRepo.ban(userId, username, "Banned via /block", query.from_user.id)
         conn.commit()
     except sqlite3.Error as e:
         await query.answer(f"Failed: {e}", show_alert=True)
@@ -599,11 +550,10 @@ async def quickUnbanCallback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if not isSuperAdmin(query.from_user.id):
         return
     userId = int(query.data.replace("quickunban_", ""))
-    row  = cursor.execute("SELECT username, first_name FROM subscribers WHERE user_id=?", (userId,)).fetchone()
+    row  = subscriberRepo.name(userId)
     name = (row[0] if row else None) or (row[1] if row else None) or str(userId)
     try:
-        cursor.execute("DELETE FROM banned_users WHERE user_id=?", (userId,))
-        cursor.execute("UPDATE subscribers SET banned=0, ban_reason=NULL WHERE user_id=?", (userId,))
+        banRepo.unban(userId)
         conn.commit()
     except sqlite3.Error as e:
         await query.answer(f"Failed: {e}", show_alert=True)
@@ -664,16 +614,17 @@ async def cmdBroadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     text    = " ".join(context.args)
-    targets = cursor.execute("SELECT user_id FROM subscribers WHERE banned=0 OR banned IS NULL").fetchall()
+    targets = subscriberRepo.activeIds()
     sent = failed = 0
-    for (uid,) in targets:
-        if isAdmin(uid):
-            continue
-        try:
-            await context.bot.send_message(uid, f"<b>Broadcast</b>\n\n{text}", parse_mode="HTML")
-            sent += 1
-        except Exception:
-            failed += 1
+    with outboundLane(BULK):
+        for uid in targets:
+            if isAdmin(uid):
+                continue
+            try:
+                await context.bot.send_message(uid, f"<b>Broadcast</b>\n\n{text}", parse_mode="HTML")
+                sent += 1
+            except Exception:
+                failed += 1
     await update.message.reply_text(
         f"<b>Broadcast Complete</b>\n\n<code>Sent    :  {sent}</code>\n<code>Failed  :  {failed}</code>",
         parse_mode="HTML",
@@ -706,16 +657,9 @@ async def cmdBan(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     try:
-        row      = cursor.execute("SELECT username FROM subscribers WHERE user_id=?", (target_id,)).fetchone()
+        row      = subscriberRepo.name(target_id)
         username = row[0] if row else None
-        cursor.execute("""
-            INSERT OR REPLACE INTO banned_users (user_id, username, reason, banned_at, banned_by)
-            VALUES (?, ?, ?, ?, ?)
-        """, (target_id, username, reason, datetime.now().isoformat(), update.effective_user.id))
-        cursor.execute(
-            "UPDATE subscribers SET banned=1, ban_reason=? WHERE user_id=?",
-            (reason, target_id)
-        )
+        banRepo.ban(target_id, username, reason, update.effective_user.id)
         conn.commit()
         await update.message.reply_text(
             f"<b>User Banned</b>\n\n"
@@ -757,8 +701,7 @@ async def cmdUnban(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except ValueError:
         await update.message.reply_text("Invalid user ID. Must be a number.")
         return
-    cursor.execute("DELETE FROM banned_users WHERE user_id=?", (target_id,))
-    cursor.execute("UPDATE subscribers SET banned=0, ban_reason=NULL WHERE user_id=?", (target_id,))
+    banRepo.unban(target_id)
     conn.commit()
     await update.message.reply_text(
         f"<b>User Unbanned</b>\n\n<code>{target_id}</code> removed from ban list.",
@@ -784,10 +727,10 @@ async def cmdUnban(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def cmdMyId(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user   = update.effective_user
     userId = user.id
-    sub              = cursor.execute("SELECT subscribed_at, last_active FROM subscribers WHERE user_id=?", (userId,)).fetchone()
-    banned           = cursor.execute("SELECT reason FROM banned_users WHERE user_id=?", (userId,)).fetchone()
-    folders_accessed = cursor.execute("SELECT COUNT(*) FROM logs WHERE user_id=?", (userId,)).fetchone()[0]
-    admin_row        = cursor.execute("SELECT is_super_admin, added_at FROM admins WHERE user_id=?", (userId,)).fetchone()
+    sub              = subscriberRepo.activity(userId)
+    banned           = banRepo.get(userId)
+    folders_accessed = logRepo.countForUser(userId)
+    admin_row        = adminRepo.get(userId)
     lines = [
         "<b>Your Account</b>\n",
         f"<code>User ID     :  {userId}</code>",
@@ -799,12 +742,12 @@ async def cmdMyId(update: Update, context: ContextTypes.DEFAULT_TYPE):
         lines.append(f"<code>Last active :  {fmtDt(sub[1])}</code>")
     lines.append(f"<code>Folders opened  :  {folders_accessed}</code>")
     if admin_row:
-        role = "Super Admin" if admin_row[0] else "Admin"
+        role = "Super Admin" if admin_row[3] else "Admin"
         lines.append(f"<code>Role        :  {role}</code>")
-        lines.append(f"<code>Admin since :  {fmtDt(admin_row[1])}</code>")
+        lines.append(f"<code>Admin since :  {fmtDt(admin_row[2])}</code>")
     if banned:
         lines.append(f"\n<code>Status  :  BANNED</code>")
-        lines.append(f"<code>Reason  :  {banned[0] or 'Not specified'}</code>")
+        lines.append(f"<code>Reason  :  {banned[2] or 'Not specified'}</code>")
     else:
         lines.append(f"<code>Status  :  Active</code>")
     await update.message.reply_text(
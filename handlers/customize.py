@@ -5,9 +5,12 @@ from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup  # type: ignore
 from telegram.ext import ContextTypes  # type: ignore
 
-from config import conn, cursor
+from config import conn
 from helpers import safeEdit, isSuperAdmin
 from keyboards import kbHome, kbBack
+from repos import settingsRepo
+from qotd import QOTD_TIME, QOTD_WINDOW, parseQotdTime
+from handlers.jobs import scheduleQotd
 
 
 # ─────────────────────────────────────────────
@@ -15,19 +18,16 @@ from keyboards import kbHome, kbBack
 # ─────────────────────────────────────────────
 
 def _get(key: str, default: str = "Not set") -> str:
-    row = cursor.execute("SELECT value FROM bot_settings WHERE key=?", (key,)).fetchone()
-    return row[0] if row else default
+    return settingsRepo.get(key, default)
 
 
 def _set(key: str, value: str):
-    cursor.execute(
-        "INSERT OR REPLACE INTO bot_settings (key, value) VALUES (?, ?)", (key, value)
-    )
+    settingsRepo.set(key, value)
     conn.commit()
 
 
 def _del(key: str):
-    cursor.execute("DELETE FROM bot_settings WHERE key=?", (key,))
+    settingsRepo.delete(key)
     conn.commit()
 
 
@@ -36,6 +36,15 @@ def _yn(key: str, default: str = "1") -> str:
     return "ON" if val == "1" else "OFF"
 
 
+def _validSetting(key: str, value: str) -> bool:
+    """Settings the scheduler reads must parse; everything else is free text."""
+    if key == "qotd_time":
+        return parseQotdTime(value) is not None
+    if key == "qotd_window_minutes":
+        return value.isdigit() and int(value) <= 720
+    return True
+
+
 def _toggle(key: str, default: str = "1") -> str:
     cur = _get(key, default)
     new = "0" if cur == "1" else "1"
@@ -184,7 +193,8 @@ async def custUxCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
 
     qotd       = _yn("qotd_enabled", "1")
-    qotd_time  = _get("qotd_time", "12:00 UTC")
+    qotd_time  = _get("qotd_time", QOTD_TIME)
+    qotd_win   = _get("qotd_window_minutes", str(QOTD_WINDOW))
     trending   = _yn("trending_enabled", "1")
     contact    = _yn("contact_admin_enabled", "1")
     inbox_notif= _yn("user_inbox_notify", "1")
@@ -194,12 +204,14 @@ async def custUxCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "<b>User Experience</b>\n\n"
         f"<code>Quote of the Day    :  {qotd}</code>\n"
         f"<code>QOTD time           :  {qotd_time}</code>\n"
+        f"<code>QOTD spread over    :  {qotd_win} min</code>\n"
         f"<code>Trending section    :  {trending}</code>\n"
         f"<code>Contact Admin btn   :  {contact}</code>\n"
         f"<code>Inbox notifications :  {inbox_notif}</code>",
         markup=InlineKeyboardMarkup([
             [InlineKeyboardButton(f"Quote of the Day  {qotd}",       callback_data="cust_toggle_qotd_enabled")],
             [InlineKeyboardButton("QOTD Time",                        callback_data="cust_set_qotd_time")],
+            [InlineKeyboardButton("QOTD Window",                      callback_data="cust_set_qotd_window_minutes")],
             [InlineKeyboardButton(f"Trending Section  {trending}",    callback_data="cust_toggle_trending_enabled")],
             [InlineKeyboardButton(f"Contact Admin Button  {contact}", callback_data="cust_toggle_contact_admin_enabled")],
             [InlineKeyboardButton(f"Inbox Notifications  {inbox_notif}", callback_data="cust_toggle_user_inbox_notify")],
@@ -321,7 +333,8 @@ _SET_LABELS = {
     "max_password_attempts":        "Max Password Attempts (1–10)",
     "default_auto_delete_minutes":  "Default Auto-Delete (minutes, or NONE)",
     "max_files_per_folder":         "Max Files Per Folder (number, or NONE)",
-    "qotd_time":                    "QOTD Time (e.g. 09:00 UTC)",
+    "qotd_time":                    "QOTD Time (e.g. 09:00 UTC or 09:00 Europe/Berlin)",
+    "qotd_window_minutes":          "QOTD Window (minutes to spread sending over, 0–720)",
     "broadcast_delay_ms":           "Broadcast Send Delay (milliseconds, e.g. 50)",
     "pin_header_text":              "Pin / Announcement Header Text",
     "broadcast_header_text":        "Broadcast Header Text",
@@ -344,6 +357,7 @@ _SET_BACK = {
     "default_auto_delete_minutes":  "cust_folders",
     "max_files_per_folder":         "cust_folders",
     "qotd_time":                    "cust_ux",
+    "qotd_window_minutes":          "cust_ux",
     "broadcast_delay_ms":           "cust_broadcast",
     "pin_header_text":              "cust_broadcast",
     "broadcast_header_text":        "cust_broadcast",
@@ -422,6 +436,15 @@ async def saveCustSetting(update, context, text: str):
         await update.message.reply_text("Session expired.", reply_markup=kbHome())
         return
 
+    if text.upper() not in ("RESET", "CANCEL") and not _validSetting(key, text):
+        context.user_data["cust_set_key"]  = key
+        context.user_data["cust_awaiting"] = True
+        await update.message.reply_text(
+            f"<b>Invalid value</b>  —  <code>{_SET_LABELS.get(key, key)}</code>\n\nTry again or type <code>CANCEL</code>.",
+            parse_mode="HTML",
+        )
+        return
+
     if text.upper() == "RESET":
         _del(key)
         await update.message.reply_text(
@@ -448,4 +471,8 @@ async def saveCustSetting(update, context, text: str):
             reply_markup=InlineKeyboardMarkup([
                 [InlineKeyboardButton("Back", callback_data=back)]
             ]),
-        )
\ No newline at end of file
+        )
+
+    if key == "qotd_time" and text.upper() != "CANCEL":
+        at = scheduleQotd(context.job_queue)
+        logging.info(f"QOTD rescheduled for {at.strftime('%H:%M')} {at.tzinfo}")
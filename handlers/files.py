@@ -6,9 +6,11 @@ from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup  # type: ignore
 from telegram.ext import ContextTypes  # type: ignore
 
-from config import conn, cursor
+from config import conn
 from helpers import safeEdit, fmtDt, fmtSize, deleteAll, validateMinutes
+from uploads import UploadSession
 from keyboards import kbHome, kbBack
+from repos import fileRepo, folderRepo
 
 
 # ─────────────────────────────────────────────
@@ -19,16 +21,16 @@ async def addMediaCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query    = update.callback_query
     await query.answer()
     folderId = int(query.data.replace("addmedia_", ""))
-    folder   = cursor.execute("SELECT name FROM folders WHERE id=?", (folderId,)).fetchone()
-    if not folder:
+    folderName = folderRepo.name(folderId)
+    if not folderName:
         await safeEdit(query, "Folder not found.", markup=kbHome())
         return
-    context.user_data["add_media_mode"]      = folder[0]
+    context.user_data["add_media_mode"]      = folderName
     context.user_data["add_media_folder_id"] = folderId
-    context.user_data["file_count"]          = 0
+    context.user_data["upload_session"]      = UploadSession(folderId, folderName)
     await safeEdit(
         query,
-        f"<b>Add Files</b>  |  <code>{folder[0]}</code>\n\n"
+        f"<b>Add Files</b>  |  <code>{folderName}</code>\n\n"
         "Send any files, photos, videos, or text messages.\n\n"
         "Type <code>END</code> when you have finished uploading.",
         markup=kbBack(f"foldermenu_{folderId}"),
@@ -45,12 +47,8 @@ async def deleteMediaCallback(update: Update, context: ContextTypes.DEFAULT_TYPE
     await query.answer()
     folderId = int(query.data.replace("deletemedia_", ""))
     try:
-        files  = cursor.execute(
-            "SELECT id, file_type, text_content, uploaded_at FROM files "
-            "WHERE folder_id=? ORDER BY uploaded_at DESC",
-            (folderId,)
-        ).fetchall()
-        folder = cursor.execute("SELECT name FROM folders WHERE id=?", (folderId,)).fetchone()
+        files      = fileRepo.listing(folderId)
+        folderName = folderRepo.name(folderId)
     except sqlite3.Error as e:
         logging.error(f"deleteMedia: {e}")
         await safeEdit(query, "Database error.", markup=kbHome())
@@ -75,7 +73,7 @@ async def deleteMediaCallback(update: Update, context: ContextTypes.DEFAULT_TYPE
     buttons.append([InlineKeyboardButton("Back", callback_data=f"foldermenu_{folderId}")])
     await safeEdit(
         query,
-        f"<b>Delete Files</b>  |  <code>{folder[0]}</code>\n\n"
+        f"<b>Delete Files</b>  |  <code>{folderName}</code>\n\n"
         "Tap a file to select it, then press <b>Delete Selected</b>.\n"
         f"Total: {len(files)} file(s)",
         markup=InlineKeyboardMarkup(buttons),
@@ -112,12 +110,8 @@ async def toggleFileCallback(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     folderId = context.user_data.get("delete_media_folder_id")
     try:
-        files  = cursor.execute(
-            "SELECT id, file_type, text_content, uploaded_at FROM files "
-            "WHERE folder_id=? ORDER BY uploaded_at DESC",
-            (folderId,)
-        ).fetchall()
-        folder = cursor.execute("SELECT name FROM folders WHERE id=?", (folderId,)).fetchone()
+        files      = fileRepo.listing(folderId)
+        folderName = folderRepo.name(folderId)
     except sqlite3.Error as e:
         logging.error(f"toggleFile: {e}")
         return
@@ -130,7 +124,7 @@ async def toggleFileCallback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     buttons.append([InlineKeyboardButton("Back", callback_data=f"foldermenu_{folderId}")])
     await safeEdit(
         query,
-        f"<b>Delete Files</b>  |  <code>{folder[0]}</code>\n\n"
+        f"<b>Delete Files</b>  |  <code>{folderName}</code>\n\n"
         f"Selected: {len(sel)} / {len(files)}",
         markup=InlineKeyboardMarkup(buttons),
         parse_mode="HTML",
@@ -146,8 +140,7 @@ async def confirmDeleteCallback(update: Update, context: ContextTypes.DEFAULT_TY
         await query.answer("No files selected.", show_alert=True)
         return
     try:
-        placeholders = ",".join("?" * len(selected))
-        cursor.execute(f"DELETE FROM files WHERE id IN ({placeholders})", selected)
+        fileRepo.delete(selected)
         conn.commit()
         context.user_data.clear()
         await safeEdit(
@@ -185,7 +178,7 @@ async def confirmDeleteAllCallback(update: Update, context: ContextTypes.DEFAULT
     await query.answer()
     folderId = int(query.data.replace("confirmdeleteall_", ""))
     try:
-        cursor.execute("DELETE FROM files WHERE folder_id=?", (folderId,))
+        fileRepo.deleteAll(folderId)
         conn.commit()
         context.user_data.clear()
         await safeEdit(
@@ -5,9 +5,11 @@ from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup  # type: ignore
 from telegram.ext import ContextTypes  # type: ignore
 
-from config import conn, cursor
+from config import conn
 from helpers import safeEdit, fmtDt, randomFolderName
 from keyboards import kbHome, kbBack
+from popularity import forget
+from repos import fileRepo, folderRepo
 
 
 # ─────────────────────────────────────────────
@@ -37,13 +39,7 @@ async def viewFoldersCallback(update: Update, context: ContextTypes.DEFAULT_TYPE
     query = update.callback_query
     await query.answer()
     try:
-        folders = cursor.execute("""
-            SELECT f.id, f.name, f.created_at, COUNT(fi.id), f.pinned
-            FROM folders f
-            LEFT JOIN files fi ON f.id = fi.folder_id
-            GROUP BY f.id
-            ORDER BY f.pinned DESC, f.created_at DESC
-        """).fetchall()
+        folders = folderRepo.withFileCounts()
     except sqlite3.Error as e:
         logging.error(f"viewFolders: {e}")
         await safeEdit(query, "Failed to load folders.", markup=kbHome())
@@ -87,15 +83,9 @@ async def folderMenuCallback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await query.answer()
     folderId = int(query.data.replace("foldermenu_", ""))
     try:
-        folder    = cursor.execute(
-            "SELECT name, password, pinned, note, otp_required, otp_expiry_minutes FROM folders WHERE id=?", (folderId,)
-        ).fetchone()
-        fileCount = cursor.execute(
-            "SELECT COUNT(*) FROM files WHERE folder_id=?", (folderId,)
-        ).fetchone()[0]
-        totalSize = cursor.execute(
-            "SELECT SUM(file_size) FROM files WHERE folder_id=?", (folderId,)
-        ).fetchone()[0] or 0
+        folder    = folderRepo.menuInfo(folderId)
+        fileCount = fileRepo.count(folderId)
+        totalSize = fileRepo.totalSize(folderId)
     except sqlite3.Error as e:
         logging.error(f"folderMenu: {e}")
         await safeEdit(query, "Failed to load folder.", markup=kbHome())
@@ -163,9 +153,8 @@ async def pinFolderCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     folderId = int(query.data.replace("pin_", ""))
     try:
-        row    = cursor.execute("SELECT pinned FROM folders WHERE id=?", (folderId,)).fetchone()
-        newVal = 0 if row and row[0] else 1
-        cursor.execute("UPDATE folders SET pinned=? WHERE id=?", (newVal, folderId))
+        newVal = 0 if folderRepo.pinned(folderId) else 1
+        folderRepo.setPinned(folderId, newVal)
         conn.commit()
     except sqlite3.Error as e:
         logging.error(f"pinFolder: {e}")
@@ -221,20 +210,17 @@ async def passwordCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     folderId = int(query.data.replace("password_", ""))
     try:
-        folder = cursor.execute(
-            "SELECT name, password FROM folders WHERE id=?", (folderId,)
-        ).fetchone()
+        folderName = folderRepo.name(folderId)
+        password   = folderRepo.password(folderId)
     except sqlite3.Error as e:
         logging.error(f"passwordCb: {e}")
         await safeEdit(query, "Database error.", markup=kbHome())
         return
 
-    if not folder:
+    if not folderName:
         await safeEdit(query, "Folder not found.", markup=kbHome())
         return
 
-    folderName, password = folder
-
     if password:
         await safeEdit(
             query,
@@ -267,7 +253,7 @@ async def removePasswordCallback(update: Update, context: ContextTypes.DEFAULT_T
     await query.answer()
     folderId = int(query.data.replace("removepass_", ""))
     try:
-        cursor.execute("UPDATE folders SET password=NULL WHERE id=?", (folderId,))
+        folderRepo.setPassword(folderId, None)
         conn.commit()
         await safeEdit(
             query,
@@ -288,15 +274,15 @@ async def deleteSelectCallback(update: Update, context: ContextTypes.DEFAULT_TYP
     query    = update.callback_query
     await query.answer()
     folderId = int(query.data.replace("delete_select_", ""))
-    folder    = cursor.execute("SELECT name FROM folders WHERE id=?", (folderId,)).fetchone()
-    fileCount = cursor.execute("SELECT COUNT(*) FROM files WHERE folder_id=?", (folderId,)).fetchone()[0]
-    if not folder:
+    folderName = folderRepo.name(folderId)
+    fileCount  = fileRepo.count(folderId)
+    if not folderName:
         await safeEdit(query, "Folder not found.", markup=kbHome())
         return
     await safeEdit(
         query,
         f"<b>Delete Folder</b>\n\n"
-        f"<code>Name   :  {folder[0]}</code>\n"
+        f"<code>Name   :  {folderName}</code>\n"
         f"<code>Files  :  {fileCount}</code>\n\n"
         "This will permanently delete the folder, all its files, links and logs.\n"
         "This action cannot be undone.",
@@ -315,11 +301,9 @@ async def deleteConfirmCallback(update: Update, context: ContextTypes.DEFAULT_TY
     await query.answer()
     folderId = int(query.data.replace("delete_confirm_", ""))
     try:
-        cursor.execute("DELETE FROM files   WHERE folder_id=?", (folderId,))
-        cursor.execute("DELETE FROM links   WHERE folder_id=?", (folderId,))
-        cursor.execute("DELETE FROM logs    WHERE folder_id=?", (folderId,))
-        cursor.execute("DELETE FROM folders WHERE id=?",        (folderId,))
+        folderRepo.delete(folderId)
         conn.commit()
+        forget(folderId)
         await safeEdit(
             query,
             "<b>Folder Deleted</b>\n\nThe folder and all associated data have been removed.",
@@ -1,14 +1,14 @@
 import logging
 import sqlite3
 import uuid
-from datetime import datetime
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup  # type: ignore
 from telegram.ext import ContextTypes  # type: ignore
 
-from config import conn, cursor, ADMIN_ID
+from config import conn, ADMIN_ID
 from helpers import safeEdit, isSuperAdmin, isAdmin, fmtDt
 from keyboards import kbHome, kbBack, kbUser
+from repos import adminRepo, inboxRepo
 
 
 # ─────────────────────────────────────────────
@@ -22,23 +22,9 @@ async def userMessagesCallback(update: Update, context: ContextTypes.DEFAULT_TYP
     viewerIsSuper = isSuperAdmin(viewerId)
 
     try:
-        if viewerIsSuper:
-            total  = cursor.execute("SELECT COUNT(*) FROM user_messages").fetchone()[0]
-            unread = cursor.execute("SELECT COUNT(*) FROM user_messages WHERE status='unread'").fetchone()[0]
-            msgs   = cursor.execute("""
-                SELECT message_id, user_id, username, first_name, sent_at, status,
-                       recipient_admin_id, recipient_is_super
-                FROM user_messages ORDER BY sent_at DESC LIMIT 20
-            """).fetchall()
-        else:
-            total  = cursor.execute("SELECT COUNT(*) FROM user_messages WHERE recipient_admin_id=?", (viewerId,)).fetchone()[0]
-            unread = cursor.execute("SELECT COUNT(*) FROM user_messages WHERE recipient_admin_id=? AND status='unread'", (viewerId,)).fetchone()[0]
-            msgs   = cursor.execute("""
-                SELECT message_id, user_id, username, first_name, sent_at, status,
-                       recipient_admin_id, recipient_is_super
-                FROM user_messages WHERE recipient_admin_id=?
-                ORDER BY sent_at DESC LIMIT 20
-            """, (viewerId,)).fetchall()
+        recipient     = None if viewerIsSuper else viewerId
+        total, unread = inboxRepo.counts(recipient)
+        msgs          = inboxRepo.messages(recipient, 20)
     except sqlite3.Error as e:
         logging.error(f"userMessages: {e}")
         await safeEdit(query, "Failed to load inbox.", markup=kbHome())
@@ -53,8 +39,7 @@ async def userMessagesCallback(update: Update, context: ContextTypes.DEFAULT_TYP
         label  = username or firstName or str(userId)
         prefix = "[New]  " if status == "unread" else ""
         if viewerIsSuper:
-            recipRow  = cursor.execute("SELECT username FROM admins WHERE user_id=?", (recipId,)).fetchone() if recipId else None
-            recipName = (recipRow[0] if recipRow else None) or (f"Admin {recipId}" if recipId else "Super Admin")
+            recipName = adminRepo.displayName(recipId) if recipId else "Super Admin"
             label    += f"  →  {recipName}"
         buttons.append([InlineKeyboardButton(f"{prefix}{label}  |  {fmtDt(sentAt)}", callback_data=f"viewmsg_{msgId}")])
 
@@ -76,10 +61,7 @@ async def viewMessageCallback(update: Update, context: ContextTypes.DEFAULT_TYPE
     viewerId = query.from_user.id
 
     try:
-        msg = cursor.execute(
-            "SELECT user_id, username, first_name, sent_at, recipient_admin_id, recipient_is_super FROM user_messages WHERE message_id=?",
-            (msgId,)
-        ).fetchone()
+        msg = inboxRepo.message(msgId)
         if not msg:
             await safeEdit(query, "Message not found.", markup=kbBack("user_messages"))
             return
@@ -91,17 +73,13 @@ async def viewMessageCallback(update: Update, context: ContextTypes.DEFAULT_TYPE
                 await safeEdit(query, "<b>Access Denied</b>", markup=kbBack("user_messages"), parse_mode="HTML")
                 return
 
-        files = cursor.execute("SELECT file_id, file_type, text_content FROM user_message_files WHERE message_id=?", (msgId,)).fetchall()
-
-        was_unread    = cursor.execute("SELECT status FROM user_messages WHERE message_id=?", (msgId,)).fetchone()
-        is_first_read = was_unread and was_unread[0] == "unread"
+        files = inboxRepo.messageFiles(msgId)
 
-        cursor.execute("UPDATE user_messages SET status='read', viewed_at=? WHERE message_id=?", (datetime.now().isoformat(), msgId))
+        is_first_read = inboxRepo.markRead(msgId) > 0
         conn.commit()
 
         if is_first_read:
-            adminRow  = cursor.execute("SELECT username FROM admins WHERE user_id=?", (viewerId,)).fetchone()
-            adminName = (adminRow[0] if adminRow else None) or f"Admin {viewerId}"
+            adminName = adminRepo.displayName(viewerId)
             try:
                 await context.bot.send_message(chat_id=userId, text=f"<b>Message Seen</b>\n\n<code>{adminName}</code> has read your message.", parse_mode="HTML")
             except Exception as e:
@@ -113,8 +91,7 @@ async def viewMessageCallback(update: Update, context: ContextTypes.DEFAULT_TYPE
         return
 
     sender   = username or firstName or str(userId)
-    recipRow = cursor.execute("SELECT username FROM admins WHERE user_id=?", (recipId,)).fetchone() if recipId else None
-    recipName = (recipRow[0] if recipRow else None) or (f"Admin {recipId}" if recipId else "Unknown")
+    recipName = adminRepo.displayName(recipId) if recipId else "Unknown"
     if recipIsSuper:
         recipName += "  [Super Admin]"
 
@@ -187,11 +164,8 @@ async def userInboxCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     userId = query.from_user.id
 
     try:
-        replies = cursor.execute("""
-            SELECT reply_id, from_admin_id, content, sent_at, status
-            FROM message_replies WHERE to_user_id=?
-            ORDER BY sent_at DESC LIMIT 20
-        """, (userId,)).fetchall()
+        total, unread = inboxRepo.replyCounts(userId)
+        replies       = inboxRepo.replies(userId, 20)
     except sqlite3.Error as e:
         logging.error(f"userInbox: {e}")
         await safeEdit(query, "Failed to load inbox.", markup=kbBack("user_menu"))
@@ -203,18 +177,16 @@ async def userInboxCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                        parse_mode="HTML")
         return
 
-    unread  = sum(1 for r in replies if r[4] == "unread")
     buttons = []
     for replyId, fromAdminId, content, sentAt, status in replies:
-        adminRow  = cursor.execute("SELECT username FROM admins WHERE user_id=?", (fromAdminId,)).fetchone()
-        adminName = (adminRow[0] if adminRow else None) or f"Admin {fromAdminId}"
+        adminName = adminRepo.displayName(fromAdminId)
         prefix    = "[New]  " if status == "unread" else ""
         buttons.append([InlineKeyboardButton(f"{prefix}{adminName}  |  {fmtDt(sentAt)}", callback_data=f"viewreply_{replyId}")])
 
     buttons.append([InlineKeyboardButton("Back", callback_data="user_menu")])
 
     await safeEdit(query,
-        f"<b>Your Inbox</b>\n\n<code>Replies  :  {len(replies)}</code>\n<code>Unread   :  {unread}</code>",
+        f"<b>Your Inbox</b>\n\n<code>Replies  :  {total}</code>\n<code>Unread   :  {unread}</code>",
         markup=InlineKeyboardMarkup(buttons), parse_mode="HTML")
 
 
@@ -225,10 +197,7 @@ async def viewReplyCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     userId  = query.from_user.id
 
     try:
-        reply = cursor.execute(
-            "SELECT reply_id, from_admin_id, message_id, content, sent_at FROM message_replies WHERE reply_id=? AND to_user_id=?",
-            (replyId, userId)
-        ).fetchone()
+        reply = inboxRepo.reply(replyId, userId)
     except sqlite3.Error as e:
         logging.error(f"viewReply: {e}")
         await safeEdit(query, "Failed to load reply.", markup=kbBack("user_inbox"))
@@ -239,16 +208,13 @@ async def viewReplyCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     replyId, fromAdminId, origMsgId, content, sentAt = reply
-    cursor.execute("UPDATE message_replies SET status='read' WHERE reply_id=?", (replyId,))
+    inboxRepo.markReplyRead(replyId)
     conn.commit()
 
-    adminRow  = cursor.execute("SELECT username FROM admins WHERE user_id=?", (fromAdminId,)).fetchone()
-    adminName = (adminRow[0] if adminRow else None) or f"Admin {fromAdminId}"
+    adminName = adminRepo.displayName(fromAdminId)
 
     # Load reply files
-    files = cursor.execute(
-        "SELECT file_id, file_type, text_content FROM message_reply_files WHERE reply_id=?", (replyId,)
-    ).fetchall()
+    files = inboxRepo.replyFiles(replyId)
 
     await safeEdit(
         query,
@@ -288,7 +254,7 @@ async def deleteReplyCallback(update: Update, context: ContextTypes.DEFAULT_TYPE
     await query.answer()
     replyId = query.data.replace("delreply_", "")
     try:
-        cursor.execute("DELETE FROM message_replies WHERE reply_id=?", (replyId,))
+        inboxRepo.deleteReply(replyId)
         conn.commit()
     except sqlite3.Error as e:
         logging.error(f"deleteReply: {e}")
@@ -332,8 +298,7 @@ async def deleteMsgFromChatCallback(update: Update, context: ContextTypes.DEFAUL
         except Exception:
             pass
     try:
-        cursor.execute("DELETE FROM user_message_files WHERE message_id=?", (msgId,))
-        cursor.execute("DELETE FROM user_messages        WHERE message_id=?", (msgId,))
+        inboxRepo.deleteMessage(msgId)
         conn.commit()
     except sqlite3.Error as e:
         logging.error(f"deleteMsgFromChat DB: {e}")
@@ -351,10 +316,7 @@ async def markAllReadCallback(update: Update, context: ContextTypes.DEFAULT_TYPE
     query    = update.callback_query
     await query.answer()
     viewerId = query.from_user.id
-    if isSuperAdmin(viewerId):
-        cursor.execute("UPDATE user_messages SET status='read' WHERE status='unread'")
-    else:
-        cursor.execute("UPDATE user_messages SET status='read' WHERE status='unread' AND recipient_admin_id=?", (viewerId,))
+    inboxRepo.markAllRead(None if isSuperAdmin(viewerId) else viewerId)
     conn.commit()
     await safeEdit(query, "<b>All Read</b>\n\nAll messages marked as read.", markup=kbBack("user_messages"), parse_mode="HTML")
 
@@ -375,15 +337,7 @@ async def confirmClearMessagesCallback(update: Update, context: ContextTypes.DEF
     await query.answer()
     viewerId = query.from_user.id
     try:
-        if isSuperAdmin(viewerId):
-            cursor.execute("DELETE FROM user_message_files")
-            cursor.execute("DELETE FROM user_messages")
-        else:
-            ownedIds = [r[0] for r in cursor.execute("SELECT message_id FROM user_messages WHERE recipient_admin_id=?", (viewerId,)).fetchall()]
-            if ownedIds:
-                ph = ",".join("?" * len(ownedIds))
-                cursor.execute(f"DELETE FROM user_message_files WHERE message_id IN ({ph})", ownedIds)
-                cursor.execute(f"DELETE FROM user_messages        WHERE message_id IN ({ph})", ownedIds)
+        inboxRepo.clearMessages(None if isSuperAdmin(viewerId) else viewerId)
         conn.commit()
         await safeEdit(query, "<b>Inbox Cleared</b>", markup=kbHome(), parse_mode="HTML")
     except sqlite3.Error as e:
@@ -399,7 +353,7 @@ async def contactAdminCallback(update: Update, context: ContextTypes.DEFAULT_TYP
     query = update.callback_query
     await query.answer()
     try:
-        admins = cursor.execute("SELECT user_id, username, is_super_admin FROM admins ORDER BY is_super_admin DESC, added_at ASC").fetchall()
+        admins = adminRepo.listAll()
     except sqlite3.Error as e:
         logging.error(f"contactAdmin: {e}")
         await safeEdit(query, "Could not load admin list.", markup=kbBack("user_menu"))
@@ -410,7 +364,7 @@ async def contactAdminCallback(update: Update, context: ContextTypes.DEFAULT_TYP
         return
 
     buttons = []
-    for adminId, username, isSuper in admins:
+    for adminId, username, _, isSuper in admins:
         label = ("[Super]  " if isSuper else "") + (username or f"Admin {adminId}")
         buttons.append([InlineKeyboardButton(label, callback_data=f"contact_select_{adminId}")])
     buttons.append([InlineKeyboardButton("Cancel", callback_data="user_menu")])
@@ -425,7 +379,7 @@ async def selectAdminToContactCallback(update: Update, context: ContextTypes.DEF
     recipientId = int(query.data.replace("contact_select_", ""))
 
     try:
-        row = cursor.execute("SELECT username, is_super_admin FROM admins WHERE user_id=?", (recipientId,)).fetchone()
+        row = adminRepo.get(recipientId)
     except sqlite3.Error as e:
         logging.error(f"selectAdminToContact: {e}")
         await safeEdit(query, "Could not find that admin.", markup=kbBack("contact_admin"))
@@ -435,7 +389,7 @@ async def selectAdminToContactCallback(update: Update, context: ContextTypes.DEF
         await safeEdit(query, "Admin not found.", markup=kbBack("contact_admin"))
         return
 
-    username, isSuper  = row
+    _, username, _, isSuper = row
     recipientLabel     = ("[Super]  " if isSuper else "") + (username or f"Admin {recipientId}")
 
     context.user_data["contact_admin_mode"]         = True
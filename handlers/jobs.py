@@ -1,23 +1,32 @@
 import logging
 from datetime import datetime
 
-from config import cursor, conn
-from handlers.settings import _sendQotd
-from handlers.polls import _broadcastPollResults
+from config import conn
+from repos import linkRepo, pollRepo, quoteRepo, settingsRepo, trendingRepo
+from handlers.polls import closePoll
+from popularity import autoTrendingBy, refreshAutoTrending
+from qotd import qotdTime, startQotdRun
 
 
 # ─────────────────────────────────────────────
 #  DAILY QUOTE OF THE DAY
 # ─────────────────────────────────────────────
 
+def scheduleQotd(jobQueue):
+    """(Re)schedule the daily run at the qotd_time setting, in its time zone."""
+    for job in jobQueue.get_jobs_by_name("qotd"):
+        job.schedule_removal()
+    at = qotdTime()
+    jobQueue.run_daily(jobQotd, time=at, name="qotd")
+    return at
+
+
 async def jobQotd(context):
-    """Runs daily — sends a random quote to all subscribers."""
+    """Runs daily — queues a quote for all subscribers, spread over the QOTD window."""
     try:
-        count = cursor.execute("SELECT COUNT(*) FROM quotes").fetchone()[0]
-        if count == 0:
+        if settingsRepo.get("qotd_enabled", "1") != "1" or quoteRepo.count() == 0:
             return
-        await _sendQotd(context)
-        logging.info("QOTD sent successfully")
+        await startQotdRun(context, "schedule")
     except Exception as e:
         logging.error(f"jobQotd: {e}")
 
@@ -26,21 +35,41 @@ async def jobQotd(context):
 #  AUTO-CLOSE EXPIRED POLLS
 # ─────────────────────────────────────────────
 
-async def jobClosePols(context):
-    """Runs every 5 minutes — closes expired polls and broadcasts results."""
+def schedulePollClose(jobQueue, pollId: int, closesAt: str) -> None:
+    """Close the poll at closes_at (right away if that has passed)."""
+    # closes_at is naive local time; a delay avoids JobQueue reading it as UTC
+    delay = max(0.0, (datetime.fromisoformat(closesAt) - datetime.now()).total_seconds())
+    jobQueue.run_once(jobClosePoll, delay, data=pollId, name=f"poll_close_{pollId}")
+
+
+def restorePollCloses(jobQueue) -> int:
+    """Startup: schedule a close job for every open poll. Returns how many."""
+    scheduled = 0
+    for pollId, closesAt in pollRepo.openCloseTimes():
+        try:
+            schedulePollClose(jobQueue, pollId, closesAt)
+            scheduled += 1
+        except (TypeError, ValueError):
+            logging.warning(f"Poll {pollId} has an unreadable closes_at; left to the hourly sweep")
+    return scheduled
+
+
+async def jobClosePoll(context):
+    """Runs once at a poll's closes_at — closes it and broadcasts results."""
+    pollId = context.job.data
     try:
-        expired = cursor.execute("""
-            SELECT id FROM polls
-            WHERE status='open'
-            AND result_sent=0
-            AND datetime(closes_at) <= datetime('now')
-        """).fetchall()
-
-        for (pollId,) in expired:
-            cursor.execute("UPDATE polls SET status='closed' WHERE id=?", (pollId,))
-            conn.commit()
-            await _broadcastPollResults(pollId, context)
+        if await closePoll(pollId, context):
             logging.info(f"Poll {pollId} auto-closed and results sent")
+    except Exception as e:
+        logging.error(f"jobClosePoll {pollId}: {e}")
+
+
+async def jobClosePols(context):
+    """Runs hourly — safety net for polls whose close job never ran."""
+    try:
+        for pollId in pollRepo.dueToClose():
+            if await closePoll(pollId, context):
+                logging.info(f"Poll {pollId} closed by the sweep and results sent")
     except Exception as e:
         logging.error(f"jobClosePolls: {e}")
 
@@ -50,12 +79,9 @@ async def jobClosePols(context):
 # ─────────────────────────────────────────────
 
 async def jobPurgeTrending(context):
-    """Runs hourly — removes expired trending items."""
+    """Runs daily — safety net for trending items the expiry scheduler missed."""
     try:
-        cursor.execute(
-            "DELETE FROM trending WHERE expires_at IS NOT NULL AND datetime(expires_at) <= datetime('now')"
-        )
-        removed = cursor.rowcount
+        removed = trendingRepo.purgeExpired()
         conn.commit()
         if removed > 0:
             logging.info(f"Purged {removed} expired trending item(s)")
@@ -63,17 +89,29 @@ async def jobPurgeTrending(context):
         logging.error(f"jobPurgeTrending: {e}")
 
 
+# ─────────────────────────────────────────────
+#  AUTO TRENDING
+# ─────────────────────────────────────────────
+
+async def jobAutoTrending(context):
+    """Runs hourly — while auto mode is on, refreshes trending from the popularity scores."""
+    try:
+        adminId = autoTrendingBy()
+        if adminId is None:
+            return
+        refreshAutoTrending(adminId)
+    except Exception as e:
+        logging.error(f"jobAutoTrending: {e}")
+
+
 # ─────────────────────────────────────────────
 #  AUTO-PURGE EXPIRED LINKS
 # ─────────────────────────────────────────────
 
 async def jobPurgeLinks(context):
-    """Runs daily — removes expired and revoked link records."""
+    """Runs daily — removes revoked links, and expired ones the expiry scheduler missed."""
     try:
-        cursor.execute("DELETE FROM links WHERE datetime(expiry) <= datetime('now')")
-        exp = cursor.rowcount
-        cursor.execute("DELETE FROM links WHERE revoked=1")
-        rev = cursor.rowcount
+        exp, rev = linkRepo.purge()
         conn.commit()
         if exp + rev > 0:
             logging.info(f"Auto-purged {exp} expired + {rev} revoked links")
@@ -5,9 +5,10 @@ from datetime import datetime, timedelta
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup  # type: ignore
 from telegram.ext import ContextTypes  # type: ignore
 
-from config import conn, cursor
+from config import conn
 from helpers import safeEdit, generateToken, fmtDt
 from keyboards import kbHome, kbBack
+from repos import folderRepo, linkRepo
 
 
 # ─────────────────────────────────────────────
@@ -18,9 +19,7 @@ async def generateLinkCallback(update: Update, context: ContextTypes.DEFAULT_TYP
     query = update.callback_query
     await query.answer()
     try:
-        folders = cursor.execute(
-            "SELECT id, name FROM folders ORDER BY pinned DESC, created_at DESC"
-        ).fetchall()
+        folders = folderRepo.choices()
     except sqlite3.Error as e:
         logging.error(f"generateLink: {e}")
         await safeEdit(query, "Database error.", markup=kbHome())
@@ -52,15 +51,15 @@ async def linkCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query    = update.callback_query
     await query.answer()
     folderId = int(query.data.split("_")[1])
-    folder   = cursor.execute("SELECT name FROM folders WHERE id=?", (folderId,)).fetchone()
-    if not folder:
+    folderName = folderRepo.name(folderId)
+    if not folderName:
         await safeEdit(query, "Folder not found.", markup=kbHome())
         return
     context.user_data["link_folder_id"] = folderId
     context.user_data["link_step"]      = "single_use"
     await safeEdit(
         query,
-        f"<b>Link Settings</b>  |  <code>{folder[0]}</code>\n\n"
+        f"<b>Link Settings</b>  |  <code>{folderName}</code>\n\n"
         "Should this be a <b>single-use</b> link?\n\n"
         "<code>Single-use</code>  —  Automatically revokes after the first person opens it.\n"
         "<code>Multi-use</code>   —  Anyone with the link can open it until it expires.",
@@ -121,13 +120,7 @@ async def revokeLinkCallback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     query = update.callback_query
     await query.answer()
     try:
-        folders = cursor.execute("""
-            SELECT f.id, f.name, COUNT(l.id)
-            FROM folders f
-            LEFT JOIN links l ON f.id = l.folder_id AND l.revoked = 0
-            GROUP BY f.id
-            HAVING COUNT(l.id) > 0
-        """).fetchall()
+        folders = folderRepo.withOpenLinks()
     except sqlite3.Error as e:
         logging.error(f"revokeLink: {e}")
         await safeEdit(query, "Database error.", markup=kbHome())
@@ -161,17 +154,15 @@ async def revokeSelectCallback(update: Update, context: ContextTypes.DEFAULT_TYP
     query    = update.callback_query
     await query.answer()
     folderId = int(query.data.replace("revoke_select_", ""))
-    folder   = cursor.execute("SELECT name FROM folders WHERE id=?", (folderId,)).fetchone()
-    if not folder:
+    folderName = folderRepo.name(folderId)
+    if not folderName:
         await safeEdit(query, "Folder not found.", markup=kbHome())
         return
-    linkCount = cursor.execute(
-        "SELECT COUNT(*) FROM links WHERE folder_id=? AND revoked=0", (folderId,)
-    ).fetchone()[0]
+    linkCount = linkRepo.countOpen(folderId)
     await safeEdit(
         query,
         f"<b>Revoke Links</b>\n\n"
-        f"<code>Folder   :  {folder[0]}</code>\n"
+        f"<code>Folder   :  {folderName}</code>\n"
         f"<code>Links    :  {linkCount} active</code>\n\n"
         "All existing links will stop working immediately.",
         markup=InlineKeyboardMarkup([
@@ -189,12 +180,12 @@ async def revokeConfirmCallback(update: Update, context: ContextTypes.DEFAULT_TY
     await query.answer()
     folderId = int(query.data.replace("revoke_confirm_", ""))
     try:
-        cursor.execute("UPDATE links SET revoked=1 WHERE folder_id=? AND revoked=0", (folderId,))
+        revoked = linkRepo.revokeFolder(folderId)
         conn.commit()
         await safeEdit(
             query,
             f"<b>Links Revoked</b>\n\n"
-            f"{cursor.rowcount} link(s) have been deactivated.",
+            f"{revoked} link(s) have been deactivated.",
             markup=kbHome(),
             parse_mode="HTML",
         )
@@ -211,12 +202,8 @@ async def purgeLinksCallback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     query = update.callback_query
     await query.answer()
     try:
-        expired = cursor.execute(
-            "SELECT COUNT(*) FROM links WHERE datetime(expiry) <= datetime('now') AND revoked=0"
-        ).fetchone()[0]
-        revoked = cursor.execute(
-            "SELECT COUNT(*) FROM links WHERE revoked=1"
-        ).fetchone()[0]
+        expired = linkRepo.countExpired()
+        revoked = linkRepo.countRevoked()
     except sqlite3.Error as e:
         logging.error(f"purgeLinks count: {e}")
         await safeEdit(query, "Database error.", markup=kbHome())
@@ -255,12 +242,7 @@ async def purgeConfirmCallback(update: Update, context: ContextTypes.DEFAULT_TYP
     await query.answer()
     try:
         # Explicitly only delete from links — never touches folders or files
-        cursor.execute(
-            "DELETE FROM links WHERE datetime(expiry) <= datetime('now') AND revoked=0"
-        )
-        expired_count = cursor.rowcount
-        cursor.execute("DELETE FROM links WHERE revoked=1")
-        revoked_count = cursor.rowcount
+        expired_count, revoked_count = linkRepo.purge()
         conn.commit()
         await safeEdit(
             query,
@@ -1,4 +1,3 @@
-import asyncio
 import logging
 import sqlite3
 import uuid
@@ -7,14 +6,58 @@ from datetime import datetime, timedelta
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup  # type: ignore
 from telegram.ext import ContextTypes  # type: ignore
 
-from config import conn, cursor, ADMIN_ID
+from config import conn, ADMIN_ID
 from helpers import (
     isAdmin, isSuperAdmin, isBanned, trackUser,
     validateFolderName, validateMinutes, randomFolderName,
-    generateToken, generateMessageId, deleteAll, fmtDt
+    generateToken, generateMessageId, fmtDt
 )
+from dispatcher import outboundLane, DELIVERY
+from fanout import sendBulk
+from storage import mirrorToStorage, sendItems
+from uploads import UploadSession, getSession
+from media import describeMedia
 from keyboards import kbHome, kbUser, kbBack
+from repos import (
+    adminRepo, banRepo, broadcastRepo, fileRepo, folderRepo, inboxRepo, linkRepo,
+    mediaRepo, pollRepo, quoteRepo, settingsRepo, subscriberRepo, trendingRepo,
+)
 from handlers.start import _deliverFolder
+from handlers.jobs import schedulePollClose
+from popularity import setAutoTrending
+from expiry import deleteMessagesLater, expireAt
+
+
+# ─────────────────────────────────────────────
+#  UPLOAD BUFFERING
+# ─────────────────────────────────────────────
+
+async def _bufferUpload(update, context, session, fid, ftype, fsize, txt, verb: str):
+    """Queue one uploaded item; single files are acknowledged now, albums once."""
+    media   = describeMedia(update.message)
+    groupId = update.message.media_group_id
+    if session.isDuplicate(media):
+        session.skipped += 1
+        if groupId:
+            session.queueAlbumAck(context.job_queue, update.effective_chat.id, groupId, duplicate=True)
+            return
+        await update.message.reply_text(
+            f"<b>{ftype.upper()} skipped</b>  |  already in this folder\n\n"
+            "Send more files or type <code>END</code> to finish.",
+            parse_mode="HTML",
+        )
+        return
+
+    storageId = await mirrorToStorage(context.bot, fid, ftype, txt)
+    session.add(context.job_queue, update.message.message_id, fid, ftype, fsize, txt, storageId, media)
+    if groupId:
+        session.queueAlbumAck(context.job_queue, update.effective_chat.id, groupId)
+        return
+    await update.message.reply_text(
+        f"<b>{ftype.upper()} {verb}</b>  |  {session.received} file(s) total\n\n"
+        "Send more files or type <code>END</code> to finish.",
+        parse_mode="HTML",
+    )
 
 
 # ─────────────────────────────────────────────
@@ -45,23 +88,13 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # ── Secret folder codeword (non-admin users) ──────────────────────────
     if text and not isAdmin(userId):
         try:
-            secret = cursor.execute(
-                "SELECT id FROM folders WHERE is_secret=1 AND secret_code=?", (text.strip(),)
-            ).fetchone()
+            folderId = folderRepo.bySecretCode(text.strip())
         except sqlite3.Error:
-            secret = None
-        if secret:
-            folderId = secret[0]
-            folderRow = cursor.execute(
-                "SELECT password FROM folders WHERE id=?", (folderId,)
-            ).fetchone()
-            folderPassword = folderRow[0] if folderRow else None
-            link = cursor.execute("""
-                SELECT token FROM links
-                WHERE folder_id=? AND revoked=0 AND datetime(expiry) > datetime('now')
-                ORDER BY created_at DESC LIMIT 1
-            """, (folderId,)).fetchone()
-            if not link:
+            folderId = None
+        if folderId:
+            folderPassword = folderRepo.password(folderId)
+            token          = linkRepo.latestActiveToken(folderId)
+            if not token:
                 await update.message.reply_text(
                     "<b>Secret Access</b>\n\n"
                     "Folder found, but there is no active link available right now.\n"
@@ -74,7 +107,7 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     "awaiting_password_verify": True,
                     "verify_folder_id":         folderId,
                     "correct_password":         folderPassword,
-                    "access_token":             link[0],
+                    "access_token":             token,
                     "password_attempts":        0,
                 })
                 await update.message.reply_text(
@@ -84,7 +117,7 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     parse_mode="HTML",
                 )
             else:
-                await _deliverFolder(update, context, folderId, link[0], user)
+                await _deliverFolder(update, context, folderId, token, user)
             return
 
     # ── Broadcast password verification ──────────────────────────────────
@@ -104,10 +137,7 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     parse_mode="HTML",
                 )
                 try:
-                    brow = cursor.execute(
-                        "SELECT created_by FROM broadcasts WHERE broadcast_code=?", (code,)
-                    ).fetchone()
-                    notify_id = brow[0] if brow else ADMIN_ID
+                    notify_id = broadcastRepo.creator(code) or ADMIN_ID
                     await context.bot.send_message(
                         chat_id=notify_id,
                         text="<b>Broadcast — Password Alert</b>\n\n"
@@ -127,16 +157,12 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
         context.user_data.clear()
         try:
-            row = cursor.execute(
-                "SELECT id, expiry_minutes, forwardable FROM broadcasts WHERE broadcast_code=?", (code,)
-            ).fetchone()
+            row = broadcastRepo.byCode(code)
             if not row:
                 await update.message.reply_text("Broadcast not found.")
                 return
             bId, expMin, fwd = row
-            files = cursor.execute(
-                "SELECT file_id, file_type, text_content FROM broadcast_files WHERE broadcast_id=?", (bId,)
-            ).fetchall()
+            files = broadcastRepo.items(bId)
         except sqlite3.Error as e:
             logging.error(f"broadcast verify: {e}")
             await update.message.reply_text("A database error occurred.")
@@ -153,23 +179,11 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 parse_mode="HTML",
             )
             sentMsgs.append(m)
-        for fid, ftype, txt in files:
-            try:
-                if ftype == "text":
-                    m = await update.message.reply_text(txt)
-                elif ftype == "video":
-                    m = await update.message.reply_video(fid, protect_content=protect, has_spoiler=True)
-                elif ftype == "photo":
-                    m = await update.message.reply_photo(fid, protect_content=protect, has_spoiler=True)
-                elif ftype == "document":
-                    m = await update.message.reply_document(fid, protect_content=protect)
-                else:
-                    m = await update.message.reply_document(fid, protect_content=protect)
-                sentMsgs.append(m)
-            except Exception as e:
-                logging.error(f"broadcast verify send: {e}")
+        with outboundLane(DELIVERY):
+            sentIds = await sendItems(context.bot, update.effective_chat.id, files, protect)
         if expMin:
-            asyncio.create_task(deleteAll(sentMsgs, expMin * 60))
+            sentIds = [m.message_id for m in sentMsgs] + sentIds
+            deleteMessagesLater(update.effective_chat.id, sentIds, expMin * 60)
         return
 
     # ── Contact admin mode (user composing a message to admin) ───────────
@@ -199,21 +213,10 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             sender           = user.username or user.first_name or str(userId)
 
             try:
-                cursor.execute("""
-                    INSERT INTO user_messages
-                        (user_id, username, first_name, message_id, sent_at, recipient_admin_id, recipient_is_super)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    userId, user.username, user.first_name,
-                    msgId, datetime.now().isoformat(),
-                    recipientId, recipientIsSuper
-                ))
-                for fd in contactFiles:
-                    cursor.execute("""
-                        INSERT INTO user_message_files (message_id, file_id, file_type, text_content)
-                        VALUES (?, ?, ?, ?)
-                    """, (msgId, fd.get("file_id"), fd.get("file_type"), fd.get("text_content")))
+                mediaRepo.register([fd.get("media") for fd in contactFiles])
+                inboxRepo.addMessage(msgId, user, recipientId, recipientIsSuper, contactFiles)
                 conn.commit()
+
             except sqlite3.Error as e:
                 logging.error(f"contact admin DB: {e}")
                 await update.message.reply_text("Failed to send message. Please try again.", reply_markup=kbUser())
@@ -289,7 +292,7 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         if ftype:
             context.user_data.setdefault("contact_files", []).append(
-                {"file_id": fid, "file_type": ftype, "text_content": txt}
+                {"file_id": fid, "file_type": ftype, "text_content": txt, "media": describeMedia(update.message)}
             )
             cnt = len(context.user_data["contact_files"])
             await update.message.reply_text(
@@ -321,7 +324,7 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         if ftype and (not text or text.upper() != "SEND"):
             context.user_data.setdefault("reply_files", []).append(
-                {"file_id": fid, "file_type": ftype, "text_content": ftxt}
+                {"file_id": fid, "file_type": ftype, "text_content": ftxt, "media": describeMedia(update.message)}
             )
             cnt = len(context.user_data["reply_files"])
             await update.message.reply_text(
@@ -341,20 +344,11 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
             replyId   = str(uuid.uuid4())[:12]
             adminId   = userId
-            adminRow  = cursor.execute("SELECT username FROM admins WHERE user_id=?", (adminId,)).fetchone()
-            adminName = (adminRow[0] if adminRow else None) or f"Admin {adminId}"
+            adminName = adminRepo.displayName(adminId)
             combined  = " | ".join(f["text_content"] for f in replyFiles if f.get("text_content")) or None
             try:
-                cursor.execute("""
-                    INSERT INTO message_replies
-                        (reply_id, message_id, from_admin_id, to_user_id, content, sent_at)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (replyId, msgId, adminId, toUserId, combined, datetime.now().isoformat()))
-                for rf in replyFiles:
-                    cursor.execute("""
-                        INSERT INTO message_reply_files (reply_id, file_id, file_type, text_content)
-                        VALUES (?, ?, ?, ?)
-                    """, (replyId, rf.get("file_id"), rf.get("file_type"), rf.get("text_content")))
+                mediaRepo.register([rf.get("media") for rf in replyFiles])
+                inboxRepo.addReply(replyId, msgId, adminId, toUserId, combined, replyFiles)
                 conn.commit()
             except sqlite3.Error as e:
                 logging.error(f"save reply: {e}")
@@ -424,10 +418,7 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
         try:
-            cursor.execute(
-                "UPDATE folders SET otp_required=1, otp_expiry_minutes=? WHERE id=?",
-                (mins, folderId)
-            )
+            folderRepo.setOtp(folderId, mins)
             conn.commit()
         except Exception as e:
             logging.error(f"otpExpiry set: {e}")
@@ -489,7 +480,7 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if context.user_data.get("awaiting_welcome_msg"):
         context.user_data.clear()
         if text and text.upper() == "RESET":
-            cursor.execute("DELETE FROM bot_settings WHERE key='welcome_message'")
+            settingsRepo.delete("welcome_message")
             conn.commit()
             await update.message.reply_text(
                 "<b>Welcome Message Reset</b>\n\nDefault greeting restored.",
@@ -497,9 +488,7 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 reply_markup=kbBack("settings_welcome"),
             )
         elif text:
-            cursor.execute(
-                "INSERT OR REPLACE INTO bot_settings (key, value) VALUES ('welcome_message', ?)", (text,)
-            )
+            settingsRepo.set("welcome_message", text)
             conn.commit()
             await update.message.reply_text(
                 f"<b>Welcome Message Saved</b>\n\nPreview:\n\n{text}",
@@ -512,10 +501,7 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if context.user_data.get("awaiting_quote"):
         context.user_data.clear()
         if text:
-            cursor.execute(
-                "INSERT INTO quotes (text, added_by, added_at) VALUES (?, ?, ?)",
-                (text, userId, datetime.now().isoformat())
-            )
+            quoteRepo.add(text, userId)
             conn.commit()
             await update.message.reply_text(
                 "<b>Quote Added</b>\n\nIt will appear in the daily rotation.",
@@ -529,9 +515,7 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         folderId = context.user_data.get("secret_folder_id")
         context.user_data.clear()
         if text:
-            cursor.execute(
-                "UPDATE folders SET is_secret=1, secret_code=? WHERE id=?", (text.strip(), folderId)
-            )
+            folderRepo.setSecret(folderId, text.strip())
             conn.commit()
             await update.message.reply_text(
                 f"<b>Secret Folder Configured</b>\n\n"
@@ -546,16 +530,15 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if context.user_data.get("awaiting_trending_label"):
         folderId = context.user_data.get("trending_folder_id")
         context.user_data.clear()
-        folder   = cursor.execute("SELECT name FROM folders WHERE id=?", (folderId,)).fetchone()
-        label    = folder[0] if (not text or text.upper() == "SKIP") else text
+        label    = folderRepo.name(folderId) if (not text or text.upper() == "SKIP") else text
         expires  = (datetime.now() + timedelta(hours=24)).isoformat()
         try:
-            cursor.execute("DELETE FROM trending WHERE folder_id=?", (folderId,))
-            cursor.execute("""
-                INSERT INTO trending (folder_id, label, added_by, added_at, expires_at, sort_order)
-                VALUES (?, ?, ?, ?, ?, 0)
-            """, (folderId, label, userId, datetime.now().isoformat(), expires))
+            trendingRepo.deleteFolder(folderId)
+            trendingId = trendingRepo.add(folderId, label, userId, expires)
+            setAutoTrending(None)   # a hand-picked list would be overwritten on the next refresh
             conn.commit()
+            expireAt("trending", trendingId, expires)
+
             await update.message.reply_text(
                 f"<b>Added to Trending</b>\n\n"
                 f"<code>Label    :  {label}</code>\n"
@@ -604,27 +587,14 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         else:
             closes_at = (datetime.now() + timedelta(minutes=poll_data["duration"])).isoformat()
             try:
-                cursor.execute("""
-                    INSERT INTO polls (question, option_a, option_b, option_c, option_d,
-                                       created_by, created_at, closes_at, status)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'open')
-                """, (
-                    poll_data.get("question"),
-                    poll_data.get("option_a"),
-                    poll_data.get("option_b"),
-                    poll_data.get("option_c"),
-                    poll_data.get("option_d"),
-                    userId,
-                    datetime.now().isoformat(),
-                    closes_at,
-                ))
-                pollId = cursor.lastrowid
+                pollId = pollRepo.create(poll_data, userId, closes_at)
                 conn.commit()
             except sqlite3.Error as e:
                 logging.error(f"poll save: {e}")
                 await update.message.reply_text("Failed to create poll.", reply_markup=kbHome())
                 context.user_data.clear()
                 return
+            schedulePollClose(context.job_queue, pollId, closes_at)
 
             context.user_data.clear()
 
@@ -651,20 +621,16 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     msg += f"<code>{choice_map[key]}</code>  {val}\n"
             msg += f"\n<code>Closes  :  {fmtDt(closes_at)}</code>"
 
-            subs = cursor.execute(
-                "SELECT user_id FROM subscribers WHERE banned=0 OR banned IS NULL"
-            ).fetchall()
-            sent = 0
-            for (uid,) in subs:
-                try:
-                    await context.bot.send_message(
-                        uid, msg,
-                        parse_mode="HTML",
-                        reply_markup=InlineKeyboardMarkup(buttons),
-                    )
-                    sent += 1
-                except Exception:
-                    pass
+            subs    = subscriberRepo.activeIds()
+            sent, _ = await sendBulk(
+                subs,
+                lambda uid: context.bot.send_message(
+                    uid, msg,
+                    parse_mode="HTML",
+                    reply_markup=InlineKeyboardMarkup(buttons),
+                ),
+                f"poll {pollId}",
+            )
 
             await update.message.reply_text(
                 f"<b>Poll Created and Sent</b>\n\n"
@@ -683,7 +649,7 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
         folderId = context.user_data.get("set_password_folder_id")
         try:
-            cursor.execute("UPDATE folders SET password=? WHERE id=?", (text, folderId))
+            folderRepo.setPassword(folderId, text)
             conn.commit()
             context.user_data.clear()
             await update.message.reply_text(
@@ -721,21 +687,12 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
         try:
-            subRow   = cursor.execute("SELECT username, first_name FROM subscribers WHERE user_id=?", (targetId,)).fetchone()
+            subRow   = subscriberRepo.name(targetId)
             username = subRow[0] if subRow else None
             fname    = subRow[1] if subRow else None
 
-            # Insert into banned_users table
-            cursor.execute("""
-                INSERT OR REPLACE INTO banned_users (user_id, username, reason, banned_at, banned_by)
-                VALUES (?, ?, 'Banned via admin panel', ?, ?)
-            """, (targetId, username, datetime.now().isoformat(), userId))
-
-            # Also flag the subscribers row
-            cursor.execute(
-                "UPDATE subscribers SET banned=1, ban_reason='Banned via admin panel' WHERE user_id=?",
-                (targetId,)
-            )
+            # banned_users row plus the subscribers flag
+            banRepo.ban(targetId, username, "Banned via admin panel", userId)
             conn.commit()
             context.user_data.clear()
 
@@ -804,22 +761,17 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         # Look up the username from subscribers if we don't have it
         if not newUsername:
-            subRow = cursor.execute(
-                "SELECT username, first_name FROM subscribers WHERE user_id=?", (newId,)
-            ).fetchone()
+            subRow = subscriberRepo.name(newId)
             if subRow:
                 newUsername = subRow[0] or subRow[1]
 
         try:
-            cursor.execute("""
-                INSERT INTO admins (user_id, username, added_by, added_at, is_super_admin)
-                VALUES (?, ?, ?, ?, 0)
-            """, (newId, newUsername, userId, datetime.now().isoformat()))
+            adminRepo.add(newId, newUsername, userId)
             conn.commit()
             context.user_data.clear()
 
-            adminRow     = cursor.execute("SELECT username FROM admins WHERE user_id=?", (userId,)).fetchone()
-            promotedBy   = (adminRow[0] if adminRow else None) or f"Admin {userId}"
+            promotedBy   = adminRepo.displayName(userId)
+
 
             await update.message.reply_text(
                 f"<b>Admin Added</b>\n\n"
@@ -876,10 +828,7 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
                 return
         try:
-            cursor.execute(
-                "INSERT INTO folders (name, created_at) VALUES (?, ?)",
-                (folderName, datetime.now().isoformat())
-            )
+            folderId = folderRepo.create(folderName)
             conn.commit()
         except sqlite3.IntegrityError:
             await update.message.reply_text(
@@ -895,7 +844,7 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         context.user_data.clear()
         context.user_data["upload_mode"]      = folderName
-        context.user_data["file_count"]       = 0
+        context.user_data["upload_session"]   = UploadSession(folderId, folderName)
         await update.message.reply_text(
             f"<b>Folder Created</b>  |  <code>{folderName}</code>\n\n"
             "Now send the files you want to add — photos, videos, documents, or text messages.\n\n"
@@ -910,7 +859,7 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         folderId = context.user_data.get("note_folder_id")
         context.user_data.clear()
         if text and text.upper() == "CLEAR":
-            cursor.execute("UPDATE folders SET note=NULL WHERE id=?", (folderId,))
+            folderRepo.setNote(folderId, None)
             conn.commit()
             await update.message.reply_text(
                 "<b>Note Removed</b>",
@@ -918,7 +867,7 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 reply_markup=kbBack(f"foldermenu_{folderId}"),
             )
         elif text:
-            cursor.execute("UPDATE folders SET note=? WHERE id=?", (text, folderId))
+            folderRepo.setNote(folderId, text)
             conn.commit()
             await update.message.reply_text(
                 "<b>Note Saved</b>",
@@ -932,13 +881,7 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         context.user_data.clear()
         keyword = text or ""
         try:
-            results = cursor.execute("""
-                SELECT f.id, f.name, COUNT(fi.id)
-                FROM folders f
-                LEFT JOIN files fi ON f.id = fi.folder_id
-                WHERE f.name LIKE ?
-                GROUP BY f.id ORDER BY f.created_at DESC
-            """, (f"%{keyword}%",)).fetchall()
+            results = folderRepo.search(keyword)
         except sqlite3.Error:
             await update.message.reply_text("Search failed.", reply_markup=kbHome())
             return
@@ -950,7 +893,7 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
         lines = [f"<b>Search Results</b>  |  {len(results)} found\n"]
-        for fid, name, count in results:
+        for fid, name, count, _, _ in results:
             lines.append(f"\n<code>{name}</code>  |  {count} file(s)")
         await update.message.reply_text("\n".join(lines), parse_mode="HTML", reply_markup=kbHome())
         return
@@ -968,10 +911,8 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
         context.user_data.clear()
         try:
-            files      = cursor.execute(
-                "SELECT file_id, file_type, text_content FROM files WHERE folder_id=?", (folderId,)
-            ).fetchall()
-            folderName = cursor.execute("SELECT name FROM folders WHERE id=?", (folderId,)).fetchone()[0]
+            files      = fileRepo.items(folderId)
+            folderName = folderRepo.name(folderId)
         except sqlite3.Error:
             await update.message.reply_text("Database error.", reply_markup=kbHome())
             return
@@ -987,20 +928,10 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             parse_mode="HTML",
         )
         sentMsgs = [infoMsg]
-        for fid, ftype, txt in files:
-            try:
-                if ftype == "text":
-                    m = await update.message.reply_text(txt)
-                elif ftype == "video":
-                    m = await update.message.reply_video(fid, has_spoiler=True)
-                elif ftype == "photo":
-                    m = await update.message.reply_photo(fid, has_spoiler=True)
-                else:
-                    m = await update.message.reply_document(fid)
-                sentMsgs.append(m)
-            except Exception as e:
-                logging.error(f"preview send: {e}")
-        asyncio.create_task(deleteAll(sentMsgs, result * 60))
+        with outboundLane(DELIVERY):
+            sentIds = await sendItems(context.bot, update.effective_chat.id, files)
+        sentIds = [m.message_id for m in sentMsgs] + sentIds
+        deleteMessagesLater(update.effective_chat.id, sentIds, result * 60)
         await update.message.reply_text(
             f"<b>Preview Active</b>\n\nAll messages above will be deleted in <code>{result}</code> minute(s).",
             parse_mode="HTML",
@@ -1031,17 +962,12 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             forwardable = context.user_data.get("forwardable", 1)
             autoDelete  = result
             try:
-                cursor.execute(
-                    "UPDATE folders SET forwardable=?, auto_delete_minutes=? WHERE id=?",
-                    (forwardable, autoDelete if autoDelete else None, folderId)
-                )
+                folderRepo.setDelivery(folderId, forwardable, autoDelete)
                 token  = generateToken()
                 expiry = (datetime.now() + timedelta(days=7)).isoformat()
-                cursor.execute(
-                    "INSERT INTO links (folder_id, token, expiry, created_at, single_use) VALUES (?, ?, ?, ?, ?)",
-                    (folderId, token, expiry, datetime.now().isoformat(), 1)
-                )
+                linkId = linkRepo.create(folderId, token, expiry, 1)
                 conn.commit()
+                expireAt("link", linkId, expiry)
                 botName = context.bot.username
                 linkUrl = f"https://t.me/{botName}?start={token}"
                 context.user_data.clear()
@@ -1090,17 +1016,13 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             context.user_data.clear()
             return
         try:
-            cursor.execute(
-                "UPDATE folders SET forwardable=?, auto_delete_minutes=? WHERE id=?",
-                (forwardable, autoDelete if autoDelete else None, folderId)
-            )
+            folderRepo.setDelivery(folderId, forwardable, autoDelete)
             token  = generateToken()
             expiry = (datetime.now() + timedelta(minutes=expiryMins)).isoformat()
-            cursor.execute(
-                "INSERT INTO links (folder_id, token, expiry, created_at, single_use) VALUES (?, ?, ?, ?, ?)",
-                (folderId, token, expiry, datetime.now().isoformat(), singleUse)
-            )
+            linkId = linkRepo.create(folderId, token, expiry, singleUse)
             conn.commit()
+            expireAt("link", linkId, expiry)
+
             botName = context.bot.username
             linkUrl = f"https://t.me/{botName}?start={token}"
             context.user_data.clear()
@@ -1196,8 +1118,12 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             ftype, txt = "text", text
 
         if ftype:
+            storageId = await mirrorToStorage(context.bot, fid, ftype, txt)
             context.user_data.setdefault("broadcast_files", []).append(
-                {"file_id": fid, "file_type": ftype, "text_content": txt}
+                {
+                    "file_id": fid, "file_type": ftype, "text_content": txt,
+                    "storage_msg_id": storageId, "media": describeMedia(update.message),
+                }
             )
             cnt = len(context.user_data["broadcast_files"])
             await update.message.reply_text(
@@ -1212,12 +1138,17 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         folderName = context.user_data["upload_mode"]
 
         if text and text.upper() == "END":
-            count    = context.user_data.get("file_count", 0)
             try:
-                folderRow = cursor.execute("SELECT id FROM folders WHERE name=?", (folderName,)).fetchone()
-                folderId  = folderRow[0] if folderRow else None
-            except Exception:
-                folderId = None
+                session = getSession(context, folderName)
+            except sqlite3.Error:
+                session = None
+            folderId = session.folderId if session else None
+            if session and not session.close(context.job_queue, update.effective_chat.id):
+                await update.message.reply_text(
+                    "<b>Save Error</b>\n\nSome files could not be saved. Please send them again.",
+                    parse_mode="HTML",
+                )
+            count = session.saved if session else 0
             context.user_data.clear()
 
             if count == 0:
@@ -1256,24 +1187,14 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         if ftype:
             try:
-                folderRow = cursor.execute("SELECT id FROM folders WHERE name=?", (folderName,)).fetchone()
-                folderId  = folderRow[0]
-                cursor.execute(
-                    "INSERT INTO files (folder_id, file_id, file_type, file_size, uploaded_at, text_content) "
-                    "VALUES (?, ?, ?, ?, ?, ?)",
-                    (folderId, fid, ftype, fsize, datetime.now().isoformat(), txt)
-                )
-                conn.commit()
-                context.user_data["file_count"] = context.user_data.get("file_count", 0) + 1
-                cnt = context.user_data["file_count"]
-                await update.message.reply_text(
-                    f"<b>{ftype.upper()} saved</b>  |  {cnt} file(s) total\n\n"
-                    "Send more files or type <code>END</code> to finish.",
-                    parse_mode="HTML",
-                )
+                session = getSession(context, folderName)
             except sqlite3.Error as e:
                 logging.error(f"upload: {e}")
+                session = None
+            if not session:
                 await update.message.reply_text("Failed to save file. Please try again.", reply_markup=kbHome())
+                return
+            await _bufferUpload(update, context, session, fid, ftype, fsize, txt, "received")
         return
 
     # ── Add media mode: existing folder ──────────────────────────────────
@@ -1281,8 +1202,15 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         folderName = context.user_data["add_media_mode"]
         folderId   = context.user_data["add_media_folder_id"]
 
+        session    = getSession(context, folderName, folderId)
+
         if text and text.upper() == "END":
-            count = context.user_data.get("file_count", 0)
+            if not session.close(context.job_queue, update.effective_chat.id):
+                await update.message.reply_text(
+                    "<b>Save Error</b>\n\nSome files could not be saved. Please send them again.",
+                    parse_mode="HTML",
+                )
+            count = session.saved
             context.user_data.clear()
             await update.message.reply_text(
                 f"<b>Upload Complete</b>  |  <code>{folderName}</code>\n\n"
@@ -1303,21 +1231,5 @@ async def messageHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             ftype, txt, fsize = "text", text, len(text.encode())
 
         if ftype:
-            try:
-                cursor.execute(
-                    "INSERT INTO files (folder_id, file_id, file_type, file_size, uploaded_at, text_content) "
-                    "VALUES (?, ?, ?, ?, ?, ?)",
-                    (folderId, fid, ftype, fsize, datetime.now().isoformat(), txt)
-                )
-                conn.commit()
-                context.user_data["file_count"] = context.user_data.get("file_count", 0) + 1
-                cnt = context.user_data["file_count"]
-                await update.message.reply_text(
-                    f"<b>{ftype.upper()} added</b>  |  {cnt} file(s) total\n\n"
-                    "Send more files or type <code>END</code> to finish.",
-                    parse_mode="HTML",
-                )
-            except sqlite3.Error as e:
-                logging.error(f"addMedia: {e}")
-                await update.message.reply_text("Failed to add file.", reply_markup=kbBack(f"foldermenu_{folderId}"))
+            await _bufferUpload(update, context, session, fid, ftype, fsize, txt, "added")
         return
\ No newline at end of file
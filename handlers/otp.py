@@ -1,29 +1,24 @@
+import html
 import logging
-import random
 import sqlite3
-from datetime import datetime, timedelta
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup  # type: ignore
 from telegram.ext import ContextTypes  # type: ignore
 
-from config import conn, cursor, ADMIN_ID
+from config import conn
 from helpers import safeEdit, isSuperAdmin, fmtDt
+from repos import folderRepo, subscriberRepo
 from keyboards import kbHome, kbBack
+from fanout import sendBulk
+import otpstore
 
 
 # ─────────────────────────────────────────────
 #  HELPERS
 # ─────────────────────────────────────────────
 
-def _genOtp() -> str:
-    return str(random.randint(100000, 999999))
-
-
 def _otpFolderInfo(folderId: int):
-    return cursor.execute(
-        "SELECT name, otp_expiry_minutes FROM folders WHERE id=? AND otp_required=1",
-        (folderId,)
-    ).fetchone()
+    return folderRepo.otpInfo(folderId, requiredOnly=True)
 
 
 # ─────────────────────────────────────────────
@@ -35,20 +30,16 @@ async def otpMenuCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
 
     try:
-        total = cursor.execute(
-            "SELECT COUNT(*) FROM folders WHERE otp_required=1"
-        ).fetchone()[0]
-        pending = cursor.execute(
-            "SELECT COUNT(*) FROM folder_otps WHERE status='pending'"
-        ).fetchone()[0]
+        total = folderRepo.countOtpRequired()
     except Exception:
-        total = pending = 0
+        total = 0
 
     await safeEdit(
         query,
         "<b>OTP Access</b>\n\n"
         f"<code>OTP-protected folders  :  {total}</code>\n"
-        f"<code>Pending OTP requests   :  {pending}</code>\n\n"
+        f"<code>Pending OTP requests   :  {otpstore.countWaiting()}</code>\n"
+        f"<code>Unused OTP codes       :  {otpstore.countActive()}</code>\n\n"
         "To require OTP on a folder, open the folder menu and tap <b>Require OTP</b>.\n\n"
         "<i>Only the Super Admin can enable or disable OTP access on folders.</i>",
         markup=InlineKeyboardMarkup([
@@ -73,9 +64,7 @@ async def otpToggleCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     folderId = int(query.data.replace("otp_toggle_", ""))
     try:
-        row = cursor.execute(
-            "SELECT otp_required, otp_expiry_minutes FROM folders WHERE id=?", (folderId,)
-        ).fetchone()
+        row = folderRepo.otpSettings(folderId)
         if not row:
             await safeEdit(query, "Folder not found.", markup=kbHome())
             return
@@ -83,10 +72,7 @@ async def otpToggleCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         current, expiry = row
         if current:
             # Turn off
-            cursor.execute(
-                "UPDATE folders SET otp_required=0, otp_expiry_minutes=NULL WHERE id=?",
-                (folderId,)
-            )
+            folderRepo.setOtp(folderId, None)
             conn.commit()
             await query.answer("OTP requirement removed.", show_alert=False)
             # Reload folder menu
@@ -143,7 +129,7 @@ async def sendOtpRequestScreen(update, context, folderId: int, folderName: str):
 # ─────────────────────────────────────────────
 
 async def otpRequestCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """User taps Request OTP — bot pings SA with Generate OTP button."""
+    """User taps Request OTP — queued for the SA's next digest of requests."""
     query  = update.callback_query
     user   = query.from_user
 
@@ -152,15 +138,10 @@ async def otpRequestCallback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await query.answer("Verify your phone number first to request OTP access.", show_alert=True)
         return
 
-    await query.answer("Request sent to admin.", show_alert=False)
-
     folderId = int(query.data.replace("otp_request_", ""))
 
     try:
-        folderName = cursor.execute(
-            "SELECT name FROM folders WHERE id=?", (folderId,)
-        ).fetchone()
-        folderName = folderName[0] if folderName else "Unknown"
+        folderName = folderRepo.name(folderId) or "Unknown"
     except sqlite3.Error:
         folderName = "Unknown"
 
@@ -169,28 +150,11 @@ async def otpRequestCallback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     context.user_data["otp_folder_id"]       = folderId
     context.user_data["otp_attempts"]        = 0
 
-    # Ping SA in-bot
-    try:
-        await context.bot.send_message(
-            chat_id=ADMIN_ID,
-            text=(
-                f"<b>OTP Access Request</b>\n\n"
-                f"<code>Folder    :  {folderName}</code>\n"
-                f"<code>User ID   :  {user.id}</code>\n"
-                f"<code>Username  :  @{user.username or 'N/A'}</code>\n"
-                f"<code>Name      :  {user.first_name}</code>\n\n"
-                "Tap Generate OTP to create a one-time code for this user."
-            ),
-            parse_mode="HTML",
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton(
-                    "Generate OTP",
-                    callback_data=f"otp_gen_{folderId}_{user.id}"
-                )]
-            ]),
-        )
-    except Exception as e:
-        logging.error(f"otpRequestCallback notify SA: {e}")
+    # Repeat taps are folded into the request already waiting for the SA
+    if not otpstore.queueRequest(context.job_queue, folderId, folderName, user):
+        await query.answer("Already requested — the admin has been notified.", show_alert=False)
+        return
+    await query.answer("Request sent to admin.", show_alert=False)
 
     # Update the user's message to confirm request sent
     try:
@@ -206,10 +170,6 @@ async def otpRequestCallback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         pass
 
 
-# ─────────────────────────────────────────────
-#  SA — GENERATE OTP (called from messages.py)
-# ─────────────────────────────────────────────
-
 # ─────────────────────────────────────────────
 #  SA — GENERATE & SEND OTP IN ONE TAP
 # ─────────────────────────────────────────────
@@ -229,34 +189,18 @@ async def otpGenerateCallback(update: Update, context: ContextTypes.DEFAULT_TYPE
     userId   = int(parts[1])
 
     try:
-        row = cursor.execute(
-            "SELECT name, otp_expiry_minutes FROM folders WHERE id=?", (folderId,)
-        ).fetchone()
+        row = folderRepo.otpInfo(folderId)
         if not row:
             await query.answer("Folder not found.", show_alert=True)
             return
         folderName, expiryMins = row
 
-        userRow   = cursor.execute(
-            "SELECT first_name, username FROM subscribers WHERE user_id=?", (userId,)
-        ).fetchone()
-        firstName = userRow[0] if userRow else "User"
-        username  = userRow[1] if userRow else "N/A"
+        userRow   = subscriberRepo.name(userId)
+        username  = userRow[0] if userRow else "N/A"
+        firstName = userRow[1] if userRow else "User"
 
-        code      = _genOtp()
-        expiresAt = (datetime.now() + timedelta(minutes=expiryMins)).isoformat()
-
-        # Revoke any old pending OTPs for this user+folder
-        cursor.execute(
-            "UPDATE folder_otps SET status='revoked' WHERE folder_id=? AND user_id=? AND status='pending'",
-            (folderId, userId)
-        )
-        cursor.execute(
-            "INSERT INTO folder_otps (folder_id, user_id, code, created_at, expires_at, status)"
-            " VALUES (?, ?, ?, ?, ?, 'pending')",
-            (folderId, userId, code, datetime.now().isoformat(), expiresAt)
-        )
-        conn.commit()
+        # Replaces any pending OTP for this user+folder
+        code, _ = otpstore.issue(folderId, userId, expiryMins)
 
     except sqlite3.Error as e:
         logging.error(f"otpGenerate: {e}")
@@ -279,30 +223,113 @@ async def otpGenerateCallback(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
     except Exception as e:
         logging.error(f"otpGenerate deliver: {e}")
-        await safeEdit(
-            query,
+        await query.message.reply_text(
             "<b>Failed to Send</b>\n\n"
             "Could not deliver the OTP to the user.\n"
             "They may not have started the bot yet.",
-            markup=kbHome(),
+            reply_markup=kbHome(),
             parse_mode="HTML",
         )
         return
 
-    # Update SA's message to confirm
-    await safeEdit(
-        query,
+    # Drop this request's button from the digest and confirm separately,
+    # so the other requests in it stay answerable
+    rows = [
+        row for row in (query.message.reply_markup.inline_keyboard if query.message.reply_markup else ())
+        if row[0].callback_data != query.data
+    ]
+    try:
+        await query.edit_message_reply_markup(InlineKeyboardMarkup(rows) if rows else None)
+    except Exception:
+        pass
+    await query.message.reply_text(
         f"<b>OTP Sent</b>\n\n"
-        f"<code>Folder   :  {folderName}</code>\n"
-        f"<code>User     :  {firstName}  (@{username})</code>\n"
+        f"<code>Folder   :  {html.escape(folderName)}</code>\n"
+        f"<code>User     :  {html.escape(f'{firstName}  (@{username})')}</code>\n"
         f"<code>OTP Code :  {code}</code>\n"
         f"<code>Expires  :  {expiryMins} minute(s)</code>\n\n"
         "The OTP has been delivered to the user.",
-        markup=kbHome(),
+        reply_markup=kbHome(),
         parse_mode="HTML",
     )
 
 
+# ─────────────────────────────────────────────
+#  SA — APPROVE ALL PENDING FOR A FOLDER
+# ─────────────────────────────────────────────
+
+async def otpApproveAllCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """SA taps Approve all — one code per waiting user, issued together and sent concurrently."""
+    query = update.callback_query
+
+    if not isSuperAdmin(query.from_user.id):
+        await query.answer("Only the Super Admin can generate OTPs.", show_alert=True)
+        return
+
+    folderId = int(query.data.replace("otp_all_", ""))
+    waiting  = dict(otpstore.waitingFor(folderId))
+    if not waiting:
+        await query.answer("No requests are waiting for this folder.", show_alert=True)
+        return
+
+    try:
+        row = folderRepo.otpInfo(folderId)
+        if not row:
+            await query.answer("Folder not found.", show_alert=True)
+            return
+        folderName, expiryMins = row
+        codes, _ = otpstore.issueMany(folderId, list(waiting), expiryMins)
+    except sqlite3.Error as e:
+        logging.error(f"otpApproveAll: {e}")
+        await query.answer("Database error.", show_alert=True)
+        return
+    await query.answer(f"Sending {len(codes)} OTP(s)...")
+
+    delivered = set()
+
+    async def send(uid):
+        await context.bot.send_message(
+            chat_id=uid,
+            text=(
+                f"<b>Your One-Time Password</b>\n\n"
+                f"Folder   :  <code>{folderName}</code>\n"
+                f"OTP Code :  <code>{codes[uid]}</code>\n"
+                f"Expires  :  <code>{expiryMins} minute(s) from now</code>\n\n"
+                "Go back to the bot and enter this code to access the folder.\n"
+                "<i>This code can only be used once.</i>"
+            ),
+            parse_mode="HTML",
+        )
+        delivered.add(uid)
+
+    sent, failed = await sendBulk(list(codes), send, f"otpApproveAll folder={folderId}")
+
+    lines = [
+        f"<b>OTPs Sent  —  {html.escape(folderName)}</b>\n",
+        f"<code>Sent     :  {sent}</code>",
+        f"<code>Failed   :  {failed}</code>",
+        f"<code>Expires  :  {expiryMins} minute(s)</code>\n",
+    ]
+    for uid, r in list(waiting.items())[:50]:
+        status = "sent" if uid in delivered else "not delivered"
+        name   = html.escape(f"{r.firstName} (@{r.username or 'N/A'})")
+        lines.append(f"<code>{name}  |  {uid}  |  {status}</code>")
+    if len(waiting) > 50:
+        lines.append(f"<i>... and {len(waiting) - 50} more</i>")
+
+    # Drop this folder's buttons from the digest and report separately, so
+    # requests for other folders stay listed and answerable
+    rows = [
+        row for row in (query.message.reply_markup.inline_keyboard if query.message.reply_markup else ())
+        if row[0].callback_data != query.data and not row[0].callback_data.startswith(f"otp_gen_{folderId}_")
+    ]
+    try:
+        await query.edit_message_reply_markup(InlineKeyboardMarkup(rows) if rows else None)
+    except Exception:
+        pass
+    await query.message.reply_text("\n".join(lines), reply_markup=kbHome(), parse_mode="HTML")
+
+
 # ─────────────────────────────────────────────
 #  USER — ENTER OTP (handled in messages.py)
 # ─────────────────────────────────────────────
@@ -319,21 +346,17 @@ async def verifyOtpEntry(update, context, text: str) -> bool:
     userId   = update.effective_user.id
     attempts = context.user_data.get("otp_attempts", 0)
 
-    code = text.strip()
-
     try:
-        otpRow = cursor.execute(
-            "SELECT id, code, expires_at FROM folder_otps "
-            "WHERE folder_id=? AND user_id=? AND status='pending' "
-            "ORDER BY created_at DESC LIMIT 1",
-            (folderId, userId)
-        ).fetchone()
+        result = otpstore.check(folderId, userId, text.strip())
+        if result == "wrong" and attempts + 1 >= otpstore.MAX_ATTEMPTS:
+            otpstore.revoke(folderId, userId)
+        conn.commit()
     except sqlite3.Error as e:
         logging.error(f"verifyOtp: {e}")
         await update.message.reply_text("A database error occurred. Please try again.")
         return True
 
-    if not otpRow:
+    if result == "none":
         await update.message.reply_text(
             "<b>No Active OTP</b>\n\n"
             "You do not have a valid OTP for this folder.\n"
@@ -343,12 +366,7 @@ async def verifyOtpEntry(update, context, text: str) -> bool:
         context.user_data.clear()
         return True
 
-    otpId, correctCode, expiresAt = otpRow
-
-    # Check expiry
-    if datetime.now() > datetime.fromisoformat(expiresAt):
-        cursor.execute("UPDATE folder_otps SET status='expired' WHERE id=?", (otpId,))
-        conn.commit()
+    if result == "expired":
         await update.message.reply_text(
             "<b>OTP Expired</b>\n\n"
             "This OTP is no longer valid.\n"
@@ -358,17 +376,14 @@ async def verifyOtpEntry(update, context, text: str) -> bool:
         context.user_data.clear()
         return True
 
-    # Check code
-    if code != correctCode:
+    if result == "wrong":
         attempts += 1
         context.user_data["otp_attempts"] = attempts
-        remaining = 3 - attempts
+        remaining = otpstore.MAX_ATTEMPTS - attempts
         if remaining <= 0:
-            cursor.execute("UPDATE folder_otps SET status='revoked' WHERE id=?", (otpId,))
-            conn.commit()
             await update.message.reply_text(
                 "<b>Too Many Attempts</b>\n\n"
-                "You have entered the wrong OTP 3 times.\n"
+                f"You have entered the wrong OTP {otpstore.MAX_ATTEMPTS} times.\n"
                 "Please request a new OTP from the admin.",
                 parse_mode="HTML",
             )
@@ -381,9 +396,6 @@ async def verifyOtpEntry(update, context, text: str) -> bool:
             )
         return True
 
-    # Correct — mark used
-    cursor.execute("UPDATE folder_otps SET status='used' WHERE id=?", (otpId,))
-    conn.commit()
     context.user_data.clear()
 
     # Deliver the folder — reuse existing delivery logic from start.py
@@ -1,13 +1,15 @@
 import logging
 import sqlite3
-from datetime import datetime, timedelta
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup  # type: ignore
 from telegram.ext import ContextTypes  # type: ignore
 
-from config import conn, cursor
+from config import conn
 from helpers import safeEdit, isSuperAdmin, fmtDt, validateMinutes
+from fanout import sendBulk
 from keyboards import kbHome, kbBack, kbMain
+from repos import pollRepo, subscriberRepo
+from polltally import tallyFor, recordVote, closeTally
 
 
 # ─────────────────────────────────────────────
@@ -22,10 +24,8 @@ async def pollMenuCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     try:
-        active = cursor.execute(
-            "SELECT COUNT(*) FROM polls WHERE status='open'"
-        ).fetchone()[0]
-        total  = cursor.execute("SELECT COUNT(*) FROM polls").fetchone()[0]
+        active = pollRepo.count("open")
+        total  = pollRepo.count()
     except sqlite3.Error as e:
         logging.error(f"pollMenu: {e}")
         await safeEdit(query, "Failed to load poll data.", markup=kbHome())
@@ -74,10 +74,7 @@ async def pollListCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     label  = "Active" if status == "open" else "Past"
 
     try:
-        polls = cursor.execute(
-            "SELECT id, question, created_at, closes_at FROM polls WHERE status=? ORDER BY created_at DESC LIMIT 10",
-            (status,)
-        ).fetchall()
+        polls = pollRepo.listByStatus(status)
     except sqlite3.Error as e:
         logging.error(f"pollList: {e}")
         await safeEdit(query, "Failed to load polls.", markup=kbBack("poll_menu"))
@@ -112,24 +109,19 @@ async def pollViewCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     pollId = int(query.data.replace("poll_view_", ""))
 
     try:
-        poll = cursor.execute(
-            "SELECT id, question, option_a, option_b, option_c, option_d, status, closes_at, created_at "
-            "FROM polls WHERE id=?", (pollId,)
-        ).fetchone()
-        if not poll:
+        tally = tallyFor(pollId)
+        if not tally:
             await safeEdit(query, "Poll not found.", markup=kbBack("poll_menu"))
             return
-        votes = cursor.execute(
-            "SELECT choice, COUNT(*) FROM poll_votes WHERE poll_id=? GROUP BY choice", (pollId,)
-        ).fetchall()
     except sqlite3.Error as e:
         logging.error(f"pollView: {e}")
         await safeEdit(query, "Failed to load poll.", markup=kbBack("poll_menu"))
         return
 
-    pid, question, a, b, c, d, status, closes_at, created_at = poll
-    vote_map   = {v[0]: v[1] for v in votes}
-    total_votes = sum(vote_map.values())
+    pid, question, a, b, c, d, _, closes_at, created_at = tally.poll
+    status      = tally.status
+    vote_map    = tally.counts
+    total_votes = tally.total
 
     def bar(choice, label):
         if not label:
@@ -169,14 +161,15 @@ async def pollCloseCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     pollId = int(query.data.replace("poll_close_", ""))
     try:
-        cursor.execute("UPDATE polls SET status='closed' WHERE id=?", (pollId,))
-        conn.commit()
+        closed = await closePoll(pollId, context)
     except sqlite3.Error as e:
         logging.error(f"pollClose: {e}")
         await safeEdit(query, "Failed to close poll.", markup=kbBack("poll_menu"))
         return
 
-    await _broadcastPollResults(pollId, context)
+    if not closed:
+        await safeEdit(query, "This poll is already closed.", markup=kbBack("poll_menu"))
+        return
     await safeEdit(
         query,
         "<b>Poll Closed</b>\n\nResults have been broadcast to all subscribers.",
@@ -185,27 +178,33 @@ async def pollCloseCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+async def closePoll(pollId: int, context) -> bool:
+    """
+    Close an open poll and broadcast its results. False if it was already
+    closed — the admin button, the scheduled job and the sweep can race.
+    """
+    closeTally(pollId)
+    if not pollRepo.close(pollId):
+        return False
+    conn.commit()
+    await _broadcastPollResults(pollId, context)
+    return True
+
+
 async def _broadcastPollResults(pollId: int, context):
     try:
-        poll = cursor.execute(
-            "SELECT question, option_a, option_b, option_c, option_d FROM polls WHERE id=?", (pollId,)
-        ).fetchone()
-        votes = cursor.execute(
-            "SELECT choice, COUNT(*) FROM poll_votes WHERE poll_id=? GROUP BY choice", (pollId,)
-        ).fetchall()
-        subs  = cursor.execute(
-            "SELECT user_id FROM subscribers WHERE banned=0 OR banned IS NULL"
-        ).fetchall()
+        tally = tallyFor(pollId)
+        subs  = subscriberRepo.activeIds()
     except sqlite3.Error as e:
         logging.error(f"broadcastPollResults: {e}")
         return
 
-    if not poll:
+    if not tally:
         return
 
-    question, a, b, c, d = poll
-    vote_map    = {v[0]: v[1] for v in votes}
-    total_votes = sum(vote_map.values())
+    question, a, b, c, d = tally.poll[1:6]
+    vote_map    = tally.counts
+    total_votes = tally.total
 
     def line(choice, label):
         if not label:
@@ -222,14 +221,13 @@ async def _broadcastPollResults(pollId: int, context):
         f"<code>Total votes  :  {total_votes}</code>"
     )
 
-    for (uid,) in subs:
-        try:
-            await context.bot.send_message(uid, msg, parse_mode="HTML")
-        except Exception:
-            pass
+    sent, failed = await sendBulk(
+        subs, lambda uid: context.bot.send_message(uid, msg, parse_mode="HTML"), f"poll {pollId} results"
+    )
+    logging.info(f"Poll {pollId} results sent to {sent} subscriber(s), {failed} failed")
 
     try:
-        cursor.execute("UPDATE polls SET result_sent=1 WHERE id=?", (pollId,))
+        pollRepo.markResultSent(pollId)
         conn.commit()
     except sqlite3.Error:
         pass
@@ -253,35 +251,22 @@ async def pollVoteCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     choice  = parts[2]
 
     try:
-        poll = cursor.execute(
-            "SELECT question, option_a, option_b, option_c, option_d, status FROM polls WHERE id=?",
-            (pollId,)
-        ).fetchone()
-        if not poll or poll[5] != "open":
+        # Counted in memory; polltally writes the rows to poll_votes in batches
+        tally = tallyFor(pollId)
+        if not tally or tally.status != "open":
             await query.answer("This poll is no longer active.", show_alert=True)
             return
 
-        existing = cursor.execute(
-            "SELECT 1 FROM poll_votes WHERE poll_id=? AND user_id=?", (pollId, userId)
-        ).fetchone()
-        if existing:
+        if not recordVote(context.job_queue, tally, userId, choice):
             await query.answer("You have already voted in this poll.", show_alert=True)
             return
 
-        cursor.execute(
-            "INSERT INTO poll_votes (poll_id, user_id, choice, voted_at) VALUES (?, ?, ?, ?)",
-            (pollId, userId, choice, datetime.now().isoformat())
-        )
-        conn.commit()
         await query.answer("Vote recorded!", show_alert=False)
 
         # Update the vote count display for this user
-        votes = cursor.execute(
-            "SELECT choice, COUNT(*) FROM poll_votes WHERE poll_id=? GROUP BY choice", (pollId,)
-        ).fetchall()
-        vote_map    = {v[0]: v[1] for v in votes}
-        total_votes = sum(vote_map.values())
-        question, a, b, c, d, _ = poll
+        vote_map    = tally.counts
+        total_votes = tally.total
+        question, a, b, c, d = tally.poll[1:6]
 
         def line(ch, label):
             if not label:
@@ -300,8 +285,6 @@ async def pollVoteCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "Thank you for voting!",
             parse_mode="HTML",
         )
-    except sqlite3.IntegrityError:
-        await query.answer("You have already voted.", show_alert=True)
     except sqlite3.Error as e:
         logging.error(f"pollVote: {e}")
         await query.answer("Failed to record vote.", show_alert=True)
\ No newline at end of file
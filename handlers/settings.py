@@ -1,13 +1,14 @@
 import logging
 import sqlite3
-from datetime import datetime
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup  # type: ignore
 from telegram.ext import ContextTypes  # type: ignore
 
-from config import conn, cursor
+from config import conn
 from helpers import safeEdit, isSuperAdmin, fmtDt
 from keyboards import kbHome, kbBack, kbMain
+from repos import folderRepo, linkRepo, qotdRunRepo, quoteRepo, settingsRepo
+from qotd import QOTD_TIME, QOTD_WINDOW, nextQuote, startQotdRun
 
 
 # ─────────────────────────────────────────────
@@ -21,20 +22,25 @@ async def settingsMenuCallback(update: Update, context: ContextTypes.DEFAULT_TYP
         await query.answer("Super admins only.", show_alert=True)
         return
 
-    welcome = cursor.execute(
-        "SELECT value FROM bot_settings WHERE key='welcome_message'"
-    ).fetchone()
-    quote_count = cursor.execute("SELECT COUNT(*) FROM quotes").fetchone()[0]
-    qotd_time   = cursor.execute(
-        "SELECT value FROM bot_settings WHERE key='qotd_time'"
-    ).fetchone()
+    welcome     = settingsRepo.get("welcome_message")
+    quote_count = quoteRepo.count()
+    qotd_time   = settingsRepo.get("qotd_time", QOTD_TIME)
+    qotd_window = settingsRepo.get("qotd_window_minutes", QOTD_WINDOW)
+    last_run    = qotdRunRepo.latest()
+
+    qotd_last = "Never"
+    if last_run:
+        started_at, finished_at, audience, sent, failed, duration = last_run
+        took      = f"{duration / 60:.0f} min" if finished_at else "sending"
+        qotd_last = f"{fmtDt(started_at)}  |  {sent}/{audience} sent, {failed} failed, {took}"
 
     await safeEdit(
         query,
         "<b>Bot Settings</b>\n\n"
         f"<code>Welcome msg   :  {'Custom' if welcome else 'Default'}</code>\n"
         f"<code>Quotes pool   :  {quote_count}</code>\n"
-        f"<code>QOTD time     :  {qotd_time[0] if qotd_time else '12:00 UTC'}</code>",
+        f"<code>QOTD time     :  {qotd_time}, over {qotd_window} min</code>\n"
+        f"<code>Last QOTD     :  {qotd_last}</code>",
         markup=InlineKeyboardMarkup([
             [InlineKeyboardButton("Welcome Message",   callback_data="settings_welcome")],
             [InlineKeyboardButton("Manage Quotes",     callback_data="settings_quotes")],
@@ -53,14 +59,12 @@ async def settingsMenuCallback(update: Update, context: ContextTypes.DEFAULT_TYP
 async def settingsWelcomeCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    current = cursor.execute(
-        "SELECT value FROM bot_settings WHERE key='welcome_message'"
-    ).fetchone()
+    current = settingsRepo.get("welcome_message")
 
     await safeEdit(
         query,
         "<b>Welcome Message</b>\n\n"
-        f"<b>Current:</b>\n{current[0] if current else '<i>Default (not set)</i>'}\n\n"
+        f"<b>Current:</b>\n{current or '<i>Default (not set)</i>'}\n\n"
         "Type a new welcome message to replace it.\n"
         "HTML formatting is supported.\n\n"
         "Type <code>RESET</code> to restore the default.",
@@ -80,9 +84,7 @@ async def settingsQuotesCallback(update: Update, context: ContextTypes.DEFAULT_T
     query = update.callback_query
     await query.answer()
     try:
-        quotes = cursor.execute(
-            "SELECT id, text, author, last_sent FROM quotes ORDER BY added_at DESC LIMIT 15"
-        ).fetchall()
+        quotes = quoteRepo.recent()
     except sqlite3.Error as e:
         logging.error(f"settingsQuotes: {e}")
         await safeEdit(query, "Failed to load quotes.", markup=kbBack("settings_menu"))
@@ -123,9 +125,7 @@ async def quoteDeleteCallback(update: Update, context: ContextTypes.DEFAULT_TYPE
     query = update.callback_query
     await query.answer()
     try:
-        quotes = cursor.execute(
-            "SELECT id, text FROM quotes ORDER BY added_at DESC LIMIT 15"
-        ).fetchall()
+        quotes = quoteRepo.recent()
     except sqlite3.Error as e:
         logging.error(f"quoteDelete: {e}")
         await safeEdit(query, "Failed to load quotes.", markup=kbBack("settings_quotes"))
@@ -145,7 +145,7 @@ async def quoteDeleteCallback(update: Update, context: ContextTypes.DEFAULT_TYPE
             text[:40] + "..." if len(text) > 40 else text,
             callback_data=f"quote_del_{qid}"
         )]
-        for qid, text in quotes
+        for qid, text, _, _ in quotes
     ]
     buttons.append([InlineKeyboardButton("Back", callback_data="settings_quotes")])
     await safeEdit(
@@ -161,7 +161,7 @@ async def quoteDelConfirmCallback(update: Update, context: ContextTypes.DEFAULT_
     await query.answer()
     qid   = int(query.data.replace("quote_del_", ""))
     try:
-        cursor.execute("DELETE FROM quotes WHERE id=?", (qid,))
+        quoteRepo.delete(qid)
         conn.commit()
         await safeEdit(
             query,
@@ -177,50 +177,16 @@ async def quoteDelConfirmCallback(update: Update, context: ContextTypes.DEFAULT_
 async def qotdSendNowCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    await _sendQotd(context)
+    runId = await startQotdRun(context, "manual", window=0)
     await safeEdit(
         query,
-        "<b>Quote Sent</b>\n\nA random quote has been sent to all subscribers.",
+        "<b>Quote Queued</b>\n\nThe next quote in the rotation is being sent to all subscribers."
+        if runId else "<b>Nothing Sent</b>\n\nAdd a quote to the pool first.",
         markup=kbBack("settings_quotes"),
         parse_mode="HTML",
     )
 
 
-async def _sendQotd(context):
-    """Pick a random quote and broadcast it to all subscribers."""
-    try:
-        quote = cursor.execute(
-            "SELECT id, text, author FROM quotes ORDER BY RANDOM() LIMIT 1"
-        ).fetchone()
-        if not quote:
-            return
-        subs = cursor.execute(
-            "SELECT user_id FROM subscribers WHERE banned=0 OR banned IS NULL"
-        ).fetchall()
-    except sqlite3.Error as e:
-        logging.error(f"sendQotd: {e}")
-        return
-
-    qid, text, author = quote
-    author_line = f"\n\n— <i>{author}</i>" if author else ""
-    msg = f"<b>Quote of the Day</b>\n\n<i>{text}</i>{author_line}"
-
-    for (uid,) in subs:
-        try:
-            await context.bot.send_message(uid, msg, parse_mode="HTML")
-        except Exception:
-            pass
-
-    try:
-        cursor.execute(
-            "UPDATE quotes SET last_sent=? WHERE id=?",
-            (datetime.now().isoformat(), qid)
-        )
-        conn.commit()
-    except sqlite3.Error:
-        pass
-
-
 # ─────────────────────────────────────────────
 #  SECRET FOLDERS
 # ─────────────────────────────────────────────
@@ -229,9 +195,7 @@ async def settingsSecretsCallback(update: Update, context: ContextTypes.DEFAULT_
     query = update.callback_query
     await query.answer()
     try:
-        secrets = cursor.execute(
-            "SELECT id, name, secret_code FROM folders WHERE is_secret=1"
-        ).fetchall()
+        secrets = folderRepo.secrets()
     except sqlite3.Error as e:
         logging.error(f"settingsSecrets: {e}")
         await safeEdit(query, "Failed to load secret folders.", markup=kbBack("settings_menu"))
@@ -261,9 +225,7 @@ async def secretMakeCallback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     query = update.callback_query
     await query.answer()
     try:
-        folders = cursor.execute(
-            "SELECT id, name FROM folders WHERE is_secret=0 ORDER BY name"
-        ).fetchall()
+        folders = folderRepo.choices(order="name", publicOnly=True)
     except sqlite3.Error as e:
         logging.error(f"secretMake: {e}")
         await safeEdit(query, "Failed to load folders.", markup=kbBack("settings_secrets"))
@@ -314,9 +276,7 @@ async def secretUnmarkCallback(update: Update, context: ContextTypes.DEFAULT_TYP
     query = update.callback_query
     await query.answer()
     try:
-        secrets = cursor.execute(
-            "SELECT id, name FROM folders WHERE is_secret=1"
-        ).fetchall()
+        secrets = folderRepo.secrets()
     except sqlite3.Error as e:
         logging.error(f"secretUnmark: {e}")
         await safeEdit(query, "Failed to load secrets.", markup=kbBack("settings_secrets"))
@@ -333,7 +293,7 @@ async def secretUnmarkCallback(update: Update, context: ContextTypes.DEFAULT_TYP
 
     buttons = [
         [InlineKeyboardButton(name, callback_data=f"secret_unmark_{fid}")]
-        for fid, name in secrets
+        for fid, name, _ in secrets
     ]
     buttons.append([InlineKeyboardButton("Back", callback_data="settings_secrets")])
 
@@ -350,9 +310,7 @@ async def secretUnmarkConfirmCallback(update: Update, context: ContextTypes.DEFA
     await query.answer()
     folderId = int(query.data.replace("secret_unmark_", ""))
     try:
-        cursor.execute(
-            "UPDATE folders SET is_secret=0, secret_code=NULL WHERE id=?", (folderId,)
-        )
+        folderRepo.setSecret(folderId, None)
         conn.commit()
         await safeEdit(
             query,
@@ -373,9 +331,7 @@ async def settingsLinkstatsCallback(update: Update, context: ContextTypes.DEFAUL
     query = update.callback_query
     await query.answer()
     try:
-        folders = cursor.execute(
-            "SELECT id, name FROM folders ORDER BY name"
-        ).fetchall()
+        folders = folderRepo.choices(order="name")
     except sqlite3.Error as e:
         logging.error(f"settingsLinkstats: {e}")
         await safeEdit(query, "Failed to load folders.", markup=kbBack("settings_menu"))
@@ -410,19 +366,8 @@ async def linkstatsViewCallback(update: Update, context: ContextTypes.DEFAULT_TY
     folderId = int(query.data.replace("linkstats_", ""))
 
     try:
-        folder = cursor.execute("SELECT name FROM folders WHERE id=?", (folderId,)).fetchone()
-        links  = cursor.execute("""
-            SELECT l.id, l.token, l.created_at, l.expiry, l.revoked, l.single_use,
-                   l.access_count,
-                   COUNT(DISTINCT la.user_id) as unique_users,
-                   MAX(la.accessed_at) as last_access
-            FROM links l
-            LEFT JOIN link_access_log la ON l.id = la.link_id
-            WHERE l.folder_id=?
-            GROUP BY l.id
-            ORDER BY l.created_at DESC
-            LIMIT 10
-        """, (folderId,)).fetchall()
+        folderName = folderRepo.name(folderId)
+        links      = linkRepo.folderStats(folderId)
     except sqlite3.Error as e:
         logging.error(f"linkstatsView: {e}")
         await safeEdit(query, "Failed to load link stats.", markup=kbBack("settings_linkstats"))
@@ -431,13 +376,13 @@ async def linkstatsViewCallback(update: Update, context: ContextTypes.DEFAULT_TY
     if not links:
         await safeEdit(
             query,
-            f"<b>Link Analytics</b>  |  {folder[0]}\n\nNo links have been generated for this folder.",
+            f"<b>Link Analytics</b>  |  {folderName}\n\nNo links have been generated for this folder.",
             markup=kbBack("settings_linkstats"),
             parse_mode="HTML",
         )
         return
 
-    lines = [f"<b>Link Analytics</b>  |  {folder[0]}\n"]
+    lines = [f"<b>Link Analytics</b>  |  {folderName}\n"]
     for lid, token, created, expiry, revoked, single_use, total, unique, last in links:
         status = "Revoked" if revoked else ("Used" if single_use and total > 0 else "Active")
         short  = token[:8] + "..."
@@ -464,13 +409,12 @@ async def linkstatsViewCallback(update: Update, context: ContextTypes.DEFAULT_TY
 # ─────────────────────────────────────────────
 
 async def getQuoteCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """User requests a random quote on demand."""
+    """User requests a quote on demand — the next one in the user deck."""
     query = update.callback_query
     await query.answer()
     try:
-        quote = cursor.execute(
-            "SELECT text, author FROM quotes ORDER BY RANDOM() LIMIT 1"
-        ).fetchone()
+        quote = nextQuote("user")
+        conn.commit()
     except sqlite3.Error as e:
         logging.error(f"getQuote: {e}")
         quote = None
@@ -487,8 +431,8 @@ async def getQuoteCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    text, author = quote
-    author_line  = f"\n\n— <i>{author}</i>" if author else ""
+    _, text, author = quote
+    author_line     = f"\n\n— <i>{author}</i>" if author else ""
 
     await safeEdit(
         query,
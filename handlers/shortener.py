@@ -2,14 +2,14 @@ import logging
 import secrets
 import sqlite3
 import string
-from datetime import datetime
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup  # type: ignore
 from telegram.ext import ContextTypes  # type: ignore
 
-from config import conn, cursor
+from config import conn
 from helpers import safeEdit, isAdmin
 from keyboards import kbHome, kbBack
+from repos import shortLinkRepo
 
 
 # ─────────────────────────────────────────────
@@ -21,13 +21,7 @@ async def shortenerMenuCallback(update: Update, context: ContextTypes.DEFAULT_TY
     await query.answer()
 
     try:
-        total  = cursor.execute(
-            "SELECT COUNT(*) FROM shortened_links WHERE created_by=?", (query.from_user.id,)
-        ).fetchone()[0]
-        clicks = cursor.execute(
-            "SELECT COALESCE(SUM(clicks),0) FROM shortened_links WHERE created_by=?",
-            (query.from_user.id,)
-        ).fetchone()[0]
+        total, clicks = shortLinkRepo.totals(query.from_user.id)
     except Exception:
         total = clicks = 0
 
@@ -97,12 +91,7 @@ async def shortenerMyLinksCallback(update: Update, context: ContextTypes.DEFAULT
     await query.answer()
 
     try:
-        links = cursor.execute("""
-            SELECT short_code, original_url, clicks, created_at
-            FROM shortened_links
-            WHERE created_by=?
-            ORDER BY created_at DESC LIMIT 20
-        """, (query.from_user.id,)).fetchall()
+        links = shortLinkRepo.byCreator(query.from_user.id)
     except sqlite3.Error as e:
         logging.error(f"myLinks: {e}")
         await safeEdit(query, "Failed to load links.", markup=kbBack("shortener_menu"))
@@ -155,10 +144,7 @@ async def processSingleShorten(update, context, url: str):
 
     code = _makeCode()
     try:
-        cursor.execute("""
-            INSERT INTO shortened_links (short_code, original_url, created_by, created_at, clicks)
-            VALUES (?, ?, ?, ?, 0)
-        """, (code, url, update.effective_user.id, datetime.now().isoformat()))
+        shortLinkRepo.add(code, url, update.effective_user.id)
         conn.commit()
     except sqlite3.Error as e:
         logging.error(f"processSingleShorten: {e}")
@@ -198,10 +184,7 @@ async def processBulkShorten(update, context):
             continue
         code = _makeCode()
         try:
-            cursor.execute("""
-                INSERT INTO shortened_links (short_code, original_url, created_by, created_at, clicks)
-                VALUES (?, ?, ?, ?, 0)
-            """, (code, url, userId, datetime.now().isoformat()))
+            shortLinkRepo.add(code, url, userId)
             conn.commit()
             short = f"https://t.me/{botName}?start=s_{code}"
             results.append(f"<code>{short}</code>")
@@ -228,27 +211,23 @@ async def processBulkShorten(update, context):
 async def handleShortLink(update, context, code: str):
     """Called from start.py when token starts with s_"""
     try:
-        row = cursor.execute(
-            "SELECT original_url FROM shortened_links WHERE short_code=?", (code,)
-        ).fetchone()
+        original = shortLinkRepo.url(code)
     except sqlite3.Error as e:
         logging.error(f"handleShortLink: {e}")
         await update.message.reply_text("Error loading link.")
         return
 
-    if not row:
+    if not original:
         await update.message.reply_text(
             "<b>Link Not Found</b>\n\nThis short link does not exist or has expired.",
             parse_mode="HTML",
         )
         return
 
-    original = row[0]
     try:
-        cursor.execute(
-            "UPDATE shortened_links SET clicks=clicks+1 WHERE short_code=?", (code,)
-        )
+        shortLinkRepo.click(code)
         conn.commit()
+
     except Exception:
         pass
 
@@ -1,4 +1,3 @@
-import asyncio
 import logging
 import sqlite3
 from datetime import datetime
@@ -6,15 +5,32 @@ from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup  # type: ignore
 from telegram.ext import ContextTypes  # type: ignore
 
-from config import conn, cursor, ADMIN_ID
-from helpers import isAdmin, isSuperAdmin, isBanned, isVerified, trackUser, deleteAll, fmtDt
+from config import conn, ADMIN_ID
+from helpers import isAdmin, isSuperAdmin, isBanned, isVerified, trackUser, fmtDt
+from dispatcher import outboundLane, DELIVERY
+from storage import sendItems
+from deliveries import runDelivery, cancelForUser
+from popularity import recordView
+from expiry import deleteMessagesLater
 from keyboards import kbMain, kbUser, kbHome
+from repos import fileRepo, folderRepo, inboxRepo, linkRepo, logRepo, settingsRepo, subscriberRepo
 
 
 # ─────────────────────────────────────────────
 #  START
 # ─────────────────────────────────────────────
 
+def _unread(userId: int) -> int:
+    """Badge for the Inbox button of the user's main menu."""
+    try:
+        if isAdmin(userId):
+            return inboxRepo.counts(None if isSuperAdmin(userId) else userId)[1]
+        return inboxRepo.replyCounts(userId)[1]
+    except sqlite3.Error as e:
+        logging.error(f"unread badge uid={userId}: {e}")
+        return 0
+
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user   = update.effective_user
     userId = user.id
@@ -45,7 +61,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"<code>Role  :  {role}</code>\n\n"
             "Select an option from the control panel below.",
             parse_mode="HTML",
-            reply_markup=kbMain(),
+            reply_markup=kbMain(_unread(userId)),
         )
     else:
         # Show verification prompt if not verified
@@ -65,10 +81,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
         # Check for custom welcome message
-        custom = cursor.execute(
-            "SELECT value FROM bot_settings WHERE key='welcome_message'"
-        ).fetchone()
-        welcome_text = custom[0] if custom else (
+        welcome_text = settingsRepo.get("welcome_message") or (
             f"<b>Hello, {user.first_name}</b>\n\n"
             "Use the options below to get started.\n"
             "If you have a private access link, open it directly to receive content."
@@ -76,7 +89,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(
             welcome_text,
             parse_mode="HTML",
-            reply_markup=kbUser(),
+            reply_markup=kbUser(_unread(userId)),
         )
 
 
@@ -113,9 +126,7 @@ async def _handleToken(update, context, token, user):
         return
 
     try:
-        link = cursor.execute(
-            "SELECT folder_id, expiry, revoked, single_use, used_by FROM links WHERE token=?", (token,)
-        ).fetchone()
+        link = linkRepo.byToken(token)
     except sqlite3.Error as e:
         logging.error(f"_handleToken DB: {e}")
         await update.message.reply_text("A database error occurred. Please try again later.")
@@ -162,9 +173,7 @@ async def _handleToken(update, context, token, user):
         return
 
     try:
-        row = cursor.execute(
-            "SELECT password, otp_required, name FROM folders WHERE id=?", (folderId,)
-        ).fetchone()
+        row = folderRepo.accessInfo(folderId)
         folderPassword = row[0] if row else None
         otpRequired    = row[1] if row else 0
         folderName     = row[2] if row else ""
@@ -197,41 +206,61 @@ async def _handleToken(update, context, token, user):
     await _deliverFolder(update, context, folderId, token, user)
 
 
-async def _notifySaOtpRequest(update, context, folderId: int, folderName: str, user):
-    """Ping the SA in-bot when a user requests OTP access."""
-    try:
-        await context.bot.send_message(
-            chat_id=ADMIN_ID,
-            text=(
-                f"<b>OTP Access Request</b>\n\n"
-                f"<code>Folder    :  {folderName}</code>\n"
-                f"<code>User ID   :  {user.id}</code>\n"
-                f"<code>Username  :  @{user.username or 'N/A'}</code>\n"
-                f"<code>Name      :  {user.first_name}</code>\n\n"
-                "Tap Generate OTP to create a one-time code for this user."
-            ),
-            parse_mode="HTML",
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton(
-                    "Generate OTP",
-                    callback_data=f"otp_gen_{folderId}_{user.id}"
-                )]
-            ]),
+async def _sendTracked(update, context, folderName, files, protect, autoDelete, sentMessages) -> bool:
+    """
+    Send folder files as a registered, cancellable delivery, then tidy up:
+    drop the cancel button and schedule auto-delete for whatever went out.
+    Returns False if the user cancelled or the delivery failed.
+    """
+    user   = update.effective_user
+    chatId = update.effective_chat.id
+
+    # Mirrored files go out in copyMessages batches
+    with outboundLane(DELIVERY):
+        delivery = await runDelivery(
+            user, folderName, len(files),
+            lambda sentIds: sendItems(context.bot, chatId, files, protect, sentIds=sentIds),
         )
-    except Exception as e:
-        logging.error(f"_notifySaOtpRequest: {e}")
+
+    try:
+        await sentMessages[0].edit_reply_markup(reply_markup=None)
+    except Exception:
+        pass
+
+    if autoDelete:
+        sentIds = [m.message_id for m in sentMessages] + delivery.sentIds
+        deleteMessagesLater(chatId, sentIds, autoDelete * 60)
+
+    if delivery.cancelled:
+        try:
+            await update.message.reply_text(
+                f"<b>Delivery Cancelled</b>\n\n"
+                f"Content delivery was stopped after {delivery.sent} of {len(files)} item(s).",
+                parse_mode="HTML",
+            )
+        except Exception:
+            pass
+        return False
+
+    if delivery.error or delivery.sent < len(files):
+        try:
+            await update.message.reply_text(
+                f"<b>Delivery Failed</b>\n\n"
+                f"Only {delivery.sent} of {len(files)} item(s) could be sent. Please try again later.",
+                parse_mode="HTML",
+            )
+        except Exception:
+            pass
+        return False
+    return True
 
 
 async def _deliverFolderOtp(update, context, folderId: int):
     """Deliver folder content after successful OTP verification (no token)."""
     user = update.effective_user
     try:
-        files = cursor.execute(
-            "SELECT file_id, file_type, text_content FROM files WHERE folder_id=?", (folderId,)
-        ).fetchall()
-        folder = cursor.execute(
-            "SELECT forwardable, auto_delete_minutes, name FROM folders WHERE id=?", (folderId,)
-        ).fetchone()
+        files  = fileRepo.items(folderId)
+        folder = folderRepo.deliveryInfo(folderId)
     except sqlite3.Error as e:
         logging.error(f"_deliverFolderOtp: {e}")
         await update.message.reply_text("A database error occurred.")
@@ -247,9 +276,6 @@ async def _deliverFolderOtp(update, context, folderId: int):
     forwardable, autoDelete, folderName = folder
     protect = forwardable == 0
 
-    cancelKey = f"cancel_delivery_{user.id}"
-    context.bot_data[cancelKey] = False
-
     cancelMsg = await update.message.reply_text(
         f"<b>Access Granted</b>\n\n"
         f"<code>Folder  :  {folderName}</code>\n"
@@ -269,44 +295,12 @@ async def _deliverFolderOtp(update, context, folderId: int):
         )
         sentMessages.append(msg)
 
-    for fileId, fileType, textContent in files:
-        if context.bot_data.get(cancelKey):
-            await update.message.reply_text(
-                "<b>Delivery Cancelled</b>\n\nContent delivery was stopped.",
-                parse_mode="HTML",
-            )
-            context.bot_data.pop(cancelKey, None)
-            return
-        try:
-            if fileType == "text":
-                msg = await update.message.reply_text(textContent)
-            elif fileType == "video":
-                msg = await update.message.reply_video(fileId, protect_content=protect, has_spoiler=True)
-            elif fileType == "photo":
-                msg = await update.message.reply_photo(fileId, protect_content=protect, has_spoiler=True)
-            elif fileType == "document":
-                msg = await update.message.reply_document(fileId, protect_content=protect)
-            else:
-                msg = await update.message.reply_document(fileId, protect_content=protect)
-            sentMessages.append(msg)
-        except Exception as e:
-            logging.error(f"_deliverFolderOtp send: {e}")
-
-    context.bot_data.pop(cancelKey, None)
-    try:
-        await cancelMsg.edit_reply_markup(reply_markup=None)
-    except Exception:
-        pass
-
-    if autoDelete:
-        import asyncio
-        asyncio.create_task(deleteAll(sentMessages, autoDelete * 60))
+    if not await _sendTracked(update, context, folderName, files, protect, autoDelete, sentMessages):
+        return
 
     try:
-        cursor.execute(
-            "INSERT INTO logs (user_id, username, folder_id, accessed_at) VALUES (?, ?, ?, ?)",
-            (user.id, user.username, folderId, datetime.now().isoformat()),
-        )
+        logRepo.add(user, folderId, datetime.now().isoformat())
+        recordView(folderId)
         conn.commit()
     except sqlite3.Error as e:
         logging.error(f"_deliverFolderOtp log: {e}")
@@ -314,15 +308,9 @@ async def _deliverFolderOtp(update, context, folderId: int):
 
 async def _deliverFolder(update, context, folderId, token, user):
     try:
-        files = cursor.execute(
-            "SELECT file_id, file_type, text_content FROM files WHERE folder_id=?", (folderId,)
-        ).fetchall()
-        folder = cursor.execute(
-            "SELECT forwardable, auto_delete_minutes, name FROM folders WHERE id=?", (folderId,)
-        ).fetchone()
-        linkRow = cursor.execute(
-            "SELECT id, single_use FROM links WHERE token=?", (token,)
-        ).fetchone()
+        files   = fileRepo.items(folderId)
+        folder  = folderRepo.deliveryInfo(folderId)
+        linkRow = linkRepo.useInfo(token)
     except sqlite3.Error as e:
         logging.error(f"_deliverFolder: {e}")
         await update.message.reply_text("A database error occurred.")
@@ -344,12 +332,9 @@ async def _deliverFolder(update, context, folderId, token, user):
         if singleUse:
             try:
                 now_str = datetime.now().isoformat()
-                cursor.execute(
-                    "UPDATE links SET revoked=1, used_by=?, used_at=? WHERE token=? AND revoked=0",
-                    (user.id, now_str, token)
-                )
+                claimed = linkRepo.consume(token, user.id, now_str)
                 conn.commit()
-                if cursor.rowcount == 0:
+                if claimed == 0:
                     await update.message.reply_text(
                         "<b>Link Unavailable</b>\n\nThis single-use link has already been redeemed.",
                         parse_mode="HTML",
@@ -359,9 +344,6 @@ async def _deliverFolder(update, context, folderId, token, user):
                 logging.error(f"single-use revoke: {e}")
 
     # ── Send cancel button FIRST — user can stop delivery ──
-    cancelKey  = f"cancel_delivery_{user.id}"
-    context.bot_data[cancelKey] = False
-
     cancelMsg = await update.message.reply_text(
         f"<b>Access Granted</b>\n\n"
         f"<code>Folder  :  {folderName}</code>\n"
@@ -383,74 +365,29 @@ async def _deliverFolder(update, context, folderId, token, user):
         )
         sentMessages.append(msg)
 
-    for fileId, fileType, textContent in files:
-        # Check if user pressed cancel before each file
-        if context.bot_data.get(cancelKey):
-            try:
-                await update.message.reply_text(
-                    "<b>Delivery Cancelled</b>\n\nContent delivery was stopped.",
-                    parse_mode="HTML",
-                )
-            except Exception:
-                pass
-            context.bot_data.pop(cancelKey, None)
-            return
-
-        try:
-            if fileType == "text":
-                msg = await update.message.reply_text(textContent)
-            elif fileType == "video":
-                msg = await update.message.reply_video(fileId, protect_content=protect, has_spoiler=True)
-            elif fileType == "photo":
-                msg = await update.message.reply_photo(fileId, protect_content=protect, has_spoiler=True)
-            elif fileType == "document":
-                msg = await update.message.reply_document(fileId, protect_content=protect)
-            else:
-                msg = await update.message.reply_document(fileId, protect_content=protect)
-            sentMessages.append(msg)
-        except Exception as e:
-            logging.error(f"_deliverFolder send: {e}")
-
-    # Remove cancel button after delivery completes
-    context.bot_data.pop(cancelKey, None)
-    try:
-        await cancelMsg.edit_reply_markup(reply_markup=None)
-    except Exception:
-        pass
-
-    if autoDelete:
-        asyncio.create_task(deleteAll(sentMessages, autoDelete * 60))
+    if not await _sendTracked(update, context, folderName, files, protect, autoDelete, sentMessages):
+        return
 
     try:
         now = datetime.now().isoformat()
-        cursor.execute(
-            "INSERT INTO logs (user_id, username, folder_id, accessed_at) VALUES (?, ?, ?, ?)",
-            (user.id, user.username, folderId, now),
-        )
-        cursor.execute(
-            "UPDATE links SET access_count = access_count + 1 WHERE token=?", (token,)
-        )
-        if linkRow:
-            linkId, singleUse = linkRow
-            cursor.execute(
-                "INSERT INTO link_access_log (link_id, folder_id, user_id, username, accessed_at) "
-                "VALUES (?, ?, ?, ?, ?)",
-                (linkId, folderId, user.id, user.username, now)
-            )
-            if singleUse:
-                try:
-                    await context.bot.send_message(
-                        chat_id=ADMIN_ID,
-                        text="<b>Single-Use Link Redeemed</b>\n\n"
-                             f"<code>Folder    :  {folderName}</code>\n"
-                             f"<code>User ID   :  {user.id}</code>\n"
-                             f"<code>Username  :  {user.username or 'N/A'}</code>\n"
-                             f"<code>Time      :  {fmtDt(now)}</code>\n\n"
-                             "The link has been automatically revoked.",
-                        parse_mode="HTML",
-                    )
-                except Exception as e:
-                    logging.error(f"single-use notify: {e}")
+        logRepo.add(user, folderId, now)
+        recordView(folderId)
+        linkId, singleUse = linkRow if linkRow else (None, 0)
+        linkRepo.recordAccess(token, linkId, folderId, user, now)
+        if singleUse:
+            try:
+                await context.bot.send_message(
+                    chat_id=ADMIN_ID,
+                    text="<b>Single-Use Link Redeemed</b>\n\n"
+                         f"<code>Folder    :  {folderName}</code>\n"
+                         f"<code>User ID   :  {user.id}</code>\n"
+                         f"<code>Username  :  {user.username or 'N/A'}</code>\n"
+                         f"<code>Time      :  {fmtDt(now)}</code>\n\n"
+                         "The link has been automatically revoked.",
+                    parse_mode="HTML",
+                )
+            except Exception as e:
+                logging.error(f"single-use notify: {e}")
         conn.commit()
     except sqlite3.Error as e:
         logging.error(f"_deliverFolder log: {e}")
@@ -472,10 +409,7 @@ async def contactHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     phone = contact.phone_number
     try:
-        cursor.execute(
-            "UPDATE subscribers SET phone_verified=1, phone_number=? WHERE user_id=?",
-            (phone, user.id)
-        )
+        subscriberRepo.setPhone(user.id, phone)
         conn.commit()
     except Exception as e:
         logging.error(f"contactHandler: {e}")
@@ -498,10 +432,7 @@ async def contactHandler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception as e:
         logging.error(f"contactHandler SA notify: {e}")
 
-    custom = cursor.execute(
-        "SELECT value FROM bot_settings WHERE key='welcome_message'"
-    ).fetchone()
-    welcome_text = custom[0] if custom else (
+    welcome_text = settingsRepo.get("welcome_message") or (
         f"<b>Hello, {user.first_name}</b>\n\n"
         "Use the options below to get started.\n"
         "If you have a private access link, open it directly to receive content."
@@ -528,8 +459,7 @@ async def cancelDeliveryCallback(update: Update, context: ContextTypes.DEFAULT_T
         await query.answer("This is not your delivery.", show_alert=True)
         return
 
-    cancelKey = f"cancel_delivery_{userId}"
-    context.bot_data[cancelKey] = True
+    cancelForUser(userId)
 
     try:
         await query.edit_message_reply_markup(reply_markup=None)
@@ -555,21 +485,19 @@ async def backMainCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"<b>Welcome back, {user.first_name}</b>\n"
             f"<code>Role  :  {role}</code>\n\n"
             "Select an option from the control panel below.",
-            markup=kbMain(),
+            markup=kbMain(_unread(user.id)),
             parse_mode="HTML",
         )
     else:
-        custom = cursor.execute(
-            "SELECT value FROM bot_settings WHERE key='welcome_message'"
-        ).fetchone()
-        welcome_text = custom[0] if custom else (
+        welcome_text = settingsRepo.get("welcome_message") or (
+
             f"<b>Hello, {user.first_name}</b>\n\n"
             "Use the options below to get started."
         )
         await safeEdit(
             query,
             welcome_text,
-            markup=kbUser(),
+            markup=kbUser(_unread(user.id)),
             parse_mode="HTML",
         )
 
@@ -583,6 +511,6 @@ async def userMenuCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         query,
         f"<b>Hello, {query.from_user.first_name}</b>\n\n"
         "Use the options below to get started.",
-        markup=kbUser(),
+        markup=kbUser(_unread(query.from_user.id)),
         parse_mode="HTML",
     )
\ No newline at end of file
@@ -4,29 +4,22 @@ import sqlite3
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup  # type: ignore
 from telegram.ext import ContextTypes  # type: ignore
 
-from config import conn, cursor
+from config import conn
 from helpers import safeEdit, fmtDt, isSuperAdmin
 from keyboards import kbHome, kbBack
+from repos import subscriberRepo
 
 
 async def subscribersCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     try:
-        total      = cursor.execute("SELECT COUNT(*) FROM subscribers").fetchone()[0]
-        active     = cursor.execute(
-            "SELECT COUNT(*) FROM subscribers WHERE datetime(last_active) > datetime('now', '-1 day')"
-        ).fetchone()[0]
-        banned     = cursor.execute(
-            "SELECT COUNT(*) FROM subscribers WHERE banned=1"
-        ).fetchone()[0]
-        verified   = cursor.execute(
-            "SELECT COUNT(*) FROM subscribers WHERE phone_verified=1"
-        ).fetchone()[0]
+        total      = subscriberRepo.count()
+        active     = subscriberRepo.countActiveSince("-1 day")
+        banned     = subscriberRepo.countBanned()
+        verified   = subscriberRepo.countVerified()
         unverified = total - verified
-        users      = cursor.execute(
-            "SELECT user_id, username, first_name, banned FROM subscribers ORDER BY subscribed_at DESC LIMIT 20"
-        ).fetchall()
+        users      = subscriberRepo.recent()
     except sqlite3.Error as e:
         logging.error(f"subscribers: {e}")
         await safeEdit(query, "Failed to load subscribers.", markup=kbHome())
@@ -67,9 +60,7 @@ async def subVerifiedListCallback(update: Update, context: ContextTypes.DEFAULT_
     query = update.callback_query
     await query.answer()
     try:
-        users = cursor.execute(
-            "SELECT user_id, username, first_name FROM subscribers WHERE phone_verified=1 ORDER BY subscribed_at DESC"
-        ).fetchall()
+        users = subscriberRepo.byVerified(True)
     except sqlite3.Error as e:
         logging.error(f"subVerifiedList: {e}")
         await safeEdit(query, "Failed to load verified users.", markup=kbBack("subscribers"))
@@ -106,9 +97,7 @@ async def subUnverifiedListCallback(update: Update, context: ContextTypes.DEFAUL
     query = update.callback_query
     await query.answer()
     try:
-        users = cursor.execute(
-            "SELECT user_id, username, first_name FROM subscribers WHERE phone_verified=0 ORDER BY subscribed_at DESC"
-        ).fetchall()
+        users = subscriberRepo.byVerified(False)
     except sqlite3.Error as e:
         logging.error(f"subUnverifiedList: {e}")
         await safeEdit(query, "Failed to load unverified users.", markup=kbBack("subscribers"))
@@ -145,10 +134,7 @@ async def subInfoCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query  = update.callback_query
     await query.answer()
     userId = int(query.data.replace("sub_info_", ""))
-    row    = cursor.execute(
-        "SELECT user_id, username, first_name, subscribed_at, last_active, banned, phone_verified, phone_number FROM subscribers WHERE user_id=?",
-        (userId,)
-    ).fetchone()
+    row    = subscriberRepo.get(userId)
     if not row:
         await safeEdit(query, "Subscriber not found.", markup=kbBack("subscribers"))
         return
@@ -200,17 +186,13 @@ async def subRevokeVerifyCallback(update: Update, context: ContextTypes.DEFAULT_
 
     userId = int(query.data.replace("sub_revoke_", ""))
     try:
-        row = cursor.execute(
-            "SELECT first_name, username FROM subscribers WHERE user_id=?", (userId,)
-        ).fetchone()
-        firstName = row[0] if row else "User"
-        username  = row[1] if row else None
-
-        cursor.execute(
-            "UPDATE subscribers SET phone_verified=0, phone_number=NULL WHERE user_id=?",
-            (userId,)
-        )
+        row = subscriberRepo.name(userId)
+        username  = row[0] if row else None
+        firstName = row[1] if row else "User"
+
+        subscriberRepo.clearPhone(userId)
         conn.commit()
+
     except sqlite3.Error as e:
         logging.error(f"subRevokeVerify: {e}")
         await safeEdit(query, "Failed to revoke verification.", markup=kbBack("subscribers"))
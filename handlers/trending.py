@@ -1,13 +1,14 @@
 import logging
 import sqlite3
-from datetime import datetime, timedelta
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup  # type: ignore
 from telegram.ext import ContextTypes  # type: ignore
 
-from config import conn, cursor
+from config import conn
 from helpers import safeEdit, isSuperAdmin, fmtDt
 from keyboards import kbHome, kbBack
+from repos import folderRepo, trendingRepo
+from popularity import HALF_LIFE_HOURS, autoTrendingBy, refreshAutoTrending, setAutoTrending
 
 
 # ─────────────────────────────────────────────
@@ -22,18 +23,16 @@ async def trendingMenuCallback(update: Update, context: ContextTypes.DEFAULT_TYP
         return
 
     try:
-        items = cursor.execute("""
-            SELECT t.id, f.name, t.label, t.expires_at
-            FROM trending t JOIN folders f ON t.folder_id = f.id
-            WHERE t.expires_at IS NULL OR datetime(t.expires_at) > datetime('now')
-            ORDER BY t.sort_order ASC, t.added_at DESC
-        """).fetchall()
+        items = trendingRepo.active()
+        auto  = autoTrendingBy() is not None
     except sqlite3.Error as e:
         logging.error(f"trendingMenu: {e}")
         await safeEdit(query, "Failed to load trending.", markup=kbHome())
         return
 
     lines = ["<b>Trending Manager</b>\n"]
+    if auto:
+        lines.append("\n<i>Auto mode is on — the list is refreshed hourly from recent views.</i>\n")
     for i, (tid, fname, label, expires) in enumerate(items, 1):
         exp_str = fmtDt(expires) if expires else "Never"
         lines.append(f"\n<code>{i}.  {label or fname}  |  Expires: {exp_str}</code>")
@@ -47,7 +46,7 @@ async def trendingMenuCallback(update: Update, context: ContextTypes.DEFAULT_TYP
         markup=InlineKeyboardMarkup([
             [InlineKeyboardButton("Add to Trending",   callback_data="trending_add")],
             [InlineKeyboardButton("Remove Item",       callback_data="trending_remove")],
-            [InlineKeyboardButton("Auto Mode (Top 5)", callback_data="trending_auto")],
+            [InlineKeyboardButton("Auto Mode: On" if auto else "Auto Mode (Top 5)", callback_data="trending_auto")],
             [InlineKeyboardButton("Clear All",         callback_data="trending_clear")],
             [InlineKeyboardButton("Main Menu",         callback_data="back_main")],
         ]),
@@ -59,9 +58,7 @@ async def trendingAddCallback(update: Update, context: ContextTypes.DEFAULT_TYPE
     query = update.callback_query
     await query.answer()
     try:
-        folders = cursor.execute(
-            "SELECT id, name FROM folders WHERE is_secret=0 ORDER BY pinned DESC, created_at DESC"
-        ).fetchall()
+        folders = folderRepo.choices(publicOnly=True)
     except sqlite3.Error as e:
         logging.error(f"trendingAdd folders: {e}")
         await safeEdit(query, "Failed to load folders.", markup=kbBack("trending_menu"))
@@ -111,11 +108,7 @@ async def trendingRemoveCallback(update: Update, context: ContextTypes.DEFAULT_T
     query = update.callback_query
     await query.answer()
     try:
-        items = cursor.execute("""
-            SELECT t.id, f.name, t.label
-            FROM trending t JOIN folders f ON t.folder_id = f.id
-            ORDER BY t.sort_order ASC, t.added_at DESC
-        """).fetchall()
+        items = trendingRepo.listAll()
     except sqlite3.Error as e:
         logging.error(f"trendingRemove: {e}")
         await safeEdit(query, "Failed to load items.", markup=kbBack("trending_menu"))
@@ -149,7 +142,7 @@ async def trendingDelCallback(update: Update, context: ContextTypes.DEFAULT_TYPE
     await query.answer()
     tid   = int(query.data.replace("trending_del_", ""))
     try:
-        cursor.execute("DELETE FROM trending WHERE id=?", (tid,))
+        trendingRepo.delete(tid)
         conn.commit()
         await safeEdit(
             query,
@@ -166,17 +159,20 @@ async def trendingAutoCallback(update: Update, context: ContextTypes.DEFAULT_TYP
     query = update.callback_query
     await query.answer()
     try:
-        # Pull top 5 most-accessed folders in last 48h
-        top = cursor.execute("""
-            SELECT f.id, f.name, COUNT(l.id) as views
-            FROM folders f
-            JOIN logs l ON f.id = l.folder_id
-            WHERE datetime(l.accessed_at) > datetime('now', '-2 days')
-            AND f.is_secret = 0
-            GROUP BY f.id
-            ORDER BY views DESC
-            LIMIT 5
-        """).fetchall()
+        if autoTrendingBy() is not None:
+            setAutoTrending(None)
+            conn.commit()
+            await safeEdit(
+                query,
+                "<b>Auto Trending Off</b>\n\nThe current items stay until they expire or are removed.",
+                markup=kbBack("trending_menu"),
+                parse_mode="HTML",
+            )
+            return
+        top = refreshAutoTrending(query.from_user.id)
+        if top:
+            setAutoTrending(query.from_user.id)
+        conn.commit()
     except sqlite3.Error as e:
         logging.error(f"trendingAuto: {e}")
         await safeEdit(query, "Failed to run auto trending.", markup=kbBack("trending_menu"))
@@ -185,25 +181,18 @@ async def trendingAutoCallback(update: Update, context: ContextTypes.DEFAULT_TYP
     if not top:
         await safeEdit(
             query,
-            "<b>Auto Trending</b>\n\nNot enough activity in the last 48 hours to generate trending.",
+            "<b>Auto Trending</b>\n\nNot enough recent activity to generate trending.",
             markup=kbBack("trending_menu"),
             parse_mode="HTML",
         )
         return
 
-    # Clear current trending and replace
-    cursor.execute("DELETE FROM trending")
-    expires = (datetime.now() + timedelta(hours=24)).isoformat()
-    for i, (fid, fname, views) in enumerate(top):
-        cursor.execute("""
-            INSERT INTO trending (folder_id, label, added_by, added_at, expires_at, sort_order)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (fid, fname, query.from_user.id, datetime.now().isoformat(), expires, i))
-    conn.commit()
-
-    lines = [f"<b>Auto Trending Updated</b>\n\nTop {len(top)} folders from last 48h:\n"]
-    for i, (fid, fname, views) in enumerate(top, 1):
-        lines.append(f"<code>{i}.  {fname}  |  {views} views</code>")
+    lines = [
+        f"<b>Auto Trending On</b>\n\nTop {len(top)} folders by recent views "
+        f"(a view counts half after {HALF_LIFE_HOURS}h). Refreshed hourly:\n"
+    ]
+    for i, (fid, fname, score) in enumerate(top, 1):
+        lines.append(f"<code>{i}.  {fname}  |  score {score:.1f}</code>")
 
     await safeEdit(
         query,
@@ -233,7 +222,8 @@ async def trendingClearConfirmCallback(update: Update, context: ContextTypes.DEF
     query = update.callback_query
     await query.answer()
     try:
-        cursor.execute("DELETE FROM trending")
+        trendingRepo.clear()
+        setAutoTrending(None)
         conn.commit()
         await safeEdit(
             query,
@@ -250,23 +240,42 @@ async def trendingClearConfirmCallback(update: Update, context: ContextTypes.DEF
 #  USER — VIEW TRENDING
 # ─────────────────────────────────────────────
 
+# The rendered screen for the current snapshot. TrendingRepo hands out the
+# same snapshot object until it is invalidated, so taps reuse this as is.
+_view = (None, None, None)
+
+
+def _trendingView(snapshot: tuple, botUsername: str) -> tuple[str, InlineKeyboardMarkup]:
+    global _view
+    if _view[0] is snapshot:
+        return _view[1], _view[2]
+
+    lines = ["<b>Trending Now</b>\n"]
+    for i, (display, _) in enumerate(snapshot, 1):
+        lines.append(f"\n<code>{i}.  {display}</code>")
+
+    # Offer access buttons for each trending folder that has an active link
+    buttons = [
+        [InlineKeyboardButton(f"Access  —  {display}", url=f"https://t.me/{botUsername}?start={token}")]
+        for display, token in snapshot if token
+    ]
+    buttons.append([InlineKeyboardButton("Back", callback_data="user_menu")])
+
+    _view = (snapshot, "\n".join(lines), InlineKeyboardMarkup(buttons))
+    return _view[1], _view[2]
+
+
 async def viewTrendingCallback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     try:
-        items = cursor.execute("""
-            SELECT t.id, f.id, f.name, t.label, t.expires_at
-            FROM trending t JOIN folders f ON t.folder_id = f.id
-            WHERE (t.expires_at IS NULL OR datetime(t.expires_at) > datetime('now'))
-            AND f.is_secret = 0
-            ORDER BY t.sort_order ASC, t.added_at DESC
-        """).fetchall()
+        snapshot = trendingRepo.publicSnapshot()
     except sqlite3.Error as e:
         logging.error(f"viewTrending: {e}")
         await safeEdit(query, "Failed to load trending.", markup=kbBack("user_menu"))
         return
 
-    if not items:
+    if not snapshot:
         await safeEdit(
             query,
             "<b>Trending Now</b>\n\nNothing is trending right now.\nCheck back soon.",
@@ -275,31 +284,5 @@ async def viewTrendingCallback(update: Update, context: ContextTypes.DEFAULT_TYP
         )
         return
 
-    lines = ["<b>Trending Now</b>\n"]
-    for i, (tid, fid, fname, label, expires) in enumerate(items, 1):
-        display = label or fname
-        lines.append(f"\n<code>{i}.  {display}</code>")
-
-    # Offer access buttons for each trending folder that has an active link
-    buttons = []
-    for tid, fid, fname, label, expires in items:
-        link = cursor.execute("""
-            SELECT token FROM links
-            WHERE folder_id=? AND revoked=0 AND datetime(expiry) > datetime('now')
-            ORDER BY created_at DESC LIMIT 1
-        """, (fid,)).fetchone()
-        display = label or fname
-        if link:
-            buttons.append([InlineKeyboardButton(
-                f"Access  —  {display}",
-                url=f"https://t.me/{context.bot.username}?start={link[0]}"
-            )])
-
-    buttons.append([InlineKeyboardButton("Back", callback_data="user_menu")])
-
-    await safeEdit(
-        query,
-        "\n".join(lines),
-        markup=InlineKeyboardMarkup(buttons),
-        parse_mode="HTML",
-    )
+    text, markup = _trendingView(snapshot, context.bot.username)
+    await safeEdit(query, text, markup=markup, parse_mode="HTML")
@@ -7,43 +7,28 @@ from datetime import datetime
 
 from telegram.error import BadRequest  # type: ignore
 
-from config import conn, cursor
+from config import conn
+from repos import adminRepo, banRepo, subscriberRepo
 
 # ─────────────────────────────────────────────
 #  AUTH
 # ─────────────────────────────────────────────
 
 def isAdmin(userId: int) -> bool:
-    return cursor.execute(
-        "SELECT 1 FROM admins WHERE user_id=?", (userId,)
-    ).fetchone() is not None
+    return adminRepo.exists(userId)
 
 
 def isSuperAdmin(userId: int) -> bool:
-    row = cursor.execute(
-        "SELECT is_super_admin FROM admins WHERE user_id=?", (userId,)
-    ).fetchone()
-    return bool(row and row[0])
+    return adminRepo.isSuper(userId)
 
 
 def isBanned(userId: int) -> bool:
-    # Check both the banned_users table AND the subscribers.banned flag
-    in_ban_table = cursor.execute(
-        "SELECT 1 FROM banned_users WHERE user_id=?", (userId,)
-    ).fetchone() is not None
-    if in_ban_table:
-        return True
-    sub_banned = cursor.execute(
-        "SELECT banned FROM subscribers WHERE user_id=?", (userId,)
-    ).fetchone()
-    return bool(sub_banned and sub_banned[0])
+    # Checks both the banned_users table AND the subscribers.banned flag
+    return banRepo.isBanned(userId)
 
 
 def isVerified(userId: int) -> bool:
-    row = cursor.execute(
-        "SELECT phone_verified FROM subscribers WHERE user_id=?", (userId,)
-    ).fetchone()
-    return bool(row and row[0])
+    return subscriberRepo.isVerified(userId)
 
 
 # ─────────────────────────────────────────────
@@ -131,17 +116,7 @@ def fmtBool(val: int | bool) -> str:
 
 def trackUser(user) -> None:
     try:
-        now = datetime.now().isoformat()
-        cursor.execute("""
-            INSERT OR IGNORE INTO subscribers
-                (user_id, username, first_name, subscribed_at, last_active)
-            VALUES (?, ?, ?, ?, ?)
-        """, (user.id, user.username, user.first_name, now, now))
-        cursor.execute("""
-            UPDATE subscribers
-               SET username = ?, first_name = ?, last_active = ?
-             WHERE user_id = ?
-        """, (user.username, user.first_name, now, user.id))
+        subscriberRepo.track(user)
         conn.commit()
     except Exception as e:
         logging.error(f"trackUser: {e}")
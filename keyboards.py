@@ -5,7 +5,11 @@ from telegram import InlineKeyboardButton, InlineKeyboardMarkup  # type: ignore
 #  NAVIGATION
 # ─────────────────────────────────────────────
 
-def kbMain() -> InlineKeyboardMarkup:
+def _badge(label: str, count: int) -> str:
+    return f"{label} ({count})" if count else label
+
+
+def kbMain(unread: int = 0) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup([
         [
             InlineKeyboardButton("Folders",       callback_data="view_folders"),
@@ -20,7 +24,7 @@ def kbMain() -> InlineKeyboardMarkup:
             InlineKeyboardButton("Subscribers",   callback_data="subscribers"),
         ],
         [
-            InlineKeyboardButton("Inbox",         callback_data="user_messages"),
+            InlineKeyboardButton(_badge("Inbox", unread), callback_data="user_messages"),
             InlineKeyboardButton("Analytics",     callback_data="stats"),
         ],
         [
@@ -45,11 +49,11 @@ def kbMain() -> InlineKeyboardMarkup:
     ])
 
 
-def kbUser() -> InlineKeyboardMarkup:
+def kbUser(unread: int = 0) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup([
         [InlineKeyboardButton("Trending Now",      callback_data="view_trending")],
         [InlineKeyboardButton("Quote of the Day",  callback_data="get_quote")],
-        [InlineKeyboardButton("My Inbox",          callback_data="user_inbox"),
+        [InlineKeyboardButton(_badge("My Inbox", unread), callback_data="user_inbox"),
          InlineKeyboardButton("Contact Admin",     callback_data="contact_admin")],
         [InlineKeyboardButton("Help",              callback_data="help_support")],
     ])
@@ -0,0 +1,193 @@
+import argparse
+import asyncio
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+
+from fakeapi import FakeBotApi, CHAT_RATE, GLOBAL_RATE
+
+# ─────────────────────────────────────────────
+#  END-TO-END LOAD TEST
+# ─────────────────────────────────────────────
+
+# Starts fakeapi.py in-process, launches main.py against it and a seeded
+# database, then simulates users going through the common path: /start,
+# share phone, open the menu, view trending, redeem a folder link. Reports
+# time-to-first-reply per step, overall update throughput and the 429s the
+# fake server handed out.
+#
+#     python loadtest.py --users 200 --concurrency 50
+#     python loadtest.py --users 500 --latency 0.08 --flood-rate 0.02 --db /tmp/bench.db
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TOKEN    = "123456:LOADTEST"
+ADMIN_ID = 10        # seed.py's super admin
+USER_IDS = 9_000_000  # simulated users start here, outside seeded subscriber ids
+
+# Used when --db does not exist yet: small enough to build in a second
+LOADTEST_SCALE = {
+    "subscribers": 2_000,
+    "folders":     100,
+    "logs":        20_000,
+    "messages":    200,
+    "otps":        200,
+}
+
+STEPS = ["start", "verify", "menu", "trending", "redeem"]
+
+
+def _ensureDatabase(path: str) -> None:
+    if os.path.exists(path):
+        return
+    from migrations import migrate
+    from seed import seedDatabase
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    seedDatabase(conn, LOADTEST_SCALE, {"folder_zipf": 0.5})
+    conn.close()
+
+
+def _redeemableTokens(path: str, limit: int = 1000) -> list:
+    """Open, multi-use links to folders without a password or OTP."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return [row[0] for row in conn.execute("""
+            SELECT l.token FROM links l JOIN folders f ON f.id = l.folder_id
+            WHERE l.revoked=0 AND l.single_use=0 AND datetime(l.expiry) > datetime('now')
+            AND f.password IS NULL AND f.otp_required=0
+            LIMIT ?
+        """, (limit,))]
+    finally:
+        conn.close()
+
+
+def _launchBot(apiUrl: str, dbPath: str, logPath: str | None) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "TELEGRAM_BOT_TOKEN": TOKEN,
+        "TELEGRAM_API_URL":   apiUrl,
+        "ADMIN_ID":           str(ADMIN_ID),
+        "DB_PATH":            dbPath,
+        "DATABASE_URL":       "",
+    }
+    out = open(logPath, "w") if logPath else subprocess.DEVNULL
+    return subprocess.Popen([sys.executable, "main.py"], cwd=BASE_DIR, env=env, stdout=out, stderr=subprocess.STDOUT)
+
+
+# ─────────────────────────────────────────────
+#  SIMULATED USERS
+# ─────────────────────────────────────────────
+
+async def _user(api: FakeBotApi, userId: int, token: str | None, think: float, timeout: float,
+                latencies: dict, timeouts: dict) -> None:
+    actions = {
+        "start":    lambda: api.pushText(userId, "/start"),
+        "verify":   lambda: api.pushContact(userId, f"+1555{userId}"),
+        "menu":     lambda: api.pushCallback(userId, "user_menu"),
+        "trending": lambda: api.pushCallback(userId, "view_trending"),
+        "redeem":   lambda: api.pushText(userId, f"/start {token}"),
+    }
+    for step in STEPS:
+        if step == "redeem" and not token:
+            continue
+        since = time.monotonic()
+        actions[step]()
+        waited = await api.waitForReply(userId, since, timeout)
+        if waited is None:
+            timeouts[step] += 1
+        else:
+            latencies[step].append(waited)
+        if think:
+            await asyncio.sleep(think)
+
+
+def _pct(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def _report(api: FakeBotApi, latencies: dict, timeouts: dict, elapsed: float, users: int) -> None:
+    handled = sum(len(v) for v in latencies.values())
+    print(f"\n{users} users, {handled} replies in {elapsed:.1f} s  →  {handled / elapsed:.1f} updates/s\n")
+    print(f"{'step':<10} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'timeouts':>9}   (ms)")
+    for step in STEPS:
+        v = latencies[step]
+        if not v and not timeouts[step]:
+            continue
+        print(f"{step:<10} {len(v):>6} {_pct(v, 50) * 1000:>8.0f} {_pct(v, 95) * 1000:>8.0f} "
+              f"{_pct(v, 99) * 1000:>8.0f} {max(v, default=0) * 1000:>8.0f} {timeouts[step]:>9}")
+    print("\nBot API calls")
+    for method, n in api.calls.most_common():
+        refused = api.refused.get(method, 0)
+        print(f"  {method:<22} {n:>7}" + (f"   ({refused} refused with 429)" if refused else ""))
+
+
+async def run(args) -> int:
+    dbPath = os.path.abspath(args.db)
+    _ensureDatabase(dbPath)
+    tokens = _redeemableTokens(dbPath)
+    if not tokens:
+        print("No redeemable links in the database; the redeem step is skipped.")
+
+    api = FakeBotApi(args.latency, args.jitter, args.flood_rate, args.retry_after,
+                     args.chat_rate, globalRate=args.global_rate, seed=args.seed)
+    url = await api.start(port=args.port)
+    bot = _launchBot(url, dbPath, args.bot_log)
+    try:
+        try:
+            await asyncio.wait_for(api.polling.wait(), args.startup_timeout)
+        except asyncio.TimeoutError:
+            print(f"main.py did not start polling within {args.startup_timeout:.0f} s (see --bot-log)")
+            return 1
+
+        latencies = {step: [] for step in STEPS}
+        timeouts  = {step: 0 for step in STEPS}
+        limit     = asyncio.Semaphore(args.concurrency)
+
+        async def one(i):
+            async with limit:
+                token = tokens[i % len(tokens)] if tokens else None
+                await _user(api, USER_IDS + i, token, args.think, args.timeout, latencies, timeouts)
+
+        started = time.monotonic()
+        await asyncio.gather(*(one(i) for i in range(args.users)))
+        elapsed = time.monotonic() - started
+        _report(api, latencies, timeouts, elapsed, args.users)
+        return 1 if any(timeouts.values()) else 0
+    finally:
+        bot.send_signal(signal.SIGINT)
+        try:
+            bot.wait(15)
+        except subprocess.TimeoutExpired:
+            bot.kill()
+        await api.stop()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Drive main.py through a fake Bot API.")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=25, help="users active at once")
+    parser.add_argument("--think", type=float, default=0.0, help="pause between a user's steps (s)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="give up on a reply after (s)")
+    parser.add_argument("--db", default=os.path.join(BASE_DIR, "loadtest.db"),
+                        help="SQLite database; seeded on first use")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--flood-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--chat-rate", type=float, default=CHAT_RATE)
+    parser.add_argument("--global-rate", type=float, default=GLOBAL_RATE)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--startup-timeout", type=float, default=30.0)
+    parser.add_argument("--bot-log", help="write main.py output here")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
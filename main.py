@@ -1,4 +1,7 @@
+import asyncio
+import functools
 import logging
+import weakref
 from datetime import time as dtime
 
 from telegram import Update  # type: ignore
@@ -10,9 +13,16 @@ from telegram.ext import (  # type: ignore
     ContextTypes,
     filters,
     MessageHandler,
+    TypeHandler,
 )
 
-from config import TOKEN
+from capture import captureUpdate
+from config import TOKEN, TELEGRAM_API_URL, CAPTURE_UPDATES
+from dispatcher import PriorityRateLimiter
+from polltally import loadOpenTallies, flushVotes
+from popularity import loadScores
+from expiry import loadExpiries
+from otpstore import loadCodes
 
 from handlers.start import start, backMainCallback, userMenuCallback, cancelDeliveryCallback, contactHandler
 from handlers.admin import (
@@ -47,7 +57,7 @@ from handlers.inbox import (
     replyToUserCallback, userInboxCallback, viewReplyCallback,
     deleteReplyCallback, userReplyBackCallback,
 )
-from handlers.analytics import statsCallback, activityCallback, botStatusCallback
+from handlers.analytics import statsCallback, activityCallback, botStatusCallback, deliveriesCallback
 from handlers.subscribers import (
     subscribersCallback, subInfoCallback,
     subVerifiedListCallback, subUnverifiedListCallback, subRevokeVerifyCallback,
@@ -79,7 +89,7 @@ from handlers.settings import (
     getQuoteCallback,
 )
 from handlers.otp import (
-    otpMenuCallback, otpToggleCallback, otpRequestCallback, otpGenerateCallback,
+    otpMenuCallback, otpToggleCallback, otpRequestCallback, otpGenerateCallback, otpApproveAllCallback,
 )
 from handlers.customize import (
     customizeMenuCallback,
@@ -87,7 +97,7 @@ from handlers.customize import (
     custUxCallback, custBroadcastCallback, custIdentityCallback,
     custNotifsCallback, custSetCallback, custToggleCallback,
 )
-from handlers.jobs import jobQotd, jobClosePols, jobPurgeTrending, jobPurgeLinks
+from handlers.jobs import scheduleQotd, jobClosePols, jobPurgeTrending, jobAutoTrending, jobPurgeLinks, restorePollCloses
 
 
 async def errorHandler(update: object, context: ContextTypes.DEFAULT_TYPE):
@@ -114,11 +124,62 @@ async def helpSupportCallback(update: Update, context: ContextTypes.DEFAULT_TYPE
     )
 
 
-def main():
-    app = ApplicationBuilder().token(TOKEN).build()
+async def postInit(app):
+    """Rebuild in-memory state from the database before the first update."""
+    logging.info(f"Vote tallies loaded for {loadOpenTallies()} open poll(s)")
+    logging.info(f"Popularity scores loaded for {loadScores()} folder(s)")
+    logging.info(f"Expiry scheduler loaded with {loadExpiries(app.job_queue)} deadline(s)")
+    logging.info(f"OTP codes loaded: {loadCodes()} pending")
+    logging.info(f"Close jobs scheduled for {restorePollCloses(app.job_queue)} open poll(s)")
+
+
+async def postShutdown(app):
+    flushVotes()
+
+
+# Updates are processed one at a time, in order. Handlers that can run for
+# minutes (deliveries, broadcasts, poll and OTP fan-out) or wait on the admin
+# chat's rate limit (phone verification notices) are registered with
+# block=False so they do not hold up everyone else, and wrapped in perUser so
+# a user's own updates still run in order behind them.
+_userLocks = weakref.WeakValueDictionary()
+
+
+def perUser(callback):
+    """Run callback under a lock per user: one user's updates in order, other users' alongside."""
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        user = update.effective_user if isinstance(update, Update) else None
+        if user is None:
+            return await callback(update, context)
+        lock = _userLocks.get(user.id)
+        if lock is None:
+            lock = _userLocks[user.id] = asyncio.Lock()
+        async with lock:
+            return await callback(update, context)
+    return wrapper
+
+
+def buildApplication(jobs: bool = True):
+    """The bot with every handler registered. main() polls it; replay.py feeds it recorded updates."""
+    # Outbound traffic is prioritised by the rate limiter
+    builder = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .rate_limiter(PriorityRateLimiter())
+        .post_init(postInit)
+        .post_shutdown(postShutdown)
+    )
+    if TELEGRAM_API_URL:
+        builder = builder.base_url(f"{TELEGRAM_API_URL}/bot").base_file_url(f"{TELEGRAM_API_URL}/file/bot")
+    app = builder.build()
+
+    # Runs before every other group and never stops them
+    if CAPTURE_UPDATES:
+        app.add_handler(TypeHandler(Update, captureUpdate), group=-1)
 
     # Commands
-    app.add_handler(CommandHandler("start",     start))
+    app.add_handler(CommandHandler("start",     perUser(start), block=False))
     app.add_handler(CommandHandler("help",      cmdHelp))
     app.add_handler(CommandHandler("stats",     cmdStats))
     app.add_handler(CommandHandler("cancel",    cmdCancel))
@@ -132,7 +193,7 @@ def main():
     app.add_handler(CommandHandler("welcome",   cmdWelcome))
     app.add_handler(CommandHandler("linkinfo",  cmdLinkinfo))
     app.add_handler(CommandHandler("block",     cmdBlock))
-    app.add_handler(CommandHandler("broadcast", cmdBroadcast))
+    app.add_handler(CommandHandler("broadcast", perUser(cmdBroadcast), block=False))
     app.add_handler(CommandHandler("ban",       cmdBan))
     app.add_handler(CommandHandler("unban",     cmdUnban))
     app.add_handler(CommandHandler("myid",      cmdMyId))
@@ -203,6 +264,7 @@ def main():
     app.add_handler(CallbackQueryHandler(statsCallback,     pattern="^stats$"))
     app.add_handler(CallbackQueryHandler(activityCallback,  pattern="^activity$"))
     app.add_handler(CallbackQueryHandler(botStatusCallback, pattern="^bot_status$"))
+    app.add_handler(CallbackQueryHandler(deliveriesCallback, pattern="^deliveries$"))
 
     # Subscribers
     app.add_handler(CallbackQueryHandler(subscribersCallback,       pattern="^subscribers$"))
@@ -230,7 +292,7 @@ def main():
     app.add_handler(CallbackQueryHandler(broadcastPasswordCallback, pattern="^broadcast_pass_(yes|no)$"))
     app.add_handler(CallbackQueryHandler(broadcastExpiryCallback,   pattern="^broadcast_exp_(yes|no)$"))
     app.add_handler(CallbackQueryHandler(broadcastForwardCallback,  pattern="^broadcast_fwd_(yes|no)$"))
-    app.add_handler(CallbackQueryHandler(broadcastPublishCallback,  pattern="^broadcast_publish$"))
+    app.add_handler(CallbackQueryHandler(perUser(broadcastPublishCallback), pattern="^broadcast_publish$", block=False))
     app.add_handler(CallbackQueryHandler(broadcastCancelCallback,   pattern="^broadcast_cancel$"))
 
     # Polls
@@ -238,7 +300,7 @@ def main():
     app.add_handler(CallbackQueryHandler(pollCreateCallback, pattern="^poll_create$"))
     app.add_handler(CallbackQueryHandler(pollListCallback,   pattern="^poll_list_(open|closed)$"))
     app.add_handler(CallbackQueryHandler(pollViewCallback,   pattern="^poll_view_\\d+$"))
-    app.add_handler(CallbackQueryHandler(pollCloseCallback,  pattern="^poll_close_\\d+$"))
+    app.add_handler(CallbackQueryHandler(perUser(pollCloseCallback), pattern="^poll_close_\\d+$", block=False))
     app.add_handler(CallbackQueryHandler(pollVoteCallback,   pattern="^vote_\\d+_[ABCD]$"))
 
     # Trending
@@ -252,10 +314,11 @@ def main():
     app.add_handler(CallbackQueryHandler(trendingClearConfirmCallback, pattern="^trending_clear_confirm$"))
 
     # OTP Access
-    app.add_handler(CallbackQueryHandler(otpMenuCallback,     pattern="^otp_menu$"))
-    app.add_handler(CallbackQueryHandler(otpToggleCallback,   pattern="^otp_toggle_\\d+$"))
-    app.add_handler(CallbackQueryHandler(otpRequestCallback,  pattern="^otp_request_\\d+$"))
-    app.add_handler(CallbackQueryHandler(otpGenerateCallback, pattern="^otp_gen_\\d+_\\d+$"))
+    app.add_handler(CallbackQueryHandler(otpMenuCallback,       pattern="^otp_menu$"))
+    app.add_handler(CallbackQueryHandler(otpToggleCallback,     pattern="^otp_toggle_\\d+$"))
+    app.add_handler(CallbackQueryHandler(otpRequestCallback,    pattern="^otp_request_\\d+$"))
+    app.add_handler(CallbackQueryHandler(otpGenerateCallback,   pattern="^otp_gen_\\d+_\\d+$"))
+    app.add_handler(CallbackQueryHandler(perUser(otpApproveAllCallback), pattern="^otp_all_\\d+$", block=False))
 
     # Customize
     app.add_handler(CallbackQueryHandler(customizeMenuCallback,   pattern="^customize_menu$"))
@@ -287,23 +350,33 @@ def main():
     app.add_handler(CallbackQueryHandler(linkstatsViewCallback,       pattern="^linkstats_\\d+$"))
 
     # Phone verification
-    app.add_handler(MessageHandler(filters.CONTACT, contactHandler))
+    app.add_handler(MessageHandler(filters.CONTACT, perUser(contactHandler), block=False))
 
     # Message handler
     app.add_handler(MessageHandler(
         filters.TEXT | filters.PHOTO | filters.VIDEO | filters.Document.ALL,
-        messageHandler,
+        perUser(messageHandler),
+        block=False,
     ))
 
     app.add_error_handler(errorHandler)
 
     # Background jobs
-    jq = app.job_queue
-    jq.run_daily(jobQotd,               time=dtime(hour=12, minute=0))
-    jq.run_repeating(jobClosePols,      interval=300,  first=30)
-    jq.run_repeating(jobPurgeTrending,  interval=3600, first=60)
-    jq.run_daily(jobPurgeLinks,         time=dtime(hour=3, minute=0))
+    if jobs:
+        jq = app.job_queue
+        scheduleQotd(jq)
+        jq.run_repeating(jobClosePols,      interval=3600, first=300)
+        jq.run_repeating(jobAutoTrending,   interval=3600, first=120)
+        jq.run_daily(jobPurgeTrending,      time=dtime(hour=3, minute=0))
+        jq.run_daily(jobPurgeLinks,         time=dtime(hour=3, minute=0))
 
+    return app
+
+
+def main():
+    app = buildApplication()
+    if CAPTURE_UPDATES:
+        logging.info(f"Capturing anonymised updates to {CAPTURE_UPDATES}")
     logging.info("Drazeforce Bot v3.0 started — polling active")
     app.run_polling()
 
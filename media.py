@@ -0,0 +1,26 @@
+# ─────────────────────────────────────────────
+#  MEDIA REGISTRY
+# ─────────────────────────────────────────────
+
+# One row per distinct Telegram file, keyed by file_unique_id. The registry
+# queries live in repos.MediaRepo; this module turns messages into entries.
+
+
+def describeMedia(message) -> dict | None:
+    """Pull the registry fields out of an incoming video, photo or document."""
+    if message.video:
+        obj, fileType = message.video, "video"
+    elif message.photo:
+        obj, fileType = message.photo[-1], "photo"
+    elif message.document:
+        obj, fileType = message.document, "document"
+    else:
+        return None
+    return {
+        "file_id":        obj.file_id,
+        "file_unique_id": obj.file_unique_id,
+        "file_type":      fileType,
+        "file_size":      obj.file_size,
+        "mime_type":      getattr(obj, "mime_type", None),
+        "duration":       getattr(obj, "duration", None),
+    }
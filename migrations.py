@@ -0,0 +1,715 @@
+import logging
+import sqlite3
+import time
+from datetime import datetime
+
+from db import PgConnection
+
+# ─────────────────────────────────────────────
+#  SCHEMA MIGRATIONS
+# ─────────────────────────────────────────────
+
+# Numbered, append-only. The applied version is kept in PRAGMA user_version on
+# SQLite (the max of schema_migrations on PostgreSQL), so a warm start is one
+# read. Pending migrations run together in a single transaction; each one is
+# timed and recorded in schema_migrations. Never edit a released migration —
+# add a new one.
+#
+# Every migration must also be safe on a database created before versioning
+# existed (user_version 0 with tables already there): use IF NOT EXISTS and
+# _addColumn rather than bare CREATE / ALTER.
+
+_BASELINE = """
+CREATE TABLE IF NOT EXISTS folders (
+    id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+    name                TEXT UNIQUE,
+    created_at          TEXT,
+    forwardable         INTEGER DEFAULT 1,
+    auto_delete_minutes INTEGER,
+    password            TEXT,
+    note                TEXT,
+    pinned              INTEGER DEFAULT 0,
+    is_secret           INTEGER DEFAULT 0,
+    secret_code         TEXT,
+    otp_required        INTEGER DEFAULT 0,
+    otp_expiry_minutes  INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS files (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    folder_id      INTEGER,
+    file_id        TEXT,
+    file_type      TEXT,
+    file_size      INTEGER,
+    uploaded_at    TEXT,
+    text_content   TEXT,
+    storage_msg_id INTEGER,
+    file_unique_id TEXT
+);
+
+CREATE TABLE IF NOT EXISTS media (
+    file_unique_id TEXT PRIMARY KEY,
+    file_id        TEXT,
+    file_type      TEXT,
+    file_size      INTEGER,
+    mime_type      TEXT,
+    duration       INTEGER,
+    first_seen     TEXT,
+    ref_count      INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS links (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    folder_id    INTEGER,
+    token        TEXT,
+    expiry       TEXT,
+    revoked      INTEGER DEFAULT 0,
+    created_at   TEXT,
+    access_count INTEGER DEFAULT 0,
+    single_use   INTEGER DEFAULT 0,
+    used_by      INTEGER,
+    used_at      TEXT
+);
+
+CREATE TABLE IF NOT EXISTS logs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id     INTEGER,
+    username    TEXT,
+    folder_id   INTEGER,
+    accessed_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS admins (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id        INTEGER UNIQUE,
+    username       TEXT,
+    added_by       INTEGER,
+    added_at       TEXT,
+    is_super_admin INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS subscribers (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id        INTEGER UNIQUE,
+    username       TEXT,
+    first_name     TEXT,
+    subscribed_at  TEXT,
+    last_active    TEXT,
+    banned         INTEGER DEFAULT 0,
+    ban_reason     TEXT,
+    phone_verified INTEGER DEFAULT 0,
+    phone_number   TEXT
+);
+
+CREATE TABLE IF NOT EXISTS broadcasts (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    broadcast_code TEXT UNIQUE,
+    created_by     INTEGER,
+    created_at     TEXT,
+    scheduled_for  TEXT,
+    password       TEXT,
+    expiry_minutes INTEGER,
+    forwardable    INTEGER DEFAULT 1,
+    total_sent     INTEGER DEFAULT 0,
+    total_failed   INTEGER DEFAULT 0,
+    status         TEXT DEFAULT 'sent'
+);
+
+CREATE TABLE IF NOT EXISTS broadcast_files (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    broadcast_id   INTEGER,
+    file_id        TEXT,
+    file_type      TEXT,
+    text_content   TEXT,
+    storage_msg_id INTEGER,
+    file_unique_id TEXT
+);
+
+CREATE TABLE IF NOT EXISTS user_messages (
+    id                 INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id            INTEGER,
+    username           TEXT,
+    first_name         TEXT,
+    message_id         TEXT UNIQUE,
+    sent_at            TEXT,
+    status             TEXT DEFAULT 'unread',
+    viewed_at          TEXT,
+    recipient_admin_id INTEGER,
+    recipient_is_super INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS user_message_files (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    message_id     TEXT,
+    file_id        TEXT,
+    file_type      TEXT,
+    text_content   TEXT,
+    file_unique_id TEXT
+);
+
+CREATE TABLE IF NOT EXISTS banned_users (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id   INTEGER UNIQUE,
+    username  TEXT,
+    reason    TEXT,
+    banned_at TEXT,
+    banned_by INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS scheduled_broadcasts (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id       TEXT UNIQUE,
+    created_by   INTEGER,
+    scheduled_at TEXT,
+    created_at   TEXT,
+    status       TEXT DEFAULT 'pending'
+);
+
+CREATE TABLE IF NOT EXISTS pinned_messages (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    message_id TEXT UNIQUE,
+    content    TEXT,
+    pinned_by  INTEGER,
+    pinned_at  TEXT
+);
+
+CREATE TABLE IF NOT EXISTS polls (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    question    TEXT,
+    option_a    TEXT,
+    option_b    TEXT,
+    option_c    TEXT,
+    option_d    TEXT,
+    created_by  INTEGER,
+    created_at  TEXT,
+    closes_at   TEXT,
+    status      TEXT DEFAULT 'open',
+    result_sent INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS poll_votes (
+    id       INTEGER PRIMARY KEY AUTOINCREMENT,
+    poll_id  INTEGER,
+    user_id  INTEGER,
+    choice   TEXT,
+    voted_at TEXT,
+    UNIQUE(poll_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS quotes (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    text      TEXT,
+    author    TEXT,
+    added_by  INTEGER,
+    added_at  TEXT,
+    last_sent TEXT
+);
+
+CREATE TABLE IF NOT EXISTS trending (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    folder_id  INTEGER,
+    label      TEXT,
+    added_by   INTEGER,
+    added_at   TEXT,
+    expires_at TEXT,
+    sort_order INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS bot_settings (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS link_access_log (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    link_id     INTEGER,
+    folder_id   INTEGER,
+    user_id     INTEGER,
+    username    TEXT,
+    accessed_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS message_replies (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    reply_id      TEXT    UNIQUE,
+    message_id    TEXT,
+    from_admin_id INTEGER,
+    to_user_id    INTEGER,
+    content       TEXT,
+    sent_at       TEXT,
+    status        TEXT    DEFAULT 'unread'
+);
+
+CREATE TABLE IF NOT EXISTS message_reply_files (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    reply_id       TEXT,
+    file_id        TEXT,
+    file_type      TEXT,
+    text_content   TEXT,
+    file_unique_id TEXT
+);
+
+CREATE TABLE IF NOT EXISTS folder_otps (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    folder_id   INTEGER,
+    user_id     INTEGER,
+    code        TEXT,
+    created_at  TEXT,
+    expires_at  TEXT,
+    status      TEXT DEFAULT 'pending'
+);
+
+CREATE TABLE IF NOT EXISTS shortened_links (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    short_code   TEXT UNIQUE,
+    original_url TEXT,
+    created_by   INTEGER,
+    created_at   TEXT,
+    clicks       INTEGER DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_folder_name      ON folders(name);
+CREATE INDEX IF NOT EXISTS idx_link_token       ON links(token);
+CREATE INDEX IF NOT EXISTS idx_admin_user       ON admins(user_id);
+CREATE INDEX IF NOT EXISTS idx_logs_folder      ON logs(folder_id);
+CREATE INDEX IF NOT EXISTS idx_subscriber_user  ON subscribers(user_id);
+CREATE INDEX IF NOT EXISTS idx_broadcast_code   ON broadcasts(broadcast_code);
+CREATE INDEX IF NOT EXISTS idx_user_message_id  ON user_messages(message_id);
+CREATE INDEX IF NOT EXISTS idx_banned_user      ON banned_users(user_id);
+CREATE INDEX IF NOT EXISTS idx_poll_votes       ON poll_votes(poll_id, user_id);
+CREATE INDEX IF NOT EXISTS idx_trending         ON trending(folder_id);
+CREATE INDEX IF NOT EXISTS idx_link_access      ON link_access_log(link_id);
+CREATE INDEX IF NOT EXISTS idx_quotes           ON quotes(last_sent);
+CREATE INDEX IF NOT EXISTS idx_reply_msg        ON message_replies(message_id);
+CREATE INDEX IF NOT EXISTS idx_reply_user       ON message_replies(to_user_id);
+CREATE INDEX IF NOT EXISTS idx_reply_files      ON message_reply_files(reply_id);
+CREATE INDEX IF NOT EXISTS idx_otp_folder_user  ON folder_otps(folder_id, user_id);
+CREATE INDEX IF NOT EXISTS idx_otp_status       ON folder_otps(status)
+"""
+
+# Columns added after the first release, for databases created before them.
+_LEGACY_COLUMNS = [
+    ("user_messages",  "recipient_admin_id",  "INTEGER", "NULL"),
+    ("user_messages",  "recipient_is_super",   "INTEGER", "0"),
+    ("folders",        "note",                 "TEXT",    "NULL"),
+    ("folders",        "pinned",               "INTEGER", "0"),
+    ("folders",        "is_secret",            "INTEGER", "0"),
+    ("folders",        "secret_code",          "TEXT",    "NULL"),
+    ("folders",        "otp_required",         "INTEGER", "0"),
+    ("folders",        "otp_expiry_minutes",   "INTEGER", "NULL"),
+    ("subscribers",    "banned",               "INTEGER", "0"),
+    ("subscribers",    "ban_reason",           "TEXT",    "NULL"),
+    ("subscribers",    "phone_verified",       "INTEGER", "0"),
+    ("subscribers",    "phone_number",         "TEXT",    "NULL"),
+    ("broadcasts",     "scheduled_for",        "TEXT",    "NULL"),
+    ("broadcasts",     "status",               "TEXT",    "'sent'"),
+    ("links",          "single_use",           "INTEGER", "0"),
+    ("links",          "used_by",              "INTEGER", "NULL"),
+    ("links",          "used_at",              "TEXT",    "NULL"),
+    ("quotes",         "author",               "TEXT",    "NULL"),
+]
+
+_MEDIA_REF_TABLES = ["files", "broadcast_files", "user_message_files", "message_reply_files"]
+
+# Indexes behind the hot predicates found by queryplan.py.
+_HOT_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_files_folder        ON files(folder_id);
+CREATE INDEX IF NOT EXISTS idx_links_folder        ON links(folder_id, revoked);
+CREATE INDEX IF NOT EXISTS idx_logs_recent         ON logs(accessed_at);
+CREATE INDEX IF NOT EXISTS idx_logs_user           ON logs(user_id);
+CREATE INDEX IF NOT EXISTS idx_subscribers_joined  ON subscribers(subscribed_at);
+CREATE INDEX IF NOT EXISTS idx_subscribers_banned  ON subscribers(user_id) WHERE banned=1;
+CREATE INDEX IF NOT EXISTS idx_otp_user_status     ON folder_otps(user_id, status);
+CREATE INDEX IF NOT EXISTS idx_folder_name_lower   ON folders(LOWER(name));
+CREATE INDEX IF NOT EXISTS idx_folder_secret       ON folders(secret_code) WHERE is_secret=1;
+CREATE INDEX IF NOT EXISTS idx_msg_sent            ON user_messages(sent_at);
+CREATE INDEX IF NOT EXISTS idx_msg_files           ON user_message_files(message_id);
+CREATE INDEX IF NOT EXISTS idx_broadcast_files     ON broadcast_files(broadcast_id);
+CREATE INDEX IF NOT EXISTS idx_polls_status        ON polls(status, closes_at);
+
+CREATE INDEX IF NOT EXISTS idx_short_links_creator ON shortened_links(created_by, created_at)
+"""
+
+# Expiry and "since" filters compare datetime(column) so ISO timestamps with a
+# "T" and SQLite's "YYYY-MM-DD HH:MM:SS" compare correctly. SQLite can index
+# that expression directly. The PostgreSQL datetime() shim is STABLE (it
+# reads 'now'), which an index may not use, so there the bare column is
+# indexed instead.
+_TIME_INDEXES = [
+    ("idx_logs_accessed",   "logs",     "accessed_at", ""),
+    ("idx_links_expiry",    "links",    "expiry",      " WHERE revoked=0"),
+    ("idx_trending_expiry", "trending", "expires_at",  ""),
+]
+
+# One row per Quote of the Day send: who it went to and how it went.
+_QOTD_RUNS = """
+CREATE TABLE IF NOT EXISTS qotd_runs (
+    id               INTEGER PRIMARY KEY AUTOINCREMENT,
+    quote_id         INTEGER,
+    source           TEXT,
+    audience         INTEGER,
+    segments         TEXT,
+    window_minutes   INTEGER,
+    started_at       TEXT,
+    finished_at      TEXT,
+    sent             INTEGER DEFAULT 0,
+    failed           INTEGER DEFAULT 0,
+    duration_seconds REAL
+);
+
+CREATE INDEX IF NOT EXISTS idx_qotd_runs_started ON qotd_runs(started_at)
+"""
+
+# Shuffled quote rotations, one per deck name; rows are consumed from the
+# lowest position and the deck is reshuffled once empty.
+_QUOTE_DECK = """
+CREATE TABLE IF NOT EXISTS quote_deck (
+    deck     TEXT,
+    position INTEGER,
+    quote_id INTEGER,
+    PRIMARY KEY (deck, position)
+);
+
+CREATE INDEX IF NOT EXISTS idx_quote_deck_quote ON quote_deck(quote_id)
+"""
+
+# Time-decayed view score per folder, kept up to date by popularity.py.
+_FOLDER_POPULARITY = """
+CREATE TABLE IF NOT EXISTS folder_popularity (
+    folder_id  INTEGER PRIMARY KEY,
+    log_score  REAL,
+    updated_at TEXT
+)
+"""
+
+# Attachment tables rebuilt with foreign keys, so deleting a message or reply
+# takes its files with it: (table, column, parent table, parent column, indexes).
+_CASCADES = [
+    ("user_message_files",  "message_id", "user_messages",   "message_id",
+     ["idx_msg_files", "idx_user_message_files_media"]),
+    ("message_reply_files", "reply_id",   "message_replies", "reply_id",
+     ["idx_reply_files", "idx_message_reply_files_media"]),
+]
+
+# Inbox totals per owner, kept by triggers so menu badges are a key lookup.
+#   ('admin', recipient_admin_id)  user_messages addressed to that admin
+#   ('all',   0)                   every user_message (super admin view)
+#   ('user',  to_user_id)          message_replies sent to that user
+_INBOX_COUNTERS = """
+CREATE TABLE IF NOT EXISTS inbox_counters (
+    kind     TEXT,
+    owner_id INTEGER,
+    total    INTEGER DEFAULT 0,
+    unread   INTEGER DEFAULT 0,
+    PRIMARY KEY (kind, owner_id)
+)
+"""
+
+# (table, [(kind, owner expression)])
+_COUNTED = [
+    ("user_messages",   [("admin", "COALESCE({row}.recipient_admin_id, 0)"), ("all", "0")]),
+    ("message_replies", [("user",  "COALESCE({row}.to_user_id, 0)")]),
+]
+
+
+# ── Helpers ──────────────────────────────────────────────────────────────
+
+def _statements(script: str) -> list:
+    """Split a script of plain DDL (no trigger bodies) into statements."""
+    return [s.strip() for s in script.split(";") if s.strip()]
+
+
+def _addColumn(cur, pg: bool, table: str, column: str, decl: str) -> None:
+    if pg:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {decl}")
+        return
+    existing = {row[1] for row in cur.execute(f"PRAGMA table_info({table})").fetchall()}
+    if column not in existing:
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _sqliteMediaTriggers(cur, table: str) -> None:
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_media_ref AFTER INSERT ON {table}
+        WHEN NEW.file_unique_id IS NOT NULL
+        BEGIN
+            UPDATE media SET ref_count = ref_count + 1 WHERE file_unique_id = NEW.file_unique_id;
+        END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_media_unref AFTER DELETE ON {table}
+        WHEN OLD.file_unique_id IS NOT NULL
+        BEGIN
+            UPDATE media SET ref_count = ref_count - 1 WHERE file_unique_id = OLD.file_unique_id;
+        END
+    """)
+
+
+def _sqliteCounterTrigger(cur, name: str, event: str, table: str, owners: list,
+                          row: str, dTotal: str, dUnread: str, when: str = "") -> None:
+    keys  = " OR ".join(f"(kind = '{kind}' AND owner_id = {expr.format(row=row)})" for kind, expr in owners)
+    seeds = ", ".join(f"('{kind}', {expr.format(row=row)})" for kind, expr in owners)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table} {when}
+        BEGIN
+            INSERT OR IGNORE INTO inbox_counters (kind, owner_id) VALUES {seeds};
+            UPDATE inbox_counters SET total = total + {dTotal}, unread = unread + {dUnread} WHERE {keys};
+        END
+    """)
+
+
+# ── Migrations ───────────────────────────────────────────────────────────
+
+def _m001Baseline(cur, pg: bool) -> None:
+    for stmt in _statements(_BASELINE):
+        cur.execute(stmt)
+
+
+def _m002LegacyColumns(cur, pg: bool) -> None:
+    for table, column, colType, default in _LEGACY_COLUMNS:
+        _addColumn(cur, pg, table, column, f"{colType} DEFAULT {default}")
+    # The index needs recipient_admin_id, which very old databases lack until now
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_msg_recipient ON user_messages(recipient_admin_id)")
+
+
+def _m003StorageMirror(cur, pg: bool) -> None:
+    _addColumn(cur, pg, "files",           "storage_msg_id", "INTEGER DEFAULT NULL")
+    _addColumn(cur, pg, "broadcast_files", "storage_msg_id", "INTEGER DEFAULT NULL")
+
+
+def _m004MediaRefs(cur, pg: bool) -> None:
+    for table in _MEDIA_REF_TABLES:
+        _addColumn(cur, pg, table, "file_unique_id", "TEXT DEFAULT NULL")
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_media ON {table}(file_unique_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_files_folder_media ON files(folder_id, file_unique_id)")
+
+    if pg:
+        cur.execute("""
+            CREATE OR REPLACE FUNCTION media_ref() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' AND NEW.file_unique_id IS NOT NULL THEN
+                    UPDATE media SET ref_count = ref_count + 1 WHERE file_unique_id = NEW.file_unique_id;
+                ELSIF TG_OP = 'DELETE' AND OLD.file_unique_id IS NOT NULL THEN
+                    UPDATE media SET ref_count = ref_count - 1 WHERE file_unique_id = OLD.file_unique_id;
+                END IF;
+                RETURN NULL;
+            END $$ LANGUAGE plpgsql
+        """)
+        for table in _MEDIA_REF_TABLES:
+            cur.execute(f"""
+                CREATE OR REPLACE TRIGGER trg_{table}_media_ref AFTER INSERT OR DELETE ON {table}
+                    FOR EACH ROW EXECUTE FUNCTION media_ref()
+            """)
+        return
+
+    for table in _MEDIA_REF_TABLES:
+        _sqliteMediaTriggers(cur, table)
+
+
+def _m005HotIndexes(cur, pg: bool) -> None:
+    for stmt in _statements(_HOT_INDEXES):
+        cur.execute(stmt)
+    for name, table, column, where in _TIME_INDEXES:
+        if pg and table == "logs":
+            continue  # idx_logs_recent already indexes the bare column
+        expr = column if pg else f"datetime({column})"
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({expr}){where}")
+
+
+def _m006Unreachable(cur, pg: bool) -> None:
+    # Set when a fan-out gets Forbidden / chat not found; cleared on the user's next update
+    _addColumn(cur, pg, "subscribers", "unreachable_at", "TEXT DEFAULT NULL")
+
+
+def _m007QotdRuns(cur, pg: bool) -> None:
+    for stmt in _statements(_QOTD_RUNS):
+        cur.execute(stmt)
+
+
+def _m008QuoteDeck(cur, pg: bool) -> None:
+    for stmt in _statements(_QUOTE_DECK):
+        cur.execute(stmt)
+
+
+def _m009FolderPopularity(cur, pg: bool) -> None:
+    cur.execute(_FOLDER_POPULARITY)
+
+
+def _m010InboxCascades(cur, pg: bool) -> None:
+    for table, column, parent, parentColumn, indexes in _CASCADES:
+        # Files whose message or reply is already gone; the delete trigger releases their media
+        cur.execute(f"DELETE FROM {table} WHERE {column} NOT IN "
+                    f"(SELECT {parentColumn} FROM {parent} WHERE {parentColumn} IS NOT NULL)")
+        if pg:
+            cur.execute(f"""
+                ALTER TABLE {table} ADD CONSTRAINT fk_{table}_{column}
+                    FOREIGN KEY ({column}) REFERENCES {parent}({parentColumn}) ON DELETE CASCADE
+            """)
+            continue
+        # SQLite cannot add a constraint to an existing table: rebuild it. Rows are
+        # copied before the triggers exist, so media ref counts are left as they are.
+        cur.execute(f"""
+            CREATE TABLE {table}_new (
+                id             INTEGER PRIMARY KEY AUTOINCREMENT,
+                {column:<14} TEXT REFERENCES {parent}({parentColumn}) ON DELETE CASCADE,
+                file_id        TEXT,
+                file_type      TEXT,
+                text_content   TEXT,
+                file_unique_id TEXT
+            )
+        """)
+        cur.execute(f"""
+            INSERT INTO {table}_new (id, {column}, file_id, file_type, text_content, file_unique_id)
+            SELECT id, {column}, file_id, file_type, text_content, file_unique_id FROM {table}
+        """)
+        cur.execute(f"DROP TABLE {table}")
+        cur.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+        byColumn, byMedia = indexes
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {byColumn} ON {table}({column})")
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {byMedia} ON {table}(file_unique_id)")
+        _sqliteMediaTriggers(cur, table)
+
+
+def _m011InboxCounters(cur, pg: bool) -> None:
+    cur.execute(_INBOX_COUNTERS)
+    for table, owners in _COUNTED:
+        if pg:
+            upserts = "\n".join(f"""
+                    INSERT INTO inbox_counters (kind, owner_id, total, unread)
+                    VALUES ('{kind}', {expr.format(row="r")}, d_total, d_unread)
+                    ON CONFLICT (kind, owner_id) DO UPDATE SET
+                        total  = inbox_counters.total  + EXCLUDED.total,
+                        unread = inbox_counters.unread + EXCLUDED.unread;""" for kind, expr in owners)
+            cur.execute(f"""
+                CREATE OR REPLACE FUNCTION {table}_count() RETURNS trigger AS $$
+                DECLARE
+                    r        {table}%ROWTYPE;
+                    d_total  INTEGER := 0;
+                    d_unread INTEGER := 0;
+                BEGIN
+                    IF TG_OP = 'INSERT' THEN
+                        r := NEW; d_total := 1;  d_unread := (NEW.status = 'unread')::int;
+                    ELSIF TG_OP = 'DELETE' THEN
+                        r := OLD; d_total := -1; d_unread := -(OLD.status = 'unread')::int;
+                    ELSE
+                        r := NEW; d_unread := (NEW.status = 'unread')::int - (OLD.status = 'unread')::int;
+                    END IF;
+                    {upserts}
+                    RETURN NULL;
+                END $$ LANGUAGE plpgsql
+            """)
+            cur.execute(f"""
+                CREATE OR REPLACE TRIGGER trg_{table}_count AFTER INSERT OR DELETE OR UPDATE OF status ON {table}
+                    FOR EACH ROW EXECUTE FUNCTION {table}_count()
+            """)
+        else:
+            _sqliteCounterTrigger(cur, f"trg_{table}_count_add", "INSERT", table, owners,
+                                  "NEW", "1", "(NEW.status = 'unread')")
+            _sqliteCounterTrigger(cur, f"trg_{table}_count_del", "DELETE", table, owners,
+                                  "OLD", "-1", "-(OLD.status = 'unread')")
+            _sqliteCounterTrigger(cur, f"trg_{table}_count_read", "UPDATE OF status", table, owners,
+                                  "NEW", "0", "(NEW.status = 'unread') - (OLD.status = 'unread')",
+                                  when="WHEN NEW.status IS NOT OLD.status")
+        # Start from what is already there
+        for kind, expr in owners:
+            cur.execute(f"""
+                INSERT INTO inbox_counters (kind, owner_id, total, unread)
+                SELECT '{kind}', {expr.format(row=table)}, COUNT(*),
+                       COALESCE(SUM(CASE WHEN status = 'unread' THEN 1 ELSE 0 END), 0)
+                FROM {table} GROUP BY 2
+            """)
+
+
+MIGRATIONS = [
+    (1, "baseline schema",         _m001Baseline),
+    (2, "legacy columns",          _m002LegacyColumns),
+    (3, "storage channel mirror",  _m003StorageMirror),
+    (4, "media reference counts",  _m004MediaRefs),
+    (5, "hot query indexes",       _m005HotIndexes),
+    (6, "unreachable subscribers", _m006Unreachable),
+    (7, "qotd run stats",          _m007QotdRuns),
+    (8, "quote rotation decks",    _m008QuoteDeck),
+    (9, "folder popularity",       _m009FolderPopularity),
+    (10, "inbox delete cascades",  _m010InboxCascades),
+    (11, "inbox counters",         _m011InboxCounters),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+# ─────────────────────────────────────────────
+#  RUNNER
+# ─────────────────────────────────────────────
+
+def _currentVersion(cur, pg: bool) -> int:
+    if not pg:
+        return cur.execute("PRAGMA user_version").fetchone()[0]
+    try:
+        row = cur.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+    except sqlite3.OperationalError:
+        return 0  # nothing has been versioned yet
+    return row[0] or 0
+
+
+def migrate(conn) -> int:
+    """
+    Bring the schema up to SCHEMA_VERSION. Returns the number of migrations
+    applied; 0 on a warm start, which costs a single version read.
+    """
+    pg  = isinstance(conn, PgConnection)
+    cur = conn.cursor()
+    if _currentVersion(cur, pg) >= SCHEMA_VERSION:
+        return 0
+
+    if pg:
+        conn.lockSchema()
+    else:
+        conn.execute("BEGIN IMMEDIATE")
+
+    applied = 0
+    started = time.perf_counter()
+    try:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version     INTEGER PRIMARY KEY,
+                name        TEXT,
+                applied_at  TEXT,
+                duration_ms REAL
+            )
+        """)
+        # Another worker may have migrated while we waited for the lock
+        current = _currentVersion(cur, pg)
+        for version, name, step in MIGRATIONS:
+            if version <= current:
+                continue
+            stepStarted = time.perf_counter()
+            step(cur, pg)
+            elapsed = (time.perf_counter() - stepStarted) * 1000
+            cur.execute(
+                "INSERT INTO schema_migrations (version, name, applied_at, duration_ms) VALUES (?, ?, ?, ?)",
+                (version, name, datetime.now().isoformat(), round(elapsed, 2))
+            )
+            logging.info(f"Migration {version} ({name}) applied in {elapsed:.1f} ms")
+            applied += 1
+        if not pg:
+            cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        logging.exception("Schema migration failed — nothing was applied")
+        raise
+
+    if applied:
+        total = (time.perf_counter() - started) * 1000
+        logging.info(f"Schema at version {SCHEMA_VERSION}: {applied} migration(s) in {total:.1f} ms")
+    return applied
+
+
+def migrationHistory(conn) -> list:
+    """(version, name, applied_at, duration_ms) of every applied migration."""
+    try:
+        return conn.execute(
+            "SELECT version, name, applied_at, duration_ms FROM schema_migrations ORDER BY version"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return []
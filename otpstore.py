@@ -0,0 +1,246 @@
+import hashlib
+import hmac
+import html
+import logging
+import secrets
+import time
+from datetime import datetime, timedelta
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup  # type: ignore
+
+from config import conn, ADMIN_ID, TOKEN
+from expiry import expireAt
+from repos import otpRepo
+
+# Wrong guesses allowed before a code is revoked.
+MAX_ATTEMPTS = 3
+
+# Taps on Request OTP for the same folder and user within this many seconds
+# of the last digest count as one request.
+REQUEST_WINDOW = 600
+
+# The super admin gets one digest this many seconds after the first new request.
+DIGEST_DELAY = 30
+
+# Requests per digest message (one Generate button each).
+DIGEST_SIZE = 20
+
+
+# ─────────────────────────────────────────────
+#  CODES
+# ─────────────────────────────────────────────
+
+# The newest pending code per (folder, user) is kept in memory, so checking
+# one is a dict lookup. folder_otps is still written on every change and read
+# back at startup. Codes are stored as an HMAC keyed by the bot token — never
+# in plain text — so a copy of the database does not hand out folder access.
+#
+# folder_otps stays the source of truth: with several workers on PostgreSQL a
+# code may have been issued, replaced or used by another one. A miss or a
+# non-matching code is looked up there, and a code only counts as used if its
+# row was still pending.
+
+class OtpCode:
+    __slots__ = ("id", "digest", "expiresAt")
+
+    def __init__(self, otpId: int, digest: str, expiresAt: datetime):
+        self.id        = otpId
+        self.digest    = digest
+        self.expiresAt = expiresAt
+
+
+_codes = {}
+
+
+def _digest(folderId: int, userId: int, code: str) -> str:
+    message = f"{folderId}:{userId}:{code}".encode()
+    return hmac.new((TOKEN or "").encode(), message, hashlib.sha256).hexdigest()
+
+
+def _fromRow(folderId: int, userId: int, otpId: int, code: str, expiresAt: str) -> OtpCode | None:
+    try:
+        expires = datetime.fromisoformat(expiresAt)
+    except (TypeError, ValueError):
+        return None
+    # Codes issued before hashing are plain six-digit strings
+    digest = code if len(code or "") == 64 else _digest(folderId, userId, code)
+    return OtpCode(otpId, digest, expires)
+
+
+def loadCodes() -> int:
+    """Startup: load every pending code. Returns how many."""
+    _codes.clear()
+    for otpId, folderId, userId, code, expiresAt in otpRepo.pendingAll():
+        entry = _fromRow(folderId, userId, otpId, code, expiresAt)
+        if entry:
+            _codes[(folderId, userId)] = entry
+    return len(_codes)
+
+
+def _reload(folderId: int, userId: int) -> OtpCode | None:
+    """Re-read the user's pending code from folder_otps into the cache."""
+    row   = otpRepo.pending(folderId, userId)
+    entry = _fromRow(folderId, userId, *row) if row else None
+    if entry:
+        _codes[(folderId, userId)] = entry
+    else:
+        _codes.pop((folderId, userId), None)
+    return entry
+
+
+def issue(folderId: int, userId: int, expiryMins: int) -> tuple[str, datetime]:
+    """New code for the user, replacing any pending one. Returns (code, expires). Commits."""
+    code    = str(100000 + secrets.randbelow(900000))
+    digest  = _digest(folderId, userId, code)
+    expires = datetime.now() + timedelta(minutes=expiryMins)
+    otpId   = otpRepo.issue(folderId, userId, digest, expires.isoformat())
+    conn.commit()
+    _codes[(folderId, userId)] = OtpCode(otpId, digest, expires)
+    expireAt("otp", otpId, expires)
+    _requests.pop((folderId, userId), None)
+    return code, expires
+
+
+def issueMany(folderId: int, userIds: list, expiryMins: int) -> tuple[dict, datetime]:
+    """issue() for several users in one transaction. Returns ({user id: code}, expires). Commits."""
+    codes   = {userId: str(100000 + secrets.randbelow(900000)) for userId in userIds}
+    digests = {userId: _digest(folderId, userId, code) for userId, code in codes.items()}
+    expires = datetime.now() + timedelta(minutes=expiryMins)
+    otpIds  = otpRepo.issueMany(folderId, digests, expires.isoformat())
+    conn.commit()
+    for userId, otpId in otpIds.items():
+        _codes[(folderId, userId)] = OtpCode(otpId, digests[userId], expires)
+        expireAt("otp", otpId, expires)
+        _requests.pop((folderId, userId), None)
+    return codes, expires
+
+
+def check(folderId: int, userId: int, code: str) -> str:
+    """'ok' (code used up), 'wrong', 'expired' or 'none'. Caller commits."""
+    key    = (folderId, userId)
+    digest = _digest(folderId, userId, code)
+    entry  = _codes.get(key) or _reload(folderId, userId)
+    if entry and not hmac.compare_digest(entry.digest, digest):
+        # Another worker may have issued a newer code since this one was cached
+        entry = _reload(folderId, userId)
+    if entry is None:
+        return "none"
+    if datetime.now() > entry.expiresAt:
+        del _codes[key]
+        otpRepo.expire([entry.id])
+        return "expired"
+    if not hmac.compare_digest(entry.digest, digest):
+        return "wrong"
+    del _codes[key]
+    # Zero rows: another worker used or revoked it first
+    return "ok" if otpRepo.use(entry.id) else "none"
+
+
+def revoke(folderId: int, userId: int) -> None:
+    """Drop the user's pending code. Caller commits."""
+    entry = _codes.pop((folderId, userId), None)
+    if entry:
+        otpRepo.setStatus(entry.id, "revoked")
+
+
+def countActive() -> int:
+    now = datetime.now()
+    return sum(1 for entry in _codes.values() if entry.expiresAt >= now)
+
+
+# ─────────────────────────────────────────────
+#  REQUESTS
+# ─────────────────────────────────────────────
+
+# Request OTP taps wait here and reach the super admin as one digest, rather
+# than one message per tap. Tapping again before the digest, or within
+# REQUEST_WINDOW of the digest that listed it, changes nothing; after that the
+# request is listed again. Issuing a code clears it.
+
+class OtpRequest:
+    __slots__ = ("folderName", "username", "firstName", "taps", "notifiedAt")
+
+    def __init__(self, folderName: str, user):
+        self.folderName = folderName
+        self.username   = user.username
+        self.firstName  = user.first_name
+        self.taps       = 0
+        self.notifiedAt = None
+
+
+_requests = {}
+_timer    = None
+
+
+def queueRequest(jobQueue, folderId: int, folderName: str, user) -> bool:
+    """Add a request to the next digest. False if it was coalesced with an earlier one."""
+    global _timer
+    key     = (folderId, user.id)
+    request = _requests.get(key)
+    if request is None:
+        request = _requests[key] = OtpRequest(folderName, user)
+    request.taps += 1
+    if request.notifiedAt is not None:
+        if time.monotonic() - request.notifiedAt < REQUEST_WINDOW:
+            return False
+        request.notifiedAt = None
+    elif request.taps > 1:
+        return False
+    if _timer is None and jobQueue:
+        _timer = jobQueue.run_once(_digestJob, DIGEST_DELAY)
+    return True
+
+
+def countWaiting() -> int:
+    return len(_requests)
+
+
+def waitingFor(folderId: int) -> list:
+    """(user id, OtpRequest) of every request waiting on a folder."""
+    return [(userId, r) for (fid, userId), r in _requests.items() if fid == folderId]
+
+
+def _digestMessage(chunk: list) -> tuple:
+    """(text, markup) for up to DIGEST_SIZE requests."""
+    lines = [f"<b>OTP Access Requests</b>  ({len(chunk)})\n"]
+    rows  = []
+    # One "Approve all" per folder with more than one user waiting
+    for folderId, folderName in {fid: r.folderName for (fid, _), r in chunk}.items():
+        waiting = len(waitingFor(folderId))
+        if waiting > 1:
+            rows.append([InlineKeyboardButton(
+                f"Approve all for {folderName} ({waiting})"[:60], callback_data=f"otp_all_{folderId}",
+            )])
+    for (folderId, userId), r in chunk:
+        taps = f"  ×{r.taps}" if r.taps > 1 else ""
+        who  = html.escape(f"{r.folderName}  |  {r.firstName} (@{r.username or 'N/A'})")
+        lines.append(f"<code>{who}  |  {userId}</code>{taps}")
+        rows.append([InlineKeyboardButton(
+            f"Generate: {r.firstName} → {r.folderName}"[:60],
+            callback_data=f"otp_gen_{folderId}_{userId}",
+        )])
+    lines.append("\nTap Generate to send that user a one-time code.")
+    return "\n".join(lines), InlineKeyboardMarkup(rows)
+
+
+async def _digestJob(context):
+    global _timer
+    _timer = None
+    now    = time.monotonic()
+    # Unanswered requests from earlier digests are dropped; a new tap lists them again
+    for key in [k for k, r in _requests.items() if r.notifiedAt and now - r.notifiedAt >= REQUEST_WINDOW]:
+        del _requests[key]
+    batch  = [(key, r) for key, r in _requests.items() if r.notifiedAt is None]
+    for i in range(0, len(batch), DIGEST_SIZE):
+        chunk        = batch[i:i + DIGEST_SIZE]
+        text, markup = _digestMessage(chunk)
+        try:
+            await context.bot.send_message(ADMIN_ID, text, parse_mode="HTML", reply_markup=markup)
+        except Exception as e:
+            # Left unnotified, so the retry lists them again
+            logging.error(f"otpDigest: {e}")
+            if _timer is None:
+                _timer = context.job_queue.run_once(_digestJob, DIGEST_DELAY)
+            continue
+        for _, r in chunk:
+            r.notifiedAt = now
@@ -0,0 +1,125 @@
+import logging
+import sqlite3
+from datetime import datetime
+
+from config import conn
+from db import savepoint
+from repos import pollRepo
+
+# Votes are written once this many are pending, or FLUSH_INTERVAL seconds after
+# the first one arrived — whichever comes first.
+FLUSH_SIZE     = 500
+FLUSH_INTERVAL = 2
+
+
+# ─────────────────────────────────────────────
+#  POLL TALLIES
+# ─────────────────────────────────────────────
+
+# Live counts for every poll voted on or viewed since startup. poll_votes is
+# still the record, but vote acknowledgements and result screens read from
+# here, so a vote costs a set lookup instead of two queries and a commit.
+# Open polls are rebuilt from poll_votes at startup; anything else is loaded
+# the first time it is asked for.
+
+class PollTally:
+    """Counts for one poll, plus who voted while it is open."""
+
+    def __init__(self, poll, votes):
+        self.poll   = poll        # pollRepo.get() row
+        self.status = poll[6]
+        self.counts = {}
+        self.voters = set()
+        for userId, choice in votes:
+            self._count(userId, choice)
+        if self.status != "open":
+            self.voters.clear()   # only needed to refuse a second vote
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def hasVoted(self, userId: int) -> bool:
+        return userId in self.voters
+
+    def _count(self, userId: int, choice: str) -> None:
+        self.voters.add(userId)
+        self.counts[choice] = self.counts.get(choice, 0) + 1
+
+
+_tallies = {}
+_pending = []
+_timer   = None
+
+
+def tallyFor(pollId: int) -> PollTally | None:
+    """The poll's tally, loaded from the database on first use. None if the poll does not exist."""
+    tally = _tallies.get(pollId)
+    if tally is None:
+        poll = pollRepo.get(pollId)
+        if not poll:
+            return None
+        tally = _tallies[pollId] = PollTally(poll, pollRepo.votes(pollId))
+    return tally
+
+
+def loadOpenTallies() -> int:
+    """Rebuild every open poll from poll_votes. Returns how many were loaded."""
+    _tallies.clear()
+    for pollId in pollRepo.openIds():
+        tallyFor(pollId)
+    return len(_tallies)
+
+
+def recordVote(jobQueue, tally: PollTally, userId: int, choice: str) -> bool:
+    """Count a vote and queue its row. False if the user already voted."""
+    global _timer
+    if tally.hasVoted(userId):
+        return False
+    tally._count(userId, choice)
+    _pending.append((tally.poll[0], userId, choice, datetime.now().isoformat()))
+    if len(_pending) >= FLUSH_SIZE:
+        flushVotes()
+    elif _timer is None and jobQueue:
+        _timer = jobQueue.run_once(_flushJob, FLUSH_INTERVAL)
+    return True
+
+
+def closeTally(pollId: int) -> PollTally | None:
+    """Stop taking votes for a poll and write the ones still pending."""
+    tally = tallyFor(pollId)
+    if tally:
+        tally.status = "closed"
+        tally.voters.clear()
+    flushVotes()
+    return tally
+
+
+def flushVotes() -> bool:
+    """Write every pending vote in one executemany. Votes stay pending if the write fails."""
+    global _timer
+    if _timer:
+        _timer.schedule_removal()
+        _timer = None
+    if not _pending:
+        return True
+    try:
+        with savepoint(conn, "flush_votes"):
+            pollRepo.addVotes(_pending)
+        conn.commit()
+    except sqlite3.Error as e:
+        logging.error(f"flushVotes ({len(_pending)} votes): {e}")
+        return False
+    _pending.clear()
+    return True
+
+
+# ─────────────────────────────────────────────
+#  JOBS
+# ─────────────────────────────────────────────
+
+async def _flushJob(context):
+    global _timer
+    _timer = None
+    if not flushVotes():
+        _timer = context.job_queue.run_once(_flushJob, FLUSH_INTERVAL)
@@ -0,0 +1,129 @@
+import heapq
+import logging
+import math
+from datetime import datetime, timedelta
+
+from config import conn
+from expiry import expireAt
+from repos import folderRepo, logRepo, popularityRepo, settingsRepo, trendingRepo
+
+# A view counts half as much after this many hours.
+HALF_LIFE_HOURS = 12
+
+# Folders whose score has decayed below this are not worth featuring.
+MIN_SCORE = 0.5
+
+# Auto mode fills trending with this many folders.
+AUTO_TOP = 5
+
+_DECAY = math.log(2) / (HALF_LIFE_HOURS * 3600)
+_EPOCH = datetime(2024, 1, 1)
+
+
+# ─────────────────────────────────────────────
+#  DECAYED SCORES
+# ─────────────────────────────────────────────
+
+# Every view adds 1 to its folder's score, and scores halve every
+# HALF_LIFE_HOURS. Rather than decaying every score on a timer, each is kept
+# as log(score) measured at _EPOCH: a view at time t adds exp(λ·(t − epoch)),
+# which never needs touching again, and the ranking stays the same as time
+# passes. The score today is exp(logScore − λ·(now − epoch)).
+#
+# Scores live in memory and in folder_popularity, so a view costs one upsert
+# and the top folders are a heap over the dict — logs are only read once, to
+# seed an empty table.
+
+_scores = {}
+
+
+def _elapsed(at: datetime) -> float:
+    return _DECAY * (at - _EPOCH).total_seconds()
+
+
+def _add(logScore: float | None, at: datetime) -> float:
+    """logScore + one view at `at`, in log space."""
+    x = _elapsed(at)
+    if logScore is None:
+        return x
+    hi, lo = max(logScore, x), min(logScore, x)
+    return hi + math.log1p(math.exp(lo - hi))
+
+
+def recordView(folderId: int) -> None:
+    """Count one view of a folder. Caller commits."""
+    # Summed in SQL, which also picks up views recorded by other workers
+    _scores[folderId] = popularityRepo.add(folderId, _elapsed(datetime.now()))
+
+
+def forget(folderId: int) -> None:
+    """Drop a deleted folder's score."""
+    _scores.pop(folderId, None)
+
+
+def loadScores(backfillDays: int = 7) -> int:
+    """
+    Startup: load folder_popularity into memory. An empty table is seeded from
+    the last `backfillDays` of logs. Returns how many folders have a score.
+    """
+    _scores.clear()
+    _scores.update(popularityRepo.all())
+    if not _scores:
+        since = (datetime.now() - timedelta(days=backfillDays)).isoformat()
+        for folderId, accessedAt in logRepo.accessesSince(since):
+            try:
+                _scores[folderId] = _add(_scores.get(folderId), datetime.fromisoformat(accessedAt))
+            except (TypeError, ValueError):
+                continue
+        if _scores:
+            popularityRepo.setMany(_scores)
+    return len(_scores)
+
+
+def topFolders(k: int = AUTO_TOP) -> list:
+    """(id, name, score) of the k most popular public folders, best first."""
+    now       = datetime.now()
+    threshold = math.log(MIN_SCORE) + _elapsed(now)
+    # Secret and deleted folders drop out of the name lookup, so ask for a
+    # few more than needed and widen the heap only if too many were lost.
+    want = k * 2
+    while True:
+        ranked = heapq.nlargest(want, ((s, fid) for fid, s in _scores.items() if s >= threshold))
+        names  = folderRepo.publicNames(fid for _, fid in ranked)
+        top    = [(fid, names[fid], math.exp(s - _elapsed(now))) for s, fid in ranked if fid in names]
+        if len(top) >= k or len(ranked) < want:
+            return top[:k]
+        want *= 4
+
+
+# ─────────────────────────────────────────────
+#  AUTO TRENDING
+# ─────────────────────────────────────────────
+
+# While the trending_auto setting holds an admin id, the hourly job replaces
+# the trending list with topFolders() in that admin's name. Adding or
+# clearing items by hand turns it off.
+
+def autoTrendingBy() -> int | None:
+    """Admin who switched auto mode on, or None if it is off."""
+    value = settingsRepo.get("trending_auto", "")
+    return int(value) if value and value.lstrip("-").isdigit() else None
+
+
+def setAutoTrending(adminId: int | None) -> None:
+    settingsRepo.set("trending_auto", str(adminId) if adminId else "")
+
+
+def refreshAutoTrending(adminId: int) -> list:
+    """Replace trending with the current top folders. Returns them; leaves trending alone if there are none."""
+    top = topFolders()
+    if not top:
+        return top
+    trendingRepo.clear()
+    expires = datetime.now() + timedelta(hours=24)
+    ids     = [trendingRepo.add(fid, fname, adminId, expires.isoformat(), i) for i, (fid, fname, _) in enumerate(top)]
+    conn.commit()
+    for trendingId in ids:
+        expireAt("trending", trendingId, expires)
+    logging.info(f"Auto trending refreshed: {', '.join(name for _, name, _ in top)}")
+    return top
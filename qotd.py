@@ -0,0 +1,163 @@
+import json
+import logging
+import math
+import random
+import sqlite3
+import time
+from datetime import datetime, time as dtime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from config import conn
+from fanout import sendBulk
+from repos import qotdRunRepo, quoteRepo, settingsRepo, subscriberRepo
+
+# Defaults for the qotd_time and qotd_window_minutes settings
+QOTD_TIME   = "12:00 UTC"
+QOTD_WINDOW = 60
+
+# A run is sent in this many slices, spaced evenly across the window.
+QOTD_SLICES = 30
+
+# Activity segments, sent in this order: (name, max days since the last update).
+SEGMENTS = [("active", 7), ("recent", 30), ("dormant", None)]
+
+
+# ─────────────────────────────────────────────
+#  SETTINGS
+# ─────────────────────────────────────────────
+
+def parseQotdTime(value: str) -> dtime | None:
+    """'09:00', '09:00 UTC' or '21:30 Europe/Berlin' -> time with tzinfo. None if unreadable."""
+    parts = (value or "").split()
+    try:
+        hour, minute = (int(p) for p in parts[0].split(":"))
+        zone = parts[1] if len(parts) > 1 else "UTC"
+        tz   = timezone.utc if zone.upper() == "UTC" else ZoneInfo(zone)
+        return dtime(hour, minute, tzinfo=tz)
+    except (IndexError, ValueError, ZoneInfoNotFoundError):
+        return None
+
+
+def qotdTime() -> dtime:
+    value  = settingsRepo.get("qotd_time", QOTD_TIME)
+    parsed = parseQotdTime(value)
+    if parsed is None:
+        logging.warning(f"qotd_time '{value}' is not HH:MM [zone]; using {QOTD_TIME}")
+        parsed = parseQotdTime(QOTD_TIME)
+    return parsed
+
+
+def qotdWindow() -> int:
+    """Minutes a scheduled run is spread across."""
+    try:
+        return max(0, int(settingsRepo.get("qotd_window_minutes", QOTD_WINDOW)))
+    except (TypeError, ValueError):
+        return QOTD_WINDOW
+
+
+# ─────────────────────────────────────────────
+#  QUOTE ROTATION
+# ─────────────────────────────────────────────
+
+# Quotes are drawn from a shuffled deck kept in quote_deck, so every quote
+# comes up once per cycle and the order survives restarts. QOTD and the
+# user-facing "Get a Quote" button draw from separate decks.
+
+def nextQuote(deck: str):
+    """(id, text, author) off the deck, reshuffling it when empty. None if there are no quotes. Caller commits."""
+    quote = quoteRepo.popDeck(deck)
+    if quote:
+        return quote
+    ids = quoteRepo.ids()
+    if not ids:
+        return None
+    random.shuffle(ids)
+    quoteRepo.fillDeck(deck, ids)
+    return quoteRepo.popDeck(deck)
+
+
+# ─────────────────────────────────────────────
+#  RUNS
+# ─────────────────────────────────────────────
+
+def _segment(rows) -> dict:
+    """{segment: [user ids]} from (user_id, last_active) rows."""
+    now      = datetime.now()
+    cutoffs  = [(name, (now - timedelta(days=days)).isoformat() if days else "") for name, days in SEGMENTS]
+    segments = {name: [] for name, _ in SEGMENTS}
+    for userId, lastActive in rows:
+        seen = lastActive or ""
+        for name, cutoff in cutoffs:
+            if seen >= cutoff:
+                segments[name].append(userId)
+                break
+    return segments
+
+
+class QotdRun:
+    """Totals for one run while its slices are being sent."""
+
+    def __init__(self, runId: int, message: str, slices: int):
+        self.id       = runId
+        self.message  = message
+        self.pending  = slices
+        self.sent     = 0
+        self.failed   = 0
+        self._started = time.monotonic()
+
+
+async def startQotdRun(context, source: str, window: int = None) -> int | None:
+    """
+    Pick a quote and queue it for the whole audience: most active subscribers
+    first, spread over `window` minutes (the qotd_window_minutes setting by
+    default, 0 = all at once). Returns the qotd_runs id, or None if there is
+    nothing to send.
+    """
+    window = qotdWindow() if window is None else window
+    try:
+        quote = nextQuote("qotd")
+        if not quote:
+            return None
+        segments = _segment(subscriberRepo.audienceActivity())
+        audience = [uid for name, _ in SEGMENTS for uid in segments[name]]
+        runId    = qotdRunRepo.start(
+            quote[0], source, len(audience),
+            json.dumps({name: len(ids) for name, ids in segments.items()}), window,
+        )
+        quoteRepo.markSent(quote[0])
+        conn.commit()
+    except sqlite3.Error as e:
+        logging.error(f"startQotdRun: {e}")
+        return None
+
+    _, text, author = quote
+    author_line = f"\n\n— <i>{author}</i>" if author else ""
+    slices = max(1, min(QOTD_SLICES if window else 1, len(audience)))
+    size   = math.ceil(len(audience) / slices) if audience else 0
+    run    = QotdRun(runId, f"<b>Quote of the Day</b>\n\n<i>{text}</i>{author_line}", slices)
+    for i in range(slices):
+        context.job_queue.run_once(
+            _qotdSliceJob, i * window * 60 / slices,
+            data=(run, audience[i * size:(i + 1) * size]), name=f"qotd_run_{runId}",
+        )
+    logging.info(f"QOTD run {runId}: {len(audience)} subscriber(s) in {slices} slice(s) over {window} min")
+    return runId
+
+
+async def _qotdSliceJob(context):
+    run, userIds = context.job.data
+    sent, failed = await sendBulk(
+        userIds, lambda uid: context.bot.send_message(uid, run.message, parse_mode="HTML"), f"QOTD run {run.id}"
+    )
+    run.sent    += sent
+    run.failed  += failed
+    run.pending -= 1
+    try:
+        qotdRunRepo.progress(run.id, run.sent, run.failed)
+        if run.pending == 0:
+            qotdRunRepo.finish(run.id, time.monotonic() - run._started)
+        conn.commit()
+    except sqlite3.Error as e:
+        logging.error(f"qotdSlice run={run.id}: {e}")
+    if run.pending == 0:
+        logging.info(f"QOTD run {run.id} done: {run.sent} sent, {run.failed} failed")
@@ -0,0 +1,197 @@
+import ast
+import itertools
+import os
+import re
+import sqlite3
+import sys
+
+from migrations import migrate
+from seed import seedDatabase
+
+# ─────────────────────────────────────────────
+#  QUERY PLAN AUDIT
+# ─────────────────────────────────────────────
+
+# Runs EXPLAIN QUERY PLAN over every statement in repos.py against a freshly
+# migrated, seeded SQLite database and exits non-zero if any of them scans a
+# whole table without being listed in EXPECTED_SCANS. Run it after adding a
+# query or changing an index:
+#
+#     python queryplan.py            # failures only
+#     python queryplan.py -v         # every plan
+#
+# Statements are read from the source, not executed, so the audit needs no
+# bot token and never touches the real database.
+
+REPOS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "repos.py")
+
+# Repo helpers whose first argument is SQL (iterRows takes conn first)
+_SQL_CALLS = {"_one", "_all", "_scalar", "_column", "_write", "_writeMany", "_insert", "_exec"}
+
+# Full scans that are the point of the query: whole-table listings, exports,
+# admin-only counts and cleanups over small tables. Keyed by (repo method,
+# table or alias as EXPLAIN reports it).
+EXPECTED_SCANS = {
+    ("AdminRepo.listAll",               "admins"):              "every admin",
+    ("AdminRepo.removable",             "admins"):              "every admin",
+    ("AdminRepo.directory",             "admins"):              "every admin; cached",
+    ("BanRepo.listAll",                 "banned_users"):        "every ban",
+    ("SubscriberRepo.activeIds",        "subscribers"):         "broadcast audience is nearly everyone",
+    ("SubscriberRepo.audienceActivity", "subscribers"):         "QOTD audience is nearly everyone",
+    ("SubscriberRepo.withBanState",     "s"):                   "sorted on a computed column",
+    ("SubscriberRepo.streamAll",        "subscribers"):         "CSV export",
+    ("SubscriberRepo.countActiveSince", "subscribers"):         "last_active is written on every update; not indexed",
+    ("SubscriberRepo.countVerified",    "subscribers"):         "stats page",
+    ("FolderRepo.choices",              "folders"):             "folder picker lists them all",
+    ("FolderRepo.withFileCounts",       "f"):                   "every folder",
+    ("FolderRepo.withOpenLinks",        "f"):                   "every folder",
+    ("FolderRepo.search",               "f"):                   "LIKE '%...%' cannot use an index",
+    ("FolderRepo.largest",              "f"):                   "ranks every folder",
+    ("FolderRepo.countOtpRequired",     "folders"):             "stats page",
+    ("MediaRepo.duplicateRefs",         "media"):               "storage report",
+    ("LinkRepo.purge",                  "links"):               "manual cleanup of revoked links",
+    ("LinkRepo.expiries",               "links"):               "loaded once at startup",
+    ("LogRepo.topFolder",               "f"):                   "ranks every folder",
+    ("PopularityRepo.all",              "folder_popularity"):   "loaded once at startup",
+    ("InboxRepo.markAllRead",           "user_messages"):       "super admin view of the whole inbox",
+    ("InboxRepo.clearMessages",         "user_messages"):       "super admin clears the whole inbox",
+    ("QuoteRepo.recent",                "quotes"):              "newest quotes; the table is small",
+    ("TrendingRepo.active",             "t"):                   "a handful of rows",
+    ("TrendingRepo.publicSnapshot",     "t"):                   "a handful of rows",
+    ("TrendingRepo.listAll",            "t"):                   "a handful of rows",
+    ("TrendingRepo.expiries",           "trending"):            "a handful of rows",
+}
+
+# Only bare table scans count: "SCAN t USING [COVERING] INDEX" walks an index
+# in order (ORDER BY ... LIMIT, a partial index, COUNT(*) over a narrow one).
+_SCAN = re.compile(r"^SCAN (\w+)$")
+
+# Big enough that ANALYZE statistics look like a real deployment, small
+# enough to build in a couple of seconds. See seed.py for the full-size set.
+AUDIT_SCALE = {
+    "subscribers": 5_000,
+    "folders":     250,
+    "logs":        50_000,
+    "messages":    1_000,
+    "otps":        2_000,
+}
+
+
+# ─────────────────────────────────────────────
+#  STATEMENT EXTRACTION
+# ─────────────────────────────────────────────
+
+def _variants(node, env: dict) -> list | None:
+    """Every string a SQL expression can evaluate to, or None if it cannot be resolved statically."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return [node.value]
+    if isinstance(node, ast.Name):
+        return env.get(node.id)
+    if isinstance(node, ast.IfExp):
+        body, orelse = _variants(node.body, env), _variants(node.orelse, env)
+        return body + orelse if body is not None and orelse is not None else None
+    if isinstance(node, ast.Call) and getattr(node.func, "id", None) == "_placeholders":
+        return ["?,?"]
+    if isinstance(node, ast.FormattedValue):
+        return _variants(node.value, env)
+    if isinstance(node, ast.JoinedStr):
+        parts = [_variants(v, env) for v in node.values]
+        if any(p is None for p in parts):
+            return None
+        return ["".join(combo) for combo in itertools.product(*parts)]
+    return None
+
+
+def _functionEnv(fn: ast.FunctionDef) -> dict:
+    """Local string variables of a repo method: sql = "..."; sql += "..."; ph = _placeholders(...)."""
+    env = {}
+    for node in ast.walk(fn):
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            values = _variants(node.value, env)
+            if values is not None:
+                env[node.targets[0].id] = values
+        elif isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name) and isinstance(node.op, ast.Add):
+            base, extra = env.get(node.target.id), _variants(node.value, env)
+            if base is not None and extra is not None:
+                env[node.target.id] = base + [b + e for b in base for e in extra]
+    return env
+
+
+def repoStatements(path: str = REPOS_PATH) -> tuple[list, list]:
+    """
+    ([(repo method, sql)], [unresolved repo methods]) for every statement in
+    repos.py. Statements built from several literals yield one entry per variant.
+    """
+    tree = ast.parse(open(path, encoding="utf-8").read())
+    found, unresolved = [], []
+    for cls in (n for n in tree.body if isinstance(n, ast.ClassDef)):
+        for fn in (n for n in cls.body if isinstance(n, ast.FunctionDef)):
+            if fn.name.startswith("_"):
+                continue
+            env  = _functionEnv(fn)
+            name = f"{cls.name}.{fn.name}"
+            for call in (n for n in ast.walk(fn) if isinstance(n, ast.Call)):
+                func = call.func
+                if isinstance(func, ast.Attribute) and func.attr in _SQL_CALLS and call.args:
+                    arg = call.args[0]
+                elif isinstance(func, ast.Name) and func.id == "iterRows" and len(call.args) > 1:
+                    arg = call.args[1]
+                else:
+                    continue
+                values = _variants(arg, env)
+                if values is None:
+                    unresolved.append(name)
+                    continue
+                found.extend((name, " ".join(sql.split())) for sql in dict.fromkeys(values))
+    return found, unresolved
+
+
+# ─────────────────────────────────────────────
+#  AUDIT
+# ─────────────────────────────────────────────
+
+def explain(conn, sql: str) -> list[str]:
+    """EXPLAIN QUERY PLAN detail lines, every parameter bound to NULL."""
+    params = [None] * sql.count("?")
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+
+def audit(conn, verbose: bool = False) -> list[str]:
+    """Problems found: unexpected scans, statements that fail to plan, unresolved SQL."""
+    statements, unresolved = repoStatements()
+    problems = [f"{name}: SQL could not be resolved from source" for name in unresolved]
+    seen = set()
+    for name, sql in statements:
+        try:
+            plan = explain(conn, sql)
+        except sqlite3.Error as e:
+            problems.append(f"{name}: {e}\n    {sql}")
+            continue
+        if verbose:
+            print(f"{name}\n    {sql}\n" + "".join(f"      {line}\n" for line in plan))
+        for line in plan:
+            m = _SCAN.match(line)
+            if not m:
+                continue
+            seen.add((name, m.group(1)))
+            if (name, m.group(1)) not in EXPECTED_SCANS:
+                problems.append(f"{name}: unexpected {line}\n    {sql}")
+    for key in EXPECTED_SCANS.keys() - seen:
+        problems.append(f"{key[0]}: expected scan of {key[1]} no longer happens — drop it from EXPECTED_SCANS")
+    return problems
+
+
+def main() -> int:
+    conn = sqlite3.connect(":memory:")
+    migrate(conn)
+    seedDatabase(conn, AUDIT_SCALE)
+    problems = audit(conn, verbose="-v" in sys.argv[1:])
+    statements, _ = repoStatements()
+    for problem in problems:
+        print(problem)
+    print(f"{len(statements)} statement(s) planned, {len(problems)} problem(s)")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
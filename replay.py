@@ -0,0 +1,195 @@
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from fakeapi import FakeBotApi
+
+# ─────────────────────────────────────────────
+#  UPDATE REPLAY
+# ─────────────────────────────────────────────
+
+# Feeds a CAPTURE_UPDATES file back through main.py's handlers against a
+# scratch database, with outbound calls answered by fakeapi.py. Timing is
+# kept: --speed 1 replays at the original pace, --speed 20 twenty times
+# faster, --speed 0 one update after another as fast as possible. Reports
+# latency and SQL statements per handler.
+#
+#     python replay.py storm.jsonl --speed 10
+#     python replay.py storm.jsonl --snapshot /backups/bot.db --json after.json
+#
+# The scratch database is a copy of --snapshot, or a small seed.py dataset.
+# The original is never written to.
+
+SUPER_ALIAS = 1   # capture.SUPER_ALIAS; config.py cannot be imported before the env is set
+
+REPLAY_SCALE = {
+    "subscribers": 5_000,
+    "folders":     200,
+    "logs":        50_000,
+    "messages":    500,
+    "otps":        500,
+}
+
+
+def _scratchDatabase(snapshot: str | None, workDir: str) -> str:
+    path = os.path.join(workDir, "replay.db")
+    if snapshot:
+        src = sqlite3.connect(f"file:{snapshot}?mode=ro", uri=True)
+        dst = sqlite3.connect(path)
+        src.backup(dst)
+        src.close()
+        dst.close()
+        return path
+    from migrations import migrate
+    from seed import seedDatabase
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    seedDatabase(conn, REPLAY_SCALE)
+    conn.close()
+    return path
+
+
+def _load(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _senderId(update: dict):
+    for key in ("message", "edited_message", "callback_query"):
+        if key in update:
+            return update[key].get("from", {}).get("id")
+    return None
+
+
+def _handlerName(app, update) -> str:
+    """Callback of the first handler main.py would pick, ignoring group -1 (capture)."""
+    for group in sorted(g for g in app.handlers if g >= 0):
+        for handler in app.handlers[group]:
+            check = handler.check_update(update)
+            if check is not None and check is not False:
+                return handler.callback.__name__
+    return "(unhandled)"
+
+
+def _pct(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def summarise(samples: dict) -> dict:
+    """{handler: {n, p50, p95, max, sql, sql_ms}} — times in ms, SQL per update."""
+    return {
+        name: {
+            "n":      len(rows),
+            "p50":    round(_pct([r[0] for r in rows], 50) * 1000, 2),
+            "p95":    round(_pct([r[0] for r in rows], 95) * 1000, 2),
+            "max":    round(max(r[0] for r in rows) * 1000, 2),
+            "sql":    round(statistics.mean(r[1] for r in rows), 1),
+            "sql_ms": round(statistics.mean(r[2] for r in rows) * 1000, 2),
+        }
+        for name, rows in sorted(samples.items(), key=lambda kv: -sum(r[0] for r in kv[1]))
+    }
+
+
+async def replay(records: list, dbPath: str, speed: float, apiLatency: float, port: int) -> tuple[dict, float]:
+    api = FakeBotApi(latency=apiLatency, chatRate=1e6, chatBurst=1e6, globalRate=1e6)
+    url = await api.start(port=port)
+
+    os.environ.update({
+        "DB_PATH":            dbPath,
+        "DATABASE_URL":       "",
+        "TELEGRAM_BOT_TOKEN": "123456:REPLAY",
+        "TELEGRAM_API_URL":   url,
+        "ADMIN_ID":           str(SUPER_ALIAS),
+        "CAPTURE_UPDATES":    "",
+    })
+    from telegram import Update  # type: ignore
+    from config import conn
+    from main import buildApplication
+    from repos import adminRepo, countingQueries
+
+    # Captured admins must be admins here too, or their updates take the user path
+    for aliasId in {_senderId(r["update"]) for r in records if r.get("role") == "admin"} - {None}:
+        adminRepo.add(aliasId, None, SUPER_ALIAS)
+    conn.commit()
+
+    app = buildApplication(jobs=False)
+    await app.initialize()
+    await app.start()
+
+    samples = {}
+
+    async def one(record):
+        update = Update.de_json(record["update"], app.bot)
+        name   = _handlerName(app, update)
+        with countingQueries() as queries:
+            started = time.perf_counter()
+            await app.process_update(update)
+            elapsed = time.perf_counter() - started
+        samples.setdefault(name, []).append((elapsed, queries[0], queries[1]))
+
+    t0      = records[0]["t"] if records else 0
+    started = time.monotonic()
+    try:
+        if speed <= 0:
+            for record in records:
+                await one(record)
+        else:
+            tasks = []
+            for record in records:
+                delay = (record["t"] - t0) / speed - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(one(record)))
+            await asyncio.gather(*tasks)
+    finally:
+        elapsed = time.monotonic() - started
+        await app.stop()
+        await app.shutdown()
+        await api.stop()
+    return samples, elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay captured updates through the handlers.")
+    parser.add_argument("capture", help="JSONL file written with CAPTURE_UPDATES")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = original pace, 0 = back to back")
+    parser.add_argument("--snapshot", help="SQLite database to copy as the starting state")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="seconds per Bot API call")
+    parser.add_argument("--port", type=int, default=8082, help="port for the fake Bot API")
+    parser.add_argument("--json", help="also write the per-handler report here")
+    args = parser.parse_args()
+
+    records = _load(args.capture)
+    if not records:
+        parser.error(f"{args.capture} has no updates")
+
+    workDir = tempfile.mkdtemp(prefix="replay-")
+    try:
+        dbPath           = _scratchDatabase(args.snapshot, workDir)
+        samples, elapsed = asyncio.run(replay(records, dbPath, args.speed, args.api_latency, args.port))
+    finally:
+        shutil.rmtree(workDir, ignore_errors=True)
+
+    report = summarise(samples)
+    print(f"\n{len(records)} updates replayed in {elapsed:.1f} s at speed {args.speed:g}\n")
+    print(f"{'handler':<32} {'n':>6} {'p50':>8} {'p95':>8} {'max':>8} {'sql/upd':>8} {'sql ms':>8}")
+    for name, r in report.items():
+        print(f"{name:<32} {r['n']:>6} {r['p50']:>8.1f} {r['p95']:>8.1f} {r['max']:>8.1f} "
+              f"{r['sql']:>8.1f} {r['sql_ms']:>8.2f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"updates": len(records), "speed": args.speed, "elapsed": round(elapsed, 3),
+                       "handlers": report}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
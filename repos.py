@@ -0,0 +1,1402 @@
+import contextlib
+import contextvars
+import logging
+import sys
+import time
+from datetime import datetime, timedelta
+
+from config import conn, cursor
+from db import iterRows
+
+# ─────────────────────────────────────────────
+#  REPOSITORIES
+# ─────────────────────────────────────────────
+
+# Every SQL statement the handlers run lives here, grouped by table. Handlers
+# call repo methods and keep ownership of the transaction: write methods do
+# not commit, so a handler can make several changes and conn.commit() once.
+# Write methods return cursor.rowcount (or the new row id for creates).
+
+# Cached lookups are reused for this long. Short enough that a change made by
+# another worker on a shared PostgreSQL database shows up quickly.
+CACHE_TTL = 60
+
+# Statements slower than this are logged with the repo method that ran them.
+SLOW_QUERY_SECONDS = 0.25
+
+_stats = {}
+
+# [statements, seconds] for the current asyncio task while countingQueries() is active
+_taskQueries = contextvars.ContextVar("taskQueries", default=None)
+
+
+def queryStats() -> list:
+    """(repo method, calls, total seconds, slowest seconds), busiest first."""
+    return sorted(
+        ((name, *s) for name, s in _stats.items()),
+        key=lambda row: row[2], reverse=True,
+    )
+
+
+@contextlib.contextmanager
+def countingQueries():
+    """
+    Count the statements run inside the block, and their total time. The
+    counter follows the asyncio task, so concurrent handlers are kept apart.
+    """
+    counter = [0, 0.0]
+    token   = _taskQueries.set(counter)
+    try:
+        yield counter
+    finally:
+        _taskQueries.reset(token)
+
+
+class Repo:
+    """Query helpers shared by every repository: timing plus a small TTL cache."""
+
+    def __init__(self):
+        self._cache = {}
+
+    # ── Execution ────────────────────────────────────────────────────────
+
+    def _exec(self, sql: str, params=(), many: bool = False):
+        started = time.perf_counter()
+        try:
+            if many:
+                return cursor.executemany(sql, params)
+            return cursor.execute(sql, params)
+        finally:
+            elapsed = time.perf_counter() - started
+            name    = f"{type(self).__name__}.{self._caller()}"
+            stat    = _stats.setdefault(name, [0, 0.0, 0.0])
+            stat[0] += 1
+            stat[1] += elapsed
+            stat[2]  = max(stat[2], elapsed)
+            counter = _taskQueries.get()
+            if counter is not None:
+                counter[0] += 1
+                counter[1] += elapsed
+            if elapsed > SLOW_QUERY_SECONDS:
+                logging.warning(f"Slow query {name}: {elapsed * 1000:.0f} ms")
+
+    @staticmethod
+    def _caller() -> str:
+        """Name of the public repo method behind the current query."""
+        frame = sys._getframe(3)
+        while frame.f_back and frame.f_code.co_name.startswith(("_", "<")):
+            frame = frame.f_back
+        return frame.f_code.co_name
+
+    def _one(self, sql: str, params=()):
+        return self._exec(sql, params).fetchone()
+
+    def _all(self, sql: str, params=()) -> list:
+        return self._exec(sql, params).fetchall()
+
+    def _scalar(self, sql: str, params=(), default=None):
+        row = self._exec(sql, params).fetchone()
+        return row[0] if row and row[0] is not None else default
+
+    def _column(self, sql: str, params=()) -> list:
+        return [row[0] for row in self._exec(sql, params).fetchall()]
+
+    def _write(self, sql: str, params=()) -> int:
+        return self._exec(sql, params).rowcount
+
+    def _writeMany(self, sql: str, seq) -> None:
+        self._exec(sql, seq, many=True)
+
+    def _insert(self, sql: str, params=()) -> int:
+        return self._exec(sql, params).lastrowid
+
+    # ── Caching hooks ────────────────────────────────────────────────────
+
+    def _cached(self, key, loader):
+        hit = self._cache.get(key)
+        now = time.monotonic()
+        if hit and now - hit[1] < CACHE_TTL:
+            return hit[0]
+        value = loader()
+        if value is not None:
+            self._cache[key] = (value, now)
+        return value
+
+    def invalidate(self, key=None) -> None:
+        """Drop one cached entry, or all of this repo's cache when key is None."""
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
+
+
+def _placeholders(values) -> str:
+    return ",".join("?" * len(values))
+
+
+# ─────────────────────────────────────────────
+#  ADMINS / BANS / SUBSCRIBERS
+# ─────────────────────────────────────────────
+
+class AdminRepo(Repo):
+
+    def exists(self, userId: int) -> bool:
+        return self._one("SELECT 1 FROM admins WHERE user_id=?", (userId,)) is not None
+
+    def isSuper(self, userId: int) -> bool:
+        return bool(self._scalar("SELECT is_super_admin FROM admins WHERE user_id=?", (userId,)))
+
+    def get(self, userId: int):
+        """(user_id, username, added_at, is_super_admin) or None."""
+        return self._one(
+            "SELECT user_id, username, added_at, is_super_admin FROM admins WHERE user_id=?", (userId,)
+        )
+
+    def listAll(self) -> list:
+        """(user_id, username, added_at, is_super_admin), super admins first."""
+        return self._all(
+            "SELECT user_id, username, added_at, is_super_admin FROM admins "
+            "ORDER BY is_super_admin DESC, added_at ASC"
+        )
+
+    def removable(self, ownerId: int) -> list:
+        """(user_id, username) of every regular admin."""
+        return self._all(
+            "SELECT user_id, username FROM admins WHERE user_id != ? AND is_super_admin = 0", (ownerId,)
+        )
+
+    def directory(self) -> dict:
+        """{user_id: username} of every admin. Cached; add() and remove() drop it."""
+        return self._cached("directory", lambda: dict(self._all("SELECT user_id, username FROM admins")))
+
+    def displayName(self, userId: int) -> str:
+        """Username, or "Admin <id>" for admins without one."""
+        return self.directory().get(userId) or f"Admin {userId}"
+
+    def count(self) -> int:
+        return self._scalar("SELECT COUNT(*) FROM admins", default=0)
+
+    def add(self, userId: int, username, addedBy: int) -> int:
+        self.invalidate()
+        return self._write("""
+            INSERT INTO admins (user_id, username, added_by, added_at, is_super_admin)
+            VALUES (?, ?, ?, ?, 0)
+        """, (userId, username, addedBy, datetime.now().isoformat()))
+
+    def remove(self, userId: int) -> int:
+        """Demote a regular admin. Super admins are never removed."""
+        self.invalidate()
+        return self._write("DELETE FROM admins WHERE user_id=? AND is_super_admin=0", (userId,))
+
+
+class BanRepo(Repo):
+    """banned_users plus the mirrored subscribers.banned flag."""
+
+    def isBanned(self, userId: int) -> bool:
+        if self._one("SELECT 1 FROM banned_users WHERE user_id=?", (userId,)) is not None:
+            return True
+        return bool(self._scalar("SELECT banned FROM subscribers WHERE user_id=?", (userId,)))
+
+    def get(self, userId: int):
+        """(user_id, username, reason, banned_at) or None."""
+        return self._one(
+            "SELECT user_id, username, reason, banned_at FROM banned_users WHERE user_id=?", (userId,)
+        )
+
+    def listAll(self) -> list:
+        return self._all(
+            "SELECT user_id, username, reason, banned_at FROM banned_users ORDER BY banned_at DESC"
+        )
+
+    def count(self) -> int:
+        return self._scalar("SELECT COUNT(*) FROM banned_users", default=0)
+
+    def ban(self, userId: int, username, reason: str, bannedBy: int) -> None:
+        self._write("""
+            INSERT OR REPLACE INTO banned_users (user_id, username, reason, banned_at, banned_by)
+            VALUES (?, ?, ?, ?, ?)
+        """, (userId, username, reason, datetime.now().isoformat(), bannedBy))
+        self._write("UPDATE subscribers SET banned=1, ban_reason=? WHERE user_id=?", (reason, userId))
+
+    def unban(self, userId: int) -> None:
+        self._write("DELETE FROM banned_users WHERE user_id=?", (userId,))
+        self._write("UPDATE subscribers SET banned=0, ban_reason=NULL WHERE user_id=?", (userId,))
+
+
+class SubscriberRepo(Repo):
+
+    def track(self, user) -> None:
+        now = datetime.now().isoformat()
+        self._write("""
+            INSERT OR IGNORE INTO subscribers
+                (user_id, username, first_name, subscribed_at, last_active)
+            VALUES (?, ?, ?, ?, ?)
+        """, (user.id, user.username, user.first_name, now, now))
+        self._write("""
+            UPDATE subscribers
+               SET username = ?, first_name = ?, last_active = ?, unreachable_at = NULL
+             WHERE user_id = ?
+        """, (user.username, user.first_name, now, user.id))
+
+    def get(self, userId: int):
+        """Full profile row for the subscriber detail view."""
+        return self._one(
+            "SELECT user_id, username, first_name, subscribed_at, last_active, banned, phone_verified, phone_number "
+            "FROM subscribers WHERE user_id=?",
+            (userId,)
+        )
+
+    def name(self, userId: int):
+        """(username, first_name) or None."""
+        return self._one("SELECT username, first_name FROM subscribers WHERE user_id=?", (userId,))
+
+    def activity(self, userId: int):
+        """(subscribed_at, last_active) or None."""
+        return self._one("SELECT subscribed_at, last_active FROM subscribers WHERE user_id=?", (userId,))
+
+    def isVerified(self, userId: int) -> bool:
+        return bool(self._scalar("SELECT phone_verified FROM subscribers WHERE user_id=?", (userId,)))
+
+    def activeIds(self) -> list:
+        """Every subscriber that is not banned and has not blocked the bot — the audience for broadcasts."""
+        return self._column(
+            "SELECT user_id FROM subscribers WHERE (banned=0 OR banned IS NULL) AND unreachable_at IS NULL"
+        )
+
+    def audienceActivity(self) -> list:
+        """(user_id, last_active) for the activeIds() audience, for segmenting by activity."""
+        return self._all(
+            "SELECT user_id, last_active FROM subscribers "
+            "WHERE (banned=0 OR banned IS NULL) AND unreachable_at IS NULL"
+        )
+
+    def markUnreachable(self, userIds) -> None:
+        """Leave these users out of activeIds() until they next send the bot an update."""
+        now = datetime.now().isoformat()
+        self._writeMany("UPDATE subscribers SET unreachable_at=? WHERE user_id=?", ((now, uid) for uid in userIds))
+
+    def recent(self, limit: int = 20) -> list:
+        return self._all(
+            "SELECT user_id, username, first_name, banned FROM subscribers ORDER BY subscribed_at DESC LIMIT ?",
+            (limit,)
+        )
+
+    def byVerified(self, verified: bool) -> list:
+        return self._all(
+            "SELECT user_id, username, first_name FROM subscribers WHERE phone_verified=? ORDER BY subscribed_at DESC",
+            (1 if verified else 0,)
+        )
+
+    def withBanState(self, limit: int = 30) -> list:
+        """(user_id, username, first_name, is_banned), banned users first."""
+        return self._all("""
+            SELECT s.user_id, s.username, s.first_name,
+                   CASE WHEN b.user_id IS NOT NULL THEN 1 ELSE 0 END as is_banned
+            FROM subscribers s
+            LEFT JOIN banned_users b ON s.user_id = b.user_id
+            ORDER BY is_banned DESC, s.subscribed_at DESC
+            LIMIT ?
+        """, (limit,))
+
+    def streamAll(self):
+        """Every subscriber for CSV export, streamed rather than fetched at once."""
+        return iterRows(
+            conn, "SELECT user_id, username, first_name, subscribed_at, last_active, banned FROM subscribers"
+        )
+
+    def count(self) -> int:
+        return self._scalar("SELECT COUNT(*) FROM subscribers", default=0)
+
+    def countJoinedSince(self, modifier: str) -> int:
+        return self._scalar(
+            "SELECT COUNT(*) FROM subscribers WHERE datetime(subscribed_at) > datetime('now', ?)", (modifier,), 0
+        )
+
+    def countActiveSince(self, modifier: str) -> int:
+        return self._scalar(
+            "SELECT COUNT(*) FROM subscribers WHERE datetime(last_active) > datetime('now', ?)", (modifier,), 0
+        )
+
+    def countBanned(self) -> int:
+        return self._scalar("SELECT COUNT(*) FROM subscribers WHERE banned=1", default=0)
+
+    def countVerified(self) -> int:
+        return self._scalar("SELECT COUNT(*) FROM subscribers WHERE phone_verified=1", default=0)
+
+    def setPhone(self, userId: int, phone: str) -> int:
+        return self._write(
+            "UPDATE subscribers SET phone_verified=1, phone_number=? WHERE user_id=?", (phone, userId)
+        )
+
+    def clearPhone(self, userId: int) -> int:
+        return self._write(
+            "UPDATE subscribers SET phone_verified=0, phone_number=NULL WHERE user_id=?", (userId,)
+        )
+
+
+# ─────────────────────────────────────────────
+#  FOLDERS / FILES / MEDIA
+# ─────────────────────────────────────────────
+
+class FolderRepo(Repo):
+
+    def name(self, folderId: int):
+        """Folder name, or None if it no longer exists."""
+        return self._cached(
+            ("name", folderId),
+            lambda: self._scalar("SELECT name FROM folders WHERE id=?", (folderId,)),
+        )
+
+    def names(self, folderIds) -> dict:
+        """Batch name lookup: {id: name}."""
+        ids = sorted(set(folderIds))
+        if not ids:
+            return {}
+        return dict(self._all(f"SELECT id, name FROM folders WHERE id IN ({_placeholders(ids)})", ids))
+
+    def publicNames(self, folderIds) -> dict:
+        """Like names(), leaving out secret folders."""
+        ids = sorted(set(folderIds))
+        if not ids:
+            return {}
+        return dict(self._all(
+            f"SELECT id, name FROM folders WHERE is_secret=0 AND id IN ({_placeholders(ids)})", ids
+        ))
+
+    def idByName(self, name: str, ignoreCase: bool = False):
+        if ignoreCase:
+            return self._scalar("SELECT id FROM folders WHERE LOWER(name)=LOWER(?)", (name,))
+        return self._scalar("SELECT id FROM folders WHERE name=?", (name,))
+
+    def menuInfo(self, folderId: int):
+        """(name, password, pinned, note, otp_required, otp_expiry_minutes) or None."""
+        return self._one(
+            "SELECT name, password, pinned, note, otp_required, otp_expiry_minutes FROM folders WHERE id=?",
+            (folderId,)
+        )
+
+    def accessInfo(self, folderId: int):
+        """(password, otp_required, name) or None."""
+        return self._one("SELECT password, otp_required, name FROM folders WHERE id=?", (folderId,))
+
+    def deliveryInfo(self, folderId: int):
+        """(forwardable, auto_delete_minutes, name) or None."""
+        return self._one(
+            "SELECT forwardable, auto_delete_minutes, name FROM folders WHERE id=?", (folderId,)
+        )
+
+    def otpInfo(self, folderId: int, requiredOnly: bool = False):
+        """(name, otp_expiry_minutes) or None; requiredOnly skips folders without OTP."""
+        sql = "SELECT name, otp_expiry_minutes FROM folders WHERE id=?"
+        if requiredOnly:
+            sql += " AND otp_required=1"
+        return self._one(sql, (folderId,))
+
+    def otpSettings(self, folderId: int):
+        """(otp_required, otp_expiry_minutes) or None."""
+        return self._one("SELECT otp_required, otp_expiry_minutes FROM folders WHERE id=?", (folderId,))
+
+    def password(self, folderId: int):
+        return self._scalar("SELECT password FROM folders WHERE id=?", (folderId,))
+
+    def pinned(self, folderId: int):
+        """Current pinned flag, or None if the folder is gone."""
+        row = self._one("SELECT pinned FROM folders WHERE id=?", (folderId,))
+        return row[0] if row else None
+
+    def bySecretCode(self, code: str):
+        return self._scalar("SELECT id FROM folders WHERE is_secret=1 AND secret_code=?", (code,))
+
+    # ── Listings ─────────────────────────────────────────────────────────
+
+    def choices(self, order: str = "recent", publicOnly: bool = False) -> list:
+        """(id, name) for pickers: pinned and newest first, or by name."""
+        where   = " WHERE is_secret=0" if publicOnly else ""
+        orderBy = "name" if order == "name" else "pinned DESC, created_at DESC"
+        return self._all(f"SELECT id, name FROM folders{where} ORDER BY {orderBy}")
+
+    def secrets(self) -> list:
+        """(id, name, secret_code) of every secret folder."""
+        return self._all("SELECT id, name, secret_code FROM folders WHERE is_secret=1")
+
+    def withFileCounts(self) -> list:
+        """(id, name, created_at, file count, pinned), pinned and newest first."""
+        return self._all("""
+            SELECT f.id, f.name, f.created_at, COUNT(fi.id), f.pinned
+            FROM folders f
+            LEFT JOIN files fi ON f.id = fi.folder_id
+            GROUP BY f.id
+            ORDER BY f.pinned DESC, f.created_at DESC
+        """)
+
+    def withOpenLinks(self) -> list:
+        """(id, name, unrevoked link count) for folders that have any."""
+        return self._all("""
+            SELECT f.id, f.name, COUNT(l.id)
+            FROM folders f
+            LEFT JOIN links l ON f.id = l.folder_id AND l.revoked = 0
+            GROUP BY f.id
+            HAVING COUNT(l.id) > 0
+        """)
+
+    def search(self, keyword: str) -> list:
+        """(id, name, file count, created_at, active link count) matching keyword."""
+        return self._all("""
+            SELECT f.id, f.name, COUNT(fi.id), f.created_at,
+                   (SELECT COUNT(*) FROM links WHERE folder_id=f.id
+                    AND revoked=0 AND datetime(expiry) > datetime('now')) as active_links
+            FROM folders f
+            LEFT JOIN files fi ON f.id = fi.folder_id
+            WHERE f.name LIKE ?
+            GROUP BY f.id ORDER BY f.created_at DESC
+        """, (f"%{keyword}%",))
+
+    def largest(self, limit: int = 20) -> list:
+        """(name, file count, bytes), biggest first."""
+        return self._all("""
+            SELECT f.name, COUNT(fi.id), COALESCE(SUM(fi.file_size), 0)
+            FROM folders f
+            LEFT JOIN files fi ON f.id = fi.folder_id
+            GROUP BY f.id ORDER BY SUM(fi.file_size) DESC LIMIT ?
+        """, (limit,))
+
+    def count(self) -> int:
+        return self._scalar("SELECT COUNT(*) FROM folders", default=0)
+
+    def countOtpRequired(self) -> int:
+        return self._scalar("SELECT COUNT(*) FROM folders WHERE otp_required=1", default=0)
+
+    # ── Writes ───────────────────────────────────────────────────────────
+
+    def create(self, name: str) -> int:
+        return self._insert(
+            "INSERT INTO folders (name, created_at) VALUES (?, ?)", (name, datetime.now().isoformat())
+        )
+
+    def setPinned(self, folderId: int, pinned: int) -> int:
+        return self._write("UPDATE folders SET pinned=? WHERE id=?", (pinned, folderId))
+
+    def setPassword(self, folderId: int, password) -> int:
+        return self._write("UPDATE folders SET password=? WHERE id=?", (password, folderId))
+
+    def setNote(self, folderId: int, note) -> int:
+        return self._write("UPDATE folders SET note=? WHERE id=?", (note, folderId))
+
+    def setOtp(self, folderId: int, minutes) -> int:
+        """Require an OTP valid for minutes, or turn OTP off when minutes is None."""
+        if minutes is None:
+            return self._write(
+                "UPDATE folders SET otp_required=0, otp_expiry_minutes=NULL WHERE id=?", (folderId,)
+            )
+        return self._write(
+            "UPDATE folders SET otp_required=1, otp_expiry_minutes=? WHERE id=?", (minutes, folderId)
+        )
+
+    def setSecret(self, folderId: int, code) -> int:
+        """Mark a folder secret behind code, or make it public again when code is None."""
+        trendingRepo.invalidate("public")
+        if code is None:
+            return self._write("UPDATE folders SET is_secret=0, secret_code=NULL WHERE id=?", (folderId,))
+        return self._write("UPDATE folders SET is_secret=1, secret_code=? WHERE id=?", (code, folderId))
+
+    def setDelivery(self, folderId: int, forwardable: int, autoDelete) -> int:
+        return self._write(
+            "UPDATE folders SET forwardable=?, auto_delete_minutes=? WHERE id=?",
+            (forwardable, autoDelete if autoDelete else None, folderId)
+        )
+
+    def delete(self, folderId: int) -> int:
+        """Delete a folder with its files, links and access logs."""
+        self.invalidate(("name", folderId))
+        trendingRepo.invalidate("public")
+        self._write("DELETE FROM files   WHERE folder_id=?", (folderId,))
+        self._write("DELETE FROM links   WHERE folder_id=?", (folderId,))
+        self._write("DELETE FROM logs    WHERE folder_id=?", (folderId,))
+        self._write("DELETE FROM folder_popularity WHERE folder_id=?", (folderId,))
+        return self._write("DELETE FROM folders WHERE id=?", (folderId,))
+
+
+class FileRepo(Repo):
+
+    def items(self, folderId: int) -> list:
+        """(file_id, file_type, text_content, storage_msg_id) — the shape storage.sendItems takes."""
+        return self._all(
+            "SELECT file_id, file_type, text_content, storage_msg_id FROM files WHERE folder_id=? ORDER BY id",
+            (folderId,)
+        )
+
+    def listing(self, folderId: int) -> list:
+        """(id, file_type, text_content, uploaded_at), newest first."""
+        return self._all(
+            "SELECT id, file_type, text_content, uploaded_at FROM files "
+            "WHERE folder_id=? ORDER BY uploaded_at DESC",
+            (folderId,)
+        )
+
+    def count(self, folderId: int = None) -> int:
+        if folderId is None:
+            return self._scalar("SELECT COUNT(*) FROM files", default=0)
+        return self._scalar("SELECT COUNT(*) FROM files WHERE folder_id=?", (folderId,), 0)
+
+    def totalSize(self, folderId: int) -> int:
+        return self._scalar("SELECT SUM(file_size) FROM files WHERE folder_id=?", (folderId,), 0)
+
+    def addMany(self, folderId: int, rows: list) -> None:
+        """rows: (file_id, file_type, file_size, uploaded_at, text_content, storage_msg_id, file_unique_id)."""
+        self._writeMany(
+            "INSERT INTO files "
+            "(folder_id, file_id, file_type, file_size, uploaded_at, text_content, storage_msg_id, file_unique_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(folderId, *row) for row in rows],
+        )
+
+    def delete(self, fileIds: list) -> int:
+        if not fileIds:
+            return 0
+        return self._write(f"DELETE FROM files WHERE id IN ({_placeholders(fileIds)})", list(fileIds))
+
+    def deleteAll(self, folderId: int) -> int:
+        return self._write("DELETE FROM files WHERE folder_id=?", (folderId,))
+
+
+class MediaRepo(Repo):
+    """
+    One row per distinct Telegram file (keyed by file_unique_id, which is
+    stable across re-uploads and bots). The per-feature tables reference it
+    and triggers from migrations.py keep media.ref_count in step with them.
+    """
+
+    def register(self, items: list) -> None:
+        """
+        Make sure every described item has a media row. Call it inside the
+        same transaction as the rows that reference the media.
+        """
+        items = [m for m in items if m]
+        if not items:
+            return
+        now = datetime.now().isoformat()
+        self._writeMany("""
+            INSERT OR IGNORE INTO media
+                (file_unique_id, file_id, file_type, file_size, mime_type, duration, first_seen)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (m["file_unique_id"], m["file_id"], m["file_type"], m["file_size"], m["mime_type"], m["duration"], now)
+            for m in items
+        ])
+
+    def idsInFolder(self, folderId: int) -> set:
+        return set(self._column(
+            "SELECT file_unique_id FROM files WHERE folder_id=? AND file_unique_id IS NOT NULL", (folderId,)
+        ))
+
+    def storageTotals(self) -> tuple[int, int]:
+        """
+        (distinct items, bytes) held in folders. Registered media is counted
+        once however many folders hold it; text and legacy rows without a
+        file_unique_id are added as stored.
+        """
+        mediaCount, mediaSize = self._one("""
+            SELECT COUNT(*), COALESCE(SUM(file_size), 0) FROM media
+            WHERE ref_count > 0 AND file_unique_id IN (SELECT file_unique_id FROM files)
+        """)
+        otherCount, otherSize = self._one(
+            "SELECT COUNT(*), COALESCE(SUM(file_size), 0) FROM files WHERE file_unique_id IS NULL"
+        )
+        return mediaCount + otherCount, mediaSize + otherSize
+
+    def duplicateRefs(self) -> int:
+        """References beyond the first, across every table that points at media."""
+        return self._scalar("SELECT COALESCE(SUM(ref_count - 1), 0) FROM media WHERE ref_count > 1", default=0)
+
+
+# ─────────────────────────────────────────────
+#  LINKS / ACCESS LOGS
+# ─────────────────────────────────────────────
+
+class LinkRepo(Repo):
+
+    def create(self, folderId: int, token: str, expiry: str, singleUse: int) -> int:
+        trendingRepo.invalidate("public")
+        return self._insert(
+            "INSERT INTO links (folder_id, token, expiry, created_at, single_use) VALUES (?, ?, ?, ?, ?)",
+            (folderId, token, expiry, datetime.now().isoformat(), singleUse)
+        )
+
+    def byToken(self, token: str):
+        """(folder_id, expiry, revoked, single_use, used_by) or None."""
+        return self._one(
+            "SELECT folder_id, expiry, revoked, single_use, used_by FROM links WHERE token=?", (token,)
+        )
+
+    def useInfo(self, token: str):
+        """(id, single_use) or None."""
+        return self._one("SELECT id, single_use FROM links WHERE token=?", (token,))
+
+    def details(self, token: str):
+        """Everything /linkinfo shows, joined with the folder name."""
+        return self._one("""
+            SELECT l.id, l.folder_id, f.name, l.expiry, l.revoked, l.single_use,
+                   l.used_by, l.used_at, l.created_at, l.access_count
+            FROM links l JOIN folders f ON l.folder_id = f.id
+            WHERE l.token=?
+        """, (token,))
+
+    def latestActiveToken(self, folderId: int):
+        return self._scalar("""
+            SELECT token FROM links
+            WHERE folder_id=? AND revoked=0 AND datetime(expiry) > datetime('now')
+            ORDER BY created_at DESC LIMIT 1
+        """, (folderId,))
+
+    def folderStats(self, folderId: int, limit: int = 10) -> list:
+        """Per-link access stats for one folder, newest first."""
+        return self._all("""
+            SELECT l.id, l.token, l.created_at, l.expiry, l.revoked, l.single_use,
+                   l.access_count,
+                   COUNT(DISTINCT la.user_id) as unique_users,
+                   MAX(la.accessed_at) as last_access
+            FROM links l
+            LEFT JOIN link_access_log la ON l.id = la.link_id
+            WHERE l.folder_id=?
+            GROUP BY l.id
+            ORDER BY l.created_at DESC
+            LIMIT ?
+        """, (folderId, limit))
+
+    def uniqueUsers(self, linkId: int) -> int:
+        return self._scalar(
+            "SELECT COUNT(DISTINCT user_id) FROM link_access_log WHERE link_id=?", (linkId,), 0
+        )
+
+    def countOpen(self, folderId: int) -> int:
+        return self._scalar("SELECT COUNT(*) FROM links WHERE folder_id=? AND revoked=0", (folderId,), 0)
+
+    def countActive(self) -> int:
+        return self._scalar(
+            "SELECT COUNT(*) FROM links WHERE revoked=0 AND datetime(expiry) > datetime('now')", default=0
+        )
+
+    def countExpired(self) -> int:
+        return self._scalar(
+            "SELECT COUNT(*) FROM links WHERE revoked=0 AND datetime(expiry) <= datetime('now')", default=0
+        )
+
+    def countRevoked(self) -> int:
+        return self._scalar("SELECT COUNT(*) FROM links WHERE revoked=1", default=0)
+
+    # ── Writes ───────────────────────────────────────────────────────────
+
+    def consume(self, token: str, userId: int, usedAt: str) -> int:
+        """Burn a single-use link. Returns 0 if someone else got there first."""
+        trendingRepo.invalidate("public")
+        return self._write(
+            "UPDATE links SET revoked=1, used_by=?, used_at=? WHERE token=? AND revoked=0",
+            (userId, usedAt, token)
+        )
+
+    def recordAccess(self, token: str, linkId, folderId: int, user, accessedAt: str) -> None:
+        self._write("UPDATE links SET access_count = access_count + 1 WHERE token=?", (token,))
+        if linkId:
+            self._write(
+                "INSERT INTO link_access_log (link_id, folder_id, user_id, username, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (linkId, folderId, user.id, user.username, accessedAt)
+            )
+
+    def revokeFolder(self, folderId: int) -> int:
+        trendingRepo.invalidate("public")
+        return self._write("UPDATE links SET revoked=1 WHERE folder_id=? AND revoked=0", (folderId,))
+
+    def purge(self) -> tuple[int, int]:
+        """Delete expired and revoked links. Returns (expired, revoked) removed."""
+        trendingRepo.invalidate("public")
+        expired = self._write("DELETE FROM links WHERE datetime(expiry) <= datetime('now') AND revoked=0")
+        revoked = self._write("DELETE FROM links WHERE revoked=1")
+        return expired, revoked
+
+    def expiries(self) -> list:
+        """(id, expiry) of every link that has not been revoked."""
+        return self._all("SELECT id, expiry FROM links WHERE revoked=0")
+
+    def deleteIds(self, linkIds: list) -> int:
+        trendingRepo.invalidate("public")
+        return self._write(f"DELETE FROM links WHERE id IN ({_placeholders(linkIds)})", linkIds)
+
+
+class LogRepo(Repo):
+    """Folder access log (logs table)."""
+
+    def add(self, user, folderId: int, accessedAt: str) -> int:
+        return self._write(
+            "INSERT INTO logs (user_id, username, folder_id, accessed_at) VALUES (?, ?, ?, ?)",
+            (user.id, user.username, folderId, accessedAt),
+        )
+
+    def count(self) -> int:
+        return self._scalar("SELECT COUNT(*) FROM logs", default=0)
+
+    def countSince(self, modifier: str) -> int:
+        return self._scalar(
+            "SELECT COUNT(*) FROM logs WHERE datetime(accessed_at) > datetime('now', ?)", (modifier,), 0
+        )
+
+    def countForUser(self, userId: int) -> int:
+        return self._scalar("SELECT COUNT(*) FROM logs WHERE user_id=?", (userId,), 0)
+
+    def recent(self, limit: int = 15) -> list:
+        """(username, user_id, folder name, accessed_at), newest first."""
+        return self._all("""
+            SELECT l.username, l.user_id, f.name, l.accessed_at
+            FROM logs l JOIN folders f ON l.folder_id = f.id
+            ORDER BY l.accessed_at DESC LIMIT ?
+        """, (limit,))
+
+    def streamRecent(self, limit: int = 1000):
+        """Latest access rows for CSV export."""
+        return iterRows(
+            conn,
+            "SELECT user_id, username, folder_id, accessed_at FROM logs ORDER BY accessed_at DESC LIMIT ?",
+            (limit,)
+        )
+
+    def topFolder(self, since: str = None):
+        """(name, views) of the most viewed folder, optionally within a datetime modifier window."""
+        if since is None:
+            return self._one("""
+                SELECT f.name, COUNT(l.id) as cnt FROM folders f
+                JOIN logs l ON f.id = l.folder_id
+                GROUP BY f.id ORDER BY cnt DESC LIMIT 1
+            """)
+        return self._one("""
+            SELECT f.name, COUNT(l.id) as cnt FROM folders f
+            JOIN logs l ON f.id = l.folder_id
+            WHERE datetime(l.accessed_at) > datetime('now', ?)
+            GROUP BY f.id ORDER BY cnt DESC LIMIT 1
+        """, (since,))
+
+    def accessesSince(self, since: str) -> list:
+        """(folder_id, accessed_at) of every view after an ISO timestamp."""
+        return self._all("SELECT folder_id, accessed_at FROM logs WHERE accessed_at > ?", (since,))
+
+
+class PopularityRepo(Repo):
+    """folder_popularity: one decayed score per folder, see popularity.py."""
+
+    def all(self) -> list:
+        return self._all("SELECT folder_id, log_score FROM folder_popularity")
+
+    def add(self, folderId: int, logScore: float) -> float:
+        """
+        Add a log-space score to the folder's, in SQL so views counted by other
+        workers are kept. Returns the folder's new log_score. Scores more than
+        30 apart keep the larger: the smaller term vanishes, and exp() underflow
+        is an error on PostgreSQL.
+        """
+        return self._scalar("""
+            INSERT INTO folder_popularity (folder_id, log_score, updated_at) VALUES (?, ?, ?)
+            ON CONFLICT (folder_id) DO UPDATE SET
+                log_score  = CASE
+                    WHEN excluded.log_score - folder_popularity.log_score > 30 THEN excluded.log_score
+                    WHEN folder_popularity.log_score - excluded.log_score > 30 THEN folder_popularity.log_score
+                    WHEN excluded.log_score > folder_popularity.log_score
+                    THEN excluded.log_score + ln(1 + exp(folder_popularity.log_score - excluded.log_score))
+                    ELSE folder_popularity.log_score + ln(1 + exp(excluded.log_score - folder_popularity.log_score))
+                END,
+                updated_at = excluded.updated_at
+            RETURNING log_score
+        """, (folderId, logScore, datetime.now().isoformat()), logScore)
+
+    def setMany(self, scores: dict) -> None:
+        now = datetime.now().isoformat()
+        self._writeMany(
+            "INSERT OR REPLACE INTO folder_popularity (folder_id, log_score, updated_at) VALUES (?, ?, ?)",
+            ((folderId, logScore, now) for folderId, logScore in scores.items())
+        )
+
+
+# ─────────────────────────────────────────────
+#  SETTINGS
+# ─────────────────────────────────────────────
+
+class SettingsRepo(Repo):
+    """bot_settings key/value pairs. Reads are cached; writes invalidate."""
+
+    def get(self, key: str, default=None):
+        value = self._cached(
+            key, lambda: self._scalar("SELECT value FROM bot_settings WHERE key=?", (key,))
+        )
+        return default if value is None else value
+
+    def set(self, key: str, value) -> None:
+        self.invalidate(key)
+        self._write("INSERT OR REPLACE INTO bot_settings (key, value) VALUES (?, ?)", (key, value))
+
+    def delete(self, key: str) -> None:
+        self.invalidate(key)
+        self._write("DELETE FROM bot_settings WHERE key=?", (key,))
+
+
+# ─────────────────────────────────────────────
+#  BROADCASTS
+# ─────────────────────────────────────────────
+
+class BroadcastRepo(Repo):
+
+    def create(self, code: str, createdBy: int, password, expiry, forwardable) -> int:
+        return self._insert("""
+            INSERT INTO broadcasts
+                (broadcast_code, created_by, created_at, password, expiry_minutes, forwardable, status)
+            VALUES (?, ?, ?, ?, ?, ?, 'sent')
+        """, (code, createdBy, datetime.now().isoformat(), password, expiry, forwardable))
+
+    def addFiles(self, broadcastId: int, files: list) -> None:
+        """files: the preview dicts collected while composing the broadcast."""
+        self._writeMany(
+            "INSERT INTO broadcast_files "
+            "(broadcast_id, file_id, file_type, text_content, storage_msg_id, file_unique_id) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    broadcastId, f.get("file_id"), f.get("file_type"), f.get("text_content"),
+                    f.get("storage_msg_id"), (f.get("media") or {}).get("file_unique_id"),
+                )
+                for f in files
+            ]
+        )
+
+    def setTotals(self, broadcastId: int, sent: int, failed: int) -> int:
+        return self._write(
+            "UPDATE broadcasts SET total_sent=?, total_failed=? WHERE id=?", (sent, failed, broadcastId)
+        )
+
+    def byCode(self, code: str):
+        """(id, expiry_minutes, forwardable) or None."""
+        return self._one(
+            "SELECT id, expiry_minutes, forwardable FROM broadcasts WHERE broadcast_code=?", (code,)
+        )
+
+    def creator(self, code: str):
+        return self._scalar("SELECT created_by FROM broadcasts WHERE broadcast_code=?", (code,))
+
+    def items(self, broadcastId: int) -> list:
+        return self._all(
+            "SELECT file_id, file_type, text_content, storage_msg_id FROM broadcast_files WHERE broadcast_id=?",
+            (broadcastId,)
+        )
+
+    def count(self) -> int:
+        return self._scalar("SELECT COUNT(*) FROM broadcasts", default=0)
+
+
+# ─────────────────────────────────────────────
+#  INBOX
+# ─────────────────────────────────────────────
+
+class InboxRepo(Repo):
+    """User → admin messages (user_messages) and admin → user replies (message_replies)."""
+
+    # ── User messages ────────────────────────────────────────────────────
+
+    def addMessage(self, msgId: str, user, recipientId, recipientIsSuper, files: list) -> None:
+        self._write("""
+            INSERT INTO user_messages
+                (user_id, username, first_name, message_id, sent_at, recipient_admin_id, recipient_is_super)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (
+            user.id, user.username, user.first_name,
+            msgId, datetime.now().isoformat(),
+            recipientId, recipientIsSuper
+        ))
+        self._writeMany("""
+            INSERT INTO user_message_files (message_id, file_id, file_type, text_content, file_unique_id)
+            VALUES (?, ?, ?, ?, ?)
+        """, [
+            (
+                msgId, fd.get("file_id"), fd.get("file_type"), fd.get("text_content"),
+                (fd.get("media") or {}).get("file_unique_id"),
+            )
+            for fd in files
+        ])
+
+    def messages(self, recipientId: int = None, limit: int = 20) -> list:
+        """Latest messages: all of them, or only those addressed to one admin."""
+        if recipientId is None:
+            return self._all("""
+                SELECT message_id, user_id, username, first_name, sent_at, status,
+                       recipient_admin_id, recipient_is_super
+                FROM user_messages ORDER BY sent_at DESC LIMIT ?
+            """, (limit,))
+        return self._all("""
+            SELECT message_id, user_id, username, first_name, sent_at, status,
+                   recipient_admin_id, recipient_is_super
+            FROM user_messages WHERE recipient_admin_id=?
+            ORDER BY sent_at DESC LIMIT ?
+        """, (recipientId, limit))
+
+    def _counter(self, kind: str, ownerId: int) -> tuple[int, int]:
+        """(total, unread) from inbox_counters, which triggers keep in step with the inbox tables."""
+        row = self._one("SELECT total, unread FROM inbox_counters WHERE kind=? AND owner_id=?", (kind, ownerId))
+        return (row[0], row[1]) if row else (0, 0)
+
+    def counts(self, recipientId: int = None) -> tuple[int, int]:
+        """(total, unread), overall or for one admin."""
+        return self._counter("all", 0) if recipientId is None else self._counter("admin", recipientId)
+
+    def replyCounts(self, userId: int) -> tuple[int, int]:
+        """(total, unread) of the replies sent to a user."""
+        return self._counter("user", userId)
+
+    def message(self, msgId: str):
+        """(user_id, username, first_name, sent_at, recipient_admin_id, recipient_is_super) or None."""
+        return self._one(
+            "SELECT user_id, username, first_name, sent_at, recipient_admin_id, recipient_is_super "
+            "FROM user_messages WHERE message_id=?",
+            (msgId,)
+        )
+
+    def messageFiles(self, msgId: str) -> list:
+        return self._all(
+            "SELECT file_id, file_type, text_content FROM user_message_files WHERE message_id=?", (msgId,)
+        )
+
+    def markRead(self, msgId: str) -> int:
+        """Returns 1 the first time a message is read, 0 after that."""
+        return self._write(
+            "UPDATE user_messages SET status='read', viewed_at=? WHERE message_id=? AND status='unread'",
+            (datetime.now().isoformat(), msgId)
+        )
+
+    def markAllRead(self, recipientId: int = None) -> int:
+        if recipientId is None:
+            return self._write("UPDATE user_messages SET status='read' WHERE status='unread'")
+        return self._write(
+            "UPDATE user_messages SET status='read' WHERE status='unread' AND recipient_admin_id=?",
+            (recipientId,)
+        )
+
+    # user_message_files rows go with their message (ON DELETE CASCADE, migration 10)
+
+    def deleteMessage(self, msgId: str) -> int:
+        return self._write("DELETE FROM user_messages WHERE message_id=?", (msgId,))
+
+    def clearMessages(self, recipientId: int = None) -> int:
+        """Delete every message, or only one admin's. Returns how many went."""
+        if recipientId is None:
+            return self._write("DELETE FROM user_messages")
+        return self._write("DELETE FROM user_messages WHERE recipient_admin_id=?", (recipientId,))
+
+    # ── Replies ──────────────────────────────────────────────────────────
+
+    def addReply(self, replyId: str, msgId: str, adminId: int, toUserId: int, content: str, files: list) -> None:
+        self._write("""
+            INSERT INTO message_replies
+                (reply_id, message_id, from_admin_id, to_user_id, content, sent_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (replyId, msgId, adminId, toUserId, content, datetime.now().isoformat()))
+        self._writeMany("""
+            INSERT INTO message_reply_files (reply_id, file_id, file_type, text_content, file_unique_id)
+            VALUES (?, ?, ?, ?, ?)
+        """, [
+            (
+                replyId, rf.get("file_id"), rf.get("file_type"), rf.get("text_content"),
+                (rf.get("media") or {}).get("file_unique_id"),
+            )
+            for rf in files
+        ])
+
+    def replies(self, userId: int, limit: int = 20) -> list:
+        """(reply_id, from_admin_id, content, sent_at, status) sent to a user, newest first."""
+        return self._all("""
+            SELECT reply_id, from_admin_id, content, sent_at, status
+            FROM message_replies WHERE to_user_id=?
+            ORDER BY sent_at DESC LIMIT ?
+        """, (userId, limit))
+
+    def reply(self, replyId: str, userId: int):
+        """(reply_id, from_admin_id, message_id, content, sent_at) if addressed to userId."""
+        return self._one(
+            "SELECT reply_id, from_admin_id, message_id, content, sent_at FROM message_replies "
+            "WHERE reply_id=? AND to_user_id=?",
+            (replyId, userId)
+        )
+
+    def replyFiles(self, replyId: str) -> list:
+        return self._all(
+            "SELECT file_id, file_type, text_content FROM message_reply_files WHERE reply_id=?", (replyId,)
+        )
+
+    def markReplyRead(self, replyId: str) -> int:
+        return self._write("UPDATE message_replies SET status='read' WHERE reply_id=?", (replyId,))
+
+    def deleteReply(self, replyId: str) -> int:
+        """Its message_reply_files rows follow by cascade."""
+        return self._write("DELETE FROM message_replies WHERE reply_id=?", (replyId,))
+
+
+# ─────────────────────────────────────────────
+#  POLLS / QUOTES / TRENDING
+# ─────────────────────────────────────────────
+
+class PollRepo(Repo):
+
+    def create(self, data: dict, createdBy: int, closesAt: str) -> int:
+        return self._insert("""
+            INSERT INTO polls (question, option_a, option_b, option_c, option_d,
+                               created_by, created_at, closes_at, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'open')
+        """, (
+            data.get("question"),
+            data.get("option_a"),
+            data.get("option_b"),
+            data.get("option_c"),
+            data.get("option_d"),
+            createdBy,
+            datetime.now().isoformat(),
+            closesAt,
+        ))
+
+    def get(self, pollId: int):
+        """(id, question, option_a..d, status, closes_at, created_at) or None."""
+        return self._one(
+            "SELECT id, question, option_a, option_b, option_c, option_d, status, closes_at, created_at "
+            "FROM polls WHERE id=?", (pollId,)
+        )
+
+    def listByStatus(self, status: str, limit: int = 10) -> list:
+        return self._all(
+            "SELECT id, question, created_at, closes_at FROM polls WHERE status=? ORDER BY created_at DESC LIMIT ?",
+            (status, limit)
+        )
+
+    def dueToClose(self) -> list:
+        return self._column("""
+            SELECT id FROM polls
+            WHERE status='open'
+            AND result_sent=0
+            AND datetime(closes_at) <= datetime('now')
+        """)
+
+    def count(self, status: str = None) -> int:
+        if status is None:
+            return self._scalar("SELECT COUNT(*) FROM polls", default=0)
+        return self._scalar("SELECT COUNT(*) FROM polls WHERE status=?", (status,), 0)
+
+    def close(self, pollId: int) -> int:
+        """1 if the poll was open, 0 if it had already been closed."""
+        return self._write("UPDATE polls SET status='closed' WHERE id=? AND status='open'", (pollId,))
+
+    def markResultSent(self, pollId: int) -> int:
+        return self._write("UPDATE polls SET result_sent=1 WHERE id=?", (pollId,))
+
+    def openIds(self) -> list:
+        return self._column("SELECT id FROM polls WHERE status='open'")
+
+    def openCloseTimes(self) -> list:
+        """(id, closes_at) for every open poll — restored as close jobs at startup."""
+        return self._all("SELECT id, closes_at FROM polls WHERE status='open'")
+
+    # ── Votes ────────────────────────────────────────────────────────────
+
+    def votes(self, pollId: int) -> list:
+        """(user_id, choice) for every vote cast; polltally.py counts them."""
+        return self._all("SELECT user_id, choice FROM poll_votes WHERE poll_id=?", (pollId,))
+
+    def addVotes(self, rows) -> None:
+        """rows: (poll_id, user_id, choice, voted_at). A vote already on record is kept."""
+        self._writeMany(
+            "INSERT OR IGNORE INTO poll_votes (poll_id, user_id, choice, voted_at) VALUES (?, ?, ?, ?)", rows
+        )
+
+
+class QuoteRepo(Repo):
+
+    def add(self, text: str, addedBy: int) -> int:
+        quoteId = self._insert(
+            "INSERT INTO quotes (text, added_by, added_at) VALUES (?, ?, ?)",
+            (text, addedBy, datetime.now().isoformat())
+        )
+        # Join every deck in progress at the end, rather than waiting for the next shuffle
+        self._write(
+            "INSERT INTO quote_deck (deck, position, quote_id) "
+            "SELECT deck, MAX(position) + 1, ? FROM quote_deck GROUP BY deck", (quoteId,)
+        )
+        return quoteId
+
+    def recent(self, limit: int = 15) -> list:
+        """(id, text, author, last_sent), newest first."""
+        return self._all(
+            "SELECT id, text, author, last_sent FROM quotes ORDER BY added_at DESC LIMIT ?", (limit,)
+        )
+
+    def ids(self) -> list:
+        return self._column("SELECT id FROM quotes")
+
+    def count(self) -> int:
+        return self._scalar("SELECT COUNT(*) FROM quotes", default=0)
+
+    def markSent(self, quoteId: int) -> int:
+        return self._write(
+            "UPDATE quotes SET last_sent=? WHERE id=?", (datetime.now().isoformat(), quoteId)
+        )
+
+    def delete(self, quoteId: int) -> int:
+        self._write("DELETE FROM quote_deck WHERE quote_id=?", (quoteId,))
+        return self._write("DELETE FROM quotes WHERE id=?", (quoteId,))
+
+    # ── Rotation decks ───────────────────────────────────────────────────
+
+    def popDeck(self, deck: str):
+        """Take the next (id, text, author) off a deck, or None if it is empty."""
+        row = self._one("""
+            SELECT d.position, q.id, q.text, q.author
+            FROM quote_deck d JOIN quotes q ON q.id = d.quote_id
+            WHERE d.deck=?
+            ORDER BY d.position LIMIT 1
+        """, (deck,))
+        if row is None:
+            return None
+        self._write("DELETE FROM quote_deck WHERE deck=? AND position=?", (deck, row[0]))
+        return row[1:]
+
+    def fillDeck(self, deck: str, quoteIds: list) -> None:
+        """quoteIds in the order they should be drawn."""
+        self._writeMany(
+            "INSERT INTO quote_deck (deck, position, quote_id) VALUES (?, ?, ?)",
+            ((deck, pos, qid) for pos, qid in enumerate(quoteIds))
+        )
+
+
+class QotdRunRepo(Repo):
+
+    def start(self, quoteId: int, source: str, audience: int, segments: str, windowMinutes: int) -> int:
+        return self._insert("""
+            INSERT INTO qotd_runs (quote_id, source, audience, segments, window_minutes, started_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (quoteId, source, audience, segments, windowMinutes, datetime.now().isoformat()))
+
+    def progress(self, runId: int, sent: int, failed: int) -> int:
+        return self._write("UPDATE qotd_runs SET sent=?, failed=? WHERE id=?", (sent, failed, runId))
+
+    def finish(self, runId: int, durationSeconds: float) -> int:
+        return self._write(
+            "UPDATE qotd_runs SET finished_at=?, duration_seconds=? WHERE id=?",
+            (datetime.now().isoformat(), round(durationSeconds, 1), runId)
+        )
+
+    def latest(self):
+        """(started_at, finished_at, audience, sent, failed, duration_seconds) of the newest run, or None."""
+        return self._one(
+            "SELECT started_at, finished_at, audience, sent, failed, duration_seconds "
+            "FROM qotd_runs ORDER BY started_at DESC LIMIT 1"
+        )
+
+
+class TrendingRepo(Repo):
+
+    def active(self) -> list:
+        """(id, folder name, label, expires_at) of unexpired entries in display order."""
+        return self._all("""
+            SELECT t.id, f.name, t.label, t.expires_at
+            FROM trending t JOIN folders f ON t.folder_id = f.id
+            WHERE t.expires_at IS NULL OR datetime(t.expires_at) > datetime('now')
+            ORDER BY t.sort_order ASC, t.added_at DESC
+        """)
+
+    def publicSnapshot(self) -> tuple:
+        """
+        (display name, newest active token or None) for each entry users may
+        see, in display order. One query, cached until the first trending
+        entry or token in it expires; trending, link and folder writes drop it.
+        """
+        hit = self._cache.get("public")
+        if hit and datetime.now() < hit[1]:
+            return hit[0]
+        rows = self._all("""
+            SELECT f.name, t.label, t.expires_at, l.token, l.expiry
+            FROM trending t JOIN folders f ON t.folder_id = f.id
+            LEFT JOIN links l ON l.id = (
+                SELECT id FROM links
+                WHERE folder_id = f.id AND revoked=0 AND datetime(expiry) > datetime('now')
+                ORDER BY created_at DESC LIMIT 1
+            )
+            WHERE (t.expires_at IS NULL OR datetime(t.expires_at) > datetime('now'))
+            AND f.is_secret = 0
+            ORDER BY t.sort_order ASC, t.added_at DESC
+        """)
+        validUntil = datetime.now() + timedelta(seconds=CACHE_TTL)
+        for _, _, expiresAt, _, linkExpiry in rows:
+            for value in (expiresAt, linkExpiry):
+                try:
+                    validUntil = min(validUntil, datetime.fromisoformat(value))
+                except (TypeError, ValueError):
+                    pass
+        snapshot = tuple((label or name, token) for name, label, _, token, _ in rows)
+        self._cache["public"] = (snapshot, validUntil)
+        return snapshot
+
+    def listAll(self) -> list:
+        """(id, folder name, label) including expired entries."""
+        return self._all("""
+            SELECT t.id, f.name, t.label
+            FROM trending t JOIN folders f ON t.folder_id = f.id
+            ORDER BY t.sort_order ASC, t.added_at DESC
+        """)
+
+    def add(self, folderId: int, label: str, addedBy: int, expiresAt, sortOrder: int = 0) -> int:
+        self.invalidate("public")
+        return self._insert("""
+            INSERT INTO trending (folder_id, label, added_by, added_at, expires_at, sort_order)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (folderId, label, addedBy, datetime.now().isoformat(), expiresAt, sortOrder))
+
+    def delete(self, trendingId: int) -> int:
+        self.invalidate("public")
+        return self._write("DELETE FROM trending WHERE id=?", (trendingId,))
+
+    def deleteFolder(self, folderId: int) -> int:
+        self.invalidate("public")
+        return self._write("DELETE FROM trending WHERE folder_id=?", (folderId,))
+
+    def clear(self) -> int:
+        self.invalidate("public")
+        return self._write("DELETE FROM trending")
+
+    def countActive(self) -> int:
+        return self._scalar(
+            "SELECT COUNT(*) FROM trending WHERE datetime(expires_at) > datetime('now')", default=0
+        )
+
+    def purgeExpired(self) -> int:
+        self.invalidate("public")
+        return self._write(
+            "DELETE FROM trending WHERE expires_at IS NOT NULL AND datetime(expires_at) <= datetime('now')"
+        )
+
+    def expiries(self) -> list:
+        """(id, expires_at) of every entry that expires."""
+        return self._all("SELECT id, expires_at FROM trending WHERE expires_at IS NOT NULL")
+
+    def deleteIds(self, trendingIds: list) -> int:
+        self.invalidate("public")
+        return self._write(f"DELETE FROM trending WHERE id IN ({_placeholders(trendingIds)})", trendingIds)
+
+
+# ─────────────────────────────────────────────
+#  OTP / SHORT LINKS
+# ─────────────────────────────────────────────
+
+class OtpRepo(Repo):
+
+    def issue(self, folderId: int, userId: int, digest: str, expiresAt: str) -> int:
+        """Revoke the user's pending codes for the folder and store a new one (hashed, see otpstore.py)."""
+        self._write(
+            "UPDATE folder_otps SET status='revoked' WHERE folder_id=? AND user_id=? AND status='pending'",
+            (folderId, userId)
+        )
+        return self._insert(
+            "INSERT INTO folder_otps (folder_id, user_id, code, created_at, expires_at, status)"
+            " VALUES (?, ?, ?, ?, ?, 'pending')",
+            (folderId, userId, digest, datetime.now().isoformat(), expiresAt)
+        )
+
+    def issueMany(self, folderId: int, codes: dict, expiresAt: str) -> dict:
+        """issue() for several users: {user_id: digest} -> {user_id: otp id}."""
+        userIds = list(codes)
+        self._write(
+            f"UPDATE folder_otps SET status='revoked' WHERE folder_id=? AND status='pending' "
+            f"AND user_id IN ({_placeholders(userIds)})",
+            [folderId] + userIds
+        )
+        now = datetime.now().isoformat()
+        return {
+            userId: self._insert(
+                "INSERT INTO folder_otps (folder_id, user_id, code, created_at, expires_at, status)"
+                " VALUES (?, ?, ?, ?, ?, 'pending')",
+                (folderId, userId, digest, now, expiresAt)
+            )
+            for userId, digest in codes.items()
+        }
+
+    def pendingAll(self) -> list:
+        """(id, folder_id, user_id, code, expires_at) of every pending code, oldest first."""
+        return self._all(
+            "SELECT id, folder_id, user_id, code, expires_at FROM folder_otps WHERE status='pending' ORDER BY id"
+        )
+
+    def pending(self, folderId: int, userId: int):
+        """(id, code, expires_at) of the user's newest pending code for a folder, or None."""
+        return self._one(
+            "SELECT id, code, expires_at FROM folder_otps WHERE folder_id=? AND user_id=? AND status='pending' "
+            "ORDER BY id DESC LIMIT 1",
+            (folderId, userId)
+        )
+
+    def setStatus(self, otpId: int, status: str) -> int:
+        return self._write("UPDATE folder_otps SET status=? WHERE id=?", (status, otpId))
+
+    def use(self, otpId: int) -> int:
+        """Mark a pending code used. 0 if it was no longer pending."""
+        return self._write("UPDATE folder_otps SET status='used' WHERE id=? AND status='pending'", (otpId,))
+
+    def expiries(self) -> list:
+        """(id, expires_at) of every pending code."""
+        return self._all("SELECT id, expires_at FROM folder_otps WHERE status='pending'")
+
+    def expire(self, otpIds: list) -> int:
+        return self._write(
+            f"UPDATE folder_otps SET status='expired' WHERE status='pending' AND id IN ({_placeholders(otpIds)})",
+            otpIds
+        )
+
+
+class ShortLinkRepo(Repo):
+
+    def add(self, code: str, url: str, createdBy: int) -> int:
+        return self._write("""
+            INSERT INTO shortened_links (short_code, original_url, created_by, created_at, clicks)
+            VALUES (?, ?, ?, ?, 0)
+        """, (code, url, createdBy, datetime.now().isoformat()))
+
+    def url(self, code: str):
+        return self._scalar("SELECT original_url FROM shortened_links WHERE short_code=?", (code,))
+
+    def click(self, code: str) -> int:
+        return self._write("UPDATE shortened_links SET clicks=clicks+1 WHERE short_code=?", (code,))
+
+    def byCreator(self, userId: int, limit: int = 20) -> list:
+        return self._all("""
+            SELECT short_code, original_url, clicks, created_at
+            FROM shortened_links
+            WHERE created_by=?
+            ORDER BY created_at DESC LIMIT ?
+        """, (userId, limit))
+
+    def totals(self, userId: int) -> tuple[int, int]:
+        """(links, clicks) created by a user."""
+        return self._one(
+            "SELECT COUNT(*), COALESCE(SUM(clicks),0) FROM shortened_links WHERE created_by=?", (userId,)
+        )
+
+
+# ─────────────────────────────────────────────
+#  INSTANCES
+# ─────────────────────────────────────────────
+
+adminRepo      = AdminRepo()
+banRepo        = BanRepo()
+subscriberRepo = SubscriberRepo()
+folderRepo     = FolderRepo()
+fileRepo       = FileRepo()
+mediaRepo      = MediaRepo()
+linkRepo       = LinkRepo()
+logRepo        = LogRepo()
+settingsRepo   = SettingsRepo()
+popularityRepo = PopularityRepo()
+broadcastRepo  = BroadcastRepo()
+inboxRepo      = InboxRepo()
+pollRepo       = PollRepo()
+quoteRepo      = QuoteRepo()
+qotdRunRepo    = QotdRunRepo()
+trendingRepo   = TrendingRepo()
+otpRepo        = OtpRepo()
+shortLinkRepo  = ShortLinkRepo()
@@ -0,0 +1,244 @@
+import argparse
+import bisect
+import itertools
+import logging
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+from migrations import migrate
+
+# ─────────────────────────────────────────────
+#  SYNTHETIC DATASET
+# ─────────────────────────────────────────────
+
+# Builds a scaled, realistic copy of the bot's database for benchmarks and
+# query plan checks. Row counts and distributions are plain dicts; every key
+# is also a command-line flag:
+#
+#     python seed.py /tmp/bench.db                           # production-sized
+#     python seed.py /tmp/small.db --scale 0.01              # 1% of everything
+#     python seed.py /tmp/bench.db --logs 500000 --banned_rate 0.1
+#
+# The output is always a new SQLite file with the current migrations applied.
+
+SCALE = {
+    "subscribers":      100_000,
+    "folders":          5_000,
+    "logs":             5_000_000,
+    "files_per_folder": 40,        # mean; sizes are skewed, a few folders are huge
+    "links_per_folder": 4,
+    "messages":         20_000,
+    "admins":           10,
+    "otps":             50_000,
+    "trending":         10,
+    "polls":            200,
+    "quotes":           500,
+}
+
+DISTRIBUTIONS = {
+    "folder_zipf":    1.1,     # popularity skew: logs, links and trending favour low folder ids
+    "user_zipf":      0.8,     # a few users generate most of the traffic
+    "history_days":   365,     # timestamps are spread over this many days back
+    "banned_rate":    0.02,
+    "verified_rate":  0.6,
+    "secret_rate":    0.05,
+    "otp_rate":       0.03,    # folders that require an OTP
+    "revoked_rate":   0.3,
+    "duplicate_rate": 0.1,     # files whose media already exists in another folder
+    "unread_rate":    0.4,
+}
+
+CHUNK = 50_000
+
+_FILE_TYPES = ["video", "video", "photo", "photo", "document", "text"]
+_STATUSES   = ["pending", "used", "revoked", "expired"]
+
+
+class _Sampler:
+    """Zipf-distributed ids 1..n, drawn in bulk with one bisect per sample."""
+
+    def __init__(self, rnd: random.Random, n: int, exponent: float):
+        self._rnd = rnd
+        self._n   = n
+        self._cum = list(itertools.accumulate(1 / (i ** exponent) for i in range(1, n + 1)))
+
+    def __call__(self) -> int:
+        return min(bisect.bisect(self._cum, self._rnd.random() * self._cum[-1]) + 1, self._n)
+
+
+def _insert(conn, sql: str, rows) -> int:
+    """executemany in CHUNK-sized batches so large tables never sit in memory."""
+    total = 0
+    rows  = iter(rows)
+    while batch := list(itertools.islice(rows, CHUNK)):
+        conn.executemany(sql, batch)
+        total += len(batch)
+    return total
+
+
+def seedDatabase(conn, scale: dict = None, dist: dict = None, seed: int = 7) -> dict:
+    """
+    Fill an already-migrated database. scale / dist override SCALE and
+    DISTRIBUTIONS key by key. Returns the number of rows written per table.
+    """
+    scale = {**SCALE, **(scale or {})}
+    dist  = {**DISTRIBUTIONS, **(dist or {})}
+    rnd   = random.Random(seed)
+    now   = datetime.now()
+    span  = dist["history_days"] * 86400
+
+    def ago() -> str:
+        return (now - timedelta(seconds=rnd.random() * span)).isoformat()
+
+    def ahead(days: float) -> str:
+        return (now + timedelta(days=rnd.uniform(-days, days))).isoformat()
+
+    nUsers   = max(scale["subscribers"], 1)
+    nFolders = max(scale["folders"], 1)
+    folder   = _Sampler(rnd, nFolders, dist["folder_zipf"])
+    user     = _Sampler(rnd, nUsers, dist["user_zipf"])
+    userId   = lambda i: 100_000 + i
+    counts   = {}
+
+    counts["admins"] = _insert(conn, """
+        INSERT OR IGNORE INTO admins (user_id, username, added_by, added_at, is_super_admin)
+        VALUES (?, ?, ?, ?, ?)
+    """, ((10 + i, f"admin{i}", 10, ago(), int(i == 0)) for i in range(scale["admins"])))
+
+    counts["subscribers"] = _insert(conn, """
+        INSERT INTO subscribers
+            (user_id, username, first_name, subscribed_at, last_active, banned, phone_verified, phone_number)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        (userId(i), f"user{i}" if rnd.random() < 0.7 else None, f"User {i}", ago(), ago(),
+         int(rnd.random() < dist["banned_rate"]), verified := int(rnd.random() < dist["verified_rate"]),
+         f"+1555{i:07d}" if verified else None)
+        for i in range(1, nUsers + 1)
+    ))
+    conn.execute("""
+        INSERT INTO banned_users (user_id, username, reason, banned_at, banned_by)
+        SELECT user_id, username, 'seeded', subscribed_at, 10 FROM subscribers WHERE banned=1
+    """)
+
+    counts["folders"] = _insert(conn, """
+        INSERT INTO folders (name, created_at, pinned, is_secret, secret_code, otp_required, otp_expiry_minutes)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (
+        (f"Folder {i:05d}", ago(), int(i <= 5), secret := int(rnd.random() < dist["secret_rate"]),
+         f"S{i:06d}" if secret else None, otp := int(rnd.random() < dist["otp_rate"]), 10 if otp else None)
+        for i in range(1, nFolders + 1)
+    ))
+
+    # Media first so the reference-count triggers have rows to bump
+    nFiles = nFolders * scale["files_per_folder"]
+    nMedia = max(int(nFiles * (1 - dist["duplicate_rate"])), 1)
+    counts["media"] = _insert(conn, """
+        INSERT INTO media (file_unique_id, file_id, file_type, file_size, first_seen, ref_count)
+        VALUES (?, ?, ?, ?, ?, 0)
+    """, ((f"U{i}", f"F{i}", rnd.choice(_FILE_TYPES), int(rnd.lognormvariate(14, 1.5)), ago())
+          for i in range(nMedia)))
+
+    def files():
+        for _ in range(nFiles):
+            m = rnd.randrange(nMedia)
+            yield (folder(), f"F{m}", rnd.choice(_FILE_TYPES), int(rnd.lognormvariate(14, 1.5)), ago(), None, f"U{m}")
+    counts["files"] = _insert(conn, """
+        INSERT INTO files (folder_id, file_id, file_type, file_size, uploaded_at, text_content, file_unique_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, files())
+
+    counts["links"] = _insert(conn, """
+        INSERT INTO links (folder_id, token, expiry, revoked, created_at, access_count, single_use)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (
+        (folder(), f"tok{i:08d}", ahead(30), int(rnd.random() < dist["revoked_rate"]), ago(),
+         int(rnd.expovariate(1 / 20)), int(rnd.random() < 0.2))
+        for i in range(nFolders * scale["links_per_folder"])
+    ))
+
+    counts["logs"] = _insert(conn, """
+        INSERT INTO logs (user_id, username, folder_id, accessed_at) VALUES (?, ?, ?, ?)
+    """, ((userId(u := user()), f"user{u}", folder(), ago()) for _ in range(scale["logs"])))
+
+    counts["user_messages"] = _insert(conn, """
+        INSERT INTO user_messages
+            (user_id, username, first_name, message_id, sent_at, status, recipient_admin_id, recipient_is_super)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (
+        (userId(u := user()), f"user{u}", f"User {u}", f"MSG{i:08d}", ago(),
+         "unread" if rnd.random() < dist["unread_rate"] else "read", 10 + (a := rnd.randrange(scale["admins"] or 1)),
+         int(a == 0))
+        for i in range(scale["messages"])
+    ))
+
+    counts["folder_otps"] = _insert(conn, """
+        INSERT INTO folder_otps (folder_id, user_id, code, created_at, expires_at, status)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, ((folder(), userId(user()), f"{rnd.randrange(10 ** 6):06d}", ago(), ahead(1), rnd.choice(_STATUSES))
+          for _ in range(scale["otps"])))
+
+    counts["trending"] = _insert(conn, """
+        INSERT INTO trending (folder_id, label, added_by, added_at, expires_at, sort_order)
+        VALUES (?, ?, 10, ?, ?, ?)
+    """, ((i % nFolders + 1, None, ago(), ahead(7) if i % 2 else None, i) for i in range(scale["trending"])))
+
+
+    counts["polls"] = _insert(conn, """
+        INSERT INTO polls (question, option_a, option_b, created_by, created_at, closes_at, status, result_sent)
+        VALUES (?, 'Yes', 'No', 10, ?, ?, ?, ?)
+    """, ((f"Poll {i}?", ago(), ahead(2), s := rnd.choice(["open", "closed"]), int(s == "closed"))
+          for i in range(scale["polls"])))
+
+    counts["quotes"] = _insert(conn, """
+        INSERT INTO quotes (text, author, added_by, added_at, last_sent) VALUES (?, ?, 10, ?, ?)
+    """, ((f"Quote number {i}", f"Author {i % 37}", ago(), ago() if rnd.random() < 0.5 else None)
+          for i in range(scale["quotes"])))
+
+    conn.commit()
+    conn.execute("ANALYZE")
+    return counts
+
+
+def _scaled(scale: dict, factor: float) -> dict:
+    fixed = {"files_per_folder", "links_per_folder", "admins", "trending"}
+    return {k: v if k in fixed else max(int(v * factor), 1) for k, v in scale.items()}
+
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build a synthetic bot database.")
+    parser.add_argument("path", help="SQLite file to create (must not exist)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every row count")
+    parser.add_argument("--seed", type=int, default=7)
+    for key, value in {**SCALE, **DISTRIBUTIONS}.items():
+        parser.add_argument(f"--{key}", type=type(value), default=None)
+    args = parser.parse_args()
+
+    if os.path.exists(args.path):
+        parser.error(f"{args.path} already exists")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    scale = _scaled(SCALE, args.scale)
+    scale.update({k: getattr(args, k) for k in SCALE if getattr(args, k) is not None})
+    dist  = {k: getattr(args, k) for k in DISTRIBUTIONS if getattr(args, k) is not None}
+
+    conn = sqlite3.connect(args.path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    migrate(conn)
+
+    started = time.perf_counter()
+    counts  = seedDatabase(conn, scale, dist, args.seed)
+    conn.close()
+    for table, n in counts.items():
+        print(f"{table:<14} {n:>10,}")
+    print(f"Seeded {args.path} in {time.perf_counter() - started:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import asyncio
+import contextlib
+import logging
+
+from telegram.error import Forbidden, TelegramError, TimedOut  # type: ignore
+
+from config import STORAGE_CHANNEL_ID
+from dispatcher import outboundLane, DELIVERY
+
+# copyMessages / deleteMessages accept at most this many ids per call
+BATCH_LIMIT = 100
+
+
+# ─────────────────────────────────────────────
+#  MIRROR
+# ─────────────────────────────────────────────
+
+def storageEnabled() -> bool:
+    return STORAGE_CHANNEL_ID != 0
+
+
+async def mirrorToStorage(bot, fileId, fileType: str, textContent) -> int | None:
+    """Post one item to the storage channel and return its message id."""
+    if not storageEnabled():
+        return None
+    try:
+        with outboundLane(DELIVERY):
+            if fileType == "text":
+                m = await bot.send_message(STORAGE_CHANNEL_ID, textContent)
+            elif fileType == "video":
+                m = await bot.send_video(STORAGE_CHANNEL_ID, fileId, has_spoiler=True)
+            elif fileType == "photo":
+                m = await bot.send_photo(STORAGE_CHANNEL_ID, fileId, has_spoiler=True)
+            else:
+                m = await bot.send_document(STORAGE_CHANNEL_ID, fileId)
+        return m.message_id
+    except Exception as e:
+        logging.error(f"mirrorToStorage: {e}")
+        return None
+
+
+# ─────────────────────────────────────────────
+#  SEND
+# ─────────────────────────────────────────────
+
+async def sendItem(bot, chatId: int, fileId, fileType: str, textContent, protect: bool = False) -> int:
+    """Re-send a single item by file_id. Returns the new message id."""
+    if fileType == "text":
+        m = await bot.send_message(chatId, textContent)
+    elif fileType == "video":
+        m = await bot.send_video(chatId, fileId, protect_content=protect, has_spoiler=True)
+    elif fileType == "photo":
+        m = await bot.send_photo(chatId, fileId, protect_content=protect, has_spoiler=True)
+    else:
+        m = await bot.send_document(chatId, fileId, protect_content=protect)
+    return m.message_id
+
+
+def _batches(items: list) -> list:
+    """
+    Split items into runs: consecutive mirrored items (increasing storage ids,
+    at most BATCH_LIMIT) become one copyMessages call, the rest go one by one.
+    """
+    runs, current = [], []
+    for item in items:
+        storageId = item[3] if storageEnabled() else None
+        if storageId and current and len(current) < BATCH_LIMIT and storageId > current[-1][3]:
+            current.append(item)
+            continue
+        if current:
+            runs.append(current)
+            current = []
+        if storageId:
+            current = [item]
+        else:
+            runs.append([item])
+    if current:
+        runs.append(current)
+    return runs
+
+
+async def _copyRun(bot, chatId: int, run: list, protect: bool, sentIds: list) -> None:
+    """
+    copyMessages for one run, adding the new ids to sentIds. The request is
+    shielded: if the delivery is cancelled meanwhile, the batch already on its
+    way is waited for and its ids kept, so auto-delete still finds them.
+    """
+    request = asyncio.ensure_future(
+        bot.copy_messages(chatId, STORAGE_CHANNEL_ID, [item[3] for item in run], protect_content=protect)
+    )
+    try:
+        copied = await asyncio.shield(request)
+    except asyncio.CancelledError:
+        with contextlib.suppress(Exception):
+            sentIds.extend(mid.message_id for mid in await request)
+        raise
+    sentIds.extend(mid.message_id for mid in copied)
+
+
+async def sendItems(bot, chatId: int, items: list, protect: bool = False, sentIds: list = None) -> list[int]:
+    """
+    Deliver (file_id, file_type, text_content, storage_msg_id) items in order.
+    Mirrored items are copied from the storage channel in bulk; anything else,
+    or a batch that fails, falls back to per-item sends. A batch that times out
+    may still have been delivered, so sending stops there rather than risk
+    duplicates; the caller sees fewer ids than items.
+
+    Returns the ids of every message sent so callers can auto-delete them.
+    Pass sentIds to collect them as they go, e.g. when the send may be cancelled.
+    """
+    if sentIds is None:
+        sentIds = []
+    for run in _batches(items):
+        if run[0][3] and storageEnabled():
+            try:
+                await _copyRun(bot, chatId, run, protect, sentIds)
+                continue
+            except TimedOut as e:
+                logging.error(f"sendItems copy_messages chat={chatId}: {e}; stopping")
+                return sentIds
+            except Forbidden:
+                raise
+            except TelegramError as e:
+                logging.error(f"sendItems copy_messages chat={chatId}: {e}")
+
+        for fileId, fileType, textContent, _ in run:
+            try:
+                sentIds.append(await sendItem(bot, chatId, fileId, fileType, textContent, protect))
+            except Forbidden:
+                raise
+            except Exception as e:
+                logging.error(f"sendItems chat={chatId}: {e}")
+    return sentIds
@@ -0,0 +1,150 @@
+import logging
+import sqlite3
+from datetime import datetime
+
+from config import conn
+from db import savepoint
+from repos import fileRepo, folderRepo, mediaRepo
+
+# Buffered rows are written once this many are pending, or FLUSH_INTERVAL
+# seconds after the first one arrived — whichever comes first.
+FLUSH_SIZE     = 50
+FLUSH_INTERVAL = 5
+
+# Album parts arrive as separate updates a few hundred ms apart; wait this
+# long after the last part before acknowledging the whole album.
+ALBUM_ACK_DELAY = 1.5
+
+
+# ─────────────────────────────────────────────
+#  UPLOAD SESSION
+# ─────────────────────────────────────────────
+
+class UploadSession:
+    """
+    One admin's in-progress upload into a folder. Keeps the folder id so it is
+    looked up once, buffers file rows for a single executemany, and tallies
+    album parts so each media group gets one reply instead of one per file.
+    Media already in the folder (same file_unique_id) is skipped.
+    """
+
+    def __init__(self, folderId: int, folderName: str):
+        self.folderId   = folderId
+        self.folderName = folderName
+        self.received   = 0
+        self.saved      = 0
+        self.skipped    = 0
+
+        self._rows     = []
+        self._media    = []
+        self._mediaIds = mediaRepo.idsInFolder(folderId)
+        self._albums   = {}
+        self._timer    = None
+
+    # ── Buffering ────────────────────────────────────────────────────────
+
+    def isDuplicate(self, media: dict | None) -> bool:
+        return bool(media) and media["file_unique_id"] in self._mediaIds
+
+    def add(self, jobQueue, messageId: int, fileId, fileType: str, fileSize, textContent, storageId,
+            media: dict | None = None) -> None:
+        uniqueId = media["file_unique_id"] if media else None
+        self._rows.append(
+            (messageId, fileId, fileType, fileSize, datetime.now().isoformat(), textContent, storageId, uniqueId)
+        )
+        if media:
+            self._media.append(media)
+            self._mediaIds.add(uniqueId)
+        self.received += 1
+        if len(self._rows) >= FLUSH_SIZE:
+            self.flush()
+        elif self._timer is None and jobQueue:
+            self._timer = jobQueue.run_once(_flushJob, FLUSH_INTERVAL, data=self)
+
+    def flush(self) -> bool:
+        """Write every buffered row. Rows stay buffered if the write fails."""
+        if self._timer:
+            self._timer.schedule_removal()
+            self._timer = None
+        if not self._rows:
+            return True
+        # Keep the chat order whatever order the updates were handled in
+        rows = sorted(self._rows)
+        try:
+            with savepoint(conn, "upload_flush"):
+                mediaRepo.register(self._media)
+                fileRepo.addMany(self.folderId, [row[1:] for row in rows])
+            conn.commit()
+        except sqlite3.Error as e:
+            logging.error(f"UploadSession.flush folder={self.folderId}: {e}")
+            return False
+        self.saved += len(rows)
+        self._rows.clear()
+        self._media.clear()
+        return True
+
+    # ── Album acknowledgement ────────────────────────────────────────────
+
+    def queueAlbumAck(self, jobQueue, chatId: int, mediaGroupId: str, duplicate: bool = False) -> None:
+        """Count an album part and (re)arm the single reply for that album."""
+        saved, skipped = self._albums.get(mediaGroupId, (0, 0))
+        self._albums[mediaGroupId] = (saved, skipped + 1) if duplicate else (saved + 1, skipped)
+        name = f"upload_album_{chatId}_{mediaGroupId}"
+        for job in jobQueue.get_jobs_by_name(name):
+            job.schedule_removal()
+        jobQueue.run_once(
+            _albumAckJob, ALBUM_ACK_DELAY, chat_id=chatId, name=name, data=(self, mediaGroupId),
+        )
+
+    def popAlbum(self, mediaGroupId: str) -> tuple[int, int]:
+        return self._albums.pop(mediaGroupId, (0, 0))
+
+    def close(self, jobQueue, chatId: int) -> bool:
+        """END typed: drop pending album replies and write what is left."""
+        for mediaGroupId in list(self._albums):
+            for job in jobQueue.get_jobs_by_name(f"upload_album_{chatId}_{mediaGroupId}"):
+                job.schedule_removal()
+        self._albums.clear()
+        return self.flush()
+
+
+def getSession(context, folderName: str, folderId: int = None) -> UploadSession | None:
+    """Return the session for the current upload, creating it on first use."""
+    session = context.user_data.get("upload_session")
+    if session and session.folderName == folderName:
+        return session
+    if folderId is None:
+        folderId = folderRepo.idByName(folderName)
+        if folderId is None:
+            return None
+    session = UploadSession(folderId, folderName)
+    context.user_data["upload_session"] = session
+    return session
+
+
+# ─────────────────────────────────────────────
+#  JOBS
+# ─────────────────────────────────────────────
+
+async def _flushJob(context):
+    session = context.job.data
+    session._timer = None
+    if not session.flush():
+        session._timer = context.job_queue.run_once(_flushJob, FLUSH_INTERVAL, data=session)
+
+
+async def _albumAckJob(context):
+    session, mediaGroupId = context.job.data
+    parts, skipped = session.popAlbum(mediaGroupId)
+    if not parts and not skipped:
+        return
+    dupes = f"  |  {skipped} already in folder" if skipped else ""
+    try:
+        await context.bot.send_message(
+            context.job.chat_id,
+            f"<b>ALBUM received</b>  |  {parts} item(s){dupes}  |  {session.received} file(s) total\n\n"
+            "Send more files or type <code>END</code> to finish.",
+            parse_mode="HTML",
+        )
+    except Exception as e:
+        logging.error(f"_albumAckJob: {e}")